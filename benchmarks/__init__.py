@@ -0,0 +1,6 @@
+"""Performance benchmarks for the loader, validator and tool dispatch.
+
+Run individual benchmarks from the repository root, e.g.
+``python -m benchmarks.bench_yaml``, or the whole suite with a baseline
+check via ``python -m benchmarks.suite --check``.
+"""
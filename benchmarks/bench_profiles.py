@@ -0,0 +1,110 @@
+"""Measure streaming validation and skill lookups on a large profile catalog.
+
+Writes ``--profiles`` copies of the profiles in ``schemas/agent_schema.json``
+(with fresh agent and skill IDs) to ``.cache/bench-profiles.json``, then
+streams it once without validation, once validating and indexing, and looks
+up ``--lookups`` random skills.  Each phase runs in a fresh interpreter so
+the reported peak RSS belongs to that phase alone.
+
+Usage::
+
+    python -m benchmarks.bench_profiles [--profiles 30000] [--lookups 1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import loader
+import profiles
+
+
+DEFAULT_OUTPUT = loader.BASE_PATH / ".cache" / "bench-profiles.json"
+
+_PHASE = """
+import json, os, random, resource, sys, time
+import profiles
+path, phase, lookups = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+if phase == "parse":
+    count = sum(1 for _ in profiles.ProfileReader(path).records())
+else:
+    db_path = path + ".sqlite3"
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    index = profiles.ProfileIndex([path], db_path=db_path)
+    count = len(index.refresh(profiles.ProfileValidator(), force=True))
+seconds = time.perf_counter() - start
+result = {"seconds": seconds, "count": count, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+if phase == "index" and lookups:
+    ids = random.Random(0).sample(index.skill_ids(), min(lookups, len(index.skill_ids())))
+    start = time.perf_counter()
+    for skill_id in ids:
+        index.lookup(skill_id)
+    result["lookup_s"] = (time.perf_counter() - start) / len(ids)
+print(json.dumps(result))
+"""
+
+
+def generate(output: Path, count: int) -> int:
+    """Write *count* profiles to *output*; returns the file size in bytes."""
+
+    source = profiles.loads((loader.BASE_PATH / "schemas" / "agent_schema.json").read_bytes())
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as handle:
+        handle.write("[")
+        for number in range(count):
+            profile = dict(source[number % len(source)])
+            letters = "".join(chr(65 + (number // 26**place) % 26) for place in range(3))
+            profile["Agent_ID"] = agent_id = f"{letters}-{number // 26**3 % 1000:03d}"
+            profile["Skills"] = [
+                dict(skill, Skill_ID=f"{agent_id}-T{position}") for position, skill in enumerate(profile["Skills"], 1)
+            ]
+            handle.write((",\n" if number else "") + json.dumps(profile, ensure_ascii=False, indent=2))
+        handle.write("]")
+    return output.stat().st_size
+
+
+def _phase(path: Path, phase: str, lookups: int) -> Dict[str, float]:
+    completed = subprocess.run(
+        [sys.executable, "-c", _PHASE, str(path), phase, str(lookups)],
+        cwd=loader.BASE_PATH,
+        check=True,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=str(loader.BASE_PATH)),
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(count: int = 30000, lookups: int = 1000, output: Path = DEFAULT_OUTPUT) -> Dict[str, Dict[str, float]]:
+    size = generate(output, count)
+    results = {phase: _phase(output, phase, lookups) for phase in ("parse", "index")}
+    print(f"{count} profiles, {size / 1e6:.1f} MB")
+    print(f"{'phase':<18} {'seconds':>8} {'MB/s':>8} {'peak RSS':>10}")
+    for phase, label in (("parse", "stream"), ("index", "validate+index")):
+        row = results[phase]
+        print(f"{label:<18} {row['seconds']:8.2f} {size / 1e6 / row['seconds']:8.1f} {row['rss_mb']:8.1f}MB")
+    if "lookup_s" in results["index"]:
+        print(f"lookup             {results['index']['lookup_s'] * 1e6:8.1f}us per skill")
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=30000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    options = parser.parse_args(argv)
+    run(options.profiles, options.lookups, options.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
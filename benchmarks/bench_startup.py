@@ -0,0 +1,83 @@
+"""Measure the import cost the lazy tool registry removes.
+
+Each scenario runs in a fresh interpreter ``--runs`` times; the median time
+spent inside the scenario (after interpreter start-up) and the number of
+modules it imported are reported:
+
+* ``registry``: ``import tool_map`` only,
+* ``one_tool``: import the registry and resolve a single stub tool,
+* ``all_tools``: resolve every entry point, which is what importing
+  ``tool_map`` cost before the registry became lazy.
+
+Usage::
+
+    python -m benchmarks.bench_startup [--runs 15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+import loader
+
+
+_SCENARIOS: Dict[str, str] = {
+    "registry": "import tool_map",
+    "one_tool": "import tool_map; tool_map.TOOL_MAP['write_python']",
+    "all_tools": "import tool_map; [tool_map.TOOL_MAP[name] for name in tool_map.ENTRY_POINTS]",
+}
+
+_HARNESS = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": len(set(sys.modules) - before)}}))
+"""
+
+
+def _run_once(code: str) -> Dict[str, float]:
+    completed = subprocess.run(
+        [sys.executable, "-c", _HARNESS.format(code=code)],
+        cwd=loader.BASE_PATH,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int = 15) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, code in _SCENARIOS.items():
+        samples = [_run_once(code) for _ in range(runs)]
+        results[name] = {
+            "median_s": statistics.median(sample["seconds"] for sample in samples),
+            "modules": samples[-1]["modules"],
+        }
+
+    print(f"Fresh interpreter per run, median of {runs} runs")
+    print(f"{'scenario':<12} {'import time':>12} {'modules':>8}")
+    for name, row in results.items():
+        print(f"{name:<12} {row['median_s'] * 1e3:10.1f}ms {row['modules']:8d}")
+    saved = results["all_tools"]["median_s"] - results["registry"]["median_s"]
+    print(f"Lazy registry saves {saved * 1e3:.1f}ms per process that imports tool_map without calling every tool.")
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    options = parser.parse_args(argv)
+    run(options.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
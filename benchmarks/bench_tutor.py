@@ -0,0 +1,73 @@
+"""Measure answer-scoring throughput for a synthetic tutor cohort.
+
+Builds ``--learners`` x ``--questions`` answers from the shared question bank
+(correct, partial and off-topic answers in equal parts) and scores them one
+call per answer and as a single batch.  The best of ``--rounds`` rounds is
+reported in answers per second.
+
+Usage::
+
+    python -m benchmarks.bench_tutor [--learners 200] [--questions 10] [--rounds 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from tools import quiz
+
+
+def _cohort(bank: quiz.QuestionBank, learners: int, questions: int, seed: int = 0) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(learners):
+        for question in rng.sample(bank.questions, min(questions, len(bank.questions))):
+            kind = rng.randrange(3)
+            if kind == 0:
+                answer = question.answer
+            elif kind == 1:
+                words = question.answer.split()
+                answer = " ".join(words[: len(words) // 2])
+            else:
+                answer = rng.choice(bank.questions).answer
+            pairs.append((question.id, answer))
+    return pairs
+
+
+def run(learners: int = 200, questions: int = 10, rounds: int = 5) -> Dict[str, float]:
+    bank = quiz.question_bank()
+    pairs = _cohort(bank, learners, questions)
+    timings = {"per_call": float("inf"), "batch": float("inf")}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for pair in pairs:
+            bank.evaluate([pair])
+        timings["per_call"] = min(timings["per_call"], time.perf_counter() - start)
+        start = time.perf_counter()
+        bank.evaluate(pairs)
+        timings["batch"] = min(timings["batch"], time.perf_counter() - start)
+
+    backend = "numpy" if quiz.np is not None else "pure-python"
+    print(f"{len(pairs)} answers ({learners} learners x {questions} questions), {backend}, best of {rounds} rounds")
+    print(f"{'mode':<10} {'seconds':>10} {'answers/s':>12}")
+    for name, seconds in timings.items():
+        print(f"{name:<10} {seconds:10.4f} {len(pairs) / seconds:12.0f}")
+    return {name: len(pairs) / seconds for name, seconds in timings.items()}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--learners", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    options = parser.parse_args(argv)
+    run(options.learners, options.questions, options.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Compare the fallback YAML parser against the legacy tokenizer and PyYAML.
+
+Every ``*.yaml`` file in the repository is parsed ``--repeat`` times by each
+parser; the best total over ``--rounds`` rounds is reported.  Files the
+legacy parser rejects are excluded from its total and counted separately.
+
+Usage::
+
+    python -m benchmarks.bench_yaml [--repeat 20] [--rounds 15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import loader
+from benchmarks import legacy_yaml
+
+
+def _repo_documents() -> List[Tuple[Path, str]]:
+    documents = []
+    for path in sorted(loader.BASE_PATH.rglob("*.yaml")):
+        if any(part.startswith(".") or part == "node_modules" for part in path.relative_to(loader.BASE_PATH).parts):
+            continue
+        documents.append((path, path.read_text(encoding="utf-8")))
+    return documents
+
+
+def _parsers() -> Dict[str, Callable[[str], object]]:
+    parsers: Dict[str, Callable[[str], object]] = {
+        "legacy_fallback": legacy_yaml._fallback_yaml_load,
+        "fallback": loader._fallback_yaml_load,
+    }
+    if loader.yaml is not None:
+        parsers["pyyaml_safe_load"] = loader.yaml.safe_load
+        c_loader = getattr(loader.yaml, "CSafeLoader", None)
+        if c_loader is not None:
+            parsers["pyyaml_csafe_load"] = lambda text: loader.yaml.load(text, Loader=c_loader)
+    return parsers
+
+
+def _supported(parse: Callable[[str], object], documents: List[Tuple[Path, str]]) -> Tuple[List[str], List[Path]]:
+    accepted, rejected = [], []
+    for path, text in documents:
+        try:
+            parse(text)
+        except Exception:  # the legacy parser rejects block scalars and more
+            rejected.append(path)
+        else:
+            accepted.append(text)
+    return accepted, rejected
+
+
+def _time_once(parse: Callable[[str], object], texts: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            parse(text)
+    return time.perf_counter() - start
+
+
+def run(repeat: int = 20, rounds: int = 15) -> Dict[str, Dict[str, float]]:
+    documents = _repo_documents()
+    parsers = _parsers()
+    _, legacy_rejected = _supported(parsers["legacy_fallback"], documents)
+    rejected = set(legacy_rejected)
+    common = [text for path, text in documents if path not in rejected]
+    every = [text for _, text in documents]
+
+    # Parsers are interleaved within each round so machine noise hits them alike.
+    results: Dict[str, Dict[str, float]] = {name: {"common_s": float("inf")} for name in parsers}
+    for _ in range(rounds):
+        for name, parse in parsers.items():
+            row = results[name]
+            row["common_s"] = min(row["common_s"], _time_once(parse, common, repeat))
+            if name != "legacy_fallback":
+                row["all_s"] = min(row.get("all_s", float("inf")), _time_once(parse, every, repeat))
+
+    print(f"{len(documents)} YAML files, {len(common)} accepted by the legacy parser "
+          f"({len(legacy_rejected)} rejected), {repeat} passes x best of {rounds} rounds")
+    baseline = results["legacy_fallback"]["common_s"]
+    print(f"{'parser':<20} {'common files':>14} {'vs legacy':>10} {'all files':>12}")
+    for name, row in results.items():
+        all_files = f"{row['all_s'] * 1e3:10.1f}ms" if "all_s" in row else f"{'n/a':>12}"
+        print(f"{name:<20} {row['common_s'] * 1e3:12.1f}ms {baseline / row['common_s']:9.2f}x {all_files}")
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=15)
+    options = parser.parse_args(argv)
+    run(options.repeat, options.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
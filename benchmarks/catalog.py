@@ -0,0 +1,153 @@
+"""Generate a large synthetic role/tool catalog for the benchmarks.
+
+The tree mirrors the repository layout (``role/``, ``tool/``, ``prompt/``,
+``rule/``) and every file passes ``validate.py``: tools follow the shapes of
+the real specifications (block scalars, flow lists, comments, cache blocks)
+and each role imports a prompt, a rule file and a sample of the tools.  The
+output is deterministic for a given seed.
+
+The loader only reads files inside the repository, so the default output is
+``.cache/bench-catalog``.
+
+Usage::
+
+    python -m benchmarks.catalog [--tools 10000] [--roles 200] [--output DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import sys
+from pathlib import Path
+from typing import List, NamedTuple
+
+import loader
+
+
+DEFAULT_OUTPUT = loader.BASE_PATH / ".cache" / "bench-catalog"
+_GROUPS = ("codebase", "file_system", "learning", "memory", "web", "notion", "serena", "productivity")
+_TOOL_TEMPLATES = (
+    """# ชื่อ Tool (จะถูกแทนที่)
+name: "{name}"
+# คำอธิบายสำหรับคนอ่าน (จะถูกแทนที่)
+description: "{description}"
+# นโยบายการทำงาน (จะถูกแทนที่)
+execution_policy:
+  default_mode: "manual"
+  allowed_modes: [manual, auto]
+# สภาพแวดล้อมการทำงาน (จะถูกแทนที่)
+execution_environment:
+  type: "api"
+  command: "$COMMAND" # (Optional)
+  target: "$TARGET"
+  endpoint: "https://api.example.com/v1/{name}"
+  requirements: [$REQUIREMENTS]
+""",
+    """name: "{name}"
+description: "{description}"
+execution_policy:
+  default_mode: "sync"
+  allowed_modes:
+    - "sync"
+  max_concurrency: {concurrency}
+  timeout_seconds: 30
+execution_environment:
+  type: "cli"
+cache:
+  enabled: true
+  ttl_seconds: 600
+  workspace: true
+""",
+    """name: "{name}"
+description: >
+  {description}
+  Generated for benchmarking; folded over two lines.
+execution_policy:
+  default_mode: "auto"
+  allowed_modes: ["manual", "auto"]
+  executor: "thread"
+execution_environment:
+  type: "internal_function"
+  command: "$COMMAND"
+  target: "$TARGET"
+  endpoint: "$WORKSPACE_PATH/data/{name}.csv"
+  requirements: [python3, jsonschema]
+""",
+)
+
+
+class CatalogInfo(NamedTuple):
+    root: Path
+    roles: int
+    tools: int
+    files: int
+
+
+def generate_catalog(
+    output: Path = DEFAULT_OUTPUT,
+    tools: int = 10000,
+    roles: int = 200,
+    tools_per_role: int = 12,
+    seed: int = 0,
+) -> CatalogInfo:
+    """Write a fresh catalog to *output*, replacing whatever was there."""
+
+    rng = random.Random(seed)
+    output = Path(output)
+    if output.exists():
+        shutil.rmtree(output)
+    (output / "prompt" / "bench").mkdir(parents=True)
+    (output / "rule").mkdir(parents=True)
+    (output / "rule" / "bench_rules.md").write_text("# Bench rules\n\n- Be fast.\n", encoding="utf-8")
+
+    tool_paths: List[str] = []
+    for number in range(tools):
+        group = _GROUPS[number % len(_GROUPS)]
+        name = f"{group}_tool_{number:05d}"
+        directory = output / "tool" / group
+        directory.mkdir(parents=True, exist_ok=True)
+        template = _TOOL_TEMPLATES[number % len(_TOOL_TEMPLATES)]
+        description = f"Synthetic {group} tool number {number} ({rng.choice(('read', 'write', 'search', 'sync'))})"
+        (directory / f"{name}.yaml").write_text(
+            template.format(name=name, description=description, concurrency=rng.randint(1, 8)), encoding="utf-8"
+        )
+        tool_paths.append(f"../../tool/{group}/{name}.yaml")
+
+    for number in range(roles):
+        name = f"bench-agent-{number:04d}"
+        prompt = output / "prompt" / "bench" / f"{name}.yaml"
+        prompt.write_text(
+            f'name: "{name}-prompt"\npersona:\n  role: "Bench agent {number}"\n  tone: |\n'
+            f"    Terse.\n    Measured.\nprompt: |\n  You are bench agent {number}.\n",
+            encoding="utf-8",
+        )
+        imports = "\n".join(f'    - "{path}"' for path in rng.sample(tool_paths, min(tools_per_role, len(tool_paths))))
+        role_dir = output / "role" / name
+        role_dir.mkdir(parents=True)
+        (role_dir / "role.yaml").write_text(
+            f'name: "{name}"\nversion: "1.0.0"\ndescription: "Synthetic role {number}"\nimports:\n'
+            f'  prompts:\n    - "../../prompt/bench/{name}.yaml"\n'
+            f'  rules:\n    - "../../rule/bench_rules.md"\n'
+            f"  tools:\n{imports}\n",
+            encoding="utf-8",
+        )
+    return CatalogInfo(output, roles, tools, tools + 2 * roles + 1)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=10000)
+    parser.add_argument("--roles", type=int, default=200)
+    parser.add_argument("--tools-per-role", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    options = parser.parse_args(argv)
+    info = generate_catalog(options.output, options.tools, options.roles, options.tools_per_role, options.seed)
+    print(f"Wrote {info.files} files ({info.roles} roles, {info.tools} tools) to {info.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Frozen copy of the original ``loader._fallback_yaml_load`` tokenizer.
+
+Kept only as the baseline for ``benchmarks.bench_yaml``; do not use it from
+runtime code.  It builds a full token list up front, re-partitions every line
+and detects numbers through ``int()``/``float()`` exceptions.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+from loader import LoaderError
+
+
+def _fallback_yaml_load(text: str) -> Dict[str, Any]:
+    """Parse a minimal subset of YAML without third-party dependencies."""
+
+    tokens = _tokenise_yaml(text)
+    stream = _TokenStream(tokens)
+    document = _parse_mapping(stream, 0)
+    return document
+
+
+def _tokenise_yaml(text: str) -> List[Tuple[int, str]]:
+    tokens: List[Tuple[int, str]] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if "\t" in line[:indent]:
+            raise LoaderError("Tabs are not supported in YAML indentation.")
+        tokens.append((indent, stripped))
+    return tokens
+
+
+class _TokenStream:
+    def __init__(self, tokens: List[Tuple[int, str]]):
+        self._tokens = tokens
+        self._index = 0
+
+    def peek(self) -> Tuple[int, str] | None:
+        if self._index >= len(self._tokens):
+            return None
+        return self._tokens[self._index]
+
+    def pop(self) -> Tuple[int, str] | None:
+        token = self.peek()
+        if token is not None:
+            self._index += 1
+        return token
+
+
+def _parse_mapping(stream: _TokenStream, current_indent: int) -> Dict[str, Any]:
+    mapping: Dict[str, Any] = {}
+
+    while True:
+        token = stream.peek()
+        if token is None:
+            break
+        indent, content = token
+        if indent < current_indent:
+            break
+        if indent > current_indent:
+            raise LoaderError("Invalid indentation in YAML mapping.")
+
+        stream.pop()
+        if content.startswith("- "):
+            raise LoaderError("List item encountered where a mapping key was expected.")
+
+        key, _, value_part = content.partition(":")
+        key = key.strip()
+        value_part = value_part.strip()
+
+        if value_part:
+            mapping[key] = _parse_scalar(value_part)
+            continue
+
+        next_token = stream.peek()
+        if next_token is None or next_token[0] <= indent:
+            mapping[key] = {}
+            continue
+
+        if next_token[1].startswith("- "):
+            mapping[key] = _parse_sequence(stream, indent + 2)
+        else:
+            mapping[key] = _parse_mapping(stream, next_token[0])
+
+    return mapping
+
+
+def _parse_sequence(stream: _TokenStream, base_indent: int) -> List[Any]:
+    sequence: List[Any] = []
+
+    while True:
+        token = stream.peek()
+        if token is None:
+            break
+        indent, content = token
+        if indent < base_indent or not content.startswith("- "):
+            break
+
+        stream.pop()
+        value_part = content[2:].strip()
+        if value_part:
+            sequence.append(_parse_scalar(value_part))
+            continue
+
+        next_token = stream.peek()
+        if next_token is None or next_token[0] <= indent:
+            sequence.append({})
+            continue
+
+        if next_token[1].startswith("- "):
+            sequence.append(_parse_sequence(stream, next_token[0]))
+        else:
+            sequence.append(_parse_mapping(stream, next_token[0]))
+
+    return sequence
+
+
+def _parse_scalar(value: str) -> Any:
+    if value.startswith("'") and value.endswith("'"):
+        return value[1:-1]
+    if value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    lower = value.lower()
+    if lower == "true":
+        return True
+    if lower == "false":
+        return False
+    if lower in {"null", "~"}:
+        return None
+    # attempt integer then float parsing
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    # Try to parse as number
+    try:
+        if '.' in value:
+            return float(value)
+        return int(value)
+    except ValueError:
+        pass
+    return value
@@ -0,0 +1,338 @@
+"""Benchmark suite for the loader, the validator and tool dispatch.
+
+Each benchmark is calibrated so one sample runs for at least ``--min-time``
+seconds, then timed over ``--samples`` samples after a warm-up; the median
+time per operation is what gets compared.  Benchmarks with a setup step
+(the "cold" ones) time one operation per sample, with the setup untimed.
+
+Covered:
+
+* ``load_agent`` / ``load_tool``, cold (spec cache and tool index cleared,
+  snapshot disabled) and warm,
+* ``_fallback_yaml_load`` against PyYAML on the repository's YAML files and
+  on a synthetic catalog (see :mod:`benchmarks.catalog`),
+* ``validate.py`` end to end in a subprocess, and ``validate_files`` over the
+  synthetic catalog,
+* ``call_tool`` dispatch against calling the function directly, with
+  ``scripts/fake_serena.py`` standing in for Serena.
+
+Results can be written as JSON (``--output``) and compared with a stored
+baseline (``--baseline``, default ``benchmarks/baselines.json``): a benchmark
+whose median is more than ``--tolerance`` slower than its baseline is a
+regression, and ``--check`` turns regressions into a non-zero exit status.
+The baseline file keeps one entry per mode (``quick`` or ``full``), and a
+run is only compared with the entry for its own mode and catalog size.
+``--save-baseline`` records the current run as the baseline for its mode.
+
+Usage::
+
+    python -m benchmarks.suite [--quick] [--filter yaml] [--check] [--save-baseline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import loader
+
+
+DEFAULT_BASELINE = Path(__file__).resolve().with_name("baselines.json")
+_FAKE_SERENA = loader.BASE_PATH / "scripts" / "fake_serena.py"
+
+
+class Benchmark(NamedTuple):
+    name: str
+    func: Callable[[], Any]
+    setup: Optional[Callable[[], Any]] = None
+
+
+class Result(NamedTuple):
+    name: str
+    median: float
+    mean: float
+    stdev: float
+    minimum: float
+    samples: int
+    loops: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def measure(bench: Benchmark, samples: int, min_time: float, warmup: int = 1) -> Result:
+    """Time *bench* and return per-operation statistics in seconds."""
+
+    timings: List[float] = []
+    if bench.setup is not None:
+        for index in range(warmup + samples):
+            bench.setup()
+            start = time.perf_counter()
+            bench.func()
+            elapsed = time.perf_counter() - start
+            if index >= warmup:
+                timings.append(elapsed)
+        loops = 1
+    else:
+        loops = 1
+        while True:  # calibrate: double the loop count until a sample is long enough
+            start = time.perf_counter()
+            for _ in range(loops):
+                bench.func()
+            if time.perf_counter() - start >= min_time or loops >= 1 << 20:
+                break
+            loops *= 2
+        for index in range(warmup + samples):
+            start = time.perf_counter()
+            for _ in range(loops):
+                bench.func()
+            if index >= warmup:
+                timings.append((time.perf_counter() - start) / loops)
+    return Result(
+        bench.name,
+        statistics.median(timings),
+        statistics.fmean(timings),
+        statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        min(timings),
+        len(timings),
+        loops,
+    )
+
+
+# -- benchmark definitions -------------------------------------------------
+
+def _cold_loader() -> None:
+    loader.clear_spec_cache()
+    loader._TOOL_INDEX.invalidate()
+
+
+def _loader_benchmarks() -> List[Benchmark]:
+    return [
+        Benchmark("loader.load_agent.cold", lambda: loader.load_agent("coder-agent"), _cold_loader),
+        Benchmark("loader.load_agent.warm", lambda: loader.load_agent("coder-agent")),
+        Benchmark("loader.load_tool.cold", lambda: loader.load_tool("find_symbol"), _cold_loader),
+        Benchmark("loader.load_tool.warm", lambda: loader.load_tool("find_symbol")),
+        Benchmark("loader.load_agent_resolved.cold", lambda: loader.load_agent_resolved("coder-agent"), _cold_loader),
+    ]
+
+
+def _yaml_texts(root: Path) -> List[str]:
+    texts = []
+    for path in sorted(root.rglob("*.yaml")):
+        parts = path.relative_to(root).parts
+        if root == loader.BASE_PATH and any(part.startswith(".") or part == "node_modules" for part in parts):
+            continue
+        texts.append(path.read_text(encoding="utf-8"))
+    return texts
+
+
+def _parse_all(parse: Callable[[str], Any], texts: List[str]) -> Callable[[], None]:
+    def run() -> None:
+        for text in texts:
+            parse(text)
+
+    return run
+
+
+def _yaml_benchmarks(catalog: Path) -> List[Benchmark]:
+    corpora = {"repo": _yaml_texts(loader.BASE_PATH), "catalog": _yaml_texts(catalog)}
+    parsers: Dict[str, Callable[[str], Any]] = {"fallback": loader._fallback_yaml_load}
+    if loader.yaml is not None:
+        parsers["pyyaml"] = loader.yaml.safe_load
+        c_loader = getattr(loader.yaml, "CSafeLoader", None)
+        if c_loader is not None:
+            parsers["pyyaml_c"] = lambda text: loader.yaml.load(text, Loader=c_loader)
+    return [
+        Benchmark(f"yaml.{corpus}.{parser}", _parse_all(parse, texts))
+        for corpus, texts in corpora.items()
+        for parser, parse in parsers.items()
+    ]
+
+
+def _validate_benchmarks(catalog: Path) -> List[Benchmark]:
+    import validate
+
+    def end_to_end() -> None:
+        subprocess.run(
+            [sys.executable, str(loader.BASE_PATH / "validate.py")],
+            cwd=loader.BASE_PATH,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    schemas = validate.load_schemas()
+    tasks = validate.discover(catalog)
+    return [
+        Benchmark("validate.repo.end_to_end", end_to_end),
+        Benchmark("validate.catalog.serial", lambda: validate.validate_files(tasks, schemas, jobs=1)),
+        Benchmark("validate.catalog.parallel", lambda: validate.validate_files(tasks, schemas)),
+    ]
+
+
+def _dispatch_benchmarks() -> List[Benchmark]:
+    os.environ.setdefault("SERENA_EXECUTABLE", str(_FAKE_SERENA))
+    import tool_cache
+    import tool_map
+    from tools import core_logic, serena
+
+    def uncached(name: str, *args: Any) -> Callable[[], Any]:
+        def run() -> Any:
+            # ``set_tool_cache(None)`` would build a fresh cache; clearing forces a miss.
+            tool_cache.clear_tool_cache()
+            return tool_map.call_tool(name, *args)
+
+        return run
+
+    return [
+        Benchmark("dispatch.prompt_cache.direct", lambda: core_logic.prompt_cache("stats")),
+        Benchmark("dispatch.prompt_cache.call_tool", lambda: tool_map.call_tool("prompt_cache", "stats")),
+        Benchmark("dispatch.find_symbol.direct", lambda: serena.find_symbol("load_tool")),
+        Benchmark("dispatch.find_symbol.call_tool_uncached", uncached("find_symbol", "load_tool")),
+        Benchmark("dispatch.find_symbol.call_tool_cached", lambda: tool_map.call_tool("find_symbol", "load_tool")),
+    ]
+
+
+def collect(catalog: Path, catalog_tools: int) -> List[Benchmark]:
+    from benchmarks.catalog import generate_catalog
+
+    generate_catalog(catalog, tools=catalog_tools, roles=max(1, catalog_tools // 50))
+    return [*_loader_benchmarks(), *_yaml_benchmarks(catalog), *_validate_benchmarks(catalog), *_dispatch_benchmarks()]
+
+
+# -- baselines -------------------------------------------------------------
+
+def compare(results: List[Result], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print each result against *baseline*; return the names that regressed."""
+
+    regressions = []
+    print(f"{'benchmark':<44} {'median':>12} {'stdev':>10} {'baseline':>12} {'change':>8}")
+    for result in results:
+        reference = baseline.get(result.name, {}).get("median")
+        if reference:
+            ratio = result.median / reference
+            status = ""
+            if ratio > 1 + tolerance:
+                status = "  REGRESSION"
+                regressions.append(result.name)
+            change = f"{(ratio - 1) * 100:+7.1f}%"
+            reference_text = _format_time(reference)
+        else:
+            change, reference_text, status = f"{'new':>8}", f"{'-':>12}", ""
+        print(f"{result.name:<44} {_format_time(result.median)} {_format_time(result.stdev, 10)} "
+              f"{reference_text} {change}{status}")
+    return regressions
+
+
+def _format_time(seconds: float, width: int = 12) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e3), ("us", 1e6)):
+        if seconds >= 1 / scale or unit == "us":
+            return f"{seconds * scale:{width - 2}.2f}{unit:>2}"
+    return ""  # pragma: no cover
+
+
+def _read_baselines(path: Path) -> Dict[str, Any]:
+    """Return the per-mode entries stored in *path*."""
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if "modes" in data:
+        return data["modes"]
+    # A single run, as written by ``--output`` or by older versions of the suite.
+    if "benchmarks" in data:
+        return {data.get("mode") or ("quick" if data.get("quick") else "full"): data}
+    return {}
+
+
+def select_baseline(entries: Dict[str, Any], mode: str, catalog_tools: int) -> Dict[str, Any]:
+    """Return the baseline benchmarks recorded for *mode*, or ``{}`` if there are none.
+
+    An entry recorded with a different catalog size is not comparable and is
+    ignored.
+    """
+
+    entry = entries.get(mode)
+    if not entry:
+        print(f"No baseline for mode '{mode}'; nothing to compare against.")
+        return {}
+    if entry.get("catalog_tools") != catalog_tools:
+        print(f"Baseline for mode '{mode}' used a catalog of {entry.get('catalog_tools')} tools, "
+              f"not {catalog_tools}; not comparing.")
+        return {}
+    return entry.get("benchmarks", {})
+
+
+def _run_payload(results: List[Result], mode: str, catalog_tools: int, samples: int) -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "mode": mode,
+        "catalog_tools": catalog_tools,
+        "samples": samples,
+        "benchmarks": {result.name: result.as_dict() for result in results},
+    }
+
+
+def _write_json(path: Path, payload: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer samples and a 1,000-tool catalog")
+    parser.add_argument("--filter", action="append", default=[], help="glob on benchmark names (repeatable)")
+    parser.add_argument("--samples", type=int)
+    parser.add_argument("--min-time", type=float)
+    parser.add_argument("--catalog-tools", type=int)
+    parser.add_argument("--catalog", type=Path, default=loader.BASE_PATH / ".cache" / "bench-catalog")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--check", action="store_true", help="exit non-zero when a benchmark regressed")
+    parser.add_argument("--save-baseline", action="store_true")
+    options = parser.parse_args(argv)
+    samples = options.samples or (5 if options.quick else 15)
+    min_time = options.min_time or (0.05 if options.quick else 0.2)
+    catalog_tools = options.catalog_tools or (1000 if options.quick else 10000)
+    mode = "quick" if options.quick else "full"
+
+    # Cold loads should measure parsing, not the precompiled snapshot.
+    os.environ["AI_SANDBOX_SNAPSHOT"] = "off"
+    benchmarks = collect(options.catalog, catalog_tools)
+    if options.filter:
+        benchmarks = [b for b in benchmarks if any(fnmatch.fnmatch(b.name, f"*{p}*") for p in options.filter)]
+    print(f"Python {sys.version.split()[0]}, {len(benchmarks)} benchmarks, {samples} samples, "
+          f"catalog of {catalog_tools} tools ({mode} mode)")
+    results = [measure(bench, samples, min_time) for bench in benchmarks]
+    entries = _read_baselines(options.baseline)
+    baseline = select_baseline(entries, mode, catalog_tools)
+    regressions = compare(results, baseline, options.tolerance)
+    payload = _run_payload(results, mode, catalog_tools, samples)
+    if options.output:
+        _write_json(options.output, payload)
+    if options.save_baseline:
+        if options.filter and baseline:
+            # A filtered run only replaces the benchmarks it ran.
+            payload["benchmarks"] = {**entries[mode]["benchmarks"], **payload["benchmarks"]}
+        entries[mode] = payload
+        _write_json(options.baseline, {"modes": entries})
+        print(f"Baseline for mode '{mode}' written to {options.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {options.tolerance:.0%}: {', '.join(regressions)}")
+        return 1 if options.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
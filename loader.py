@@ -13,14 +13,34 @@ from automated tooling or tests where deterministic behaviour is required.
 
 from __future__ import annotations
 
+import hashlib
+import itertools
+import json
+import marshal
+import os
+import re
+import sys
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+import metrics
 
 try:  # pragma: no cover - dependency optionality
     import yaml  # type: ignore
 except ImportError:  # pragma: no cover - fallback handled below
     yaml = None
 
+# libyaml's C loader parses several times faster than the pure-Python one.
+_SAFE_LOADER = None
+if yaml is not None:
+    _SAFE_LOADER = yaml.CSafeLoader if getattr(yaml, "__with_libyaml__", False) else yaml.SafeLoader
+
 
 BASE_PATH = Path(__file__).resolve().parent
 
@@ -29,6 +49,10 @@ class LoaderError(FileNotFoundError):
     """Raised when a requested agent or tool definition cannot be found."""
 
 
+class DuplicateToolWarning(UserWarning):
+    """Emitted when several ``tool/**`` files share the same short name."""
+
+
 def _ensure_within_base(path: Path) -> Path:
     """Validate that *path* stays inside the repository boundary."""
 
@@ -38,195 +62,1389 @@ def _ensure_within_base(path: Path) -> Path:
     return resolved
 
 
-def _load_yaml(path: Path) -> Dict[str, Any]:
-    """Parse a YAML file and return a dictionary."""
+def parse_yaml_file(path: Path) -> Dict[str, Any]:
+    """Parse a YAML file into a plain, mutable dictionary without caching.
+
+    PyYAML is used when installed (with the libyaml ``CSafeLoader`` when it
+    was built with it), otherwise :func:`_fallback_yaml_load`.
+    """
 
     with path.open("r", encoding="utf-8") as handle:
+        if yaml is None:
+            try:
+                return _fallback_yaml_load(handle)
+            except LoaderError as exc:
+                raise LoaderError(f"Failed to parse YAML at '{path}': {exc}") from exc
         text = handle.read()
 
-    if yaml is not None:
+    try:
+        data = yaml.load(text, Loader=_SAFE_LOADER) or {}
+    except yaml.YAMLError as exc:  # pragma: no cover - transparent re-raise
+        raise LoaderError(f"Failed to parse YAML at '{path}': {exc}") from exc
+    return data if isinstance(data, dict) else {}
+
+
+def _read_text(path: Path) -> str:
+    with path.open("r", encoding="utf-8") as handle:
+        return handle.read()
+
+
+def _parse_json_file(path: Path) -> Any:
+    """Parse a JSON file, tolerating the ``\\'`` escapes of hand-edited catalogs."""
+
+    text = _read_text(path)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(text.replace("\\'", "'"))
+    except json.JSONDecodeError as exc:
+        raise LoaderError(f"Failed to parse JSON at '{path}': {exc}") from exc
+
+
+def _freeze(value: Any) -> Any:
+    """Return a recursively read-only view of parsed YAML/JSON data."""
+
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Return a mutable deep copy of a value produced by the spec cache."""
+
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class SpecCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    currsize: int
+    maxsize: int
+
+
+class _SpecCache:
+    """Bounded LRU of parsed documents keyed by resolved path.
+
+    Entries are validated against ``(st_mtime_ns, st_size)`` on every lookup
+    so edits on disk are picked up without an explicit invalidation.
+    """
+
+    def __init__(self, maxsize: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._maxsize = max(0, maxsize)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, path: Path, parse: Callable[[Path], Any]) -> Any:
+        key = str(path)
         try:
-            data = yaml.safe_load(text) or {}
-        except yaml.YAMLError as exc:  # pragma: no cover - transparent re-raise
-            raise LoaderError(f"Failed to parse YAML at '{path}': {exc}") from exc
-        return data if isinstance(data, dict) else {}
+            stat = os.stat(key)
+        except OSError as exc:
+            raise LoaderError(f"Unable to read '{path}': {exc}") from exc
+        signature = (stat.st_mtime_ns, stat.st_size)
 
-    return _fallback_yaml_load(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
 
+        value = _freeze(parse(path))
 
-def _fallback_yaml_load(text: str) -> Dict[str, Any]:
-    """Parse a minimal subset of YAML without third-party dependencies."""
+        with self._lock:
+            if self._maxsize:
+                self._entries[key] = (signature, value)
+                self._entries.move_to_end(key)
+                self._evict()
+        return value
 
-    tokens = _tokenise_yaml(text)
-    stream = _TokenStream(tokens)
-    document = _parse_mapping(stream, 0)
-    return document
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self._maxsize = max(0, maxsize)
+            self._evict()
 
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> SpecCacheInfo:
+        with self._lock:
+            return SpecCacheInfo(
+                self._hits, self._misses, self._evictions, len(self._entries), self._maxsize
+            )
+
+    def _evict(self) -> None:
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+
+_SPEC_CACHE = _SpecCache(int(os.environ.get("AI_SANDBOX_SPEC_CACHE_SIZE", "256")))
+
+
+_SNAPSHOT_MAGIC = b"AISBSNAP"
+_SNAPSHOT_FORMAT = 1
+_SNAPSHOT_SOURCES = ("role", "tool", "prompt", "rule", "schemas", "_common")
+_SNAPSHOT_PARSERS: Dict[str, Callable[[Path], Any]] = {
+    ".yaml": parse_yaml_file,
+    ".json": _parse_json_file,
+    ".md": _read_text,
+}
+DEFAULT_SNAPSHOT_PATH = BASE_PATH / ".cache" / "specs.snapshot"
 
-def _tokenise_yaml(text: str) -> List[Tuple[int, str]]:
-    tokens: List[Tuple[int, str]] = []
-    for line in text.splitlines():
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#"):
-            continue
-        indent = len(line) - len(line.lstrip(" "))
-        if "\t" in line[:indent]:
-            raise LoaderError("Tabs are not supported in YAML indentation.")
-        tokens.append((indent, stripped))
-    return tokens
 
+class SnapshotInfo(NamedTuple):
+    path: str
+    digest: str
+    entries: int
+    stale: int
+    skipped: Tuple[str, ...]
 
-class _TokenStream:
-    def __init__(self, tokens: List[Tuple[int, str]]):
-        self._tokens = tokens
-        self._index = 0
 
-    def peek(self) -> Tuple[int, str] | None:
-        if self._index >= len(self._tokens):
+class _Snapshot:
+    """Precompiled parse results for the whole configuration tree.
+
+    Each entry stores the file's ``(st_mtime_ns, st_size)``, its SHA-256 and
+    the marshalled parse result.  An entry is used when the stat signature
+    matches, or when the content hash still matches after a touch/checkout;
+    otherwise the caller falls back to parsing the file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        digest: str,
+        entries: Dict[str, Tuple[int, int, str, bytes]],
+        skipped: Tuple[str, ...] = (),
+    ):
+        self.path = path
+        self.digest = digest
+        self.skipped = skipped
+        self._entries = entries
+        self._stale: set = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def read(cls, path: Path) -> "_Snapshot | None":
+        try:
+            with path.open("rb") as handle:
+                raw = handle.read()
+        except OSError:
+            return None
+        if not raw.startswith(_SNAPSHOT_MAGIC):
             return None
-        return self._tokens[self._index]
+        try:
+            header = marshal.loads(raw[len(_SNAPSHOT_MAGIC):])
+        except (EOFError, ValueError, TypeError):
+            return None
+        if (
+            not isinstance(header, dict)
+            or header.get("format") != _SNAPSHOT_FORMAT
+            or header.get("python") != tuple(sys.version_info[:2])
+        ):
+            return None
+        return cls(path, header["digest"], header["entries"], tuple(header.get("skipped", ())))
 
-    def pop(self) -> Tuple[int, str] | None:
-        token = self.peek()
-        if token is not None:
-            self._index += 1
-        return token
+    def get(self, path: Path) -> Tuple[bool, Any]:
+        try:
+            relative = path.relative_to(BASE_PATH).as_posix()
+        except ValueError:
+            return False, None
+        entry = self._entries.get(relative)
+        if entry is None or relative in self._stale:
+            return False, None
+        mtime_ns, size, digest, payload = entry
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False, None
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            if stat.st_size != size or _file_digest(path) != digest:
+                with self._lock:
+                    self._stale.add(relative)
+                return False, None
+            with self._lock:
+                self._entries[relative] = (stat.st_mtime_ns, size, digest, payload)
+        return True, marshal.loads(payload)
 
+    def info(self) -> SnapshotInfo:
+        with self._lock:
+            return SnapshotInfo(str(self.path), self.digest, len(self._entries), len(self._stale), self.skipped)
 
-def _parse_mapping(stream: _TokenStream, current_indent: int) -> Dict[str, Any]:
-    mapping: Dict[str, Any] = {}
 
-    while True:
-        token = stream.peek()
-        if token is None:
-            break
-        indent, content = token
-        if indent < current_indent:
-            break
-        if indent > current_indent:
-            raise LoaderError("Invalid indentation in YAML mapping.")
+def _file_digest(path: Path) -> str:
+    with path.open("rb") as handle:
+        return hashlib.sha256(handle.read()).hexdigest()
 
-        stream.pop()
-        if content.startswith("- "):
-            raise LoaderError("List item encountered where a mapping key was expected.")
 
-        key, _, value_part = content.partition(":")
-        key = key.strip()
-        value_part = value_part.strip()
+def _iter_snapshot_sources() -> Iterable[Path]:
+    for directory in _SNAPSHOT_SOURCES:
+        root = BASE_PATH / directory
+        for current, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1] in _SNAPSHOT_PARSERS:
+                    yield Path(current, filename)
 
-        if value_part:
-            mapping[key] = _parse_scalar(value_part)
+
+def compile_snapshot(output: Path | None = None) -> SnapshotInfo:
+    """Parse every role/tool/prompt/rule/schema file into one snapshot file.
+
+    The snapshot is written atomically and picked up by the next loader
+    import (or immediately, when it replaces the active snapshot path).
+    Files that fail to parse, or whose values marshal cannot store (such as
+    YAML dates), are left out and reported in ``skipped``; they are parsed
+    from disk when loaded.
+    """
+
+    output = Path(output) if output is not None else DEFAULT_SNAPSHOT_PATH
+    entries: Dict[str, Tuple[int, int, str, bytes]] = {}
+    skipped: List[str] = []
+    for path in _iter_snapshot_sources():
+        resolved = _ensure_within_base(path)
+        relative = resolved.relative_to(BASE_PATH).as_posix()
+        stat = os.stat(resolved)
+        try:
+            payload = marshal.dumps(_SNAPSHOT_PARSERS[resolved.suffix](resolved))
+        except (LoaderError, UnicodeDecodeError, ValueError):
+            # ValueError: marshal cannot store the value, e.g. a YAML date.
+            skipped.append(relative)
             continue
+        entries[relative] = (stat.st_mtime_ns, stat.st_size, _file_digest(resolved), payload)
+
+    hasher = hashlib.sha256()
+    for relative in sorted(entries):
+        hasher.update(relative.encode("utf-8") + b"\0" + entries[relative][2].encode("ascii") + b"\n")
+    digest = hasher.hexdigest()
+
+    header = {
+        "format": _SNAPSHOT_FORMAT,
+        "python": tuple(sys.version_info[:2]),
+        "digest": digest,
+        "entries": entries,
+        "skipped": tuple(skipped),
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_name(output.name + f".{os.getpid()}.tmp")
+    with temporary.open("wb") as handle:
+        handle.write(_SNAPSHOT_MAGIC)
+        handle.write(marshal.dumps(header))
+    os.replace(temporary, output)
+
+    global _SNAPSHOT, _SNAPSHOT_LOADED
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT_LOADED and _snapshot_path() == output.resolve():
+            _SNAPSHOT_LOADED = False
+            _SNAPSHOT = None
+    return SnapshotInfo(str(output), digest, len(entries), 0, tuple(skipped))
+
+
+_SNAPSHOT: _Snapshot | None = None
+_SNAPSHOT_LOADED = False
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def _snapshot_path() -> Path | None:
+    configured = os.environ.get("AI_SANDBOX_SNAPSHOT")
+    if configured is None:
+        return DEFAULT_SNAPSHOT_PATH.resolve()
+    if configured.strip().lower() in {"", "0", "off", "false"}:
+        return None
+    return Path(configured).resolve()
+
+
+def _active_snapshot() -> _Snapshot | None:
+    global _SNAPSHOT, _SNAPSHOT_LOADED
+    if _SNAPSHOT_LOADED:
+        return _SNAPSHOT
+    with _SNAPSHOT_LOCK:
+        if not _SNAPSHOT_LOADED:
+            path = _snapshot_path()
+            _SNAPSHOT = _Snapshot.read(path) if path is not None else None
+            _SNAPSHOT_LOADED = True
+        return _SNAPSHOT
+
+
+def snapshot_info() -> SnapshotInfo | None:
+    """Describe the active snapshot, or ``None`` when no valid one is loaded."""
+
+    snapshot = _active_snapshot()
+    return snapshot.info() if snapshot is not None else None
+
 
-        next_token = stream.peek()
-        if next_token is None or next_token[0] <= indent:
-            mapping[key] = {}
+def _from_snapshot(parse: Callable[[Path], Any]) -> Callable[[Path], Any]:
+    def load(path: Path) -> Any:
+        snapshot = _active_snapshot()
+        if snapshot is not None:
+            found, data = snapshot.get(path)
+            if found:
+                return data
+        return parse(path)
+
+    return load
+
+
+_parse_yaml_cached = _from_snapshot(parse_yaml_file)
+_parse_json_cached = _from_snapshot(_parse_json_file)
+_read_text_cached = _from_snapshot(_read_text)
+
+
+def _timed_parse_yaml(path: Path) -> Any:
+    try:
+        label = path.relative_to(BASE_PATH).as_posix()
+    except ValueError:
+        label = str(path)
+    with metrics.SPEC_PARSE_SECONDS.time(file=label):
+        return _parse_yaml_cached(path)
+
+
+def _load_yaml(path: Path) -> Mapping[str, Any]:
+    """Return the cached, read-only parse of the YAML file at *path*."""
+
+    return _SPEC_CACHE.get(path.resolve(), _timed_parse_yaml)
+
+
+def load_schema(schema_name: str) -> Any:
+    """Load ``schemas/<schema_name>.json`` as a read-only view."""
+
+    if not schema_name or "/" in schema_name or ".." in schema_name:
+        raise LoaderError("Schema names must be simple identifiers without path separators.")
+    schema_file = _ensure_within_base(BASE_PATH / "schemas" / f"{schema_name}.json")
+    if not schema_file.is_file():
+        raise LoaderError(f"Schema '{schema_name}' was not found.")
+    return _SPEC_CACHE.get(schema_file, _parse_json_cached)
+
+
+def spec_cache_info() -> SpecCacheInfo:
+    """Return hit/miss/eviction counters for the parsed-spec cache."""
+
+    return _SPEC_CACHE.info()
+
+
+def _spec_cache_samples() -> List[metrics.Sample]:
+    info = _SPEC_CACHE.info()
+    return metrics.cache_samples("spec", info.hits, info.misses, evictions=info.evictions, entries=info.currsize)
+
+
+metrics.register_collector(_spec_cache_samples)
+
+
+def set_spec_cache_size(maxsize: int) -> None:
+    """Change the number of parsed documents kept in memory (``0`` disables)."""
+
+    _SPEC_CACHE.resize(maxsize)
+
+
+def clear_spec_cache() -> None:
+    """Drop every cached document and reset the counters."""
+
+    _SPEC_CACHE.clear()
+
+
+def _fallback_yaml_load(text: str | Iterable[str]) -> Dict[str, Any]:
+    """Parse the YAML subset used by this repository without third-party dependencies.
+
+    *text* may be a string or any iterable of lines (such as an open file), which
+    is consumed lazily.  Block and flow collections, ``|``/``>`` block scalars,
+    quoted scalars and inline comments are supported; anchors, tags and
+    multi-document streams are not.  Plain scalars resolve like PyYAML's
+    ``safe_load`` (booleans, null, int, float and base-60 numbers) except
+    timestamps, which stay strings.
+    """
+
+    if isinstance(text, str):
+        stream = _LineStream(iter(text.splitlines()))
+    else:
+        stream = _LineStream(line.rstrip("\r\n") for line in text)
+    token = stream.peek()
+    if token is None:
+        return {}
+    document = _parse_node(stream, token[0])
+    if stream._token is not None or stream.peek() is not None:
+        raise LoaderError(f"Unexpected content at line {stream.lineno}: invalid indentation.")
+    return document if isinstance(document, dict) else {}
+
+
+def _significant_lines(
+    lines: Iterable[str], tail: List[str], lineno: int = 0
+) -> Iterator[Tuple[int, str, int, str, Tuple[str, ...]]]:
+    """Yield ``(indent, content, lineno, line, skipped)`` for non-blank, non-comment lines.
+
+    ``skipped`` holds the raw blank/comment lines preceding *line* so block and
+    quoted scalars can recover them; trailing skipped lines go to *tail*.
+    """
+
+    skipped: List[str] = []
+    for lineno, line in enumerate(lines, lineno + 1):
+        content = line.lstrip(" ")
+        if not content or content[0] == "#":
+            skipped.append(line)
+            continue
+        indent = len(line) - len(content)
+        if content[-1] in " \t\r":
+            content = content.rstrip()
+            if not content:
+                skipped.append(line)
+                continue
+        first = content[0]
+        if first == "\t":
+            raise LoaderError(f"Tabs are not supported in YAML indentation (line {lineno}).")
+        if not indent and first in "-.%" and (content == "---" or content == "..." or first == "%"):
+            skipped.append(line)
             continue
+        if skipped:
+            yield indent, content, lineno, line, tuple(skipped)
+            skipped.clear()
+        else:
+            yield indent, content, lineno, line, ()
+    tail.extend(skipped)
+
 
-        if next_token[1].startswith("- "):
-            mapping[key] = _parse_sequence(stream, indent + 2)
+class _LineStream:
+    """One-token lookahead over a lazily consumed sequence of YAML lines.
+
+    :meth:`peek` returns the next significant line as ``(indent, content, ...)``
+    without consuming it; :meth:`raw` hands out unprocessed lines (including
+    blanks and comment-like lines) for block and multi-line quoted scalars.
+    """
+
+    __slots__ = ("_lines", "_tokens", "_token", "_queue", "_tail", "lineno")
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._tail: List[str] = []
+        self._tokens = _significant_lines(lines, self._tail)
+        self._token: Tuple[int, str, int, str, Tuple[str, ...]] | None = None
+        self._queue: List[str] | None = None
+        self.lineno = 0
+
+    def peek(self) -> Tuple[int, str, int, str, Tuple[str, ...]] | None:
+        token = self._token
+        if token is None:
+            if self._queue:
+                # Lines handed back by unread() are tokenised again first.
+                pending, self._queue = self._queue, None
+                self._tokens = _significant_lines(
+                    itertools.chain(pending, tuple(self._tail), self._lines), self._tail, self.lineno - len(pending)
+                )
+                self._tail.clear()
+            token = self._token = next(self._tokens, None)
+            if token is not None:
+                self.lineno = token[2]
+        return token
+
+    def pop(self) -> None:
+        self._token = None
+
+    def raw(self) -> str | None:
+        queue = self._queue
+        if queue is None:
+            queue = self._queue = []
+        if not queue:
+            token = self._token or next(self._tokens, None)
+            self._token = None
+            if token is None:
+                if not self._tail:
+                    return None
+                queue.extend(self._tail)
+                self._tail.clear()
+            else:
+                self.lineno = token[2]
+                queue.extend(token[4])
+                queue.append(token[3])
+        return queue.pop(0)
+
+    def unread(self, line: str) -> None:
+        if self._queue is None:
+            self._queue = []
+        self._queue.insert(0, line)
+
+    def replace(self, indent: int, content: str) -> None:
+        """Substitute the current token, e.g. the remainder of ``- key: value``."""
+
+        self._token = (indent, content, self.lineno, " " * indent + content, ())
+
+
+_SPECIAL_VALUE_START = frozenset("\"'|>[{#-&*!%@`")
+
+
+def _is_sequence_item(content: str) -> bool:
+    return content[0] == "-" and (len(content) == 1 or content[1] == " ")
+
+
+def _parse_node(stream: _LineStream, indent: int) -> Any:
+    token = stream._token or stream.peek()
+    assert token is not None
+    content = token[1]
+    first = content[0]
+    if first not in _SPECIAL_VALUE_START:
+        colon = content.find(": ")
+        if colon > 0 and " #" not in content[:colon]:
+            return _parse_mapping(stream, indent)
+    elif first == "-" and (len(content) == 1 or content[1] == " "):
+        return _parse_sequence(stream, indent)
+    if first in "[{|>" or _split_key(content) is None:
+        stream.pop()
+        return _parse_value(stream, indent - 1, content)
+    return _parse_mapping(stream, indent)
+
+
+def _parse_mapping(stream: _LineStream, indent: int) -> Dict[str, Any]:
+    mapping: Dict[str, Any] = {}
+    while True:
+        token = stream._token or stream.peek()
+        if token is None or token[0] < indent:
+            return mapping
+        if token[0] > indent:
+            raise LoaderError(f"Invalid indentation in YAML mapping at line {stream.lineno}.")
+        content = token[1]
+        first = content[0]
+        colon = content.find(": ") if first not in _SPECIAL_VALUE_START else -1
+        if colon > 0 and " #" not in content[:colon]:
+            key = content[:colon].rstrip()
+            rest = content[colon + 1:]
+        elif colon == -1 and content[-1] == ":" and first not in _SPECIAL_VALUE_START and " #" not in content:
+            key = content[:-1].rstrip()
+            rest = ""
         else:
-            mapping[key] = _parse_mapping(stream, next_token[0])
+            if first == "-" and (len(content) == 1 or content[1] == " "):
+                raise LoaderError(
+                    f"List item encountered where a mapping key was expected at line {stream.lineno}."
+                )
+            split = _split_key(content)
+            if split is None:
+                raise LoaderError(f"Expected 'key: value' at line {stream.lineno}.")
+            key, rest = split
+        stream._token = None
 
-    return mapping
+        # Fast path for the common one-line ``key: "quoted"`` / ``key: plain``.
+        value = rest.lstrip(" ")
+        if value:
+            first = value[0]
+            if first == '"':
+                end = value.find('"', 1)
+                if end > 0 and value.find("\\", 1, end) == -1:
+                    trailing = value[end + 1:]
+                    if not trailing or trailing.lstrip(" ")[:1] == "#":
+                        mapping[key] = value[1:end]
+                        continue
+            elif first not in _SPECIAL_VALUE_START:
+                if " #" in value:
+                    value = _strip_comment(value)
+                following = stream._token or stream.peek()
+                if following is None or following[0] <= indent:
+                    mapping[key] = _resolve_plain(value)
+                    continue
+            elif first == "[" or first == "{":
+                mapping[key] = _parse_flow_value(stream, value)
+                continue
+        else:
+            following = stream._token or stream.peek()
+            if following is not None and following[0] > indent:
+                mapping[key] = _parse_node(stream, following[0])
+                continue
+        mapping[key] = _parse_value(stream, indent, rest, allow_inline_sequence=True)
 
 
-def _parse_sequence(stream: _TokenStream, base_indent: int) -> List[Any]:
+def _parse_sequence(stream: _LineStream, indent: int) -> List[Any]:
     sequence: List[Any] = []
-
     while True:
-        token = stream.peek()
+        token = stream._token or stream.peek()
         if token is None:
+            return sequence
+        content = token[1]
+        if token[0] != indent or content[0] != "-" or (len(content) > 1 and content[1] != " "):
+            if token[0] > indent:
+                raise LoaderError(f"Invalid indentation in YAML sequence at line {stream.lineno}.")
+            return sequence
+        rest = content[2:].lstrip(" ")
+        if not rest or rest[0] == "#":
+            stream.pop()
+            sequence.append(_parse_value(stream, indent, ""))
+            continue
+        first = rest[0]
+        if first == '"':
+            end = len(rest) - 1
+            if end and rest[end] == '"' and rest.find('"', 1) == end and rest.find("\\") == -1:
+                stream._token = None
+                sequence.append(rest[1:end])
+                continue
+        item_indent = indent + len(content) - len(rest)
+        if _is_sequence_item(rest) or (first not in "[{|>" and _split_key(rest) is not None):
+            # Compact nested collection: "- key: value" or "- - item".
+            stream.replace(item_indent, rest)
+            sequence.append(_parse_node(stream, item_indent))
+            continue
+        stream.pop()
+        sequence.append(_parse_value(stream, indent, rest))
+
+
+def _split_key(content: str) -> Tuple[str, str] | None:
+    """Split ``key: rest`` (plain or quoted key) or return ``None`` for scalars."""
+
+    first = content[0]
+    if first == '"' or first == "'":
+        try:
+            key, end = _parse_quoted(content, 0)
+        except LoaderError:
+            return None
+        rest = content[end:].lstrip(" ")
+        if rest[:1] != ":" or (len(rest) > 1 and rest[1] != " "):
+            return None
+        return key, rest[1:]
+    if first in "[{#&*!|>%@`":
+        return None
+    colon = content.find(": ")
+    if colon == -1:
+        if content[-1] != ":":
+            return None
+        colon = len(content) - 1
+    key = content[:colon]
+    if " #" in key:
+        return None
+    return key.rstrip(), content[colon + 1:]
+
+
+def _parse_value(stream: _LineStream, indent: int, rest: str, allow_inline_sequence: bool = False) -> Any:
+    """Parse the value following ``key:`` or ``-`` on a line indented by *indent*."""
+
+    rest = rest.strip(" ")
+    if not rest or rest[0] == "#":
+        token = stream.peek()
+        if token is not None:
+            if token[0] > indent:
+                return _parse_node(stream, token[0])
+            if allow_inline_sequence and token[0] == indent and _is_sequence_item(token[1]):
+                return _parse_sequence(stream, indent)
+        return None
+
+    first = rest[0]
+    if first == "|" or first == ">":
+        return _parse_block_scalar(stream, indent, rest)
+    if first == "[" or first == "{":
+        return _parse_flow_value(stream, rest)
+    if first == '"' or first == "'":
+        end = rest.find(first, 1)
+        if end == len(rest) - 1 and (rest.find("\\", 1) == -1 if first == '"' else rest.find("''", 1) == -1):
+            return rest[1:end]
+        while True:
+            try:
+                value, end = _parse_quoted(rest, 0)
+                break
+            except _Unterminated:
+                line = stream.raw()
+                if line is None:
+                    raise LoaderError(f"Unterminated quoted scalar at line {stream.lineno}.")
+                # Fold the source line break: a space, or a newline per blank line.
+                stripped = line.strip()
+                if not stripped:
+                    rest = rest.rstrip(" ") + "\n"
+                elif rest.endswith("\n"):
+                    rest += stripped
+                else:
+                    rest = f"{rest.rstrip(' ')} {stripped}"
+        trailing = rest[end:].lstrip(" ")
+        if trailing and trailing[0] != "#":
+            raise LoaderError(f"Unexpected text after quoted scalar at line {stream.lineno}.")
+        return value
+
+    if _is_sequence_item(rest):
+        raise LoaderError(f"Block sequence entries are not allowed after a key at line {stream.lineno}.")
+    value = _strip_comment(rest)
+    # Plain scalars may continue on more-indented lines (folded with spaces).
+    token = stream.peek()
+    while token is not None and token[0] > indent and not _is_sequence_item(token[1]):
+        if _split_key(token[1]) is not None:
+            raise LoaderError(f"Invalid indentation in YAML mapping at line {stream.lineno}.")
+        stream.pop()
+        value = f"{value} {_strip_comment(token[1])}"
+        token = stream.peek()
+    return _resolve_plain(value)
+
+
+def _strip_comment(text: str) -> str:
+    hash_at = text.find(" #")
+    if hash_at != -1:
+        text = text[:hash_at]
+    return text.rstrip()
+
+
+def _parse_block_scalar(stream: _LineStream, indent: int, header: str) -> str:
+    style = header[0]
+    chomping = "clip"
+    explicit = 0
+    for char in _strip_comment(header[1:]).strip():
+        if char == "-":
+            chomping = "strip"
+        elif char == "+":
+            chomping = "keep"
+        elif char.isdigit():
+            explicit = int(char)
+        else:
+            raise LoaderError(f"Invalid block scalar header '{header}' at line {stream.lineno}.")
+
+    block_indent = indent + explicit if explicit else 0
+    lines: List[str] = []
+    while True:
+        line = stream.raw()
+        if line is None:
             break
-        indent, content = token
-        if indent < base_indent or not content.startswith("- "):
+        stripped = line.lstrip(" ")
+        current = len(line) - len(stripped)
+        if not stripped.strip():
+            lines.append(line[block_indent:] if block_indent and current > block_indent else "")
+            continue
+        if not block_indent:
+            if current <= max(indent, 0) and indent >= 0:
+                stream.unread(line)
+                break
+            block_indent = current
+        if current < block_indent:
+            stream.unread(line)
             break
+        lines.append(line[block_indent:])
 
-        stream.pop()
-        value_part = content[2:].strip()
-        if value_part:
-            sequence.append(_parse_scalar(value_part))
+    trailing = 0
+    while trailing < len(lines) and not lines[len(lines) - 1 - trailing]:
+        trailing += 1
+    body = lines[: len(lines) - trailing] if trailing else lines
+
+    if style == "|":
+        text = "\n".join(body)
+    else:
+        text = _fold_block(body)
+
+    if not body:
+        return "\n" * trailing if chomping == "keep" else ""
+    if chomping == "strip":
+        return text
+    if chomping == "keep":
+        return text + "\n" * (trailing + 1)
+    return text + "\n"
+
+
+def _fold_block(lines: List[str]) -> str:
+    pieces: List[str] = []
+    previous_literal = True
+    pending_breaks = 0
+    for line in lines:
+        if not line:
+            pending_breaks += 1
             continue
+        literal = line[0] in " \t"
+        if pieces:
+            if pending_breaks:
+                pieces.append("\n" * (pending_breaks + (1 if literal or previous_literal else 0)))
+            elif literal or previous_literal:
+                pieces.append("\n")
+            else:
+                pieces.append(" ")
+        pending_breaks = 0
+        pieces.append(line)
+        previous_literal = literal
+    return "".join(pieces)
+
+
+class _Unterminated(LoaderError):
+    """Internal signal: a quoted or flow scalar continues on the next line."""
+
+
+_DOUBLE_ESCAPES = {
+    "0": "\0", "a": "\a", "b": "\b", "t": "\t", "\t": "\t", "n": "\n", "v": "\v",
+    "f": "\f", "r": "\r", "e": "\x1b", " ": " ", '"': '"', "/": "/", "\\": "\\",
+    "N": "\x85", "_": "\xa0", "L": " ", "P": " ",
+}
+_HEX_ESCAPES = {"x": 2, "u": 4, "U": 8}
+
 
-        next_token = stream.peek()
-        if next_token is None or next_token[0] <= indent:
-            sequence.append({})
+def _parse_quoted(text: str, pos: int) -> Tuple[str, int]:
+    """Parse a quoted scalar starting at ``text[pos]``; return ``(value, end)``."""
+
+    quote = text[pos]
+    start = pos + 1
+    if quote == "'":
+        end = text.find("'", start)
+        parts = []
+        while True:
+            if end == -1:
+                raise _Unterminated("Unterminated single-quoted scalar.")
+            if text.startswith("''", end):
+                parts.append(text[start:end + 1])
+                start = end + 2
+                end = text.find("'", start)
+                continue
+            parts.append(text[start:end])
+            return "".join(parts), end + 1
+
+    parts = []
+    index = start
+    while True:
+        quote_at = text.find('"', index)
+        slash_at = text.find("\\", index, quote_at if quote_at != -1 else len(text))
+        if quote_at == -1 and slash_at == -1:
+            raise _Unterminated("Unterminated double-quoted scalar.")
+        if slash_at == -1:
+            parts.append(text[index:quote_at])
+            return "".join(parts), quote_at + 1
+        parts.append(text[index:slash_at])
+        code = text[slash_at + 1:slash_at + 2]
+        if not code:
+            raise _Unterminated("Unterminated double-quoted scalar.")
+        if code in _HEX_ESCAPES:
+            width = _HEX_ESCAPES[code]
+            digits = text[slash_at + 2:slash_at + 2 + width]
+            if len(digits) != width or not all(char in "0123456789abcdefABCDEF" for char in digits):
+                raise LoaderError(f"Invalid escape '\\{code}{digits}' in double-quoted scalar.")
+            parts.append(chr(int(digits, 16)))
+            index = slash_at + 2 + width
             continue
+        if code == "\n":
+            index = slash_at + 2
+            continue
+        escaped = _DOUBLE_ESCAPES.get(code)
+        if escaped is None:
+            raise LoaderError(f"Invalid escape '\\{code}' in double-quoted scalar.")
+        parts.append(escaped)
+        index = slash_at + 2
 
-        if next_token[1].startswith("- "):
-            sequence.append(_parse_sequence(stream, next_token[0]))
-        else:
-            sequence.append(_parse_mapping(stream, next_token[0]))
 
-    return sequence
+_SIMPLE_FLOW_SEQUENCE = re.compile(r"\[([^\[\]{}\"'#:]*)\]")
 
 
-def _parse_scalar(value: str) -> Any:
-    if value.startswith("'") and value.endswith("'"):
-        return value[1:-1]
-    if value.startswith('"') and value.endswith('"'):
-        return value[1:-1]
-    lower = value.lower()
-    if lower == "true":
-        return True
-    if lower == "false":
-        return False
-    if lower in {"null", "~"}:
-        return None
-    # attempt integer then float parsing
-    try:
-        return int(value)
-    except ValueError:
-        pass
-    try:
-        return float(value)
-    except ValueError:
-        pass
-    # Try to parse as number
-    try:
-        if '.' in value:
-            return float(value)
-        return int(value)
-    except ValueError:
-        pass
+def _parse_flow_value(stream: _LineStream, rest: str) -> Any:
+    simple = _SIMPLE_FLOW_SEQUENCE.fullmatch(rest)
+    if simple is not None:
+        # Fast path for one-line sequences of plain scalars, e.g. [manual, auto].
+        items = [item.strip() for item in simple.group(1).split(",")]
+        if items[-1] == "":
+            items.pop()
+        if "" not in items:
+            return [_resolve_plain(item) for item in items]
+    text = _strip_flow_comment(rest)
+    while True:
+        try:
+            value, end = _parse_flow(text, 0)
+            break
+        except _Unterminated:
+            line = stream.raw()
+            if line is None:
+                raise LoaderError(f"Unterminated flow collection at line {stream.lineno}.")
+            text = f"{text} {_strip_flow_comment(line.strip())}"
+    trailing = text[end:].strip(" ")
+    if trailing:
+        raise LoaderError(f"Unexpected text after flow collection at line {stream.lineno}.")
     return value
 
-def load_agent(agent_name: str) -> Dict[str, Any]:
-    """Load ``role/<agent_name>/role.yaml`` and return its parsed contents."""
 
-    if not agent_name or "/" in agent_name or ".." in agent_name:
-        raise LoaderError("Agent names must be simple identifiers without path separators.")
+def _strip_flow_comment(line: str) -> str:
+    """Drop a trailing comment from one line of a flow collection (quote-aware)."""
 
-    role_dir = _ensure_within_base(BASE_PATH / "role" / agent_name)
-    role_file = role_dir / "role.yaml"
-    if not role_file.exists():
-        raise LoaderError(f"Agent definition for '{agent_name}' was not found.")
-    return _load_yaml(role_file)
+    if "#" not in line:
+        return line
+    quote = ""
+    previous = " "
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = ""
+            elif char == "\\" and quote == '"':
+                previous = char
+                continue
+        elif char in "\"'" and previous in " [{,:":
+            quote = char
+        elif char == "#" and previous in " \t":
+            return line[:index].rstrip()
+        previous = char
+    return line
+
+
+_FLOW_PLAIN = re.compile(r"[^,\[\]{}:]*(?::(?![ ,\[\]{}]|$)[^,\[\]{}:]*)*")
+
+
+def _skip_spaces(text: str, pos: int) -> int:
+    length = len(text)
+    while pos < length and text[pos] in " \t\n":
+        pos += 1
+    return pos
+
+
+def _parse_flow(text: str, pos: int) -> Tuple[Any, int]:
+    pos = _skip_spaces(text, pos)
+    if pos >= len(text):
+        raise _Unterminated("Unterminated flow collection.")
+    char = text[pos]
+    if char == "[":
+        items: List[Any] = []
+        pos += 1
+        while True:
+            pos = _skip_spaces(text, pos)
+            if pos >= len(text):
+                raise _Unterminated("Unterminated flow sequence.")
+            if text[pos] == "]":
+                return items, pos + 1
+            item, pos = _parse_flow(text, pos)
+            pos = _skip_spaces(text, pos)
+            if pos < len(text) and text[pos] == ":" and isinstance(item, str):
+                # Single-pair mapping inside a sequence: [key: value]
+                value, pos = _parse_flow(text, pos + 1)
+                item = {item: value}
+                pos = _skip_spaces(text, pos)
+            items.append(item)
+            pos = _expect_separator(text, pos, "]")
+    if char == "{":
+        mapping: Dict[Any, Any] = {}
+        pos += 1
+        while True:
+            pos = _skip_spaces(text, pos)
+            if pos >= len(text):
+                raise _Unterminated("Unterminated flow mapping.")
+            if text[pos] == "}":
+                return mapping, pos + 1
+            key, pos = _parse_flow(text, pos)
+            pos = _skip_spaces(text, pos)
+            value = None
+            if pos < len(text) and text[pos] == ":":
+                pos = _skip_spaces(text, pos + 1)
+                if pos < len(text) and text[pos] not in ",}":
+                    value, pos = _parse_flow(text, pos)
+            mapping[key] = value
+            pos = _expect_separator(text, pos, "}")
+    if char == '"' or char == "'":
+        return _parse_quoted(text, pos)
+    if char in "]}":
+        raise LoaderError(f"Unexpected '{char}' in flow collection.")
+    # Plain scalar: ends at a flow indicator or at ": " / ":" followed by an indicator.
+    end = _FLOW_PLAIN.match(text, pos).end()
+    return _resolve_plain(text[pos:end].strip()), end
+
+
+def _expect_separator(text: str, pos: int, closing: str) -> int:
+    pos = _skip_spaces(text, pos)
+    if pos >= len(text):
+        raise _Unterminated("Unterminated flow collection.")
+    if text[pos] == ",":
+        return pos + 1
+    if text[pos] == closing:
+        return pos
+    raise LoaderError(f"Expected ',' or '{closing}' in flow collection, found '{text[pos]}'.")
+
+
+_INT_PATTERN = re.compile(r"[-+]?(?:0|[1-9][0-9_]*)")
+_RADIX_INT_PATTERN = re.compile(r"[-+]?0(?:b[01_]+|x[0-9a-fA-F_]+|[0-7_]+)")
+_FLOAT_PATTERN = re.compile(r"[-+]?[0-9][0-9_]*\.[0-9_]*(?:[eE][-+][0-9]+)?|\.[0-9][0-9_]*(?:[eE][-+][0-9]+)?")
+_SEXAGESIMAL_PATTERN = re.compile(r"[-+]?(?:[1-9][0-9_]*(?::[0-5]?[0-9])+|[0-9][0-9_]*(?::[0-5]?[0-9])+\.[0-9_]*)")
+_PLAIN_CONSTANTS: Dict[str, Any] = {
+    "": None, "~": None, "null": None, "Null": None, "NULL": None,
+    "true": True, "True": True, "TRUE": True, "yes": True, "Yes": True, "YES": True,
+    "on": True, "On": True, "ON": True,
+    "false": False, "False": False, "FALSE": False, "no": False, "No": False, "NO": False,
+    "off": False, "Off": False, "OFF": False,
+    ".inf": float("inf"), ".Inf": float("inf"), ".INF": float("inf"),
+    "+.inf": float("inf"), "+.Inf": float("inf"), "+.INF": float("inf"),
+    "-.inf": float("-inf"), "-.Inf": float("-inf"), "-.INF": float("-inf"),
+    ".nan": float("nan"), ".NaN": float("nan"), ".NAN": float("nan"),
+}
+
+
+_NOT_CONSTANT = object()
+
+
+def _resolve_plain(value: str) -> Any:
+    """Resolve a plain scalar to bool/None/int/float or keep it as a string.
+
+    Numbers are recognised with anchored regular expressions, so strings such
+    as ``1.0.2`` never go through a failing ``int()``/``float()`` call.
+    """
+
+    constant = _PLAIN_CONSTANTS.get(value, _NOT_CONSTANT)
+    if constant is not _NOT_CONSTANT:
+        return constant
+    first = value[0]
+    if first in "0123456789+-.":
+        if value.isdigit() and value.isascii() and (first != "0" or len(value) == 1):
+            return int(value)
+        if _INT_PATTERN.fullmatch(value):
+            return int(value.replace("_", ""))
+        if _FLOAT_PATTERN.fullmatch(value):
+            return float(value.replace("_", ""))
+        if _RADIX_INT_PATTERN.fullmatch(value):
+            digits = value.replace("_", "")
+            sign = -1 if digits[0] == "-" else 1
+            digits = digits.lstrip("+-")
+            if digits[1:2] == "b":
+                return sign * int(digits[2:], 2)
+            if digits[1:2] == "x":
+                return sign * int(digits[2:], 16)
+            return sign * int(digits[1:] or "0", 8)
+        if ":" in value and _SEXAGESIMAL_PATTERN.fullmatch(value):
+            return _resolve_sexagesimal(value.replace("_", ""))
+    return value
+
+
+def _resolve_sexagesimal(digits: str) -> int | float:
+    """Resolve YAML 1.1 base-60 numbers such as ``1:30`` (90) like PyYAML does."""
+
+    sign = -1 if digits[0] == "-" else 1
+    convert = float if "." in digits else int
+    total = convert(0)
+    for part in digits.lstrip("+-").split(":"):
+        total = total * 60 + convert(part)
+    return sign * total
+
+
+def load_agent(agent_name: str) -> Mapping[str, Any]:
+    """Load ``role/<agent_name>/role.yaml`` and return its parsed contents.
+
+    The result is a read-only view shared with other callers; use
+    :func:`thaw` to obtain a mutable copy.
+    """
+
+    return _load_yaml(_role_file(agent_name))
+
+
+class _ToolIndex:
+    """In-memory ``name -> path`` index over ``tool/**/*.yaml``.
+
+    The tree is scanned once and the index is only rebuilt when the mtime of
+    one of the indexed directories changes (adding, removing or renaming an
+    entry updates the mtime of its parent directory).  Lookups therefore cost
+    one ``stat`` per directory instead of a full ``rglob`` per call.
+    """
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Path] = {}
+        self._duplicates: Dict[str, Tuple[Path, ...]] = {}
+        self._dir_mtimes: Dict[str, int] | None = None
+
+    def lookup(self, tool_name: str) -> Path | None:
+        with self._lock:
+            self._refresh()
+            return self._entries.get(tool_name)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._entries)
+
+    def duplicates(self) -> Dict[str, Tuple[Path, ...]]:
+        with self._lock:
+            self._refresh()
+            return dict(self._duplicates)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._dir_mtimes = None
+
+    def _refresh(self) -> None:
+        if self._dir_mtimes is not None and not self._is_stale():
+            return
+        self._build()
+
+    def _is_stale(self) -> bool:
+        assert self._dir_mtimes is not None
+        for directory, mtime_ns in self._dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _build(self) -> None:
+        found: Dict[str, List[Path]] = {}
+        dir_mtimes: Dict[str, int] = {}
+        root = str(self._root)
+        for current, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            try:
+                dir_mtimes[current] = os.stat(current).st_mtime_ns
+            except OSError:  # pragma: no cover - directory vanished mid-walk
+                continue
+            for filename in filenames:
+                if not filename.endswith(".yaml"):
+                    continue
+                path = Path(current, filename)
+                found.setdefault(filename[: -len(".yaml")], []).append(path)
+
+        entries: Dict[str, Path] = {}
+        duplicates: Dict[str, Tuple[Path, ...]] = {}
+        for name, paths in found.items():
+            # A file directly under ``tool/`` wins, otherwise keep the
+            # historical ``sorted(rglob(...))[0]`` precedence.
+            direct = self._root / f"{name}.yaml"
+            ordered = sorted(paths, key=lambda item: (item != direct, item))
+            entries[name] = ordered[0]
+            if len(ordered) > 1:
+                duplicates[name] = tuple(ordered)
+
+        new_duplicates = {
+            name: paths for name, paths in duplicates.items()
+            if self._duplicates.get(name) != paths
+        }
+        for name, paths in sorted(new_duplicates.items()):
+            listing = ", ".join(str(path.relative_to(self._root)) for path in paths)
+            warnings.warn(
+                f"Duplicate tool name '{name}' in tool/: {listing}; using '{paths[0].relative_to(self._root)}'.",
+                DuplicateToolWarning,
+                stacklevel=4,
+            )
+
+        self._entries = entries
+        self._duplicates = duplicates
+        self._dir_mtimes = dir_mtimes
+
+
+_TOOL_INDEX = _ToolIndex(BASE_PATH / "tool")
 
 
 def _iter_tool_candidates(tool_name: str) -> List[Path]:
-    """Return all matching ``tool/**/*.yaml`` paths for *tool_name*."""
+    """Return the indexed ``tool/**/*.yaml`` path for *tool_name*, if any."""
+
+    _ensure_within_base(BASE_PATH / "tool")
+    candidate = _TOOL_INDEX.lookup(tool_name)
+    if candidate is None or not candidate.is_file():
+        return []
+    return [candidate]
 
-    tools_root = _ensure_within_base(BASE_PATH / "tool")
-    direct = tools_root / f"{tool_name}.yaml"
-    candidates = [direct] if direct.exists() else []
-    if not candidates:
-        pattern = f"**/{tool_name}.yaml"
-        candidates = sorted(tools_root.rglob(pattern))
-    return [candidate for candidate in candidates if candidate.is_file()]
 
+def tool_names() -> List[str]:
+    """Return the sorted short names of every tool specification."""
 
-def load_tool(tool_name: str) -> Dict[str, Any]:
-    """Load a tool specification by its short name."""
+    return _TOOL_INDEX.names()
+
+
+def duplicate_tools() -> Dict[str, Tuple[Path, ...]]:
+    """Return tool names defined more than once, mapped to all their paths.
+
+    The first path of each tuple is the one :func:`load_tool` resolves to.
+    """
+
+    return _TOOL_INDEX.duplicates()
+
+
+def load_tool(tool_name: str) -> Mapping[str, Any]:
+    """Load a tool specification by its short name as a read-only view."""
 
     if not tool_name or "/" in tool_name or ".." in tool_name:
         raise LoaderError("Tool names must be simple identifiers without path separators.")
 
     for candidate in _iter_tool_candidates(tool_name):
-        return _load_yaml(candidate)
+        return _load_yaml(_ensure_within_base(candidate))
 
     raise LoaderError(f"Tool specification for '{tool_name}' was not found.")
 
 
-__all__ = ["load_agent", "load_tool", "LoaderError"]
+def _load_text(path: Path) -> str:
+    """Return the cached contents of a text (Markdown) import."""
+
+    return _SPEC_CACHE.get(path.resolve(), _read_text_cached)
+
+
+@dataclass(frozen=True)
+class ResolvedAgent:
+    """A role with every ``imports`` entry loaded.
+
+    ``prompts`` and ``tools`` hold read-only views of the parsed YAML files,
+    ``rules`` the raw Markdown text, all in the order listed by the role.
+    """
+
+    name: str
+    version: str
+    description: str
+    path: Path
+    prompts: Tuple[Mapping[str, Any], ...]
+    rules: Tuple[str, ...]
+    tools: Tuple[Mapping[str, Any], ...]
+
+    @property
+    def persona(self) -> Mapping[str, Any] | None:
+        """The persona of the last prompt that defines one (as ``server.js``)."""
+
+        persona = None
+        for prompt in self.prompts:
+            if isinstance(prompt.get("persona"), Mapping):
+                persona = prompt["persona"]
+        return persona
+
+
+_IMPORT_KINDS: Dict[str, Callable[[Path], Any]] = {
+    "prompts": _load_yaml,
+    "rules": _load_text,
+    "tools": _load_yaml,
+}
+
+_IMPORT_POOL: ThreadPoolExecutor | None = None
+_IMPORT_POOL_LOCK = threading.Lock()
+_INFLIGHT: Dict[str, Future] = {}
+
+
+def _import_pool() -> ThreadPoolExecutor:
+    global _IMPORT_POOL
+    with _IMPORT_POOL_LOCK:
+        if _IMPORT_POOL is None:
+            workers = int(os.environ.get("AI_SANDBOX_IMPORT_WORKERS", "0")) or min(8, (os.cpu_count() or 1) + 4)
+            _IMPORT_POOL = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader-import")
+        return _IMPORT_POOL
+
+
+def _resolve_import(role_dir: Path, relative_path: object) -> Path:
+    if not isinstance(relative_path, str) or not relative_path.strip():
+        raise LoaderError("Import paths must be non-empty strings.")
+    resolved = _ensure_within_base(role_dir / relative_path)
+    if not resolved.is_file():
+        raise LoaderError(f"Missing import: {relative_path}")
+    return resolved
+
+
+def _submit_import(path: Path, load: Callable[[Path], Any]) -> Future:
+    """Schedule *path* once, sharing the future with concurrent requesters."""
+
+    key = str(path)
+    with _IMPORT_POOL_LOCK:
+        future = _INFLIGHT.get(key)
+        if future is not None:
+            return future
+    future = _import_pool().submit(load, path)
+    with _IMPORT_POOL_LOCK:
+        existing = _INFLIGHT.setdefault(key, future)
+    if existing is future:
+        future.add_done_callback(lambda _done, key=key: _release_inflight(key, future))
+    return existing
+
+
+def _release_inflight(key: str, future: Future) -> None:
+    with _IMPORT_POOL_LOCK:
+        if _INFLIGHT.get(key) is future:
+            del _INFLIGHT[key]
+
+
+def _role_imports(role_doc: Mapping[str, Any], role_dir: Path) -> Dict[str, List[Future]]:
+    imports = role_doc.get("imports")
+    if not isinstance(imports, Mapping):
+        imports = {}
+    scheduled: Dict[str, List[Future]] = {}
+    for kind, load in _IMPORT_KINDS.items():
+        entries = imports.get(kind) or ()
+        if not isinstance(entries, (list, tuple)):
+            raise LoaderError(f"'imports.{kind}' must be a list of relative paths.")
+        scheduled[kind] = [_submit_import(_resolve_import(role_dir, entry), load) for entry in entries]
+    return scheduled
+
+
+def _role_file(agent_name: str) -> Path:
+    if not agent_name or "/" in agent_name or ".." in agent_name:
+        raise LoaderError("Agent names must be simple identifiers without path separators.")
+    role_file = _ensure_within_base(BASE_PATH / "role" / agent_name) / "role.yaml"
+    if not role_file.exists():
+        raise LoaderError(f"Agent definition for '{agent_name}' was not found.")
+    return role_file
+
+
+def _assemble(agent_name: str, role_file: Path, role_doc: Mapping[str, Any], scheduled: Dict[str, List[Future]]) -> ResolvedAgent:
+    def collect(kind: str) -> Tuple[Any, ...]:
+        return tuple(future.result() for future in scheduled[kind])
+
+    name = role_doc.get("name")
+    return ResolvedAgent(
+        name=name.strip() if isinstance(name, str) and name.strip() else agent_name,
+        version=str(role_doc.get("version", "")),
+        description=str(role_doc.get("description", "")),
+        path=role_file,
+        prompts=collect("prompts"),
+        rules=collect("rules"),
+        tools=collect("tools"),
+    )
+
+
+def load_agent_resolved(agent_name: str) -> ResolvedAgent:
+    """Load a role together with its prompts, rule texts and tool specs.
+
+    Imports are read concurrently on a shared thread pool and every path is
+    checked with :func:`_ensure_within_base` before it is opened.
+    """
+
+    return load_agents_resolved([agent_name])[agent_name]
+
+
+def load_agents_resolved(agent_names: Iterable[str] | None = None) -> Dict[str, ResolvedAgent]:
+    """Resolve several roles at once (all of ``role/*`` when *agent_names* is ``None``).
+
+    Imports shared between roles, such as ``tool/memory/*.yaml``, are loaded
+    only once.
+    """
+
+    if agent_names is None:
+        role_root = _ensure_within_base(BASE_PATH / "role")
+        agent_names = sorted(entry.name for entry in role_root.iterdir() if (entry / "role.yaml").is_file())
+
+    pending = []
+    for agent_name in agent_names:
+        role_file = _role_file(agent_name)
+        role_doc = _load_yaml(role_file)
+        pending.append((agent_name, role_file, role_doc, _role_imports(role_doc, role_file.parent)))
+
+    return {
+        agent_name: _assemble(agent_name, role_file, role_doc, scheduled)
+        for agent_name, role_file, role_doc, scheduled in pending
+    }
+
+
+__all__ = [
+    "load_agent",
+    "load_agent_resolved",
+    "load_agents_resolved",
+    "ResolvedAgent",
+    "load_schema",
+    "parse_yaml_file",
+    "compile_snapshot",
+    "snapshot_info",
+    "SnapshotInfo",
+    "DEFAULT_SNAPSHOT_PATH",
+    "load_tool",
+    "tool_names",
+    "duplicate_tools",
+    "thaw",
+    "spec_cache_info",
+    "set_spec_cache_size",
+    "clear_spec_cache",
+    "SpecCacheInfo",
+    "LoaderError",
+    "DuplicateToolWarning",
+]
+
+
+def main(argv: List[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Agent/tool specification loader utilities.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subcommands.add_parser("compile", help="Write a precompiled snapshot of every spec file.")
+    compile_parser.add_argument("--output", type=Path, default=None, help=f"Snapshot path (default: {DEFAULT_SNAPSHOT_PATH.relative_to(BASE_PATH)}).")
+    options = parser.parse_args(argv)
+
+    if options.command == "compile":
+        info = compile_snapshot(options.output)
+        print(f"Wrote {info.entries} entries to {info.path} (sha256 {info.digest[:12]}).")
+        for relative in info.skipped:
+            print(f"Skipped file (parsed on load instead): {relative}", file=sys.stderr)
+    return 0
+
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""In-process metrics and sampled logging for the Python runtime.
+
+Metrics are plain counters and histograms kept in one registry:
+
+* ``ai_sandbox_tool_call_seconds``: tool calls by tool and outcome
+  (``ok``, ``error`` or ``cached``), from :func:`tool_map.call_tool` and
+  :mod:`tool_executor`,
+* ``ai_sandbox_spec_parse_seconds``: parse time per spec file in
+  :mod:`loader` (cache misses only),
+* ``ai_sandbox_serena_spawn_seconds`` / ``ai_sandbox_serena_exec_seconds``:
+  starting a Serena process versus running a command on it, and
+* cache hit/miss counts, collected from the caches when metrics are read.
+
+:func:`snapshot` returns everything as a dictionary and
+:func:`render_prometheus` in the Prometheus text format.  When
+``AI_SANDBOX_METRICS_FILE`` is set the text is written there at exit;
+``AI_SANDBOX_METRICS=off`` turns recording into a no-op.
+
+:func:`get_logger` returns a :class:`SampledLogger`, a thin wrapper around
+:mod:`logging` that checks the level before doing any work and keeps only
+a fraction (``AI_SANDBOX_LOG_SAMPLE``, default ``1``) of debug and info
+records.  With the level above DEBUG a disabled call costs one cached level
+check.
+"""
+from __future__ import annotations
+
+import atexit
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Sequence, Tuple
+
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _enabled_from_env() -> bool:
+    return os.environ.get("AI_SANDBOX_METRICS", "on").strip().lower() not in {"0", "off", "false", "no"}
+
+
+ENABLED = _enabled_from_env()
+
+
+def _key(labels: Mapping[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not ENABLED:
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not ENABLED:
+            return
+        key = _key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[slot] += 1
+            series.sum += value
+            series.count += 1
+
+    def time(self, **labels: Any):
+        """Context manager observing the duration of its block."""
+
+        if not ENABLED:
+            return nullcontext()
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: Dict[str, Any]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        rows = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), series.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    rows.append((f"{self.name}_bucket", (*key, ("le", le)), float(cumulative)))
+                rows.append((f"{self.name}_sum", key, series.sum))
+                rows.append((f"{self.name}_count", key, float(series.count)))
+        return rows
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """``{labels: {"count", "sum", "mean"}}`` with labels rendered as ``a=1,b=2``."""
+
+        with self._lock:
+            return {
+                ",".join(f"{name}={value}" for name, value in key): {
+                    "count": series.count,
+                    "sum": series.sum,
+                    "mean": series.sum / series.count if series.count else 0.0,
+                }
+                for key, series in sorted(self._series.items())
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Sample(NamedTuple):
+    """A value read from a collector when metrics are exported."""
+
+    name: str
+    help: str
+    kind: str
+    labels: Mapping[str, Any]
+    value: float
+
+
+_METRICS: Dict[str, Counter | Histogram] = {}
+_COLLECTORS: List[Callable[[], Iterable[Sample]]] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def counter(name: str, help: str) -> Counter:
+    """Return the counter *name*, creating it on first use."""
+
+    with _REGISTRY_LOCK:
+        metric = _METRICS.get(name)
+        if metric is None:
+            metric = _METRICS[name] = Counter(name, help)
+        return metric  # type: ignore[return-value]
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Return the histogram *name*, creating it on first use."""
+
+    with _REGISTRY_LOCK:
+        metric = _METRICS.get(name)
+        if metric is None:
+            metric = _METRICS[name] = Histogram(name, help, buckets)
+        return metric  # type: ignore[return-value]
+
+
+def register_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+    """Call *collect* whenever metrics are exported; it yields :class:`Sample` values."""
+
+    with _REGISTRY_LOCK:
+        if collect not in _COLLECTORS:
+            _COLLECTORS.append(collect)
+
+
+def cache_samples(cache: str, hits: int, misses: int, **extra: float) -> List[Sample]:
+    """Standard hit/miss/ratio samples for a cache named *cache*."""
+
+    lookups = hits + misses
+    samples = [
+        Sample("ai_sandbox_cache_hits_total", "Cache hits.", "counter", {"cache": cache}, hits),
+        Sample("ai_sandbox_cache_misses_total", "Cache misses.", "counter", {"cache": cache}, misses),
+        Sample("ai_sandbox_cache_hit_ratio", "Cache hits / lookups.", "gauge", {"cache": cache},
+               hits / lookups if lookups else 0.0),
+    ]
+    for name, value in extra.items():
+        samples.append(Sample(f"ai_sandbox_cache_{name}", f"Cache {name}.", "gauge", {"cache": cache}, value))
+    return samples
+
+
+def _collected() -> List[Sample]:
+    samples: List[Sample] = []
+    for collect in list(_COLLECTORS):
+        try:
+            samples.extend(collect())
+        except Exception:  # a broken collector must not break the export
+            get_logger(__name__).warning("Metrics collector %r failed.", collect)
+    return samples
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return the current metrics as plain data."""
+
+    data: Dict[str, Any] = {}
+    with _REGISTRY_LOCK:
+        metrics = list(_METRICS.values())
+    for metric in metrics:
+        if isinstance(metric, Histogram):
+            data[metric.name] = metric.stats()
+        else:
+            data[metric.name] = {",".join(f"{n}={v}" for n, v in key): value for _, key, value in metric.samples()}
+    for sample in _collected():
+        label = ",".join(f"{name}={value}" for name, value in sorted(sample.labels.items()))
+        data.setdefault(sample.name, {})[label] = sample.value
+    return data
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _line(name: str, labels: Iterable[Tuple[str, str]], value: float) -> str:
+    rendered = ",".join(f'{label}="{_escape(str(text))}"' for label, text in labels)
+    return f"{name}{{{rendered}}} {value!r}" if rendered else f"{name} {value!r}"
+
+
+def render_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+
+    lines: List[str] = []
+    with _REGISTRY_LOCK:
+        metrics = sorted(_METRICS.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_line(name, key, value) for name, key, value in metric.samples())
+    seen = set()
+    for sample in sorted(_collected(), key=lambda sample: sample.name):
+        if sample.name not in seen:
+            seen.add(sample.name)
+            lines.append(f"# HELP {sample.name} {sample.help}")
+            lines.append(f"# TYPE {sample.name} {sample.kind}")
+        lines.append(_line(sample.name, sorted(sample.labels.items()), float(sample.value)))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path | str) -> Path:
+    """Atomically write :func:`render_prometheus` to *path* (e.g. for a node-exporter textfile)."""
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(render_prometheus(), encoding="utf-8")
+    os.replace(tmp_path, target)
+    return target
+
+
+def reset() -> None:
+    """Clear every recorded value (collectors are kept)."""
+
+    with _REGISTRY_LOCK:
+        metrics = list(_METRICS.values())
+    for metric in metrics:
+        metric.clear()
+
+
+def _write_at_exit() -> None:
+    path = os.environ.get("AI_SANDBOX_METRICS_FILE")
+    if path and ENABLED:
+        write_prometheus(path)
+
+
+atexit.register(_write_at_exit)
+
+
+# -- logging ---------------------------------------------------------------
+
+class SampledLogger:
+    """A :mod:`logging` logger that drops a share of DEBUG/INFO records.
+
+    Warnings and errors are never sampled.  Formatting is deferred to
+    :mod:`logging`, so pass arguments instead of pre-formatted strings.
+    """
+
+    __slots__ = ("logger", "rate")
+
+    def __init__(self, logger: logging.Logger, rate: float) -> None:
+        self.logger = logger
+        self.rate = rate
+
+    def _keep(self) -> bool:
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    def debug(self, message: str, *args: Any) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG) and self._keep():
+            self.logger.debug(message, *args)
+
+    def info(self, message: str, *args: Any) -> None:
+        if self.logger.isEnabledFor(logging.INFO) and self._keep():
+            self.logger.info(message, *args)
+
+    def warning(self, message: str, *args: Any) -> None:
+        self.logger.warning(message, *args)
+
+    def error(self, message: str, *args: Any) -> None:
+        self.logger.error(message, *args)
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+
+def get_logger(name: str, rate: float | None = None) -> SampledLogger:
+    """Return a :class:`SampledLogger` for *name*."""
+
+    if rate is None:
+        rate = float(os.environ.get("AI_SANDBOX_LOG_SAMPLE", "1"))
+    return SampledLogger(logging.getLogger(name), rate)
+
+
+def log_call(log: SampledLogger, tool: str, args: Sequence[Any], kwargs: Mapping[str, Any]) -> None:
+    """Record that *tool* ran, without logging argument values."""
+
+    if log.logger.isEnabledFor(logging.DEBUG):
+        log.debug("%s called with %d positional args and keywords %s", tool, len(args), sorted(kwargs))
+
+
+# -- shared metrics ----------------------------------------------------------
+
+TOOL_CALL_SECONDS = histogram("ai_sandbox_tool_call_seconds", "Tool call duration by tool and outcome.")
+SPEC_PARSE_SECONDS = histogram("ai_sandbox_spec_parse_seconds", "Spec file parse time on cache misses.")
+SERENA_SPAWN_SECONDS = histogram("ai_sandbox_serena_spawn_seconds", "Time to start a Serena process.")
+SERENA_EXEC_SECONDS = histogram("ai_sandbox_serena_exec_seconds", "Time to run a Serena command once started.")
+NOTION_REQUEST_SECONDS = histogram("ai_sandbox_notion_request_seconds", "Notion API request time by operation and status.")
+
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "Sample",
+    "SampledLogger",
+    "counter",
+    "histogram",
+    "register_collector",
+    "cache_samples",
+    "snapshot",
+    "render_prometheus",
+    "write_prometheus",
+    "reset",
+    "get_logger",
+    "log_call",
+    "TOOL_CALL_SECONDS",
+    "SPEC_PARSE_SECONDS",
+    "SERENA_SPAWN_SECONDS",
+    "SERENA_EXEC_SECONDS",
+    "NOTION_REQUEST_SECONDS",
+    "DEFAULT_BUCKETS",
+]
@@ -0,0 +1,836 @@
+#!/usr/bin/env python3
+"""Stream, validate and index agent-profile catalogs.
+
+Agent-profile files (``schemas/agent_schema.json``, ``schemas/agent_001.json``)
+hold a list of ``Agent_Profile`` records, each with nested
+``Skills[].Parameters[]`` arrays.  They are read with an incremental JSON
+parser over fixed-size chunks: only one skill object is materialised at a
+time, so memory stays flat whatever the size of the file.  Every profile and
+skill is checked against ``schemas/agent_profile_schema.json`` as it arrives.
+
+While streaming, the byte span of each skill is written to a sqlite index
+(``.cache/profile-index.sqlite3``), so :meth:`ProfileIndex.lookup` can read a
+single skill such as ``ASA-001-T1`` with one seek.  Files are only re-read
+when their mtime or size changes.
+
+The parser accepts two quirks found in the hand-written catalogs and reports
+them as warnings: the non-JSON escape ``\\'`` and trailing commas.
+
+Usage::
+
+    python profiles.py validate [FILE ...] [--format text|json] [--chunk-size N]
+    python profiles.py lookup SKILL_ID [SKILL_ID ...]
+"""
+from __future__ import annotations
+
+import argparse
+import codecs
+import copy
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+from loader import BASE_PATH
+
+
+PROFILE_SCHEMA_FILE = "schemas/agent_profile_schema.json"
+DEFAULT_PROFILE_FILES: Tuple[str, ...] = ("schemas/agent_schema.json", "schemas/agent_001.json")
+DEFAULT_INDEX_PATH = BASE_PATH / ".cache" / "profile-index.sqlite3"
+CHUNK_SIZE = 64 * 1024
+_SCHEMA_VERSION = 1
+_BATCH_ROWS = 1000
+# Passes over a file that keeps changing while it is read before giving up.
+_INDEX_ATTEMPTS = 3
+
+_TOKEN = re.compile(
+    r'[ \t\r\n]*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([{}\[\]:,])'
+    r"|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)|(true|false|null))",
+    re.S,
+)
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_ESCAPE = re.compile(r"\\(.)", re.S)
+_LITERALS = {"true": True, "false": False, "null": None}
+_STRING, _NUMBER, _LITERAL, _EOF = '"', "0", "t", ""
+_DECODER = json.JSONDecoder()
+
+
+class ProfileSyntaxError(ValueError):
+    """Raised when a profile file is not (lenient) JSON."""
+
+    def __init__(self, message: str, offset: int) -> None:
+        super().__init__(f"{message} at byte {offset}")
+        self.offset = offset
+
+
+class Token(NamedTuple):
+    kind: str
+    raw: str
+    offset: int  # character position in the decoded stream
+
+
+class _Lexer:
+    """Chunked tokenizer and lenient parser over a UTF-8 byte stream.
+
+    Positions are kept in characters of the decoded text and converted to
+    byte offsets on request by encoding the text between a known
+    ``(character, byte)`` anchor and the target, so each byte is re-encoded
+    about once.  :meth:`fast_value` hands whole objects to the C decoder
+    and only falls back to the token-by-token parser for the lenient cases.
+    """
+
+    def __init__(self, handle: BinaryIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._base = 0  # character position of _buffer[0]
+        self._anchor = (0, 0)  # (character position, byte offset)
+        self._eof = False
+        self.last_end = 0  # character position just past the last value or token read
+        self.quirks: Dict[str, List[int]] = {}  # name -> [count, first byte offset]
+
+    def byte_offset(self, position: int) -> int:
+        """Byte offset of the character *position*, which must still be buffered."""
+
+        char, byte = self._anchor
+        if position >= char:
+            byte += len(self._buffer[char - self._base : position - self._base].encode("utf-8"))
+        else:
+            byte -= len(self._buffer[position - self._base : char - self._base].encode("utf-8"))
+        self._anchor = (position, byte)
+        return byte
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._handle.read(self._chunk_size)
+        try:
+            text = self._decoder.decode(data, final=not data)
+        except UnicodeDecodeError as exc:
+            raise ProfileSyntaxError(f"invalid UTF-8 ({exc.reason})", self.byte_offset(self._base + len(self._buffer))) from None
+        self._eof = not data
+        self.byte_offset(self._base + self._pos)  # keep the anchor inside the buffer
+        self._base += self._pos
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        return bool(data)
+
+    def _error(self, message: str, position: int) -> ProfileSyntaxError:
+        return ProfileSyntaxError(message, self.byte_offset(position))
+
+    def next(self) -> Token:
+        while True:
+            match = _TOKEN.match(self._buffer, self._pos)
+            # A token touching the end of the buffer may continue in the next chunk.
+            if match is not None and (match.end() < len(self._buffer) or self._eof):
+                break
+            if not self._fill() and match is None:
+                rest = self._buffer[self._pos :]
+                position = self._base + len(self._buffer) - len(rest.lstrip())
+                if rest.strip():
+                    raise self._error("unexpected input", position)
+                self.last_end = position
+                return Token(_EOF, "", position)
+        group = match.lastindex or 0
+        start = self._base + match.start(group)
+        self._pos = match.end()
+        self.last_end = self._base + self._pos
+        if group == 1:
+            return Token(_STRING, match.group(1), start - 1)
+        if group == 2:
+            return Token(match.group(2), "", start)
+        return Token(_NUMBER if group == 3 else _LITERAL, match.group(group), start)
+
+    def lookahead(self) -> str:
+        """Skip whitespace and return the next character without consuming it ("" at the end)."""
+
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos : self._pos + 1]
+
+    def position(self) -> int:
+        return self._base + self._pos
+
+    def _quirk(self, name: str, position: int) -> None:
+        entry = self.quirks.setdefault(name, [0, self.byte_offset(position)])
+        entry[0] += 1
+
+    def string(self, token: Token) -> str:
+        raw = token.raw
+        if "\\" not in raw:
+            return raw
+        if "\\'" in raw:
+            fixed = _ESCAPE.sub(lambda m: "'" if m.group(1) == "'" else m.group(0), raw)
+            if fixed != raw:
+                self._quirk("non-standard \\' escape", token.offset)
+                raw = fixed
+        try:
+            return json.loads('"' + raw + '"')
+        except ValueError as exc:
+            raise self._error(f"invalid string ({exc})", token.offset) from None
+
+    def expect(self, kind: str) -> Token:
+        token = self.next()
+        if token.kind != kind:
+            raise self._error(f"expected {kind!r}, found {_describe(token)}", token.offset)
+        return token
+
+    def members(self) -> Iterator[str]:
+        """Yield the keys of the object whose ``{`` was just read; the caller reads each value."""
+
+        token = self.next()
+        if token.kind == "}":
+            return
+        while True:
+            if token.kind != _STRING:
+                raise self._error(f"expected a key, found {_describe(token)}", token.offset)
+            key = self.string(token)
+            self.expect(":")
+            yield key
+            token = self.next()
+            if token.kind == "}":
+                return
+            if token.kind != ",":
+                raise self._error(f"expected ',' or '}}', found {_describe(token)}", token.offset)
+            token = self.next()
+            if token.kind == "}":
+                self._quirk("trailing comma", token.offset)
+                return
+
+    def elements(self) -> Iterator[int]:
+        """Yield once per element of the array whose ``[`` was just read.
+
+        The lexer is positioned at the element (its character position is
+        yielded) and the caller reads it, e.g. with :meth:`fast_value`.
+        """
+
+        if self.lookahead() == "]":
+            self.next()
+            return
+        while True:
+            yield self.position()
+            token = self.next()
+            if token.kind == "]":
+                return
+            if token.kind != ",":
+                raise self._error(f"expected ',' or ']', found {_describe(token)}", token.offset)
+            if self.lookahead() == "]":
+                self._quirk("trailing comma", self.position())
+                self.next()
+                return
+
+    def value(self) -> Any:
+        """Read one value token by token, accepting the lenient syntax."""
+
+        token = self.next()
+        kind = token.kind
+        if kind == _STRING:
+            return self.string(token)
+        if kind == "{":
+            result = {}
+            for key in self.members():
+                result[key] = self.value()
+            return result
+        if kind == "[":
+            return [self.value() for _ in self.elements()]
+        if kind == _NUMBER:
+            return json.loads(token.raw)
+        if kind == _LITERAL:
+            return _LITERALS[token.raw]
+        raise self._error(f"unexpected {_describe(token)}", token.offset)
+
+    def fast_value(self) -> Any:
+        """Read one value, with the C decoder when it is strict JSON."""
+
+        if self.lookahead() in ("{", "["):
+            failure = None
+            while True:
+                try:
+                    result, end = _DECODER.raw_decode(self._buffer, self._pos)
+                except ValueError as exc:
+                    # Either the value runs past the buffer or it is not strict JSON:
+                    # an error that survives a refill unchanged is the latter.
+                    seen = (exc.msg, self._base + exc.pos)
+                    if seen == failure or not self._fill():
+                        break
+                    failure = seen
+                    continue
+                self._pos = end
+                self.last_end = self._base + end
+                return result
+        return self.value()
+
+
+def _describe(token: Token) -> str:
+    if token.kind == _EOF:
+        return "end of file"
+    if token.kind in (_STRING, _NUMBER, _LITERAL):
+        return "a value"
+    return repr(token.kind)
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse one document with the lenient rules used for profile files."""
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    lexer = _Lexer(io.BytesIO(data))
+    result = lexer.fast_value()
+    token = lexer.next()
+    if token.kind != _EOF:
+        raise lexer._error("trailing data", token.offset)
+    return result
+
+
+class Record(NamedTuple):
+    """A profile (without its skills) or a single skill, with its byte span."""
+
+    kind: str  # "profile" or "skill"
+    data: Dict[str, Any]
+    offset: int
+    length: int
+    agent_id: str | None
+    skills: int = 0
+
+
+class Issue(NamedTuple):
+    path: str
+    level: str  # "error" or "warning"
+    message: str
+    offset: int | None = None
+
+
+class ProfileReader:
+    """Iterate over the records of one profile file."""
+
+    def __init__(self, path: Path | str, chunk_size: int = CHUNK_SIZE) -> None:
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.quirks: Dict[str, List[int]] = {}
+
+    def records(self) -> Iterator[Record]:
+        with self.path.open("rb") as handle:
+            lexer = _Lexer(handle, self.chunk_size)
+            self.quirks = lexer.quirks
+            if lexer.lookahead() == "[":
+                lexer.next()
+                for _ in lexer.elements():
+                    yield from self._profile(lexer)
+            else:
+                yield from self._profile(lexer)
+            token = lexer.next()
+            if token.kind != _EOF:
+                raise lexer._error("trailing data after the profiles", token.offset)
+
+    @staticmethod
+    def _profile(lexer: _Lexer) -> Iterator[Record]:
+        token = lexer.next()
+        if token.kind != "{":
+            raise lexer._error(f"expected a profile object, found {_describe(token)}", token.offset)
+        start = lexer.byte_offset(token.offset)
+        header: Dict[str, Any] = {}
+        skills = 0
+        for key in lexer.members():
+            if key == "Skills" and lexer.lookahead() == "[":
+                lexer.next()
+                header[key] = []
+                agent_id = _text(header.get("Agent_ID"))
+                for position in lexer.elements():
+                    offset = lexer.byte_offset(position)
+                    data = lexer.fast_value()
+                    skills += 1
+                    yield Record("skill", data, offset, lexer.byte_offset(lexer.last_end) - offset, agent_id)
+            else:
+                header[key] = lexer.fast_value()
+        end = lexer.byte_offset(lexer.last_end)
+        yield Record("profile", header, start, end - start, _text(header.get("Agent_ID")), skills)
+
+
+def _text(value: Any) -> str | None:
+    return value if isinstance(value, str) else None
+
+
+def load_profile_schema(root: Path = BASE_PATH) -> Dict[str, Any]:
+    with (root / PROFILE_SCHEMA_FILE).open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+}
+_ANNOTATIONS = frozenset({"$schema", "$id", "title", "description", "definitions", "default", "examples"})
+
+
+def _compile_check(schema: Dict[str, Any], root: Dict[str, Any]) -> Callable[[Any], bool] | None:
+    """Compile the keyword subset the profile schema uses into a predicate.
+
+    Returns ``None`` when *schema* uses anything else; the caller then relies
+    on jsonschema alone.  The predicate only says valid or not; messages
+    still come from jsonschema.
+    """
+
+    if "$ref" in schema:
+        ref = schema["$ref"]
+        target = root.get("definitions", {}).get(ref[len("#/definitions/") :]) if ref.startswith("#/definitions/") else None
+        return _compile_check(target, root) if isinstance(target, dict) else None
+    checks: List[Callable[[Any], bool]] = []
+    for keyword, argument in schema.items():
+        if keyword in _ANNOTATIONS:
+            continue
+        if keyword == "type" and argument in _TYPES:
+            checks.append(_TYPES[argument])
+        elif keyword == "required":
+            checks.append(lambda value, names=tuple(argument): not isinstance(value, dict) or all(n in value for n in names))
+        elif keyword == "properties":
+            compiled = {}
+            for name, subschema in argument.items():
+                check = _compile_check(subschema, root)
+                if check is None:
+                    return None
+                compiled[name] = check
+            checks.append(
+                lambda value, compiled=compiled: not isinstance(value, dict)
+                or all(check(value[name]) for name, check in compiled.items() if name in value)
+            )
+        elif keyword == "items" and isinstance(argument, dict):
+            check = _compile_check(argument, root)
+            if check is None:
+                return None
+            checks.append(lambda value, check=check: not isinstance(value, list) or all(map(check, value)))
+        elif keyword == "pattern":
+            search = re.compile(argument).search
+            checks.append(lambda value, search=search: not isinstance(value, str) or search(value) is not None)
+        elif keyword == "minLength":
+            checks.append(lambda value, size=argument: not isinstance(value, str) or len(value) >= size)
+        elif keyword == "enum" and all(isinstance(item, str) for item in argument):
+            checks.append(lambda value, allowed=frozenset(argument): isinstance(value, str) and value in allowed)
+        else:
+            return None
+    return lambda value: all(check(value) for check in checks)
+
+
+class ProfileValidator:
+    """Compiled validators for profile headers and for single skills.
+
+    Records first go through a predicate compiled from the schema; only the
+    ones it rejects are run through jsonschema to get the error messages.
+    """
+
+    def __init__(self, schema: Dict[str, Any] | None = None) -> None:
+        from jsonschema import Draft7Validator
+
+        schema = schema if schema is not None else load_profile_schema()
+        Draft7Validator.check_schema(schema)
+        # Skills are checked one at a time, so the header only needs the array itself.
+        header = copy.deepcopy(schema)
+        header.setdefault("properties", {})["Skills"] = {"type": "array"}
+        self._header = Draft7Validator(header)
+        skill = {"$ref": "#/definitions/skill", "definitions": schema.get("definitions", {})}
+        self._skill = Draft7Validator(skill)
+        self._fast_header = _compile_check(header, header)
+        self._fast_skill = _compile_check(skill, skill)
+
+    def iter_errors(self, record: Record) -> Iterator[str]:
+        skill_id = None
+        if record.kind == "skill":
+            skill_id = record.data.get("Skill_ID") if isinstance(record.data, dict) else None
+            prefix = f"{record.agent_id or '?'}/Skills/{skill_id if isinstance(skill_id, str) else '?'}"
+            validator, fast = self._skill, self._fast_skill
+        else:
+            prefix = record.agent_id or "<profile>"
+            validator, fast = self._header, self._fast_header
+        if fast is None or not fast(record.data):
+            for error in sorted(validator.iter_errors(record.data), key=lambda error: list(error.absolute_path)):
+                location = "/".join(str(part) for part in error.absolute_path)
+                yield f"{prefix}{'/' + location if location else ''}: {error.message}"
+        if (
+            record.kind == "skill"
+            and record.agent_id
+            and isinstance(skill_id, str)
+            and not skill_id.startswith(record.agent_id + "-")
+        ):
+            yield f"{prefix}: Skill_ID does not start with the profile's Agent_ID {record.agent_id!r}"
+
+
+def check_file(
+    path: Path | str,
+    validator: ProfileValidator | None = None,
+    on_record: Callable[[Record], None] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Issue]:
+    """Stream *path*, yielding validation issues as records arrive.
+
+    *on_record* is called with every record, valid or not, before its issues
+    are yielded.  A syntax error ends the file; the records before it have
+    already been passed on.
+    """
+
+    reader = ProfileReader(path, chunk_size)
+    name = _relative(reader.path)
+    try:
+        for record in reader.records():
+            if on_record is not None:
+                on_record(record)
+            if validator is not None:
+                for message in validator.iter_errors(record):
+                    yield Issue(name, "error", message, record.offset)
+    except ProfileSyntaxError as exc:
+        yield Issue(name, "error", f"syntax error: {exc}", exc.offset)
+    except OSError as exc:
+        yield Issue(name, "error", f"cannot read file: {exc}")
+    for quirk, (count, offset) in reader.quirks.items():
+        yield Issue(name, "warning", f"{count} x {quirk} (first at byte {offset})", offset)
+
+
+def _relative(path: Path | str) -> str:
+    try:
+        return Path(path).resolve().relative_to(BASE_PATH).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def default_profile_files() -> List[Path]:
+    configured = os.environ.get("AI_SANDBOX_PROFILE_FILES")
+    names = configured.split(os.pathsep) if configured else DEFAULT_PROFILE_FILES
+    return [BASE_PATH / name for name in names if name]
+
+
+class ProfileIndex:
+    """Skill ID to ``(file, offset, length)`` index over a set of profile files.
+
+    Lookups re-check the files' stat signatures at most every
+    ``refresh_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[Path | str] | None = None,
+        db_path: Path | str | None = None,
+        refresh_interval: float = 2.0,
+    ) -> None:
+        self.paths = [Path(path).resolve() for path in (paths if paths is not None else default_profile_files())]
+        self.db_path = Path(db_path or os.environ.get("AI_SANDBOX_PROFILE_INDEX") or DEFAULT_INDEX_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.refresh_interval = refresh_interval
+        self._last_refresh = float("-inf")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                rank INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS skills (
+                skill_id TEXT NOT NULL, file_id INTEGER NOT NULL, agent_id TEXT,
+                offset INTEGER NOT NULL, length INTEGER NOT NULL,
+                PRIMARY KEY (skill_id, file_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS skills_file ON skills(file_id);
+            """
+        )
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(_SCHEMA_VERSION):
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute("DELETE FROM files")
+                self._db.execute("DELETE FROM skills")
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(_SCHEMA_VERSION),))
+
+    def refresh(
+        self,
+        validator: ProfileValidator | None = None,
+        force: bool = False,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> List[Issue]:
+        """Re-stream the files that changed (all of them with *force*).
+
+        Returns the issues found in the files that were read and, when
+        anything was re-indexed, the skill IDs defined in more than one file.
+        """
+
+        issues: List[Issue] = []
+        changed = False
+        with self._lock:
+            known = {path: (file_id, mtime, size) for file_id, path, mtime, size in self._db.execute(
+                "SELECT id, path, mtime_ns, size FROM files"
+            )}
+            wanted = {str(path) for path in self.paths}
+            with self._db:
+                self._db.execute("BEGIN")
+                for path, (file_id, _, _) in known.items():
+                    if path not in wanted:
+                        self._drop(file_id)
+                        changed = True
+                for rank, path in enumerate(self.paths):
+                    key = str(path)
+                    try:
+                        stat = path.stat()
+                    except OSError as exc:
+                        if key in known:
+                            self._drop(known[key][0])
+                            changed = True
+                        issues.append(Issue(_relative(path), "error", f"cannot read file: {exc}"))
+                        continue
+                    previous = known.get(key)
+                    if previous and not force and previous[1] == stat.st_mtime_ns and previous[2] == stat.st_size:
+                        self._db.execute("UPDATE files SET rank = ? WHERE id = ?", (rank, previous[0]))
+                        continue
+                    if previous:
+                        self._drop(previous[0])
+                    changed = True
+                    issues.extend(self._index_stable(path, stat, rank, validator, chunk_size))
+            if changed:
+                issues.extend(self._duplicates())
+            self._last_refresh = time.monotonic()
+        return issues
+
+    def _maybe_refresh(self) -> None:
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def _drop(self, file_id: int) -> None:
+        self._db.execute("DELETE FROM skills WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_stable(
+        self, path: Path, stat: os.stat_result, rank: int, validator: ProfileValidator | None, chunk_size: int
+    ) -> List[Issue]:
+        """Index *path*, reading it again if it changed while it was streamed.
+
+        The spans of a file rewritten mid-read can mix two versions, so the
+        file is re-stat'ed afterwards.  If it is still changing after
+        ``_INDEX_ATTEMPTS`` passes, the last pass is kept with a signature
+        that makes the next refresh read it again.
+        """
+
+        key = str(path)
+        for attempt in range(1, _INDEX_ATTEMPTS + 1):
+            file_id = self._db.execute(
+                "INSERT INTO files (path, mtime_ns, size, rank) VALUES (?, ?, ?, ?)",
+                (key, stat.st_mtime_ns, stat.st_size, rank),
+            ).lastrowid
+            issues = self._index_file(path, file_id, validator, chunk_size)
+            try:
+                after = path.stat()
+            except OSError:
+                after = None
+            if after is not None and (after.st_mtime_ns, after.st_size) == (stat.st_mtime_ns, stat.st_size):
+                break
+            if after is None or attempt == _INDEX_ATTEMPTS:
+                self._db.execute("UPDATE files SET mtime_ns = -1 WHERE id = ?", (file_id,))
+                break
+            self._drop(file_id)
+            stat = after
+        return issues
+
+    def _index_file(self, path: Path, file_id: int, validator: ProfileValidator | None, chunk_size: int) -> List[Issue]:
+        rows: List[Tuple[str, int, str | None, int, int]] = []
+        issues: List[Issue] = []
+        name = _relative(path)
+
+        def flush() -> None:
+            for row in rows:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO skills (skill_id, file_id, agent_id, offset, length) VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+                if cursor.rowcount == 0:
+                    issues.append(Issue(name, "error", f"duplicate Skill_ID {row[0]!r}", row[3]))
+            rows.clear()
+
+        def on_record(record: Record) -> None:
+            skill_id = record.data.get("Skill_ID") if record.kind == "skill" and isinstance(record.data, dict) else None
+            if isinstance(skill_id, str):
+                rows.append((skill_id, file_id, record.agent_id, record.offset, record.length))
+                if len(rows) >= _BATCH_ROWS:
+                    flush()
+
+        for issue in check_file(path, validator, on_record, chunk_size):
+            issues.append(issue)
+        flush()
+        return issues
+
+    def _duplicates(self) -> List[Issue]:
+        rows = self._db.execute(
+            """
+            SELECT s.skill_id, f.path, s.offset FROM skills s JOIN files f ON f.id = s.file_id
+            WHERE s.skill_id IN (SELECT skill_id FROM skills GROUP BY skill_id HAVING COUNT(*) > 1)
+            ORDER BY s.skill_id, f.rank
+            """
+        ).fetchall()
+        issues: List[Issue] = []
+        first: Dict[str, str] = {}
+        for skill_id, path, offset in rows:
+            if skill_id in first:
+                message = f"Skill_ID {skill_id!r} is also defined in {first[skill_id]}; lookups use that one"
+                issues.append(Issue(_relative(path), "warning", message, offset))
+            else:
+                first[skill_id] = _relative(path)
+        return issues
+
+    def lookup(self, skill_id: str) -> Dict[str, Any] | None:
+        """Return one skill with its location, reading only its bytes.
+
+        A span that no longer holds the skill (the file changed since it was
+        indexed) forces a refresh, and the lookup is tried once more.
+        """
+
+        for stale in (False, True):
+            with self._lock:
+                if stale:
+                    self.refresh(force=True)
+                else:
+                    self._maybe_refresh()
+                row = self._db.execute(
+                    """
+                    SELECT f.path, s.agent_id, s.offset, s.length FROM skills s JOIN files f ON f.id = s.file_id
+                    WHERE s.skill_id = ? ORDER BY f.rank LIMIT 1
+                    """,
+                    (skill_id,),
+                ).fetchone()
+            if row is None:
+                return None
+            path, agent_id, offset, length = row
+            try:
+                with open(path, "rb") as handle:
+                    handle.seek(offset)
+                    skill = loads(handle.read(length))
+            except (OSError, ValueError):  # ProfileSyntaxError is a ValueError
+                if stale:
+                    raise
+                continue
+            if isinstance(skill, dict) and skill.get("Skill_ID") == skill_id:
+                return {"skill_id": skill_id, "agent_id": agent_id, "path": _relative(path), "offset": offset,
+                        "skill": skill}
+        return None
+
+    def skill_ids(self, agent_id: str | None = None) -> List[str]:
+        with self._lock:
+            self._maybe_refresh()
+            if agent_id is None:
+                rows = self._db.execute("SELECT DISTINCT skill_id FROM skills ORDER BY skill_id")
+            else:
+                rows = self._db.execute(
+                    "SELECT DISTINCT skill_id FROM skills WHERE agent_id = ? ORDER BY skill_id", (agent_id,)
+                )
+            return [skill_id for (skill_id,) in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_INDEX: ProfileIndex | None = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index() -> ProfileIndex:
+    """Return the shared :class:`ProfileIndex` over the default profile files."""
+
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = ProfileIndex()
+        return _INDEX
+
+
+def lookup_skill(skill_id: str) -> Dict[str, Any] | None:
+    return get_index().lookup(skill_id)
+
+
+def render_text(issues: Sequence[Issue], files: Sequence[Path], skills: int) -> str:
+    lines = ["--- Validating agent profiles ---"]
+    by_file: Dict[str, List[Issue]] = {}
+    for issue in issues:
+        by_file.setdefault(issue.path, []).append(issue)
+    for path in files:
+        name = _relative(path)
+        found = by_file.pop(name, [])
+        mark = "❌" if any(issue.level == "error" for issue in found) else ("⚠️ " if found else "✅")
+        lines.append(f"  {mark} {name}")
+        lines.extend(f"     {issue.level}: {issue.message}" for issue in found)
+    errors = sum(1 for issue in issues if issue.level == "error")
+    warnings = len(issues) - errors
+    lines.append(f"\n--- {skills} skills indexed, {errors} errors, {warnings} warnings ---")
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("validate", help="stream, validate and index profile files")
+    check.add_argument("files", nargs="*", type=Path, help="profile files (default: the configured catalog)")
+    check.add_argument("--format", choices=("text", "json"), default="text")
+    check.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    find = commands.add_parser("lookup", help="print skills by Skill_ID from the index")
+    find.add_argument("skill_ids", nargs="+")
+    options = parser.parse_args(argv)
+
+    if options.command == "lookup":
+        index = get_index()
+        missing = 0
+        for skill_id in options.skill_ids:
+            found = index.lookup(skill_id)
+            missing += found is None
+            print(json.dumps(found or {"skill_id": skill_id, "error": "not found"}, ensure_ascii=False, indent=2))
+        return 1 if missing else 0
+
+    try:
+        validator = ProfileValidator()
+    except ImportError:
+        print("Error: jsonschema is not installed. Please run 'pip install jsonschema'", file=sys.stderr)
+        return 1
+    index = ProfileIndex(options.files or None)
+    issues = index.refresh(validator, force=True, chunk_size=options.chunk_size)
+    skills = len(index.skill_ids())
+    if options.format == "json":
+        print(json.dumps({"skills": skills, "issues": [issue._asdict() for issue in issues]}, ensure_ascii=False, indent=2))
+    else:
+        print(render_text(issues, index.paths, skills))
+    return 1 if any(issue.level == "error" for issue in issues) else 0
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "DEFAULT_PROFILE_FILES",
+    "Issue",
+    "ProfileIndex",
+    "ProfileReader",
+    "ProfileSyntaxError",
+    "ProfileValidator",
+    "Record",
+    "check_file",
+    "default_profile_files",
+    "get_index",
+    "load_profile_schema",
+    "loads",
+    "lookup_skill",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
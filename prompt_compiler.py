@@ -0,0 +1,445 @@
+"""Compile role prompts once and render requests by substitution.
+
+A role's system prompt is assembled from its ``role.yaml`` imports (prompts,
+rules, tools), the shared rules in ``_common/rules`` and the master toolkit
+template.  :class:`PromptCompiler` resolves every build-time placeholder of a
+small layout up front, leaving a :class:`CompiledPrompt` whose only open slot
+is the user's request, so rendering is a single string join.
+
+Each compiled prompt records the files it was built from.  The compiler keeps
+the reverse map (file -> roles), so after editing a shared rule file only the
+roles that import it are rebuilt.  Placeholders are only recognised in the
+layout; ``{{...}}`` or ``${...}`` inside imported files is copied verbatim.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import loader
+import metrics
+from loader import BASE_PATH, LoaderError
+
+
+DEFAULT_TEMPLATE_PATH = BASE_PATH / "template" / "master" / "agent_template.md"
+COMMON_RULES: Tuple[Path, ...] = (BASE_PATH / "_common" / "rules" / "standard_rules.md",)
+
+DEFAULT_LAYOUT = """\
+# {{role.name}}
+{{role.description}}
+
+## Persona
+{{persona.role}}
+{{persona.tone}}
+
+## Instructions
+{{prompt}}
+
+## Rules
+{{rules}}
+
+## Tools
+{{tools}}
+
+## Toolkit Reference
+{{template}}
+
+## Request
+{{user_prompt}}
+"""
+
+RUNTIME_FIELDS = ("user_prompt",)
+BUILD_FIELDS = (
+    "role.name", "role.description", "role.version", "persona.role", "persona.tone",
+    "prompt", "rules", "tools", "template",
+)
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([\w.]+)\s*\}\}")
+_TOKEN = re.compile(r"[^\x00-\x7f]|[A-Za-z]{1,4}|\d{1,3}|[^\s\w]")
+
+Signature = Tuple[int, int]
+
+
+class PromptCompileError(ValueError):
+    """Raised when a layout uses an unknown placeholder."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: short word pieces, digit groups, punctuation, one per non-ASCII character."""
+
+    return len(_TOKEN.findall(text))
+
+
+def _relative(path: Path) -> str:
+    try:
+        return path.relative_to(BASE_PATH).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _signature(path: Path) -> Signature | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_layout(layout: str) -> List[Tuple[bool, str]]:
+    """Split *layout* into ``(is_placeholder, text)`` parts."""
+
+    parts: List[Tuple[bool, str]] = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(layout):
+        name = match.group(1)
+        if name not in BUILD_FIELDS and name not in RUNTIME_FIELDS:
+            raise PromptCompileError(f"Unknown placeholder '{{{{{name}}}}}' in prompt layout.")
+        parts.append((False, layout[position:match.start()]))
+        parts.append((True, name))
+        position = match.end()
+    parts.append((False, layout[position:]))
+    return parts
+
+
+@dataclass(frozen=True)
+class Section:
+    """Size of one part of a compiled prompt."""
+
+    name: str
+    source: str
+    bytes: int
+    tokens: int
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A role prompt with every build-time placeholder already substituted.
+
+    ``chunks`` alternates literal text and runtime slot names, starting and
+    ending with literal text.
+    """
+
+    role: str
+    chunks: Tuple[str, ...]
+    sections: Tuple[Section, ...]
+    dependencies: Tuple[Path, ...]
+    compiled_at: float = field(default_factory=time.time)
+
+    def render(self, user_prompt: str = "") -> str:
+        """Return the full prompt for *user_prompt*."""
+
+        if len(self.chunks) == 3:
+            return self.chunks[0] + user_prompt + self.chunks[2]
+        values = {"user_prompt": user_prompt}
+        return "".join(
+            values[chunk] if position % 2 else chunk for position, chunk in enumerate(self.chunks)
+        )
+
+    @property
+    def static_bytes(self) -> int:
+        return sum(len(chunk.encode("utf-8")) for chunk in self.chunks[::2])
+
+    @property
+    def static_tokens(self) -> int:
+        return sum(estimate_tokens(chunk) for chunk in self.chunks[::2])
+
+
+def _as_text(value: Any) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _imports(role_doc: Mapping[str, Any], kind: str) -> List[Any]:
+    imports = role_doc.get("imports")
+    entries = imports.get(kind) if isinstance(imports, Mapping) else None
+    return list(entries) if isinstance(entries, (list, tuple)) else []
+
+
+def _tool_line(spec: Mapping[str, Any], path: Path) -> str:
+    name = spec.get("name") or path.stem
+    description = _as_text(spec.get("description"))
+    return f"- {name}: {description}" if description else f"- {name}"
+
+
+class PromptCompiler:
+    """Build and cache :class:`CompiledPrompt` objects for roles.
+
+    ``refresh()`` stats every tracked file once and recompiles only the roles
+    that depend on a changed one; :meth:`get` calls it at most once every
+    *check_interval* seconds.
+    """
+
+    def __init__(
+        self,
+        layout: str | None = None,
+        template_path: Path | None = DEFAULT_TEMPLATE_PATH,
+        common_rules: Iterable[Path] = COMMON_RULES,
+        check_interval: float = 1.0,
+    ) -> None:
+        self._parts = _parse_layout(DEFAULT_LAYOUT if layout is None else layout)
+        self.template_path = template_path
+        self.common_rules = tuple(Path(path) for path in common_rules)
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._signatures: Dict[Path, Signature | None] = {}
+        self._dependents: Dict[Path, set] = {}
+        self._last_check = 0.0
+        self.hits = 0
+        self.compiles = 0
+
+    # -- building ---------------------------------------------------------
+    def _compile(self, role: str) -> CompiledPrompt:
+        role_file = loader._role_file(role)
+        dependencies: List[Path] = [role_file.resolve()]
+        # Stat before reading so an edit made mid-compile is seen by the next refresh.
+        signatures: Dict[Path, Signature | None] = {dependencies[0]: _signature(role_file)}
+
+        def read(path: Path, load: Any) -> Any:
+            path = path.resolve()
+            if path not in signatures:
+                signatures[path] = _signature(path)
+                dependencies.append(path)
+            return load(path)
+
+        role_doc = read(role_file, loader._load_yaml)
+        if not isinstance(role_doc, Mapping):
+            raise LoaderError(f"Agent definition for '{role}' must be a mapping.")
+        role_dir = role_file.parent
+        sections: List[Section] = []
+
+        def section(name: str, source: str, text: str) -> str:
+            if text:
+                sections.append(Section(name, source, len(text.encode("utf-8")), estimate_tokens(text)))
+            return text
+
+        values: Dict[str, str] = {
+            "role.name": _as_text(role_doc.get("name")) or role,
+            "role.description": _as_text(role_doc.get("description")),
+            "role.version": _as_text(role_doc.get("version")),
+        }
+
+        prompts: List[str] = []
+        persona: Mapping[str, Any] = {}
+        for entry in _imports(role_doc, "prompts"):
+            path = loader._resolve_import(role_dir, entry)
+            doc = read(path, loader._load_yaml)
+            if not isinstance(doc, Mapping):
+                continue
+            if isinstance(doc.get("persona"), Mapping):
+                persona = doc["persona"]
+            prompts.append(section(f"prompt:{_relative(path)}", _relative(path), _as_text(doc.get("prompt"))))
+        values["persona.role"] = _as_text(persona.get("role"))
+        values["persona.tone"] = _as_text(persona.get("tone"))
+        section("persona", "prompts", "\n".join(filter(None, (values["persona.role"], values["persona.tone"]))))
+        values["prompt"] = "\n\n".join(filter(None, prompts))
+
+        rule_paths: List[Path] = list(self.common_rules)
+        rule_paths += [loader._resolve_import(role_dir, entry) for entry in _imports(role_doc, "rules")]
+        rules: List[str] = []
+        seen: set = set()
+        for path in rule_paths:
+            path = path.resolve()
+            if path in seen:
+                continue
+            seen.add(path)
+            text = _as_text(read(path, loader._load_text))
+            rules.append(section(f"rule:{_relative(path)}", _relative(path), text))
+        values["rules"] = "\n\n".join(filter(None, rules))
+
+        tools: List[str] = []
+        for entry in _imports(role_doc, "tools"):
+            path = loader._resolve_import(role_dir, entry)
+            spec = read(path, loader._load_yaml)
+            if isinstance(spec, Mapping):
+                tools.append(_tool_line(spec, path))
+        values["tools"] = section("tools", "imports.tools", "\n".join(tools))
+
+        values["template"] = ""
+        if self.template_path is not None and any(slot and name == "template" for slot, name in self._parts):
+            text = _as_text(read(Path(self.template_path), loader._load_text))
+            values["template"] = section("template", _relative(Path(self.template_path)), text)
+
+        chunks: List[str] = [""]
+        layout_text: List[str] = []
+        for is_slot, text in self._parts:
+            if not is_slot:
+                chunks[-1] += text
+                layout_text.append(text)
+            elif text in RUNTIME_FIELDS:
+                chunks += [text, ""]
+            else:
+                chunks[-1] += values[text]
+        section("layout", "layout", "".join(layout_text))
+
+        with self._lock:
+            self._signatures.update(signatures)
+            for path in dependencies:
+                self._dependents.setdefault(path, set()).add(role)
+            self.compiles += 1
+        return CompiledPrompt(role, tuple(chunks), tuple(sections), tuple(dependencies))
+
+    def _store(self, role: str, compiled: CompiledPrompt) -> None:
+        previous = self._prompts.get(role)
+        if previous is not None:
+            for path in set(previous.dependencies) - set(compiled.dependencies):
+                self._dependents.get(path, set()).discard(role)
+        self._prompts[role] = compiled
+
+    def _drop(self, role: str) -> None:
+        previous = self._prompts.pop(role, None)
+        if previous is not None:
+            for path in previous.dependencies:
+                self._dependents.get(path, set()).discard(role)
+
+    # -- public API -------------------------------------------------------
+    def get(self, role: str) -> CompiledPrompt:
+        """Return the compiled prompt for *role*, building it on first use."""
+
+        with self._lock:
+            if time.monotonic() - self._last_check >= self.check_interval:
+                self.refresh()
+            compiled = self._prompts.get(role)
+            if compiled is not None:
+                self.hits += 1
+                return compiled
+            compiled = self._compile(role)
+            self._store(role, compiled)
+            return compiled
+
+    def render(self, role: str, user_prompt: str = "") -> str:
+        """Shortcut for ``get(role).render(user_prompt)``."""
+
+        return self.get(role).render(user_prompt)
+
+    def compile_all(self) -> Dict[str, CompiledPrompt]:
+        """Compile every role under ``role/`` that is not already cached."""
+
+        roles = sorted(path.parent.name for path in (BASE_PATH / "role").glob("*/role.yaml"))
+        return {role: self.get(role) for role in roles}
+
+    def refresh(self) -> List[str]:
+        """Recompile roles whose dependencies changed; returns their names."""
+
+        with self._lock:
+            self._last_check = time.monotonic()
+            changed = [path for path, old in self._signatures.items() if _signature(path) != old]
+            affected = sorted({role for path in changed for role in self._dependents.get(path, ())})
+            for path in changed:
+                if not self._dependents.get(path):
+                    self._signatures.pop(path, None)
+                    self._dependents.pop(path, None)
+            rebuilt: List[str] = []
+            for role in affected:
+                try:
+                    compiled = self._compile(role)
+                except LoaderError:
+                    self._drop(role)
+                    continue
+                self._store(role, compiled)
+                rebuilt.append(role)
+            return rebuilt
+
+    def dependencies(self, role: str) -> Tuple[Path, ...]:
+        """Files the compiled prompt for *role* was built from."""
+
+        return self.get(role).dependencies
+
+    def dependents(self, path: Path | str) -> List[str]:
+        """Compiled roles that would be rebuilt if *path* changed."""
+
+        with self._lock:
+            return sorted(self._dependents.get(Path(path).resolve(), ()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prompts.clear()
+            self._signatures.clear()
+            self._dependents.clear()
+
+
+_DEFAULT: PromptCompiler | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_compiler() -> PromptCompiler:
+    """Return the process-wide compiler.
+
+    ``AI_SANDBOX_PROMPT_CHECK_INTERVAL`` sets how often (in seconds) it looks
+    for edited source files.
+    """
+
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            interval = float(os.environ.get("AI_SANDBOX_PROMPT_CHECK_INTERVAL", "1.0"))
+            _DEFAULT = PromptCompiler(check_interval=interval)
+        return _DEFAULT
+
+
+def render_prompt(role: str, user_prompt: str = "") -> str:
+    """Render *role*'s system prompt around *user_prompt* using the shared compiler."""
+
+    return get_compiler().render(role, user_prompt)
+
+
+def _compiler_samples() -> List[metrics.Sample]:
+    compiler = _DEFAULT
+    if compiler is None:
+        return []
+    return metrics.cache_samples(
+        "prompt_compiler", compiler.hits, compiler.compiles, entries=len(compiler._prompts),
+    )
+
+
+metrics.register_collector(_compiler_samples)
+
+
+def main(argv: List[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile role prompts and report their section sizes.")
+    parser.add_argument("roles", nargs="*", help="Roles to compile (default: every role).")
+    parser.add_argument("--render", metavar="TEXT", help="Print the prompt rendered around TEXT instead of sizes.")
+    options = parser.parse_args(argv)
+
+    compiler = get_compiler()
+    try:
+        compiled = {role: compiler.get(role) for role in options.roles} if options.roles else compiler.compile_all()
+    except LoaderError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for role, prompt in compiled.items():
+        if options.render is not None:
+            print(prompt.render(options.render))
+            continue
+        print(f"{role}: {prompt.static_bytes} bytes, ~{prompt.static_tokens} tokens, {len(prompt.dependencies)} files")
+        for item in prompt.sections:
+            print(f"  {item.name:<48} {item.bytes:>8} B {item.tokens:>7} tok")
+    return 0
+
+
+__all__ = [
+    "BUILD_FIELDS",
+    "COMMON_RULES",
+    "CompiledPrompt",
+    "DEFAULT_LAYOUT",
+    "DEFAULT_TEMPLATE_PATH",
+    "PromptCompileError",
+    "PromptCompiler",
+    "RUNTIME_FIELDS",
+    "Section",
+    "estimate_tokens",
+    "get_compiler",
+    "render_prompt",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
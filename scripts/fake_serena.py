@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Offline stand-in for the ``serena`` CLI.
+
+Point ``tools.serena`` at it with ``SERENA_EXECUTABLE=scripts/fake_serena.py``.
+It supports both calling conventions used by ``tools/serena.py``:
+
+* one-shot: ``fake_serena.py find_symbol <name>`` prints the result and exits;
+* session: ``fake_serena.py session --stdio`` answers newline-delimited JSON
+  requests, handling each on its own thread so responses may arrive out of
+  order.
+
+``find_symbol`` greps ``def``/``class`` definitions in the ``*.py`` files of the
+current directory.  ``insert_after_symbol`` only reports where it would insert;
+it never writes.  For exercising the session manager the session also accepts
+``ping``, ``sleep <seconds>`` and ``crash``.
+
+Environment variables:
+
+``FAKE_SERENA_INDEX_DELAY``
+    Seconds to sleep at start-up, standing in for indexing (default 0).
+``FAKE_SERENA_NO_SESSION``
+    When set, ``session`` is rejected like an older CLI would.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+
+def _index() -> List[tuple]:
+    definitions = []
+    pattern = re.compile(r"^\s*(?:async\s+)?(?:def|class)\s+([A-Za-z_]\w*)")
+    for path in sorted(Path.cwd().rglob("*.py")):
+        if any(part.startswith(".") or part == "node_modules" for part in path.parts):
+            continue
+        try:
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        for lineno, line in enumerate(lines, 1):
+            match = pattern.match(line)
+            if match:
+                definitions.append((match.group(1), path.relative_to(Path.cwd()).as_posix(), lineno))
+    return definitions
+
+
+def _find_symbol(index: List[tuple], args: List[str]) -> str:
+    if not args:
+        raise ValueError("find_symbol requires a symbol name")
+    matches = [{"name": name, "file": file, "line": line} for name, file, line in index if name == args[0]]
+    return json.dumps(matches)
+
+
+def _insert_after_symbol(index: List[tuple], args: List[str]) -> str:
+    if len(args) < 2:
+        raise ValueError("insert_after_symbol requires a symbol name and the code to insert")
+    for name, file, line in index:
+        if name == args[0]:
+            return json.dumps({"symbol": name, "file": file, "line": line, "inserted": False})
+    raise ValueError(f"symbol not found: {args[0]}")
+
+
+COMMANDS = {"find_symbol": _find_symbol, "insert_after_symbol": _insert_after_symbol}
+
+
+def _serve(index: List[tuple]) -> int:
+    write_lock = threading.Lock()
+
+    def respond(message: dict) -> None:
+        with write_lock:
+            sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+    def handle(request: dict) -> None:
+        request_id = request.get("id")
+        command = request.get("command")
+        args = [str(arg) for arg in request.get("args") or ()]
+        try:
+            if command == "ping":
+                result = "pong"
+            elif command == "sleep":
+                time.sleep(float(args[0]) if args else 1.0)
+                result = ""
+            elif command in COMMANDS:
+                result = COMMANDS[command](index, args)
+            else:
+                raise ValueError(f"unknown command: {command}")
+        except (ValueError, IndexError) as exc:
+            respond({"id": request_id, "error": str(exc)})
+        else:
+            respond({"id": request_id, "stdout": result})
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            print(f"invalid request: {line!r}", file=sys.stderr)
+            continue
+        if request.get("command") == "crash":
+            print("crash requested", file=sys.stderr)
+            os._exit(3)
+        threading.Thread(target=handle, args=(request,), daemon=True).start()
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    if not argv:
+        print("usage: fake_serena.py <command> [args...]", file=sys.stderr)
+        return 2
+    command, args = argv[0], argv[1:]
+    if command == "session" and os.environ.get("FAKE_SERENA_NO_SESSION"):
+        print("error: unknown command 'session'", file=sys.stderr)
+        return 2
+
+    time.sleep(float(os.environ.get("FAKE_SERENA_INDEX_DELAY", "0")))
+    index = _index()
+    if command == "session":
+        return _serve(index)
+    if command not in COMMANDS:
+        print(f"error: unknown command '{command}'", file=sys.stderr)
+        return 2
+    try:
+        print(COMMANDS[command](index, args))
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Notion API described by ``action/notion_core.yaml``.
+
+Routes, required headers and required bodies come from the same spec that
+drives ``tools/notion.py``, so the client can be exercised offline::
+
+    python scripts/notion_stub_server.py --port 8765 &
+    NOTION_BASE_URL=http://127.0.0.1:8765/v1 NOTION_TOKEN=stub python ...
+
+Data lives in memory: a database ``stub-database`` seeded with ``--pages``
+pages and a block ``stub-block`` with ``--blocks`` paragraph children.  List
+operations paginate with ``next_cursor``/``has_more`` and every ``GET``
+answer carries an ``ETag`` honoured through ``If-None-Match``.
+Connections are kept alive (HTTP/1.1).
+
+For exercising the client, ``--rate-limit-every N`` answers every Nth
+request with ``429`` and ``Retry-After: --retry-after``, ``--error-every N``
+answers every Nth request with ``502`` *after* applying it (a gateway that
+lost the reply), ``--drop-every N`` closes the connection without answering
+every Nth request, also after applying it, and ``--latency`` delays every
+answer.  ``GET /__stats`` reports request, connection, 304, 429, 502 and
+dropped counts and the peak number of requests handled at once.  :func:`start_server` runs the server on a background thread
+for in-process use.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Pattern, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.notion import DEFAULT_SPEC_PATH, NotionSpec, Operation  # noqa: E402
+
+
+DATABASE_ID = "stub-database"
+BLOCK_ID = "stub-block"
+MAX_PAGE_SIZE = 100
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _title(page: Dict[str, Any]) -> str:
+    for prop in (page.get("properties") or {}).values():
+        if isinstance(prop, dict) and isinstance(prop.get("title"), list):
+            return "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in prop["title"])
+    return ""
+
+
+def _title_property(text: str) -> Dict[str, Any]:
+    return {"Name": {"id": "title", "type": "title", "title": [{"type": "text", "text": {"content": text}, "plain_text": text}]}}
+
+
+class StubError(Exception):
+    def __init__(self, status: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class NotionStore:
+    """In-memory pages, databases and block children."""
+
+    def __init__(self, pages: int = 250, blocks: int = 250) -> None:
+        self.lock = threading.Lock()
+        created = _now()
+        self.databases: Dict[str, Dict[str, Any]] = {
+            DATABASE_ID: {
+                "object": "database",
+                "id": DATABASE_ID,
+                "created_time": created,
+                "title": [{"type": "text", "text": {"content": "Stub database"}, "plain_text": "Stub database"}],
+                "properties": {"Name": {"id": "title", "type": "title", "title": {}}},
+            }
+        }
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        for number in range(pages):
+            self.create_page({"parent": {"database_id": DATABASE_ID}, "properties": _title_property(f"Page {number}")})
+        self.children: Dict[str, List[Dict[str, Any]]] = {BLOCK_ID: []}
+        self.append_children(BLOCK_ID, [self._paragraph(f"Paragraph {number}") for number in range(blocks)])
+
+    @staticmethod
+    def _paragraph(text: str) -> Dict[str, Any]:
+        return {"type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}, "plain_text": text}]}}
+
+    def create_page(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        parent = body.get("parent")
+        if not isinstance(parent, dict) or not (parent.get("database_id") or parent.get("page_id")):
+            raise StubError(400, "validation_error", "body.parent should be a database_id or page_id parent")
+        database_id = parent.get("database_id")
+        if database_id and database_id not in self.databases:
+            raise StubError(404, "object_not_found", f"Could not find database with ID: {database_id}")
+        now = _now()
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "created_time": now,
+            "last_edited_time": now,
+            "archived": False,
+            "parent": {"type": "database_id", **parent} if database_id else {"type": "page_id", **parent},
+            "properties": dict(body.get("properties") or {}),
+        }
+        self.pages[page["id"]] = page
+        return page
+
+    def update_page(self, page_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        page = self.page(page_id)
+        if "properties" in body:
+            page["properties"].update(body["properties"] or {})
+        if "archived" in body:
+            page["archived"] = bool(body["archived"])
+        page["last_edited_time"] = _now()
+        return page
+
+    def page(self, page_id: str) -> Dict[str, Any]:
+        try:
+            return self.pages[page_id]
+        except KeyError:
+            raise StubError(404, "object_not_found", f"Could not find page with ID: {page_id}") from None
+
+    def database(self, database_id: str) -> Dict[str, Any]:
+        try:
+            return self.databases[database_id]
+        except KeyError:
+            raise StubError(404, "object_not_found", f"Could not find database with ID: {database_id}") from None
+
+    def append_children(self, block_id: str, children: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if block_id not in self.children and block_id not in self.pages:
+            raise StubError(404, "object_not_found", f"Could not find block with ID: {block_id}")
+        added = [dict(child, object="block", id=str(uuid.uuid4()), has_children=False) for child in children]
+        self.children.setdefault(block_id, []).extend(added)
+        return added
+
+
+def _paginate(items: List[Dict[str, Any]], cursor: Any, page_size: Any) -> Dict[str, Any]:
+    try:
+        size = min(MAX_PAGE_SIZE, max(1, int(page_size))) if page_size is not None else MAX_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise StubError(400, "validation_error", "page_size should be an integer") from None
+    start = 0
+    if cursor:
+        for position, item in enumerate(items):
+            if item["id"] == cursor:
+                start = position
+                break
+        else:
+            raise StubError(400, "validation_error", f"start_cursor {cursor!r} is not valid")
+    window = items[start : start + size]
+    more = start + size < len(items)
+    return {
+        "object": "list",
+        "results": window,
+        "next_cursor": items[start + size]["id"] if more else None,
+        "has_more": more,
+        "type": "page_or_database",
+    }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        spec: NotionSpec,
+        store: NotionStore,
+        rate_limit_every: int = 0,
+        retry_after: float = 1.0,
+        latency: float = 0.0,
+        verbose: bool = False,
+        error_every: int = 0,
+        drop_every: int = 0,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.spec = spec
+        self.store = store
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.latency = latency
+        self.verbose = verbose
+        self.error_every = error_every
+        self.drop_every = drop_every
+        prefix = urllib.parse.urlsplit(spec.base_url).path.rstrip("/")
+        self.routes: List[Tuple[Pattern[str], Dict[str, Operation]]] = []
+        for path in dict.fromkeys(operation.path for operation in spec.operations.values()):
+            pattern = re.compile("^" + re.escape(prefix) + re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(path)) + "$")
+            methods = {op.method: op for op in spec.operations.values() if op.path == path}
+            self.routes.append((pattern, methods))
+        self.counter = itertools.count(1)
+        self.error_counter = itertools.count(1)
+        self.drop_counter = itertools.count(1)
+        self.stats = {"requests": 0, "connections": 0, "not_modified": 0, "rate_limited": 0, "errors": 0, "dropped": 0,
+                      "peak_in_flight": 0}
+        self.in_flight = 0
+        self.stats_lock = threading.Lock()
+
+    def bump(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def track(self, delta: int) -> None:
+        with self.stats_lock:
+            self.in_flight += delta
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.bump("connections")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def _send(self, status: int, payload: Any = None, headers: Dict[str, str] | None = None) -> None:
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, code: str, message: str, headers: Dict[str, str] | None = None) -> None:
+        self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/__stats":
+            with self.server.stats_lock:
+                self._send(200, dict(self.server.stats))
+            return
+        self.server.bump("requests")
+        self.server.track(1)
+        try:
+            self._answer(method, url, raw_body)
+        finally:
+            self.server.track(-1)
+
+    def _answer(self, method: str, url: urllib.parse.SplitResult, raw_body: bytes) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        every = self.server.rate_limit_every
+        if every and next(self.server.counter) % every == 0:
+            self.server.bump("rate_limited")
+            self._error(429, "rate_limited", "You have been rate limited.", {"Retry-After": f"{self.server.retry_after:g}"})
+            return
+        for pattern, methods in self.server.routes:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            operation = methods.get(method)
+            if operation is None:
+                self._error(405, "invalid_request", f"{method} is not supported on {url.path}")
+                return
+            try:
+                status, payload = self._handle(operation, match.groupdict(), urllib.parse.parse_qs(url.query), raw_body)
+            except StubError as exc:
+                self._error(exc.status, exc.code, str(exc))
+                return
+            if self.server.error_every and next(self.server.error_counter) % self.server.error_every == 0:
+                self.server.bump("errors")
+                self._error(502, "bad_gateway", "Bad gateway.")
+                return
+            if self.server.drop_every and next(self.server.drop_counter) % self.server.drop_every == 0:
+                self.server.bump("dropped")
+                self.close_connection = True  # no reply at all, as if the connection died
+                return
+            if method == "GET":
+                data = json.dumps(payload, sort_keys=True).encode("utf-8")
+                etag = '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.server.bump("not_modified")
+                    self._send(304, None, {"ETag": etag})
+                    return
+                self._send(status, payload, {"ETag": etag})
+                return
+            self._send(status, payload)
+            return
+        self._error(404, "invalid_request_url", "Invalid request URL.")
+
+    def _handle(self, operation: Operation, path_params: Dict[str, str], query: Dict[str, List[str]], raw_body: bytes) -> Tuple[int, Any]:
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            raise StubError(401, "unauthorized", "API token is invalid.")
+        for parameter in operation.parameters:
+            if parameter.location == "header" and parameter.required and not self.headers.get(parameter.name):
+                raise StubError(400, "missing_version" if parameter.name == "Notion-Version" else "validation_error",
+                                f"{parameter.name} header should be defined")
+        body: Dict[str, Any] = {}
+        if raw_body:
+            try:
+                body = json.loads(raw_body)
+            except ValueError:
+                raise StubError(400, "invalid_json", "Error parsing JSON body.") from None
+            if not isinstance(body, dict):
+                raise StubError(400, "validation_error", "body should be an object")
+        elif operation.body_required:
+            raise StubError(400, "validation_error", "body failed validation: body should be defined")
+
+        params = {name: urllib.parse.unquote(value) for name, value in path_params.items()}
+        store = self.server.store
+        name = operation.operation_id
+        with store.lock:
+            if name == "getPage":
+                return 200, store.page(params["page_id"])
+            if name == "updatePage":
+                return 200, store.update_page(params["page_id"], body)
+            if name == "createPage":
+                return 200, store.create_page(body)
+            if name == "getDatabase":
+                return 200, store.database(params["database_id"])
+            if name == "queryDatabase":
+                store.database(params["database_id"])
+                rows = [page for page in store.pages.values()
+                        if page["parent"].get("database_id") == params["database_id"] and not page["archived"]]
+                return 200, _paginate(rows, body.get("start_cursor"), body.get("page_size"))
+            if name == "search":
+                text = str(body.get("query") or "").lower()
+                rows = [page for page in store.pages.values() if text in _title(page).lower() and not page["archived"]]
+                return 200, _paginate(rows, body.get("start_cursor"), body.get("page_size"))
+            if name == "getPageOrBlockChildrenContent":
+                if params["block_id"] not in store.children and params["block_id"] not in store.pages:
+                    raise StubError(404, "object_not_found", f"Could not find block with ID: {params['block_id']}")
+                rows = store.children.get(params["block_id"], [])
+                cursor = (query.get("start_cursor") or [None])[0]
+                page_size = (query.get("page_size") or [None])[0]
+                return 200, dict(_paginate(rows, cursor, page_size), type="block", block={})
+            if name == "appendBlockChildren":
+                children = body.get("children")
+                if not isinstance(children, list):
+                    raise StubError(400, "validation_error", "body.children should be an array")
+                added = store.append_children(params["block_id"], children)
+                return 200, {"object": "list", "results": added, "next_cursor": None, "has_more": False}
+        raise StubError(501, "not_implemented", f"{name} is not implemented by the stub")
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    spec_path: Path | str = DEFAULT_SPEC_PATH,
+    pages: int = 250,
+    blocks: int = 250,
+    **options: Any,
+) -> Tuple[StubServer, str]:
+    """Serve on a daemon thread; returns the server and its base URL."""
+
+    spec = NotionSpec.load(spec_path)
+    server = StubServer((host, port), spec, NotionStore(pages, blocks), **options)
+    threading.Thread(target=server.serve_forever, name="notion-stub", daemon=True).start()
+    prefix = urllib.parse.urlsplit(spec.base_url).path.rstrip("/")
+    return server, f"http://{host}:{server.server_address[1]}{prefix}"
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=250)
+    parser.add_argument("--blocks", type=int, default=250)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--error-every", type=int, default=0, help="answer every Nth request with 502 after applying it")
+    parser.add_argument("--drop-every", type=int, default=0,
+                        help="close the connection without answering every Nth request, after applying it")
+    parser.add_argument("--verbose", action="store_true")
+    options = parser.parse_args(argv)
+    spec = NotionSpec.load()
+    server = StubServer(
+        (options.host, options.port),
+        spec,
+        NotionStore(options.pages, options.blocks),
+        rate_limit_every=options.rate_limit_every,
+        retry_after=options.retry_after,
+        latency=options.latency,
+        verbose=options.verbose,
+        error_every=options.error_every,
+        drop_every=options.drop_every,
+    )
+    prefix = urllib.parse.urlsplit(spec.base_url).path.rstrip("/")
+    print(f"Notion stub listening on http://{options.host}:{server.server_address[1]}{prefix}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
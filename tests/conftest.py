@@ -0,0 +1,30 @@
+"""Make the repository root and ``scripts/`` importable from the tests."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+@pytest.fixture
+def spec_tree(tmp_path, monkeypatch):
+    """Point :mod:`loader` at an empty tree under *tmp_path* with fresh caches.
+
+    The snapshot is disabled so every document is parsed from disk.
+    """
+
+    import loader
+
+    for directory in ("role", "tool", "prompt", "rule", "schemas"):
+        (tmp_path / directory).mkdir()
+    monkeypatch.setattr(loader, "BASE_PATH", tmp_path)
+    monkeypatch.setattr(loader, "_TOOL_INDEX", loader._ToolIndex(tmp_path / "tool"))
+    monkeypatch.setattr(loader, "_SPEC_CACHE", loader._SpecCache(256))
+    monkeypatch.setattr(loader, "_SNAPSHOT", None)
+    monkeypatch.setattr(loader, "_SNAPSHOT_LOADED", True)
+    return tmp_path
@@ -0,0 +1,101 @@
+"""Tests for baseline handling in benchmarks/suite.py."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from benchmarks import suite
+
+
+@pytest.fixture
+def tiny_suite(monkeypatch):
+    calls = []
+
+    def collect(catalog, catalog_tools):
+        calls.append(catalog_tools)
+        return [suite.Benchmark("tiny.sum", lambda: sum(range(10)))]
+
+    monkeypatch.setattr(suite, "collect", collect)
+    monkeypatch.setenv("AI_SANDBOX_SNAPSHOT", "off")
+    return calls
+
+
+def _run(tmp_path, *options):
+    return suite.main(["--samples", "2", "--min-time", "0.001", "--catalog", str(tmp_path / "catalog"), *options])
+
+
+def _entry(mode, tools, median):
+    return {"mode": mode, "catalog_tools": tools, "benchmarks": {"tiny.sum": {"median": median}}}
+
+
+def test_save_baseline_keeps_one_entry_per_mode(tmp_path, tiny_suite):
+    path = tmp_path / "baselines.json"
+    assert _run(tmp_path, "--quick", "--baseline", str(path), "--save-baseline") == 0
+    assert _run(tmp_path, "--baseline", str(path), "--save-baseline") == 0
+    assert tiny_suite == [1000, 10000]
+
+    modes = json.loads(path.read_text(encoding="utf-8"))["modes"]
+    assert sorted(modes) == ["full", "quick"]
+    assert (modes["quick"]["catalog_tools"], modes["full"]["catalog_tools"]) == (1000, 10000)
+    assert "tiny.sum" in modes["quick"]["benchmarks"]
+
+
+def test_check_compares_only_against_the_same_mode(tmp_path, tiny_suite, capsys):
+    path = tmp_path / "baselines.json"
+    # A quick baseline impossibly fast, so any comparison would regress.
+    path.write_text(json.dumps({"modes": {"quick": _entry("quick", 1000, 1e-12)}}), encoding="utf-8")
+
+    assert _run(tmp_path, "--baseline", str(path), "--check") == 0
+    assert "No baseline for mode 'full'" in capsys.readouterr().out
+    assert _run(tmp_path, "--quick", "--baseline", str(path), "--check") == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+def test_baseline_with_another_catalog_size_is_not_compared(tmp_path, tiny_suite, capsys):
+    path = tmp_path / "baselines.json"
+    path.write_text(json.dumps({"modes": {"quick": _entry("quick", 1000, 1e-12)}}), encoding="utf-8")
+    assert _run(tmp_path, "--quick", "--catalog-tools", "50", "--baseline", str(path), "--check") == 0
+    assert "not comparing" in capsys.readouterr().out
+
+
+def test_filtered_save_only_replaces_the_benchmarks_it_ran(tmp_path, tiny_suite):
+    path = tmp_path / "baselines.json"
+    stored = _entry("quick", 1000, 1.0)
+    stored["benchmarks"]["other.bench"] = {"median": 2.0}
+    path.write_text(json.dumps({"modes": {"quick": stored}}), encoding="utf-8")
+
+    _run(tmp_path, "--quick", "--filter", "tiny", "--baseline", str(path), "--save-baseline")
+    benchmarks = json.loads(path.read_text(encoding="utf-8"))["modes"]["quick"]["benchmarks"]
+    assert benchmarks["other.bench"] == {"median": 2.0}
+    assert benchmarks["tiny.sum"]["median"] < 1.0
+
+
+def test_single_run_files_are_read_by_their_mode(tmp_path):
+    legacy = tmp_path / "legacy.json"
+    legacy.write_text(json.dumps({"quick": True, "benchmarks": {"a": {"median": 1.0}}}), encoding="utf-8")
+    assert list(suite._read_baselines(legacy)) == ["quick"]
+    # Older files did not record the catalog size, so they are never compared.
+    assert suite.select_baseline(suite._read_baselines(legacy), "quick", 1000) == {}
+
+    output = tmp_path / "run.json"
+    output.write_text(json.dumps(_entry("full", 10000, 1.0)), encoding="utf-8")
+    assert suite.select_baseline(suite._read_baselines(output), "full", 10000) == {"tiny.sum": {"median": 1.0}}
+    assert suite._read_baselines(tmp_path / "missing.json") == {}
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance(capsys):
+    results = [
+        suite.Result("fast", 1.0, 1.0, 0.0, 1.0, 3, 1),
+        suite.Result("slow", 1.5, 1.5, 0.0, 1.5, 3, 1),
+        suite.Result("new", 1.0, 1.0, 0.0, 1.0, 3, 1),
+    ]
+    baseline = {"fast": {"median": 1.1}, "slow": {"median": 1.0}}
+    assert suite.compare(results, baseline, tolerance=0.25) == ["slow"]
+    assert "new" in capsys.readouterr().out
+
+
+def test_committed_baseline_records_both_modes():
+    modes = suite._read_baselines(suite.DEFAULT_BASELINE)
+    assert modes["quick"]["catalog_tools"] == 1000
+    assert modes["full"]["catalog_tools"] == 10000
@@ -0,0 +1,124 @@
+"""``tools.code_index``: incremental indexing, BM25 search, grep and symbols."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from tools.code_index import CodeIndex, tokenize
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "ws"
+    _write(root / "shapes.py", """\
+RATIO = 2
+
+
+class Shape:
+    def area(self):
+        return 0
+
+
+def parse_config(path):
+    # read the config file
+    return open(path).read()
+""")
+    _write(root / "docs" / "guide.md", "How to parse the config.\nParsing is fast.\n")
+    _write(root / "node_modules" / "skip.js", "parse_config\n")
+    (root / "blob.bin").write_bytes(b"\0parse_config")
+    return root
+
+
+@pytest.fixture
+def index(workspace, tmp_path):
+    index = CodeIndex(workspace, tmp_path / "index.sqlite3", refresh_interval=0)
+    yield index
+    index.close()
+
+
+def test_tokenize_splits_compound_identifiers():
+    assert tokenize("parseConfig HTTPServer snake_case x1") == [
+        "parseconfig", "parse", "config", "httpserver", "http", "server", "snake_case", "snake", "case", "x1",
+    ]
+
+
+def test_refresh_only_reindexes_changed_files(workspace, index):
+    assert index.refresh() == (2, 0)
+    assert index.refresh() == (0, 0)
+
+    _write(workspace / "docs" / "guide.md", "Rewritten.\n")
+    (workspace / "shapes.py").unlink()
+
+    assert index.refresh() == (1, 1)
+
+
+def test_search_ranks_files_with_every_term(index):
+    results = index.search("parse config")
+
+    assert {result.path for result in results} == {"shapes.py", os.path.join("docs", "guide.md")}
+    shapes = next(result for result in results if result.path == "shapes.py")
+    assert [hit.line for hit in shapes.lines] == [9, 10]
+    assert shapes.lines[0].text == "def parse_config(path):"
+    assert index.search("parse missingword") == []
+    assert index.search("   ") == []
+
+
+def test_grep_matches_substrings_case_insensitively(workspace, index):
+    results = index.grep("CONFIG FILE")
+
+    assert [(result.path, [hit.line for hit in result.lines]) for result in results] == [("shapes.py", [10])]
+    source = (workspace / "shapes.py").read_bytes()
+    assert results[0].lines[0].offset == source.index(b"    # read the config file")
+
+
+def test_symbols_and_outline(index):
+    assert index.find_symbol("area") == [
+        {"name": "area", "kind": "method", "qualname": "Shape.area", "file": "shapes.py", "line": 5, "end_line": 6}
+    ]
+    assert index.find_symbol("Shape.area")[0]["kind"] == "method"
+    assert [entry["name"] for entry in index.outline("shapes.py")] == ["RATIO", "Shape", "area", "parse_config"]
+    assert index.find_symbol("missing") == []
+
+
+def test_edits_are_seen_by_the_next_query(workspace, index):
+    assert index.find_symbol("renamed") == []
+
+    _write(workspace / "shapes.py", "def renamed():\n    pass\n")
+
+    assert index.find_symbol("renamed")[0]["line"] == 1
+    assert index.find_symbol("parse_config") == []
+
+
+def test_skipped_directories_and_binary_files(index):
+    paths = {result.path for result in index.grep("parse_config")}
+
+    assert paths == {"shapes.py"}
+
+
+def test_index_persists_across_instances(workspace, tmp_path, index):
+    index.refresh()
+
+    reopened = CodeIndex(workspace, tmp_path / "index.sqlite3", refresh_interval=0)
+    try:
+        assert reopened.refresh() == (0, 0)
+        assert reopened.find_symbol("Shape")[0]["file"] == "shapes.py"
+    finally:
+        reopened.close()
+
+
+def test_search_tool_uses_the_index():
+    from tools.standard_tools import search
+
+    result = search("CodeIndex", limit=5)
+
+    assert result["status"] == "success"
+    assert any(entry["path"] == "tools/code_index.py" for entry in result["results"])
@@ -0,0 +1,173 @@
+"""``tools.code_runner``: the warm worker pool and its sandbox."""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+
+import pytest
+
+from tools import code_runner
+from tools.code_runner import CodeRunnerError, CodeRunnerPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = CodeRunnerPool(size=2, limits=code_runner._Limits(timeout=10, max_output=4096))
+    if pool.run("pass").exit_code == 126:
+        pool.close()
+        pytest.skip("the kernel offers no namespaces/Landlock sandbox here")
+    yield pool
+    pool.close()
+
+
+def _processes_with(marker, wait=2.0):
+    """Pids whose command line contains *marker*, once killed ones have gone (or *wait* ran out)."""
+
+    deadline = time.monotonic() + wait
+    while True:
+        found = []
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as handle:
+                    if marker.encode() in handle.read():
+                        found.append(int(pid))
+            except OSError:
+                continue
+        if not found or time.monotonic() >= deadline:
+            return found
+        time.sleep(0.05)
+
+
+def _unique_seconds():
+    # A sleep argument no other process uses, so /proc can be searched for it.
+    return f"{300 + uuid.uuid4().int % 1000}.{uuid.uuid4().int % 10**6:06d}"
+
+
+def test_python_and_shell_snippets(pool):
+    result = pool.run("import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.exit(3)")
+    assert (result.stdout, result.stderr, result.exit_code, result.ok) == ("out\n", "err\n", 3, False)
+
+    assert pool.run("echo $((6 * 7))", "bash").stdout == "42\n"
+    assert pool.run("raise ValueError('bad')").stderr.strip().endswith("ValueError: bad")
+    with pytest.raises(CodeRunnerError, match="Unsupported language"):
+        pool.run("1", "ruby")
+
+
+def test_output_is_streamed_and_capped(pool):
+    chunks = []
+
+    result = pool.run("import sys\nfor _ in range(100):\n    print('x' * 99, flush=True)", on_output=lambda *c: chunks.append(c))
+
+    assert result.truncated and len(result.stdout) == 4096
+    assert "".join(text for stream, text in chunks if stream == "stdout") == result.stdout
+
+
+def test_busy_loop_times_out(pool):
+    started = time.monotonic()
+    result = pool.run("while True:\n    pass", timeout=0.5)
+
+    assert result.timed_out and not result.ok
+    assert time.monotonic() - started < 5
+
+
+def test_closing_the_streams_does_not_escape_the_timeout(pool):
+    seconds = _unique_seconds()
+    started = time.monotonic()
+
+    result = pool.run(f"exec 1>&- 2>&-\nsleep {seconds}", "bash", timeout=1)
+
+    assert result.timed_out
+    assert time.monotonic() - started < 5
+    assert _processes_with(f"sleep\0{seconds}") == []
+
+    result = pool.run(f"import os, time\nos.close(1)\nos.close(2)\ntime.sleep({seconds})", timeout=1)
+    assert result.timed_out and result.duration < 5
+
+
+def test_background_processes_do_not_outlive_the_job(pool):
+    seconds = _unique_seconds()
+
+    result = pool.run(f"sleep {seconds} >/dev/null 2>&1 &\necho started", "bash")
+
+    assert result.stdout == "started\n" and result.exit_code == 0
+    assert _processes_with(f"sleep\0{seconds}") == []
+
+
+def test_filesystem_is_confined(pool, tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("secret", encoding="utf-8")
+    script = f"""
+import os
+open('inside.txt', 'w').write('ok')
+print(open('inside.txt').read())
+for path in ({str(tmp_path / 'outside.txt')!r}, '/root/escape.txt'):
+    try:
+        open(path, 'w')
+    except PermissionError:
+        print('denied', path)
+try:
+    open({str(secret)!r}).read()
+except PermissionError:
+    print('denied read')
+"""
+    result = pool.run(script)
+
+    assert result.stdout.splitlines() == [
+        "ok", f"denied {tmp_path / 'outside.txt'}", "denied /root/escape.txt", "denied read",
+    ]
+    assert not (tmp_path / "outside.txt").exists()
+
+
+def test_network_is_unavailable(pool):
+    script = """
+import socket
+try:
+    socket.create_connection(("1.1.1.1", 53), timeout=2)
+except OSError as exc:
+    print(type(exc).__name__)
+else:
+    print("connected")
+"""
+    assert pool.run(script).stdout.strip() in {"OSError", "TimeoutError", "ConnectionRefusedError"}
+    assert pool.run("import socket\nprint(socket.if_nameindex())").stdout.strip() == "[(1, 'lo')]"
+
+
+def test_workers_are_recycled_after_max_runs():
+    pool = CodeRunnerPool(size=1, max_runs=2)
+    try:
+        pids = [pool.run("import os\nprint(os.getppid())").stdout for _ in range(4)]
+    finally:
+        pool.close()
+
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_refill_after_close_does_not_leak_workers(monkeypatch):
+    started = []
+    close_during_start = []
+
+    class RecordingWorker(code_runner._Worker):
+        def __init__(self):
+            super().__init__()
+            started.append(self)
+            if close_during_start:
+                close_during_start.pop().close()
+
+    monkeypatch.setattr(code_runner, "_Worker", RecordingWorker)
+
+    pool = CodeRunnerPool(size=1)
+    pool.close()
+    pool._refill()  # e.g. a retired worker's replacement thread running late
+    assert len(started) == 1 and not started[0].alive
+
+    pool = CodeRunnerPool(size=1)
+    close_during_start.append(pool)
+    pool._refill()  # ``close`` runs while the replacement is starting
+    assert len(started) == 3
+    assert not any(worker.alive for worker in started)
+    with pytest.raises(CodeRunnerError, match="shut down"):
+        pool.run("pass")
@@ -0,0 +1,127 @@
+"""Streaming, mmap and atomic-write helpers in ``tools.file_io`` and the file tools."""
+
+from __future__ import annotations
+
+import os
+import stat
+
+import pytest
+
+import loader
+from tools import file_io, standard_tools
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    root = tmp_path / "repo"
+    root.mkdir()
+    monkeypatch.setattr(loader, "BASE_PATH", root)
+    monkeypatch.setattr(file_io, "BASE_PATH", root)
+    return root
+
+
+def test_iter_chunks_streams_a_byte_range(root):
+    (root / "data.bin").write_bytes(bytes(range(100)))
+
+    chunks = list(file_io.iter_chunks("data.bin", chunk_size=16, offset=10, length=40))
+
+    assert [len(chunk) for chunk in chunks] == [16, 16, 8]
+    assert b"".join(chunks) == bytes(range(10, 50))
+    with pytest.raises(ValueError):
+        next(file_io.iter_chunks("data.bin", chunk_size=0))
+
+
+def test_read_range_returns_a_view_over_the_mapping(root):
+    (root / "data.txt").write_bytes(b"0123456789")
+
+    view = file_io.read_range("data.txt", 2, 5)
+    assert bytes(view) == b"23456"
+    view.release()
+
+    assert bytes(file_io.read_range("data.txt", 8)) == b"89"
+    assert bytes(file_io.read_range("data.txt", 50)) == b""
+    (root / "empty").write_bytes(b"")
+    assert bytes(file_io.read_range("empty")) == b""
+    with pytest.raises(ValueError):
+        file_io.read_range("data.txt", -1)
+
+
+def test_write_stream_replaces_atomically_and_keeps_permissions(root):
+    target = root / "out.txt"
+    target.write_text("old", encoding="utf-8")
+    os.chmod(target, 0o640)
+
+    written = file_io.write_stream("out.txt", ["héllo ", b"wor", memoryview(b"ld")])
+
+    assert written == len("héllo world".encode("utf-8"))
+    assert target.read_text(encoding="utf-8") == "héllo world"
+    assert stat.S_IMODE(target.stat().st_mode) == 0o640
+    assert [path.name for path in root.iterdir()] == ["out.txt"]
+
+
+def test_failed_write_leaves_the_target_untouched(root):
+    target = root / "out.txt"
+    target.write_text("original", encoding="utf-8")
+
+    def chunks():
+        yield b"partial"
+        raise RuntimeError("producer failed")
+
+    with pytest.raises(RuntimeError):
+        file_io.write_stream("out.txt", chunks())
+
+    assert target.read_text(encoding="utf-8") == "original"
+    assert [path.name for path in root.iterdir()] == ["out.txt"]
+
+
+def test_write_stream_creates_parent_directories(root):
+    file_io.write_stream("a/b/c.txt", ["x"])
+
+    assert (root / "a" / "b" / "c.txt").read_text(encoding="utf-8") == "x"
+
+
+@pytest.mark.parametrize("path", ["../outside.txt", "/etc/passwd", "link/secret"])
+def test_paths_cannot_escape_the_root(root, path):
+    (root / "link").symlink_to(root.parent)
+
+    with pytest.raises(loader.LoaderError):
+        file_io.resolve(path)
+    assert standard_tools.read_file(path)["status"] == "error"
+    assert standard_tools.write_file(path, "x")["status"] == "error"
+
+
+def test_delete_refuses_directories(root):
+    (root / "dir").mkdir()
+    (root / "file").write_text("x", encoding="utf-8")
+
+    with pytest.raises(IsADirectoryError):
+        file_io.delete("dir")
+    with pytest.raises(IsADirectoryError):
+        file_io.delete(".")
+    file_io.delete("file")
+    assert not (root / "file").exists()
+
+
+def test_list_dir_pages_by_name(root):
+    for name in ("d", "b", "a", "c", "e"):
+        (root / name).write_text(name * 3, encoding="utf-8")
+    (root / "sub").mkdir()
+
+    first = file_io.list_dir(".", limit=2)
+    assert [entry.name for entry in first.entries] == ["a", "b"]
+    assert first.entries[0] == file_io.DirEntry("a", "file", 3)
+
+    (root / "aa").write_text("x", encoding="utf-8")  # sorts before the cursor
+    second = file_io.list_dir(".", first.next_cursor, limit=2)
+    assert [entry.name for entry in second.entries] == ["c", "d"]
+
+    last = file_io.list_dir(".", "d", limit=5)
+    assert [(entry.name, entry.kind) for entry in last.entries] == [("e", "file"), ("sub", "dir")]
+    assert last.next_cursor is None
+
+
+def test_file_tools_round_trip(root):
+    assert standard_tools.write_file("notes.md", "# Title\n")["bytes_written"] == 8
+    assert standard_tools.read_file("notes.md", offset=2) == {"status": "success", "content": "Title\n"}
+    assert standard_tools.delete_file("notes.md")["status"] == "success"
+    assert standard_tools.read_file("notes.md")["status"] == "error"
@@ -0,0 +1,192 @@
+"""Tests for the write-behind key-value store in tools/kv_store.py."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from tools.kv_store import MISSING, KVStore, make_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A long interval keeps writes buffered until a test flushes them.
+    kv = KVStore(tmp_path / "kv.sqlite3", flush_interval=60)
+    yield kv
+    kv.close()
+
+
+def _table(path):
+    connection = sqlite3.connect(str(path))
+    try:
+        return connection.execute("SELECT namespace, key, value FROM kv ORDER BY namespace, key").fetchall()
+    finally:
+        connection.close()
+
+
+def test_make_key_joins_parts():
+    assert make_key("alice", "s1", "note") == "alice/s1/note"
+    assert make_key("alice", "") == "alice/"
+    assert make_key("alice", "s1", "a/b") == "alice/s1/a/b"
+
+
+@pytest.mark.parametrize("parts", [(), ("a/b", "x"), ("", "x"), ("alice", "", "x")])
+def test_make_key_rejects_bad_parts(parts):
+    with pytest.raises(ValueError):
+        make_key(*parts)
+
+
+def test_buffered_writes_are_visible_before_flush(store):
+    store.put("memory", "alice/s1/a", {"n": 1})
+    store.put_many("memory", [("alice/s1/b", [1, 2]), ("alice/s2/c", "text")])
+
+    assert store.info().pending == 3
+    assert _table(store.path) == []
+    assert store.get("memory", "alice/s1/a") == {"n": 1}
+    assert store.scan("memory", "alice/s1/") == [("alice/s1/a", {"n": 1}), ("alice/s1/b", [1, 2])]
+
+
+def test_get_tells_missing_from_stored_null(store):
+    store.put("memory", "k", None)
+    assert store.get("memory", "k", MISSING) is None
+    assert store.get("memory", "absent", MISSING) is MISSING
+    store.flush()
+    assert store.get("memory", "k", MISSING) is None
+
+
+def test_namespaces_are_separate(store):
+    store.put("memory", "alice/x", 1)
+    store.put("profile", "alice/x", 2)
+    store.flush()
+    assert store.get("memory", "alice/x") == 1
+    assert store.get("profile", "alice/x") == 2
+    assert store.scan("profile", "alice/") == [("alice/x", 2)]
+
+
+def test_scan_merges_buffer_over_table_in_key_order(store):
+    store.put_many("memory", [("u/b", 1), ("u/d", 2), ("u/f", 3), ("v/a", 9)])
+    store.flush()
+    store.put("memory", "u/a", 0)
+    store.put("memory", "u/d", 20)
+    store.delete("memory", "u/f")
+
+    assert store.scan("memory", "u/") == [("u/a", 0), ("u/b", 1), ("u/d", 20)]
+    assert store.scan("memory", "u/", limit=2) == [("u/a", 0), ("u/b", 1)]
+    assert store.get("memory", "u/f", MISSING) is MISSING
+
+
+def test_scan_prefix_does_not_match_sibling_keys(store):
+    store.put_many("memory", [("alice/s1/x", 1), ("alice/s10/x", 2), ("alicex/s1/x", 3)])
+    store.flush()
+    assert [key for key, _ in store.scan("memory", "alice/s1/")] == ["alice/s1/x"]
+    assert [key for key, _ in store.scan("memory", "alice/")] == ["alice/s1/x", "alice/s10/x"]
+
+
+def test_delete_prefix_removes_flushed_and_buffered_keys(store):
+    store.put_many("memory", [("u/s1/a", 1), ("u/s1/b", 2), ("u/s2/a", 3)])
+    store.flush()
+    store.put("memory", "u/s1/c", 4)
+
+    assert store.delete_prefix("memory", "u/s1/") == 3
+    assert store.scan("memory", "u/") == [("u/s2/a", 3)]
+    assert store.flush() == 3
+    assert _table(store.path) == [("memory", "u/s2/a", "3")]
+
+
+def test_flush_commits_one_batch_and_counts_writes(store):
+    assert store.flush() == 0
+    store.put_many("memory", [("a", 1), ("b", 2)])
+    store.put("memory", "a", 3)
+
+    assert store.flush() == 2
+    info = store.info()
+    assert (info.pending, info.flushes, info.flushed_writes) == (0, 1, 2)
+    assert _table(store.path) == [("memory", "a", "3"), ("memory", "b", "2")]
+
+
+def test_close_flushes_and_data_survives_reopen(tmp_path):
+    path = tmp_path / "kv.sqlite3"
+    kv = KVStore(path, flush_interval=60)
+    kv.put("profile", "alice/name", "Alice")
+    kv.put("profile", "alice/langs", ["th", "en"])
+    kv.close()
+
+    reopened = KVStore(path, flush_interval=60)
+    try:
+        assert reopened.scan("profile", "alice/") == [("alice/langs", ["th", "en"]), ("alice/name", "Alice")]
+    finally:
+        reopened.close()
+
+
+def test_closed_store_rejects_writes(tmp_path):
+    kv = KVStore(tmp_path / "kv.sqlite3", flush_interval=60)
+    kv.close()
+    kv.close()
+    with pytest.raises(RuntimeError):
+        kv.put("memory", "k", 1)
+    with pytest.raises(RuntimeError):
+        kv.delete("memory", "k")
+
+
+def test_background_flush_after_interval(tmp_path):
+    kv = KVStore(tmp_path / "kv.sqlite3", flush_interval=0.01)
+    try:
+        kv.put("memory", "k", 1)
+        deadline = time.monotonic() + 5
+        while kv.info().flushes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _table(kv.path) == [("memory", "k", "1")]
+    finally:
+        kv.close()
+
+
+def test_max_pending_wakes_the_flusher_early(tmp_path):
+    kv = KVStore(tmp_path / "kv.sqlite3", flush_interval=60, max_pending=3)
+    try:
+        kv.put_many("memory", [("a", 1), ("b", 2)])
+        time.sleep(0.1)
+        assert kv.info().flushes == 0
+        kv.put("memory", "c", 3)
+        deadline = time.monotonic() + 5
+        while kv.info().flushes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert kv.info().flushed_writes == 3
+    finally:
+        kv.close()
+
+
+def test_scan_during_concurrent_flushes_misses_no_keys(store):
+    written = 0
+    stop = threading.Event()
+
+    def writer():
+        nonlocal written
+        while not stop.is_set() and written < 2000:
+            store.put("memory", f"k/{written:05d}", written)
+            written += 1
+            store.flush()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(200):
+            expected = written
+            keys = {key for key, _ in store.scan("memory", "k/")}
+            missing = [index for index in range(expected) if f"k/{index:05d}" not in keys]
+            assert not missing
+            if not thread.is_alive():
+                break
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_buffered_writes_are_shared_across_threads(store):
+    store.put("memory", "k", "v")
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(store.get("memory", "k")))
+    thread.start()
+    thread.join()
+    assert seen == ["v"]
@@ -0,0 +1,124 @@
+"""Parsed-spec cache and tool index behind ``loader.load_tool``/``load_agent``."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import loader
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_repeated_loads_hit_the_cache(spec_tree):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\nversion: 1\n")
+
+    first = loader.load_tool("echo")
+    second = loader.load_tool("echo")
+
+    assert first is second
+    info = loader.spec_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+def test_edit_with_same_size_is_picked_up(spec_tree):
+    spec = _write(spec_tree / "tool" / "echo.yaml", "name: echo\nversion: 1\n")
+    assert loader.load_tool("echo")["version"] == 1
+
+    spec.write_text("name: echo\nversion: 2\n", encoding="utf-8")
+    _bump_mtime(spec)
+
+    assert loader.load_tool("echo")["version"] == 2
+
+
+def test_cached_documents_are_read_only(spec_tree):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\ntags:\n  - a\n  - b\n")
+    spec = loader.load_tool("echo")
+
+    with pytest.raises(TypeError):
+        spec["name"] = "changed"
+    assert spec["tags"] == ("a", "b")
+
+    copy = loader.thaw(spec)
+    copy["tags"].append("c")
+    assert copy == {"name": "echo", "tags": ["a", "b", "c"]}
+    assert loader.load_tool("echo")["tags"] == ("a", "b")
+
+
+def test_lru_evicts_the_least_recently_used_entry(spec_tree):
+    for name in ("a", "b", "c"):
+        _write(spec_tree / "tool" / f"{name}.yaml", f"name: {name}\n")
+    loader.set_spec_cache_size(2)
+
+    loader.load_tool("a")
+    loader.load_tool("b")
+    loader.load_tool("a")
+    loader.load_tool("c")
+
+    info = loader.spec_cache_info()
+    assert (info.currsize, info.evictions) == (2, 1)
+    loader.load_tool("a")
+    assert loader.spec_cache_info().hits == 2
+
+
+def test_zero_size_disables_caching(spec_tree):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+    loader.set_spec_cache_size(0)
+
+    assert loader.load_tool("echo") is not loader.load_tool("echo")
+    assert loader.spec_cache_info().currsize == 0
+
+
+def test_deleted_file_raises_loader_error(spec_tree):
+    spec = _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+    loader.load_tool("echo")
+
+    spec.unlink()
+
+    with pytest.raises(loader.LoaderError):
+        loader.load_tool("echo")
+
+
+def test_tool_index_picks_up_new_and_nested_files(spec_tree):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+    assert loader.tool_names() == ["echo"]
+
+    _write(spec_tree / "tool" / "memory" / "recall.yaml", "name: recall\n")
+
+    assert loader.tool_names() == ["echo", "recall"]
+    assert loader.load_tool("recall")["name"] == "recall"
+
+
+def test_duplicate_names_prefer_the_top_level_file(spec_tree):
+    _write(spec_tree / "tool" / "a" / "echo.yaml", "name: nested\n")
+    _write(spec_tree / "tool" / "echo.yaml", "name: direct\n")
+
+    with pytest.warns(loader.DuplicateToolWarning):
+        assert loader.load_tool("echo")["name"] == "direct"
+    assert [path.name for path in loader.duplicate_tools()["echo"]] == ["echo.yaml", "echo.yaml"]
+
+
+@pytest.mark.parametrize("name", ["", "../secrets", "a/b"])
+def test_rejects_path_like_names(spec_tree, name):
+    with pytest.raises(loader.LoaderError):
+        loader.load_tool(name)
+    with pytest.raises(loader.LoaderError):
+        loader.load_agent(name)
+
+
+def test_load_agent_reads_role_yaml(spec_tree):
+    _write(spec_tree / "role" / "tutor" / "role.yaml", "name: tutor\nversion: '1.0'\n")
+
+    assert loader.load_agent("tutor")["version"] == "1.0"
+    with pytest.raises(loader.LoaderError):
+        loader.load_agent("missing")
@@ -0,0 +1,114 @@
+"""``loader.load_agent_resolved`` and ``load_agents_resolved``."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import loader
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _role(tree, name, imports):
+    lines = [f"name: {name}", "version: '1.0'", "description: test role", "imports:"]
+    for kind, paths in imports.items():
+        lines.append(f"  {kind}:")
+        lines.extend(f"    - {path}" for path in paths)
+    return _write(tree / "role" / name / "role.yaml", "\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def tree(spec_tree):
+    _write(spec_tree / "prompt" / "base.yaml", "persona:\n  name: Base\n")
+    _write(spec_tree / "prompt" / "tutor.yaml", "persona:\n  name: Tutor\nstyle: friendly\n")
+    _write(spec_tree / "prompt" / "plain.yaml", "style: terse\n")
+    _write(spec_tree / "rule" / "rules.md", "# Rules\nBe kind.\n")
+    _write(spec_tree / "tool" / "memory" / "recall.yaml", "name: recall\n")
+    _write(spec_tree / "tool" / "search.yaml", "name: search\n")
+    _role(spec_tree, "tutor", {
+        "prompts": ["../../prompt/base.yaml", "../../prompt/tutor.yaml", "../../prompt/plain.yaml"],
+        "rules": ["../../rule/rules.md"],
+        "tools": ["../../tool/search.yaml", "../../tool/memory/recall.yaml"],
+    })
+    _role(spec_tree, "coder", {"tools": ["../../tool/memory/recall.yaml"]})
+    return spec_tree
+
+
+def test_imports_are_loaded_in_role_order(tree):
+    agent = loader.load_agent_resolved("tutor")
+
+    assert (agent.name, agent.version, agent.description) == ("tutor", "1.0", "test role")
+    assert agent.path == tree / "role" / "tutor" / "role.yaml"
+    assert [prompt.get("style") for prompt in agent.prompts] == [None, "friendly", "terse"]
+    assert agent.rules == ("# Rules\nBe kind.\n",)
+    assert [tool["name"] for tool in agent.tools] == ["search", "recall"]
+
+
+def test_persona_comes_from_the_last_prompt_defining_one(tree):
+    assert loader.load_agent_resolved("tutor").persona["name"] == "Tutor"
+    assert loader.load_agent_resolved("coder").persona is None
+
+
+def test_all_roles_share_one_parse_per_import(tree):
+    agents = loader.load_agents_resolved()
+
+    assert sorted(agents) == ["coder", "tutor"]
+    assert agents["coder"].tools[0] is agents["tutor"].tools[1]
+
+
+def test_imports_are_loaded_concurrently(tree, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+    original = loader._IMPORT_KINDS["rules"]
+
+    def slow_text(path):
+        barrier.wait()
+        return original(path)
+
+    def slow_yaml(path):
+        if path.name == "search.yaml":
+            barrier.wait()
+        return loader._load_yaml(path)
+
+    monkeypatch.setitem(loader._IMPORT_KINDS, "rules", slow_text)
+    monkeypatch.setitem(loader._IMPORT_KINDS, "tools", slow_yaml)
+
+    agent = loader.load_agent_resolved("tutor")
+
+    assert agent.rules and agent.tools
+
+
+def test_missing_import_raises(tree):
+    _role(tree, "broken", {"rules": ["../../rule/missing.md"]})
+
+    with pytest.raises(loader.LoaderError, match="Missing import"):
+        loader.load_agent_resolved("broken")
+
+
+def test_imports_cannot_escape_the_tree(tree):
+    outside = tree.parent / "outside.md"
+    outside.write_text("secret", encoding="utf-8")
+    _role(tree, "escape", {"rules": ["../../../outside.md"]})
+
+    with pytest.raises(loader.LoaderError, match="outside of the repository"):
+        loader.load_agent_resolved("escape")
+
+
+def test_non_list_imports_are_rejected(tree):
+    _write(tree / "role" / "odd" / "role.yaml", "name: odd\nimports:\n  tools: ../../tool/search.yaml\n")
+
+    with pytest.raises(loader.LoaderError, match="must be a list"):
+        loader.load_agent_resolved("odd")
+
+
+def test_repository_roles_resolve():
+    agents = loader.load_agents_resolved()
+
+    assert agents
+    for agent in agents.values():
+        assert agent.path.name == "role.yaml"
@@ -0,0 +1,106 @@
+"""``loader.compile_snapshot`` and loading specs through the snapshot."""
+
+from __future__ import annotations
+
+import datetime
+import os
+
+import pytest
+
+import loader
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def snapshot(spec_tree, monkeypatch):
+    """Compile a snapshot of *spec_tree* and make it the active one."""
+
+    path = spec_tree / ".cache" / "specs.snapshot"
+    monkeypatch.setenv("AI_SANDBOX_SNAPSHOT", str(path))
+
+    def compile_and_activate():
+        info = loader.compile_snapshot(path)
+        monkeypatch.setattr(loader, "_SNAPSHOT_LOADED", False)
+        loader.clear_spec_cache()
+        return info
+
+    return compile_and_activate
+
+
+def test_snapshot_serves_specs_without_parsing(spec_tree, snapshot, monkeypatch):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\nversion: 1\n")
+    _write(spec_tree / "rule" / "rules.md", "Be kind.\n")
+    info = snapshot()
+    assert info.entries == 2 and info.skipped == ()
+
+    def fail(path):
+        raise AssertionError(f"parsed {path}")
+
+    monkeypatch.setattr(loader, "parse_yaml_file", fail)
+    assert loader.load_tool("echo")["version"] == 1
+    assert loader.snapshot_info().entries == 2
+
+
+def test_dates_are_skipped_instead_of_aborting(spec_tree, snapshot):
+    _write(spec_tree / "tool" / "dated.yaml", "name: dated\ncreated: 2024-01-01\n")
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+
+    info = snapshot()
+
+    assert info.skipped == ("tool/dated.yaml",)
+    assert info.entries == 1
+    assert loader.load_tool("dated")["created"] == datetime.date(2024, 1, 1)
+
+
+def test_compile_cli_reports_skipped_files(spec_tree, monkeypatch, capsys):
+    monkeypatch.setattr(loader, "DEFAULT_SNAPSHOT_PATH", spec_tree / ".cache" / "specs.snapshot")
+    _write(spec_tree / "tool" / "dated.yaml", "created: 2024-01-01\n")
+
+    assert loader.main(["compile", "--output", str(spec_tree / "out.snapshot")]) == 0
+
+    captured = capsys.readouterr()
+    assert "Wrote 0 entries" in captured.out
+    assert "tool/dated.yaml" in captured.err
+
+
+def test_unparsable_files_still_raise(spec_tree, snapshot):
+    _write(spec_tree / "tool" / "broken.yaml", "name: [unclosed\n")
+
+    assert snapshot().skipped == ("tool/broken.yaml",)
+    with pytest.raises(loader.LoaderError):
+        loader.load_tool("broken")
+
+
+def test_edited_file_is_parsed_from_disk(spec_tree, snapshot):
+    spec = _write(spec_tree / "tool" / "echo.yaml", "name: echo\nversion: 1\n")
+    snapshot()
+
+    spec.write_text("name: echo\nversion: 22\n", encoding="utf-8")
+
+    assert loader.load_tool("echo")["version"] == 22
+    assert loader.snapshot_info().stale == 1
+
+
+def test_touched_file_with_same_content_stays_fresh(spec_tree, snapshot):
+    spec = _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+    snapshot()
+    stat = os.stat(spec)
+    os.utime(spec, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    assert loader.load_tool("echo")["name"] == "echo"
+    assert loader.snapshot_info().stale == 0
+
+
+def test_corrupt_snapshot_is_ignored(spec_tree, snapshot, monkeypatch):
+    _write(spec_tree / "tool" / "echo.yaml", "name: echo\n")
+    snapshot()
+    (spec_tree / ".cache" / "specs.snapshot").write_bytes(b"AISBSNAP garbage")
+    monkeypatch.setattr(loader, "_SNAPSHOT_LOADED", False)
+
+    assert loader.snapshot_info() is None
+    assert loader.load_tool("echo")["name"] == "echo"
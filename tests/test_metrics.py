@@ -0,0 +1,180 @@
+"""Tests for the metrics registry, Prometheus export and sampled logging in metrics.py."""
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+import metrics
+import tool_map
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry, so tests do not see each other's metrics."""
+
+    monkeypatch.setattr(metrics, "_METRICS", {})
+    monkeypatch.setattr(metrics, "_COLLECTORS", [])
+    monkeypatch.setattr(metrics, "ENABLED", True)
+
+
+def test_registry_returns_one_instance_per_name(registry):
+    first = metrics.counter("test_total", "Help.")
+    assert metrics.counter("test_total", "Other help.") is first
+    assert metrics.histogram("test_seconds", "Help.") is metrics.histogram("test_seconds", "Help.")
+
+
+def test_counter_keeps_one_value_per_label_set(registry):
+    calls = metrics.counter("test_calls_total", "Calls.")
+    calls.inc(tool="a", outcome="ok")
+    calls.inc(2, outcome="ok", tool="a")
+    calls.inc(tool="b", outcome="error")
+    assert metrics.snapshot()["test_calls_total"] == {"outcome=ok,tool=a": 3.0, "outcome=error,tool=b": 1.0}
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive(registry):
+    latency = metrics.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, tool="a")
+
+    rows = {(name, dict(labels).get("le")): value for name, labels, value in latency.samples()}
+    assert rows[("test_latency_seconds_bucket", "0.1")] == 2  # 0.1 lands in le="0.1"
+    assert rows[("test_latency_seconds_bucket", "1.0")] == 3
+    assert rows[("test_latency_seconds_bucket", "+Inf")] == 4
+    assert rows[("test_latency_seconds_count", None)] == 4
+    assert rows[("test_latency_seconds_sum", None)] == pytest.approx(2.65)
+    assert latency.stats()["tool=a"]["mean"] == pytest.approx(2.65 / 4)
+
+
+def test_histogram_timer_observes_its_block_even_on_error(registry):
+    latency = metrics.histogram("test_block_seconds", "Block time.")
+    with latency.time(step="ok"):
+        pass
+    with pytest.raises(RuntimeError):
+        with latency.time(step="fail"):
+            raise RuntimeError
+    stats = latency.stats()
+    assert stats["step=ok"]["count"] == 1 and stats["step=fail"]["count"] == 1
+
+
+def test_disabled_metrics_record_nothing(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    calls = metrics.counter("test_off_total", "Calls.")
+    latency = metrics.histogram("test_off_seconds", "Latency.")
+    calls.inc()
+    latency.observe(1.0)
+    with latency.time():
+        pass
+    assert calls.samples() == [] and latency.samples() == []
+
+
+def test_collectors_are_read_on_export_and_failures_are_contained(registry, caplog):
+    state = {"hits": 3, "misses": 1}
+    metrics.register_collector(lambda: metrics.cache_samples("demo", state["hits"], state["misses"], entries=7))
+    metrics.register_collector(lambda: 1 / 0)
+
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        data = metrics.snapshot()
+    assert data["ai_sandbox_cache_hit_ratio"] == {"cache=demo": 0.75}
+    assert data["ai_sandbox_cache_entries"] == {"cache=demo": 7}
+    assert "collector" in caplog.text
+
+    state["hits"] = 0
+    state["misses"] = 0
+    assert metrics.snapshot()["ai_sandbox_cache_hit_ratio"] == {"cache=demo": 0.0}
+
+
+def test_register_collector_ignores_duplicates(registry):
+    def collect():
+        return [metrics.Sample("test_gauge", "A gauge.", "gauge", {}, 1.0)]
+
+    metrics.register_collector(collect)
+    metrics.register_collector(collect)
+    assert metrics.render_prometheus().count("test_gauge 1.0") == 1
+
+
+def test_render_prometheus_text_format(registry):
+    metrics.counter("test_requests_total", "Requests.").inc(path='a "b"\\c\nd')
+    metrics.histogram("test_step_seconds", "Steps.", buckets=(1.0,)).observe(0.5)
+    metrics.register_collector(lambda: metrics.cache_samples("spec", 1, 1))
+
+    text = metrics.render_prometheus()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{path="a \\"b\\"\\\\c\\nd"} 1.0' in lines
+    assert "# TYPE test_step_seconds histogram" in lines
+    assert 'test_step_seconds_bucket{le="1.0"} 1.0' in lines
+    assert 'test_step_seconds_bucket{le="+Inf"} 1.0' in lines
+    assert "test_step_seconds_count 1.0" in lines
+    assert lines.count("# TYPE ai_sandbox_cache_hit_ratio gauge") == 1
+    assert 'ai_sandbox_cache_hit_ratio{cache="spec"} 0.5' in lines
+
+
+def test_write_prometheus_replaces_the_file(registry, tmp_path):
+    metrics.counter("test_written_total", "Written.").inc()
+    target = metrics.write_prometheus(tmp_path / "out" / "metrics.prom")
+    assert "test_written_total 1.0" in target.read_text(encoding="utf-8")
+    assert [path.name for path in target.parent.iterdir()] == ["metrics.prom"]
+
+
+def test_reset_clears_values_but_keeps_metrics(registry):
+    calls = metrics.counter("test_reset_total", "Calls.")
+    calls.inc()
+    metrics.reset()
+    assert calls.samples() == []
+    assert metrics.counter("test_reset_total", "Calls.") is calls
+
+
+def test_call_tool_times_each_outcome(monkeypatch):
+    def boom():
+        raise ValueError("boom")
+
+    monkeypatch.setattr(tool_map, "TOOL_MAP", {"metrics_ok": lambda: 1, "metrics_fail": boom})
+    monkeypatch.setattr("tool_cache.get_tool_cache", lambda: None)
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    before = metrics.TOOL_CALL_SECONDS.stats()
+
+    tool_map.call_tool("metrics_ok")
+    with pytest.raises(ValueError):
+        tool_map.call_tool("metrics_fail")
+
+    after = metrics.TOOL_CALL_SECONDS.stats()
+    for label in ("outcome=ok,tool=metrics_ok", "outcome=error,tool=metrics_fail"):
+        assert after[label]["count"] == before.get(label, {"count": 0})["count"] + 1
+
+
+def test_sampled_logger_drops_only_debug_and_info(caplog):
+    log = metrics.get_logger("test.sampled", rate=0.0)
+    with caplog.at_level(logging.DEBUG, logger="test.sampled"):
+        log.debug("debug %s", 1)
+        log.info("info")
+        log.warning("warning %s", 2)
+        log.error("error")
+    assert [record.getMessage() for record in caplog.records] == ["warning 2", "error"]
+
+
+def test_sampled_logger_skips_work_when_level_is_disabled(caplog):
+    class Loud:
+        def __str__(self):
+            raise AssertionError("formatted although DEBUG is off")
+
+    log = metrics.get_logger("test.quiet", rate=1.0)
+    with caplog.at_level(logging.INFO, logger="test.quiet"):
+        log.debug("%s", Loud())
+    assert caplog.records == []
+
+
+def test_log_sample_rate_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("AI_SANDBOX_LOG_SAMPLE", "0.25")
+    assert metrics.get_logger("test.env").rate == 0.25
+
+
+def test_log_call_records_names_not_values(caplog):
+    log = metrics.get_logger("test.calls", rate=1.0)
+    with caplog.at_level(logging.DEBUG, logger="test.calls"):
+        metrics.log_call(log, "memory_store", ("secret-value",), {"user_id": "alice", "value": "token"})
+    [record] = caplog.records
+    message = record.getMessage()
+    assert "memory_store" in message and "['user_id', 'value']" in message
+    assert "secret-value" not in message and "alice" not in message and "token" not in message
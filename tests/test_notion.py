@@ -0,0 +1,283 @@
+"""``tools.notion`` against the spec-driven stub in ``scripts/notion_stub_server.py``."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from notion_stub_server import BLOCK_ID, DATABASE_ID, start_server
+from tools.notion import NotionClient, NotionError
+
+
+@pytest.fixture
+def stub():
+    """Factory starting a stub with the given options; every server is shut down afterwards."""
+
+    servers = []
+
+    def start(**options):
+        server, url = start_server(**options)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def connect():
+    clients = []
+
+    def make(url, **options):
+        options.setdefault("backoff", 0.01)
+        client = NotionClient(token="stub", base_url=url, **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _title(text):
+    return {"Name": {"title": [{"type": "text", "text": {"content": text}}]}}
+
+
+def _first_page_id(client):
+    return client.query_database({"page_size": 1}, database_id=DATABASE_ID)["results"][0]["id"]
+
+
+def test_iter_results_follows_cursors(stub, connect):
+    server, url = stub(pages=120)
+    client = connect(url)
+
+    ids = [page["id"] for page in client.iter_results("queryDatabase", page_size=50, database_id=DATABASE_ID)]
+
+    assert len(ids) == len(set(ids)) == 120
+    assert server.stats["requests"] == 3
+
+
+def test_iter_results_with_query_cursor(stub, connect):
+    _server, url = stub(blocks=30)
+    client = connect(url)
+
+    blocks = list(client.iter_results("getPageOrBlockChildrenContent", page_size=7, block_id=BLOCK_ID))
+
+    assert [block["paragraph"]["rich_text"][0]["plain_text"] for block in blocks] == [f"Paragraph {n}" for n in range(30)]
+
+
+def test_paginate_prefetches_next_page(stub, connect):
+    server, url = stub(pages=30)
+    client = connect(url)
+
+    async def consume():
+        seen = []
+        async for page in client.paginate("queryDatabase", page_size=10, database_id=DATABASE_ID):
+            if not seen:
+                # While the caller is still on the first result, page two is already requested.
+                await asyncio.sleep(0.3)
+                seen.append(server.stats["requests"])
+            seen.append(page["id"])
+        return seen
+
+    requests_during_first_page, *ids = asyncio.run(consume())
+
+    assert requests_during_first_page == 2
+    assert ids == [page["id"] for page in client.iter_results("queryDatabase", page_size=10, database_id=DATABASE_ID)]
+
+
+def test_bulk_respects_concurrency(stub, connect):
+    server, url = stub(pages=0, latency=0.05)
+    client = connect(url)
+    bodies = [{"parent": {"database_id": DATABASE_ID}, "properties": _title(f"Bulk {n}")} for n in range(12)]
+
+    results = asyncio.run(client.create_pages(bodies, concurrency=3))
+
+    assert [page["properties"]["Name"]["title"][0]["text"]["content"] for page in results] == [f"Bulk {n}" for n in range(12)]
+    assert server.stats["peak_in_flight"] == 3
+    assert len(server.store.pages) == 12
+
+
+def test_bulk_returns_errors_in_place(stub, connect):
+    _server, url = stub(pages=1)
+    client = connect(url)
+    page_id = _first_page_id(client)
+
+    results = asyncio.run(client.update_pages([(page_id, {"archived": False}), ("missing", {"archived": True})]))
+
+    assert results[0]["id"] == page_id
+    assert isinstance(results[1], NotionError) and results[1].status == 404
+
+
+def test_rate_limit_pauses_every_caller(stub, connect):
+    server, url = stub(pages=1, rate_limit_every=2, retry_after=0.4)
+    client = connect(url)
+    page_id = _first_page_id(client)  # request 1; request 2 will be rate limited
+    results = {}
+
+    def read(name):
+        results[name] = client.get_page(page_id=page_id)
+
+    started = time.monotonic()
+    first = threading.Thread(target=read, args=("first",))
+    first.start()
+    while client.stats["rate_limited"] == 0:
+        time.sleep(0.005)
+    # A caller arriving during the pause must not send anything until it ends.
+    second = threading.Thread(target=read, args=("second",))
+    second.start()
+    time.sleep(0.2)
+    assert server.stats["requests"] == 2
+    first.join()
+    second.join()
+
+    assert time.monotonic() - started >= 0.4
+    assert results["first"]["id"] == results["second"]["id"] == page_id
+    assert client.stats["rate_limited"] == server.stats["rate_limited"] >= 1
+
+
+def test_etag_revalidation_and_invalidation_after_patch(stub, connect):
+    server, url = stub(pages=1)
+    client = connect(url)
+    page_id = _first_page_id(client)
+
+    first = client.get_page(page_id=page_id)
+    again = client.get_page(page_id=page_id)
+    assert again == first
+    assert client.stats["not_modified"] == server.stats["not_modified"] == 1
+
+    client.update_page({"properties": _title("Renamed")}, page_id=page_id)
+    assert not client._etags  # the write dropped the cached read
+
+    renamed = client.get_page(page_id=page_id)
+    assert renamed["properties"]["Name"]["title"][0]["text"]["content"] == "Renamed"
+    assert server.stats["not_modified"] == 1
+    assert client.get_page(page_id=page_id) == renamed
+    assert server.stats["not_modified"] == 2
+
+
+@pytest.mark.parametrize(
+    "operation, body, params, message",
+    [
+        ("getPage", None, {}, "needs the 'page_id' path parameter"),
+        ("getPage", None, {"page_id": "x", "colour": "red"}, "unknown parameters: colour"),
+        ("getPage", {"x": 1}, {"page_id": "x"}, "does not take a request body"),
+        ("createPage", None, {}, "needs a request body"),
+    ],
+)
+def test_parameters_are_checked_before_sending(stub, connect, operation, body, params, message):
+    server, url = stub(pages=0)
+    client = connect(url)
+
+    with pytest.raises(NotionError, match=message):
+        client.call(operation, body, **params)
+    with pytest.raises(AttributeError):
+        client.no_such_operation
+    assert server.stats["requests"] == 0
+
+
+def test_server_errors_are_reported(stub, connect):
+    _server, url = stub(pages=0)
+    client = connect(url)
+
+    with pytest.raises(NotionError) as excinfo:
+        client.get_page(page_id="missing")
+
+    assert (excinfo.value.status, excinfo.value.code) == (404, "object_not_found")
+
+
+def test_gets_are_retried_after_5xx(stub, connect):
+    server, url = stub(pages=1, error_every=2)
+    client = connect(url)
+    page_id = _first_page_id(client)  # request 1 succeeds
+
+    page = client.get_page(page_id=page_id)  # request 2 fails, 3 succeeds
+
+    assert page["id"] == page_id
+    assert server.stats["errors"] == 1
+    assert client.stats["retries"] == 1
+
+
+def test_writes_are_not_retried_after_5xx(stub, connect):
+    server, url = stub(pages=0, error_every=1)
+    client = connect(url)
+
+    with pytest.raises(NotionError) as excinfo:
+        client.create_page({"parent": {"database_id": DATABASE_ID}, "properties": _title("Once")})
+
+    assert excinfo.value.status == 502
+    assert server.stats["requests"] == 1
+    assert len(server.store.pages) == 1  # applied once, not duplicated by a retry
+
+
+def test_gets_are_retried_after_the_server_drops_a_kept_alive_connection(stub, connect):
+    server, url = stub(pages=1, drop_every=2)
+    client = connect(url)
+    page_id = _first_page_id(client)  # request 1 opens the connection that is kept alive
+
+    page = client.get_page(page_id=page_id)  # request 2 is dropped, 3 succeeds on a new connection
+
+    assert page["id"] == page_id
+    assert server.stats["dropped"] == 1
+    assert client.pool.connections_opened == 2
+
+
+def test_writes_are_not_resent_after_the_server_drops_the_connection(stub, connect):
+    server, url = stub(pages=0, drop_every=2)
+    client = connect(url)
+    client.get_database(database_id=DATABASE_ID)  # request 1 leaves a kept-alive connection
+
+    with pytest.raises(NotionError, match="createPage failed"):
+        client.create_page({"parent": {"database_id": DATABASE_ID}, "properties": _title("Once")})
+
+    assert server.stats["dropped"] == 1
+    assert server.stats["requests"] == 2
+    assert len(server.store.pages) == 1  # applied once, not duplicated by a resend
+
+
+class _FakeConnection:
+    """Stands in for ``http.client.HTTPConnection``; *fail* is raised by ``request``."""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.sent = []
+
+    def request(self, method, url, body=None, headers=None):
+        if self.fail is not None:
+            raise self.fail
+        self.sent.append((method, url, body))
+
+    def getresponse(self):
+        class Response:
+            status = 200
+            will_close = False
+
+            def read(self):
+                return b"{}"
+
+            def getheaders(self):
+                return []
+
+        return Response()
+
+    def close(self):
+        pass
+
+
+def test_writes_that_never_left_are_resent_on_a_fresh_connection(monkeypatch):
+    from tools.notion import ConnectionPool
+
+    pool = ConnectionPool("http://127.0.0.1:9/v1")
+    pool._idle.append(_FakeConnection(fail=BrokenPipeError()))
+    fresh = _FakeConnection()
+    monkeypatch.setattr(pool, "_connect", lambda: fresh)
+
+    status, _headers, data = pool.request("POST", "/pages", b"{}", {})
+
+    assert (status, data) == (200, b"{}")
+    assert fresh.sent == [("POST", "/v1/pages", b"{}")]
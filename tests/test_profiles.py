@@ -0,0 +1,233 @@
+"""Tests for streaming, validating and indexing agent profiles in profiles.py."""
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+import profiles
+from profiles import ProfileIndex, ProfileReader, ProfileSyntaxError, check_file, loads
+
+
+def _profile(agent_id, *skill_numbers, note=""):
+    return {
+        "Agent_Profile": f"Agent {agent_id}",
+        "Agent_ID": agent_id,
+        "Track": "Builder",
+        "Skills": [
+            {
+                "Skill_Name": f"Skill {number}{note}",
+                "Skill_ID": f"{agent_id}-T{number}",
+                "Parameters": [
+                    {"Param_Name": "input", "Data_Type": "Text", "Scope_Format": "\"x\"", "Description": "ข้อมูล"}
+                ],
+            }
+            for number in skill_numbers
+        ],
+    }
+
+
+def _write(path, *profiles_):
+    path.write_text(json.dumps(list(profiles_), ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def _bump(path, seconds=1):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def index(tmp_path):
+    files = [_write(tmp_path / "a.json", _profile("AAA-001", 1, 2)),
+             _write(tmp_path / "b.json", _profile("BBB-001", 1))]
+    built = ProfileIndex(files, tmp_path / "index.sqlite3", refresh_interval=3600)
+    built.refresh()
+    yield built
+    built.close()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 65536])
+def test_reader_yields_skills_then_profile_with_byte_spans(tmp_path, chunk_size):
+    path = _write(tmp_path / "p.json", _profile("AAA-001", 1, 2), _profile("BBB-001", 3))
+    raw = path.read_bytes()
+    records = list(ProfileReader(path, chunk_size).records())
+
+    assert [(record.kind, record.agent_id) for record in records] == [
+        ("skill", "AAA-001"), ("skill", "AAA-001"), ("profile", "AAA-001"), ("skill", "BBB-001"), ("profile", "BBB-001"),
+    ]
+    assert records[2].skills == 2 and records[2].data["Skills"] == []
+    for record in records:
+        field = "Agent_ID" if record.kind == "profile" else "Skill_ID"
+        assert loads(raw[record.offset : record.offset + record.length])[field] == record.data[field]
+
+
+def test_single_profile_object_is_accepted(tmp_path):
+    path = tmp_path / "one.json"
+    path.write_text(json.dumps(_profile("AAA-001", 1)), encoding="utf-8")
+    assert [record.kind for record in ProfileReader(path).records()] == ["skill", "profile"]
+
+
+def test_loads_matches_json_and_accepts_the_catalog_quirks():
+    document = {"a": [1, -2.5e3, True, None, 'x"y'], "ไทย": {"b": "é"}}
+    assert loads(json.dumps(document, ensure_ascii=False)) == document
+    assert loads('{"a": "it\\\'s", "b": [1, 2,],}') == {"a": "it's", "b": [1, 2]}
+    with pytest.raises(ProfileSyntaxError):
+        loads('{"a": }')
+
+
+def test_check_file_reports_syntax_errors_and_quirks(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('[{"Agent_ID": "AAA-001", "Skills": [{"Skill_ID": "AAA-001-T1",},]}, {"Agent_ID": ]', encoding="utf-8")
+    seen = []
+    issues = list(check_file(path, on_record=seen.append))
+
+    assert [record.kind for record in seen] == ["skill", "profile"]
+    errors = [issue for issue in issues if issue.level == "error"]
+    assert len(errors) == 1 and errors[0].message.startswith("syntax error")
+    assert any("trailing comma" in issue.message for issue in issues if issue.level == "warning")
+    assert [issue.level for issue in check_file(tmp_path / "missing.json")] == ["error"]
+
+
+def test_validator_reports_schema_errors(tmp_path):
+    pytest.importorskip("jsonschema")
+    bad = _profile("AAA-001", 1)
+    bad["Skills"][0]["Skill_ID"] = "ZZZ-T1"
+    del bad["Track"]
+    path = _write(tmp_path / "p.json", bad)
+    messages = [issue.message for issue in check_file(path, profiles.ProfileValidator())]
+    assert any("does not start with the profile's Agent_ID" in message for message in messages)
+    assert messages
+
+
+def test_lookup_reads_one_skill(index):
+    found = index.lookup("AAA-001-T2")
+    assert found["agent_id"] == "AAA-001" and found["path"].endswith("a.json")
+    assert found["skill"]["Skill_Name"] == "Skill 2"
+    assert index.lookup("nope") is None
+    assert index.skill_ids() == ["AAA-001-T1", "AAA-001-T2", "BBB-001-T1"]
+    assert index.skill_ids("BBB-001") == ["BBB-001-T1"]
+
+
+def test_refresh_rereads_only_changed_files(index, tmp_path, monkeypatch):
+    read = []
+    original = ProfileIndex._index_file
+
+    def spy(self, path, *args):
+        read.append(path.name)
+        return original(self, path, *args)
+
+    monkeypatch.setattr(ProfileIndex, "_index_file", spy)
+    assert index.refresh() == [] and read == []
+    _write(tmp_path / "b.json", _profile("BBB-001", 1, 2))
+    _bump(tmp_path / "b.json")
+    index.refresh()
+    assert read == ["b.json"]
+    assert "BBB-001-T2" in index.skill_ids()
+
+
+def test_duplicates_resolve_to_the_first_file(tmp_path):
+    first = _write(tmp_path / "first.json", _profile("AAA-001", 1, note=" first"))
+    second = _write(tmp_path / "second.json", _profile("AAA-001", 1, note=" second"))
+    index = ProfileIndex([first, second], tmp_path / "index.sqlite3")
+    try:
+        issues = index.refresh()
+        assert [issue.path for issue in issues] == [str(second)]
+        assert "also defined in" in issues[0].message
+        assert index.lookup("AAA-001-T1")["skill"]["Skill_Name"] == "Skill 1 first"
+        index.paths.reverse()
+        index.refresh()
+        assert index.lookup("AAA-001-T1")["skill"]["Skill_Name"] == "Skill 1 second"
+    finally:
+        index.close()
+
+
+def test_removed_files_are_dropped(index, tmp_path):
+    (tmp_path / "b.json").unlink()
+    issues = index.refresh()
+    assert [issue.message.startswith("cannot read file") for issue in issues] == [True]
+    assert index.skill_ids() == ["AAA-001-T1", "AAA-001-T2"]
+
+
+def test_file_rewritten_while_indexing_is_read_again(tmp_path):
+    path = _write(tmp_path / "a.json", _profile("AAA-001", 1))
+    index = ProfileIndex([path], tmp_path / "index.sqlite3", refresh_interval=3600)
+    original = ProfileIndex._index_file
+    passes = []
+
+    def rewrite_during_first_pass(self, file_path, *args):
+        issues = original(self, file_path, *args)
+        if not passes:
+            _write(path, _profile("AAA-001", 1, 2, note=" (longer names shift every span)"))
+            _bump(path)
+        passes.append(file_path)
+        return issues
+
+    try:
+        index._index_file = rewrite_during_first_pass.__get__(index)
+        index.refresh()
+        assert len(passes) == 2
+        del index._index_file
+        assert index.skill_ids() == ["AAA-001-T1", "AAA-001-T2"]
+        assert index.lookup("AAA-001-T2")["skill"]["Skill_Name"].startswith("Skill 2")
+        read = []
+        index._index_file = lambda file_path, *args: read.append(file_path) or []
+        index.refresh()
+        assert read == []  # the stored signature is the final one
+    finally:
+        index.close()
+
+
+def test_file_that_never_settles_is_read_again_next_time(tmp_path, monkeypatch):
+    path = _write(tmp_path / "a.json", _profile("AAA-001", 1))
+    index = ProfileIndex([path], tmp_path / "index.sqlite3", refresh_interval=3600)
+    original = ProfileIndex._index_file
+
+    def always_changing(self, file_path, *args):
+        issues = original(self, file_path, *args)
+        _bump(path)
+        return issues
+
+    try:
+        monkeypatch.setattr(ProfileIndex, "_index_file", always_changing)
+        index.refresh()
+        assert index.skill_ids() == ["AAA-001-T1"]
+        monkeypatch.setattr(ProfileIndex, "_index_file", original)
+        read = []
+        monkeypatch.setattr(ProfileIndex, "_index_file", lambda self, p, *a: read.append(p) or original(self, p, *a))
+        index.refresh()
+        assert read == [path]
+    finally:
+        index.close()
+
+
+def test_lookup_with_stale_spans_refreshes_instead_of_raising(index, tmp_path):
+    # Rewritten without the index noticing (refresh_interval is an hour).
+    _write(tmp_path / "a.json", _profile("AAA-001", 2, 1, note=" moved"))
+    found = index.lookup("AAA-001-T1")
+    assert found["skill"]["Skill_Name"] == "Skill 1 moved"
+    assert index.lookup("AAA-001-T2")["skill"]["Skill_Name"] == "Skill 2 moved"
+
+
+def test_lookup_of_a_skill_removed_behind_the_index_returns_none(index, tmp_path):
+    _write(tmp_path / "a.json", _profile("AAA-001", 1))
+    (tmp_path / "b.json").write_text("", encoding="utf-8")
+    assert index.lookup("BBB-001-T1") is None
+    assert index.lookup("AAA-001-T2") is None
+
+
+def test_cli_lookup_and_validate(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("jsonschema")
+    path = _write(tmp_path / "a.json", _profile("AAA-001", 1))
+    monkeypatch.setenv("AI_SANDBOX_PROFILE_FILES", str(path))
+    monkeypatch.setenv("AI_SANDBOX_PROFILE_INDEX", str(tmp_path / "index.sqlite3"))
+    monkeypatch.setattr(profiles, "_INDEX", None)
+
+    assert profiles.main(["lookup", "AAA-001-T1"]) == 0
+    assert json.loads(capsys.readouterr().out)["skill_id"] == "AAA-001-T1"
+    assert profiles.main(["lookup", "nope"]) == 1
+    capsys.readouterr()
+    assert profiles.main(["validate", str(path), "--format", "json"]) == 0
+    assert json.loads(capsys.readouterr().out)["skills"] == 1
+    profiles.get_index().close()
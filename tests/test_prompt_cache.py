@@ -0,0 +1,135 @@
+"""``tools.prompt_cache``: the segment trie, byte budget and persistence."""
+
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tools import prompt_cache
+from tools.prompt_cache import PromptCache, normalise, prompt_segments
+
+PERSONA = {"name": "Tutor", "tone": "friendly"}
+RULES = ["Be kind.", "Cite sources."]
+
+
+def _segments(prompt):
+    return prompt_segments(prompt, PERSONA, RULES)
+
+
+def test_normalise_canonicalises_line_endings_and_blanks():
+    assert normalise("  café  \r\nline two   \r\n\n") == "café\nline two"
+
+
+def test_exact_lookup_counts_hits_and_misses():
+    cache = PromptCache()
+    cache.put(_segments("explain loops"), "refined loops")
+
+    assert cache.get(_segments("explain loops")) == "refined loops"
+    assert cache.get(_segments("explain   loops")) is None
+    assert cache.get(prompt_segments("explain loops\r\n", PERSONA, RULES)) == "refined loops"
+    info = cache.info()
+    assert (info.hits, info.misses, info.hit_rate) == (2, 1, 2 / 3)
+
+
+def test_prompts_of_one_role_share_their_prefix():
+    cache = PromptCache()
+    for prompt in ("a", "b", "c"):
+        cache.put(_segments(prompt), prompt.upper())
+
+    # persona + 2 rules shared, plus one leaf per prompt
+    assert cache.info().nodes == 3 + 3
+    assert len(cache) == 3
+
+
+def test_longest_prefix_returns_the_deepest_cached_value():
+    cache = PromptCache()
+    base = _segments("x")[:-1]
+    cache.put(base[:1], "persona only")
+    cache.put(base, "persona and rules")
+
+    assert cache.longest_prefix(_segments("new prompt")) == (3, "persona and rules")
+    assert cache.longest_prefix(prompt_segments("p", {"name": "Other"})) == (0, None)
+    assert cache.info().prefix_hits == 1
+
+
+def test_byte_budget_evicts_least_recently_used_and_prunes():
+    cache = PromptCache(max_bytes=40)
+    cache.put(["role", "one"], "x" * 10)
+    cache.put(["role", "two"], "y" * 10)
+    cache.get(["role", "one"])
+    cache.put(["other", "three"], "z" * 10)
+
+    assert ["role", "two"] not in cache
+    assert ["role", "one"] in cache and ["other", "three"] in cache
+    info = cache.info()
+    assert info.evictions == 1
+    assert info.nbytes == len("roleone" + "otherthree") + 20 <= 40
+
+
+def test_overwriting_and_discarding_keep_the_byte_count():
+    cache = PromptCache()
+    cache.put(["a", "b"], "short")
+    cache.put(["a", "b"], "a much longer value")
+    assert cache.info().nbytes == 2 + len("a much longer value")
+
+    assert cache.discard(["a", "b"])
+    assert not cache.discard(["a", "b"])
+    assert (cache.info().nbytes, cache.info().nodes) == (0, 0)
+
+
+def test_empty_prompt_is_rejected():
+    with pytest.raises(ValueError):
+        PromptCache().put([], "value")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = PromptCache(path=path)
+    cache.put(_segments("a"), {"refined": "A"})
+    cache.put(_segments("b"), "B")
+    cache.get(_segments("a"))
+    cache.save()
+    assert not cache.dirty
+
+    reloaded = PromptCache(max_bytes=10_000, path=path)
+
+    assert reloaded.get(_segments("a")) == {"refined": "A"}
+    assert reloaded.info().nodes == cache.info().nodes
+    # LRU order survives: "b" is the oldest and goes first.
+    reloaded.max_bytes = reloaded.info().nbytes - 1
+    reloaded.put(_segments("a"), {"refined": "A"})
+    assert _segments("b") not in reloaded
+
+
+def test_unreadable_files_are_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{broken", encoding="utf-8")
+    assert len(PromptCache(path=path)) == 0
+
+    path.write_text(json.dumps({"version": 99, "nodes": [], "entries": []}), encoding="utf-8")
+    assert len(PromptCache(path=path)) == 0
+
+
+def test_role_segments_use_persona_system_prompts_and_rules():
+    agent = SimpleNamespace(persona=PERSONA, prompts=[{"prompt": "System."}, {"persona": PERSONA}], rules=("Rule.",))
+
+    assert prompt_cache.role_segments(agent, "hi") == [
+        json.dumps(PERSONA, sort_keys=True), "System.", "Rule.", "hi",
+    ]
+
+
+def test_prompt_cache_tool(monkeypatch):
+    from tools.core_logic import prompt_cache as tool
+
+    monkeypatch.setenv("AI_SANDBOX_PROMPT_CACHE", "off")
+    monkeypatch.setattr(prompt_cache, "_DEFAULT", None)
+
+    assert tool("put", "hello", value="Hello!", persona=PERSONA)["status"] == "success"
+    assert tool("get", "hello", persona=PERSONA) == {"status": "success", "hit": True, "value": "Hello!"}
+    assert tool("prefix", "hello again", persona=PERSONA)["depth"] == 0
+    assert tool("stats")["stats"]["entries"] == 1
+    assert tool("save")["status"] == "error"
+    assert tool("get")["status"] == "error"
+    assert tool("bogus", "x")["status"] == "error"
@@ -0,0 +1,178 @@
+"""Tests for compiled role prompts and dependency tracking in prompt_compiler.py."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import prompt_compiler
+from loader import LoaderError
+from prompt_compiler import PromptCompileError, PromptCompiler, estimate_tokens
+
+
+@pytest.fixture
+def tree(spec_tree, monkeypatch):
+    monkeypatch.setattr(prompt_compiler, "BASE_PATH", spec_tree)
+    _write(spec_tree / "_common" / "standard.md", "Be kind.\n")
+    _write(spec_tree / "template" / "agent.md", "Toolkit {{not_a_slot}} text.\n")
+    _write(spec_tree / "prompt" / "coder.yaml",
+           'prompt: "Write tests first."\npersona:\n  role: "Senior engineer"\n  tone: "Direct"\n')
+    _write(spec_tree / "rule" / "shared.md", "Never push to main.\n")
+    _write(spec_tree / "rule" / "coder.md", "Run the linter. ${HOME}\n")
+    _write(spec_tree / "tool" / "fs" / "read_file.yaml", 'name: "read_file"\ndescription: "Read a file."\n')
+    _role(spec_tree, "coder", prompts=["coder.yaml"], rules=["shared.md", "coder.md"], tools=["fs/read_file.yaml"])
+    _role(spec_tree, "planner", rules=["shared.md"])
+    return spec_tree
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _edit(path, text):
+    mtime = path.stat().st_mtime_ns + 1_000_000_000
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+def _role(tree, name, prompts=(), rules=(), tools=()):
+    def block(kind, entries, folder):
+        if not entries:
+            return f"  {kind}: []\n"
+        return f"  {kind}:\n" + "".join(f'    - "../../{folder}/{entry}"\n' for entry in entries)
+
+    text = (f'name: "{name}"\ndescription: "The {name} role."\nimports:\n'
+            + block("prompts", prompts, "prompt") + block("rules", rules, "rule") + block("tools", tools, "tool"))
+    return _write(tree / "role" / name / "role.yaml", text)
+
+
+def _compiler(tree, **options):
+    options.setdefault("template_path", tree / "template" / "agent.md")
+    options.setdefault("common_rules", [tree / "_common" / "standard.md"])
+    options.setdefault("check_interval", 3600)
+    return PromptCompiler(**options)
+
+
+def test_default_layout_assembles_every_section(tree):
+    text = _compiler(tree).render("coder", "Fix the bug.")
+
+    for expected in ("# coder", "The coder role.", "Senior engineer", "Direct", "Write tests first.",
+                     "Be kind.", "Never push to main.", "- read_file: Read a file.", "## Request\nFix the bug."):
+        assert expected in text
+    assert text.index("Be kind.") < text.index("Never push to main.") < text.index("Run the linter.")
+
+
+def test_placeholders_in_imported_files_are_copied_verbatim(tree):
+    text = _compiler(tree).render("coder", "{{role.name}}")
+    assert "Toolkit {{not_a_slot}} text." in text
+    assert "${HOME}" in text
+    assert text.endswith("{{role.name}}\n")
+
+
+def test_unknown_layout_placeholder_is_rejected():
+    with pytest.raises(PromptCompileError, match="nope"):
+        PromptCompiler(layout="{{ nope }}")
+
+
+def test_custom_layout_with_several_runtime_slots(tree):
+    compiler = _compiler(tree, layout="[{{ role.name }}] {{user_prompt}} / {{user_prompt}}")
+    compiled = compiler.get("coder")
+    assert compiled.chunks == ("[coder] ", "user_prompt", " / ", "user_prompt", "")
+    assert compiled.render("hi") == "[coder] hi / hi"
+    assert all(section.name != "template" for section in compiled.sections)
+
+
+def test_compiled_prompt_is_cached_and_sized(tree):
+    compiler = _compiler(tree)
+    first = compiler.get("coder")
+    assert compiler.get("coder") is first
+    assert (compiler.compiles, compiler.hits) == (1, 1)
+    assert first.static_bytes == len("".join(first.chunks[::2]).encode("utf-8"))
+    names = [section.name for section in first.sections]
+    assert "rule:rule/shared.md" in names and "tools" in names and "layout" in names
+
+
+def test_dependencies_and_dependents(tree):
+    compiler = _compiler(tree)
+    compiler.get("coder")
+    compiler.get("planner")
+    shared = tree / "rule" / "shared.md"
+
+    assert compiler.dependents(shared) == ["coder", "planner"]
+    assert compiler.dependents(tree / "rule" / "coder.md") == ["coder"]
+    assert compiler.dependents(tree / "_common" / "standard.md") == ["coder", "planner"]
+    assert (tree / "role" / "coder" / "role.yaml").resolve() in compiler.dependencies("coder")
+
+
+def test_refresh_rebuilds_only_roles_using_the_changed_file(tree):
+    compiler = _compiler(tree)
+    coder, planner = compiler.get("coder"), compiler.get("planner")
+
+    _edit(tree / "rule" / "coder.md", "Run the formatter.\n")
+    assert compiler.refresh() == ["coder"]
+    assert compiler.get("planner") is planner
+    assert "Run the formatter." in compiler.render("coder")
+    assert compiler.get("coder") is not coder
+
+    _edit(tree / "rule" / "shared.md", "Open a pull request.\n")
+    assert compiler.refresh() == ["coder", "planner"]
+    assert compiler.refresh() == []
+
+
+def test_get_checks_for_edits_after_the_interval(tree):
+    compiler = _compiler(tree, check_interval=0)
+    assert "Be kind." in compiler.render("planner")
+    _edit(tree / "_common" / "standard.md", "Be brief.\n")
+    assert "Be brief." in compiler.render("planner")
+
+
+def test_removed_import_updates_the_dependency_map(tree):
+    compiler = _compiler(tree)
+    compiler.get("coder")
+    role_file = tree / "role" / "coder" / "role.yaml"
+    _edit(role_file, role_file.read_text(encoding="utf-8").replace('    - "../../rule/coder.md"\n', ""))
+
+    assert compiler.refresh() == ["coder"]
+    assert "Run the linter." not in compiler.render("coder")
+    assert compiler.dependents(tree / "rule" / "coder.md") == []
+
+
+def test_role_that_breaks_is_dropped_until_fixed(tree):
+    compiler = _compiler(tree)
+    compiler.get("coder")
+    rule = tree / "rule" / "coder.md"
+    rule.unlink()
+
+    assert compiler.refresh() == []
+    with pytest.raises(LoaderError, match="Missing import"):
+        compiler.get("coder")
+    _write(rule, "Back again.\n")
+    assert "Back again." in compiler.render("coder")
+
+
+def test_unknown_role_raises(tree):
+    with pytest.raises(LoaderError):
+        _compiler(tree).get("ghost")
+    with pytest.raises(LoaderError):
+        _compiler(tree).get("../coder")
+
+
+def test_compile_all_and_cli(tree, monkeypatch, capsys):
+    compiler = _compiler(tree)
+    assert sorted(compiler.compile_all()) == ["coder", "planner"]
+
+    monkeypatch.setattr(prompt_compiler, "_DEFAULT", compiler)
+    assert prompt_compiler.main(["planner"]) == 0
+    assert capsys.readouterr().out.startswith("planner: ")
+    assert prompt_compiler.main(["coder", "--render", "Question?"]) == 0
+    assert "## Request\nQuestion?" in capsys.readouterr().out
+    assert prompt_compiler.main(["ghost"]) == 1
+
+
+def test_estimate_tokens_counts_pieces():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello") == 2  # "hell" + "o"
+    assert estimate_tokens("12345, ok") == 4  # "123" "45" "," "ok"
+    assert estimate_tokens("ภาษา") == 4
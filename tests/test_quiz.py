@@ -0,0 +1,161 @@
+"""Tests for quiz generation and answer scoring in tools/quiz.py."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from tools import quiz
+from tools.core_logic import evaluate_answer, generate_quiz
+from tools.quiz import QuizError, evaluate_answers, generate_quizzes, question_bank
+
+BANK = """
+questions:
+  - id: "q1"
+    topic: "Python"
+    difficulty: 1
+    question: "List or tuple?"
+    answer: "A list is mutable while a tuple is immutable and hashable."
+    keywords: ["mutable", "immutable", "hashable"]
+  - id: "q2"
+    topic: "python"
+    difficulty: 2
+    question: "What is a generator?"
+    answer: "A generator uses yield to produce values lazily and saves memory."
+    keywords: ["yield", "lazily", "memory"]
+  - id: "q3"
+    topic: "python"
+    difficulty: 2
+    question: "What does with do?"
+    answer: "The with statement uses a context manager for cleanup."
+    keywords: ["context manager", "cleanup"]
+  - id: "q4"
+    topic: "sql"
+    difficulty: 1
+    question: "What is an index?"
+    answer: "An index speeds up lookups on a column."
+    keywords: ["lookup", "column"]
+"""
+
+
+@pytest.fixture
+def bank_file(tmp_path, monkeypatch):
+    path = tmp_path / "bank.yaml"
+    path.write_text(BANK, encoding="utf-8")
+    monkeypatch.setenv("AI_SANDBOX_QUESTION_BANK", str(path))
+    monkeypatch.setattr(quiz, "_BANK", None)
+    return path
+
+
+def _ids(entry):
+    return [question["id"] for question in entry["quiz"]]
+
+
+def test_string_difficulty_and_count_are_coerced(bank_file):
+    [entry] = generate_quizzes([{"learner_id": "a", "topic": "python", "count": "5", "difficulty": "2"}])
+    assert _ids(entry) == ["q2", "q3"]
+    [entry] = generate_quizzes([{"learner_id": "a", "count": " 1 ", "difficulty": 2.0}])
+    assert len(entry["quiz"]) == 1 and entry["quiz"][0]["difficulty"] == 2
+
+
+def test_blank_difficulty_and_topic_mean_any(bank_file):
+    [entry] = generate_quizzes([{"learner_id": "a", "count": 10, "difficulty": "", "topic": None}])
+    assert _ids(entry) == ["q1", "q2", "q3", "q4"]
+
+
+@pytest.mark.parametrize(
+    "request_, message",
+    [
+        ({"count": "many"}, "'count' must be a whole number"),
+        ({"count": None}, "'count' must be a whole number"),
+        ({"count": 2.5}, "'count' must be a whole number"),
+        ({"count": True}, "'count' must be a whole number"),
+        ({"count": -1}, "'count' must not be negative"),
+        ({"difficulty": "hard"}, "'difficulty' must be a whole number"),
+        ({"difficulty": [2]}, "'difficulty' must be a whole number"),
+    ],
+)
+def test_malformed_requests_raise_quiz_error_naming_the_learner(bank_file, request_, message):
+    with pytest.raises(QuizError, match=f"Learner 'bob': {message}"):
+        generate_quizzes([{"learner_id": "ok", "count": 1}, dict(request_, learner_id="bob")])
+
+
+def test_non_mapping_request_is_rejected(bank_file):
+    with pytest.raises(QuizError):
+        generate_quizzes(["python"])
+
+
+def test_selection_is_deterministic_per_seed_and_learner(bank_file):
+    requests = [{"learner_id": name, "count": 2} for name in ("a", "b", "c", "d", "e")]
+    first = generate_quizzes(requests, seed=7)
+    assert generate_quizzes(requests, seed=7) == first
+    assert generate_quizzes(list(reversed(requests)), seed=7) == list(reversed(first))
+    assert len({tuple(_ids(entry)) for entry in first}) > 1
+
+
+def test_topic_lookup_ignores_case(bank_file):
+    [entry] = generate_quizzes([{"topic": "PYTHON", "count": 10, "difficulty": 1}])
+    assert _ids(entry) == ["q1"]
+    [entry] = generate_quizzes([{"topic": "unknown", "count": 3}])
+    assert entry["quiz"] == []
+
+
+def test_evaluate_scores_rubric_and_similarity(bank_file):
+    results = evaluate_answers(
+        [
+            {"learner_id": "a", "question_id": "q1", "answer": "A list is mutable, a tuple is immutable and hashable."},
+            {"learner_id": "b", "question_id": "q1", "answer": "Lists are mutable."},
+            {"learner_id": "c", "question_id": "q2", "answer": "No idea."},
+        ]
+    )
+    assert [result["learner_id"] for result in results] == ["a", "b", "c"]
+    assert results[0]["verdict"] == "correct" and results[0]["missing_keywords"] == []
+    assert results[1]["matched_keywords"] == ["mutable"]
+    assert results[1]["missing_keywords"] == ["immutable", "hashable"]
+    assert "immutable" in results[1]["feedback"]
+    assert results[2]["verdict"] == "incorrect" and results[2]["keyword_coverage"] == 0.0
+
+
+def test_multiword_keywords_need_every_word(bank_file):
+    partial, full = evaluate_answers(
+        [
+            {"question_id": "q3", "answer": "It calls a manager."},
+            {"question_id": "q3", "answer": "It uses a context manager."},
+        ]
+    )
+    assert "context manager" not in partial["matched_keywords"]
+    assert "context manager" in full["matched_keywords"]
+
+
+def test_unknown_question_id_raises(bank_file):
+    with pytest.raises(QuizError, match="nope"):
+        evaluate_answers([{"question_id": "nope", "answer": "x"}])
+    assert evaluate_answers([]) == []
+
+
+def test_bank_is_reloaded_only_when_the_file_changes(bank_file):
+    bank = question_bank()
+    assert question_bank() is bank
+    bank_file.write_text(BANK.replace('"q4"', '"q5"'), encoding="utf-8")
+    stat = bank_file.stat()
+    os.utime(bank_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    reloaded = question_bank()
+    assert reloaded is not bank and "q5" in reloaded.position
+
+
+def test_malformed_bank_raises(bank_file):
+    bank_file.write_text('questions:\n  - id: "x"\n    difficulty: "hard"\n    question: "?"\n', encoding="utf-8")
+    with pytest.raises(QuizError, match="Malformed question"):
+        question_bank()
+    bank_file.write_text("questions: []\n", encoding="utf-8")
+    with pytest.raises(QuizError, match="empty"):
+        question_bank()
+
+
+def test_tool_wrappers_report_errors(bank_file):
+    assert generate_quiz(topic="python", count="2", difficulty="2")["quiz"]
+    assert generate_quiz(count="many")["status"] == "error"
+    batch = generate_quiz(learners=[{"learner_id": "a", "count": 1}])
+    assert batch["status"] == "success" and len(batch["quizzes"]) == 1
+    assert evaluate_answer(question_id="nope", answer="x")["status"] == "error"
+    assert evaluate_answer(question_id="q4", answer="an index on a column speeds lookups")["status"] == "success"
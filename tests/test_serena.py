@@ -0,0 +1,168 @@
+"""``tools.serena`` sessions against ``scripts/fake_serena.py``."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+import threading
+
+import pytest
+
+from conftest import ROOT
+from tools import serena
+
+FAKE_SERENA = ROOT / "scripts" / "fake_serena.py"
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    (tmp_path / "module.py").write_text("def target():\n    pass\n\n\nclass Other:\n    pass\n", encoding="utf-8")
+    monkeypatch.setenv("SERENA_EXECUTABLE", str(FAKE_SERENA))
+    monkeypatch.setenv("SERENA_WORKSPACE", str(tmp_path))
+    monkeypatch.delenv("SERENA_SESSION", raising=False)
+    monkeypatch.delenv("FAKE_SERENA_NO_SESSION", raising=False)
+    serena.shutdown_sessions()
+    yield tmp_path
+    serena.shutdown_sessions()
+
+
+def _symbols(output):
+    return [(match["name"], match["file"], match["line"]) for match in json.loads(output)]
+
+
+def test_calls_reuse_one_session(workspace):
+    assert _symbols(serena.find_symbol("target")) == [("target", "module.py", 1)]
+    session = serena.get_session()
+
+    assert _symbols(serena.find_symbol("Other")) == [("Other", "module.py", 5)]
+    assert serena.get_session() is session
+    assert session.alive and session.workspace == str(workspace)
+
+
+def test_requests_are_multiplexed_by_id(workspace):
+    session = serena.get_session()
+
+    slow = session.submit("sleep", ["1"])
+    fast = session.submit("ping", [])
+
+    assert fast.result(timeout=5) == "pong"
+    assert not slow.done()
+    assert slow.result(timeout=5) == ""
+
+
+def test_concurrent_callers_share_the_session(workspace):
+    serena.find_symbol("target")
+    results = []
+
+    def call():
+        results.append(_symbols(serena.find_symbol("target")))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [[("target", "module.py", 1)]] * 8
+
+
+def test_crashed_session_fails_pending_requests_and_restarts(workspace):
+    session = serena.get_session()
+    pending = session.submit("sleep", ["5"])
+
+    with pytest.raises(serena.SerenaError, match="crash requested"):
+        session.request("crash", [], timeout=5)
+    with pytest.raises(serena.SerenaError, match="session exited"):
+        pending.result(timeout=5)
+    assert not session.alive
+
+    assert _symbols(serena.find_symbol("target")) == [("target", "module.py", 1)]
+    replacement = serena.get_session()
+    assert replacement is not session and replacement.pid != session.pid
+
+
+def test_timed_out_session_is_replaced(workspace):
+    session = serena.get_session()
+
+    with pytest.raises(serena.SerenaError, match="timed out"):
+        session.request("sleep", ["5"], timeout=0.2)
+
+    assert not session.alive
+    assert serena.get_session() is not session
+
+
+def test_command_errors_are_reported(workspace):
+    with pytest.raises(serena.SerenaError, match="symbol not found"):
+        serena.insert_after_symbol("missing", "pass")
+
+
+def test_falls_back_to_one_shot_processes(workspace, monkeypatch):
+    monkeypatch.setenv("FAKE_SERENA_NO_SESSION", "1")
+
+    assert serena.get_session() is None
+    assert _symbols(serena.find_symbol("target")) == [("target", "module.py", 1)]
+
+    started = []
+    monkeypatch.setattr(serena, "_start_session", lambda *args: started.append(args))
+    serena.find_symbol("target")
+    assert started == []
+
+
+def test_session_disabled_uses_one_shot_processes(workspace, monkeypatch):
+    monkeypatch.setenv("SERENA_SESSION", "0")
+
+    assert _symbols(serena.find_symbol("Other")) == [("Other", "module.py", 5)]
+    assert serena.get_session() is None
+
+
+def test_async_calls_use_the_session(workspace):
+    async def main():
+        return await asyncio.gather(*(serena.find_symbol_async("target") for _ in range(4)))
+
+    outputs = asyncio.run(main())
+
+    assert [_symbols(output) for output in outputs] == [[("target", "module.py", 1)]] * 4
+    assert serena.get_session() is not None
+
+
+def test_health_check_drops_dead_sessions(workspace):
+    session = serena.get_session()
+    assert serena.health_check() == {str(workspace): True}
+
+    session.close()
+
+    assert serena.health_check() == {str(workspace): False}
+
+
+def test_missing_executable_lookup_is_cached(workspace, monkeypatch):
+    monkeypatch.setenv("SERENA_EXECUTABLE", "serena-not-installed")
+    lookups = []
+    real_which = shutil.which
+
+    def which(name):
+        lookups.append(name)
+        return real_which(name)
+
+    monkeypatch.setattr(serena.shutil, "which", which)
+    for _ in range(3):
+        with pytest.raises(serena.SerenaError, match="not available"):
+            serena._resolve_serena_command()
+    assert lookups == ["serena-not-installed"]
+
+    monkeypatch.setenv("SERENA_EXECUTABLE", str(FAKE_SERENA))
+    assert serena._resolve_serena_command() == str(FAKE_SERENA)
+    assert lookups == ["serena-not-installed", str(FAKE_SERENA)]
+
+
+def test_missing_executable_is_looked_up_again_after_the_retry_interval(workspace, monkeypatch):
+    monkeypatch.setenv("SERENA_EXECUTABLE", "serena-not-installed")
+    monkeypatch.setattr(serena, "SESSION_RETRY_AFTER", 0.0)
+    lookups = []
+    monkeypatch.setattr(serena.shutil, "which", lambda name: lookups.append(name))
+
+    for _ in range(2):
+        with pytest.raises(serena.SerenaError):
+            serena._resolve_serena_command()
+
+    assert len(lookups) == 2
@@ -0,0 +1,184 @@
+"""``tool_cache``: keys, file checks, invalidation and both backends."""
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+import tool_cache
+from tool_cache import MISS, CachePolicy, MemoryBackend, SqliteBackend, ToolCache
+
+READ = CachePolicy(enabled=True, files=True)
+WRITE = CachePolicy(invalidates=("read",))
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setenv("SERENA_WORKSPACE", str(tmp_path))
+    (tmp_path / "a.py").write_text("A = 1\n", encoding="utf-8")
+    (tmp_path / "b.py").write_text("B = 2\n", encoding="utf-8")
+    return tmp_path
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        yield ToolCache(MemoryBackend(max_entries=4))
+    else:
+        backend = SqliteBackend(tmp_path / "cache.sqlite3", max_entries=4)
+        yield ToolCache(backend)
+        backend.close()
+
+
+def _call(cache, name, args, policy, compute, kwargs=None):
+    """Mimic ``tool_map.call_tool``: serve a hit or compute and store."""
+
+    kwargs = kwargs or {}
+    key, value = cache.lookup(name, args, kwargs, policy)
+    if value is not MISS:
+        return value
+    result = compute()
+    if key is not None:
+        cache.store(key, name, args, result, policy, kwargs)
+    if policy.invalidates:
+        cache.after_call(name, args, result, policy, kwargs)
+    return result
+
+
+def _edit(path, text):
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_identical_calls_hit(workspace, cache):
+    policy = CachePolicy(enabled=True)
+    calls = []
+
+    for _ in range(3):
+        assert _call(cache, "t", ("x",), policy, lambda: calls.append(1) or {"n": 1}) == {"n": 1}
+
+    assert len(calls) == 1
+    assert (cache.info().hits, cache.info().misses) == (2, 1)
+
+
+def test_disabled_policy_is_never_cached(workspace, cache):
+    assert cache.lookup("t", ("x",), {}, CachePolicy()) == (None, MISS)
+
+
+def test_hits_are_copies(workspace):
+    cache = ToolCache(MemoryBackend())
+    policy = CachePolicy(enabled=True)
+    _call(cache, "t", (), policy, lambda: {"items": [1]})
+
+    first = _call(cache, "t", (), policy, lambda: None)
+    first["items"].append(2)
+
+    assert _call(cache, "t", (), policy, lambda: None) == {"items": [1]}
+
+
+def test_ttl_expires_entries(workspace, cache, monkeypatch):
+    policy = CachePolicy(enabled=True, ttl_seconds=10)
+    _call(cache, "t", (), policy, lambda: "old")
+    now = time.time()
+    monkeypatch.setattr(tool_cache.time, "time", lambda: now + 11)
+
+    assert _call(cache, "t", (), policy, lambda: "new") == "new"
+
+
+def test_lru_evicts_past_max_entries(workspace, cache):
+    policy = CachePolicy(enabled=True)
+    for number in range(6):
+        _call(cache, "t", (number,), policy, lambda number=number: number)
+
+    info = cache.info()
+    assert (info.currsize, info.evictions) == (4, 2)
+
+
+def test_edit_to_a_file_argument_is_a_miss(workspace, cache):
+    _call(cache, "read", ("a.py",), READ, lambda: "A = 1")
+    _edit(workspace / "a.py", "A = 10\n")
+
+    assert _call(cache, "read", ("a.py",), READ, lambda: "A = 10") == "A = 10"
+
+
+def test_symbol_lookup_sees_external_edits_of_the_resolved_file(workspace, cache):
+    calls = []
+
+    def read_symbol():
+        calls.append(1)
+        return {"status": "success", "path": "a.py", "code": (workspace / "a.py").read_text(encoding="utf-8")}
+
+    kwargs = {"symbol": "A"}
+    assert _call(cache, "read", (), READ, read_symbol, kwargs)["code"] == "A = 1\n"
+    assert _call(cache, "read", (), READ, read_symbol, kwargs)["code"] == "A = 1\n"
+    assert len(calls) == 1
+
+    _edit(workspace / "a.py", "A = 100\n")
+
+    assert _call(cache, "read", (), READ, read_symbol, kwargs)["code"] == "A = 100\n"
+    assert len(calls) == 2
+
+
+def test_deleted_result_file_is_a_miss(workspace, cache):
+    _call(cache, "read", (), READ, lambda: {"path": "b.py"}, {"symbol": "B"})
+    (workspace / "b.py").unlink()
+
+    assert cache.lookup("read", (), {"symbol": "B"}, READ)[1] is MISS
+
+
+def test_writes_drop_only_entries_for_the_touched_file(workspace, cache):
+    _call(cache, "read", ("a.py",), READ, lambda: "A")
+    _call(cache, "read", ("b.py",), READ, lambda: "B")
+
+    _call(cache, "write", ("a.py", "A = 3\n"), WRITE, lambda: {"status": "success"})
+
+    assert cache.lookup("read", ("a.py",), {}, READ)[1] is MISS
+    assert cache.lookup("read", ("b.py",), {}, READ)[1] == "B"
+    assert cache.info().invalidations == 1
+
+
+def test_entries_naming_no_file_are_dropped_by_any_write(workspace, cache):
+    policy = CachePolicy(enabled=True)
+    _call(cache, "read", ("missing-symbol",), policy, lambda: {"status": "error"})
+
+    _call(cache, "write", ("a.py",), WRITE, lambda: None)
+
+    assert cache.lookup("read", ("missing-symbol",), {}, policy)[1] is MISS
+
+
+def test_invalidate_actions_limit_which_calls_invalidate(workspace, cache):
+    manager = CachePolicy(invalidates=("read",), invalidate_actions=("upload", "delete"))
+    _call(cache, "read", ("a.py",), READ, lambda: "A")
+
+    _call(cache, "manager", ("download", "a.py"), manager, lambda: None)
+    assert cache.lookup("read", ("a.py",), {}, READ)[1] == "A"
+
+    _call(cache, "manager", (), manager, lambda: None, {"action": "delete", "path": "a.py"})
+    assert cache.lookup("read", ("a.py",), {}, READ)[1] is MISS
+
+
+def test_sqlite_entries_survive_reopening(workspace, tmp_path):
+    path = tmp_path / "shared.sqlite3"
+    policy = CachePolicy(enabled=True)
+    first = SqliteBackend(path)
+    _call(ToolCache(first), "t", ("x",), policy, lambda: {"n": 1})
+    first.close()
+
+    second = SqliteBackend(path)
+    try:
+        assert ToolCache(second).lookup("t", ("x",), {}, policy)[1] == {"n": 1}
+        _call(ToolCache(second), "t", ("set",), policy, lambda: {1, 2})
+        assert len(second) == 1
+    finally:
+        second.close()
+
+
+def test_repository_policies():
+    read_code = tool_cache.cache_policy("read_code")
+    assert read_code.enabled and read_code.files and read_code.workspace
+    assert "read_code" in tool_cache.cache_policy("write_file").invalidates
+    assert tool_cache.cache_policy("file_manager").invalidate_actions == ("upload", "delete")
+    assert tool_cache.cache_policy("no_such_tool") == CachePolicy()
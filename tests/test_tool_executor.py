@@ -0,0 +1,174 @@
+"""Async and batched dispatch in ``tool_executor``."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import tool_executor
+from loader import LoaderError
+
+
+def _pid():
+    return os.getpid()
+
+
+def _square(value):
+    return value * value
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    """Replace the registry and specs with the ``(functions, specs)`` dicts returned."""
+
+    functions, specs = {}, {}
+
+    def load_tool(name):
+        try:
+            return specs[name]
+        except KeyError:
+            raise LoaderError(name) from None
+
+    monkeypatch.setattr(tool_executor, "TOOL_MAP", functions)
+    monkeypatch.setattr(tool_executor, "ASYNC_TOOL_MAP", {})
+    monkeypatch.setattr(tool_executor, "load_tool", load_tool)
+    monkeypatch.setattr(tool_executor.tool_cache, "get_tool_cache", lambda: None)
+    yield functions, specs
+    tool_executor.shutdown_executor()
+
+
+def _policy(**policy):
+    return {"execution_policy": policy}
+
+
+def test_python_tools_run_in_this_process(tools):
+    functions, _ = tools
+    functions["pid"] = _pid
+
+    assert asyncio.run(tool_executor.run_tool_async("pid")) == os.getpid()
+
+
+def test_process_executor_runs_in_a_worker(tools):
+    functions, specs = tools
+    functions["pid"] = _pid
+    functions["square"] = _square
+    specs["pid"] = specs["square"] = _policy(executor="process")
+
+    assert asyncio.run(tool_executor.run_tool_async("pid")) != os.getpid()
+    assert tool_executor.run_tools([("square", (7,))]) == [49]
+
+
+def test_timeout_raises_and_keeps_the_slot_until_the_job_exits(tools):
+    functions, specs = tools
+    release = threading.Event()
+    started = []
+
+    def gate(number):
+        started.append(number)
+        if number == 1:
+            release.wait(5)
+        return number
+
+    functions["gate"] = gate
+    specs["gate"] = _policy(max_concurrency=1, timeout_seconds=0.1)
+
+    async def main():
+        with pytest.raises(tool_executor.ToolTimeoutError, match="timed out after 0.1 seconds"):
+            await tool_executor.run_tool_async("gate", (1,))
+        second = asyncio.create_task(tool_executor.run_tool_async("gate", (2,), timeout=5))
+        await asyncio.sleep(0.3)
+        assert started == [1]
+        release.set()
+        return await second
+
+    assert asyncio.run(main()) == 2
+    assert started == [1, 2]
+
+
+def test_max_concurrency_bounds_parallel_calls(tools):
+    functions, specs = tools
+    lock = threading.Lock()
+    running = [0, 0]  # current, peak
+
+    def work():
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return True
+
+    functions["work"] = work
+    specs["work"] = _policy(max_concurrency=2)
+
+    assert tool_executor.run_tools(["work"] * 8) == [True] * 8
+    assert running[1] == 2
+
+
+def test_batch_returns_results_and_errors_in_order(tools):
+    functions, _ = tools
+    functions["square"] = _square
+
+    def fail():
+        raise ValueError("boom")
+
+    functions["fail"] = fail
+
+    results = tool_executor.run_tools([("square", (3,)), "fail", tool_executor.ToolCall("square", (4,))])
+
+    assert results[0] == 9 and results[2] == 16
+    assert isinstance(results[1], ValueError)
+    with pytest.raises(ValueError):
+        tool_executor.run_tools(["fail"], return_exceptions=False)
+
+
+def test_unknown_tool_is_an_execution_error(tools):
+    with pytest.raises(tool_executor.ToolExecutionError, match="no implementation"):
+        asyncio.run(tool_executor.run_tool_async("missing"))
+
+
+def test_cli_tools_run_their_command(tools):
+    _, specs = tools
+    script = "import sys; print(sys.argv[1]); sys.exit(int(sys.argv[2]))"
+    specs["cli"] = {"execution_environment": {"type": "cli", "command": f"{sys.executable} -c '{script}'"}}
+
+    assert asyncio.run(tool_executor.run_tool_async("cli", ("hello", 0))) == "hello\n"
+    with pytest.raises(tool_executor.ToolExecutionError, match="exit status 3"):
+        asyncio.run(tool_executor.run_tool_async("cli", ("hello", 3)))
+
+
+def test_cli_timeout_kills_the_child(tools, tmp_path):
+    _, specs = tools
+    marker = tmp_path / "finished"
+    script = f"import time; time.sleep(2); open({str(marker)!r}, 'w').close()"
+    specs["cli"] = {
+        "execution_environment": {"type": "cli", "command": f"{sys.executable} -c \"{script}\""},
+        "execution_policy": {"timeout_seconds": 0.3},
+    }
+
+    with pytest.raises(tool_executor.ToolTimeoutError):
+        asyncio.run(tool_executor.run_tool_async("cli"))
+    time.sleep(2.5)
+    assert not marker.exists()
+
+
+def test_policy_defaults_and_invalid_values(tools):
+    _, specs = tools
+    specs["odd"] = {
+        "execution_environment": {"type": "cli", "command": "$COMMAND"},
+        "execution_policy": {"max_concurrency": True, "timeout_seconds": -1, "executor": "gpu"},
+    }
+
+    assert tool_executor.tool_policy("missing") == tool_executor.ToolPolicy(environment="python")
+    assert tool_executor.tool_policy("odd") == tool_executor.ToolPolicy(environment="cli")
+
+
+def test_repository_specs_choose_their_executor():
+    assert tool_executor.tool_policy("generate_quiz").executor == "process"
+    assert tool_executor.tool_policy("memory_store").executor == "thread"
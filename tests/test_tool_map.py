@@ -0,0 +1,166 @@
+"""Tests for the lazy tool registry in tool_map.py."""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import tool_map
+from conftest import ROOT
+from loader import LoaderError
+from tool_map import LazyToolRegistry
+
+LABTOOLS = '''
+CALLS = []
+
+def alpha(*args):
+    return ("alpha", args)
+
+def beta(*args):
+    return ("beta", args)
+'''
+
+
+@pytest.fixture
+def lab(spec_tree, tmp_path, monkeypatch):
+    """A spec tree plus an importable ``labtools`` package that specs may target."""
+
+    package = tmp_path / "pkgs" / "labtools"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text(LABTOOLS, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path / "pkgs"))
+    monkeypatch.setenv("AI_SANDBOX_TOOL_PACKAGES", "labtools")
+    monkeypatch.delitem(sys.modules, "labtools", raising=False)
+    (spec_tree / "tool" / "lab").mkdir()
+    return spec_tree
+
+
+def _spec(tree, name, target=None):
+    path = tree / "tool" / "lab" / f"{name}.yaml"
+    environment = f'execution_environment:\n  type: "python"\n  target: "{target}"\n' if target else ""
+    path.write_text(f'name: "{name}"\ndescription: "test tool"\n{environment}', encoding="utf-8")
+    return path
+
+
+def _edit(path, text):
+    mtime = path.stat().st_mtime_ns
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+
+
+def test_importing_tool_map_imports_no_tool_modules():
+    script = textwrap.dedent(
+        """
+        import sys
+        import tool_map
+        print(sorted(m for m in sys.modules if m == "tools" or m.startswith("tools.")))
+        tool_map.TOOL_MAP["read_file"]
+        print(sorted(m for m in sys.modules if m.startswith("tools.")))
+        print(tool_map.TOOL_MAP.loaded())
+        """
+    )
+    env = dict(os.environ, AI_SANDBOX_SNAPSHOT="off")
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    assert output[0] == "[]"
+    assert "'tools.standard_tools'" in output[1] and "tools.serena" not in output[1]
+    assert output[2] == "['read_file']"
+
+
+def test_entry_points_resolve_on_first_lookup(lab):
+    registry = LazyToolRegistry({"alpha_tool": "labtools:alpha"})
+    assert "labtools" not in sys.modules
+    assert registry.target("alpha_tool") == "labtools:alpha"
+    assert registry.loaded() == [] and "labtools" not in sys.modules
+
+    assert registry["alpha_tool"]("x") == ("alpha", ("x",))
+    assert registry.loaded() == ["alpha_tool"]
+    assert registry["alpha_tool"] is registry["alpha_tool"]
+
+
+def test_unknown_names_raise_key_error(lab):
+    registry = LazyToolRegistry({})
+    assert "nope" not in registry
+    assert registry.get("nope") is None
+    with pytest.raises(KeyError):
+        registry["nope"]
+
+
+def test_spec_target_overrides_and_adds_tools(lab):
+    _spec(lab, "alpha_tool", "labtools:beta")
+    _spec(lab, "yaml_only", "labtools:alpha")
+    _spec(lab, "plain")
+    registry = LazyToolRegistry({"alpha_tool": "labtools:alpha", "plain": "labtools:alpha"})
+
+    assert registry["alpha_tool"]()[0] == "beta"
+    assert registry["yaml_only"]()[0] == "alpha"
+    assert registry["plain"]()[0] == "alpha"  # no target in the spec: entry point
+    assert sorted(registry) == ["alpha_tool", "plain", "yaml_only"]
+    assert len(registry) == 3
+
+
+def test_spec_target_is_reread_when_the_spec_changes(lab):
+    path = _spec(lab, "switch", "labtools:alpha")
+    registry = LazyToolRegistry({})
+    assert registry["switch"]()[0] == "alpha"
+
+    _edit(path, path.read_text(encoding="utf-8").replace("labtools:alpha", "labtools:beta"))
+    assert registry.target("switch") == "labtools:beta"
+    assert registry["switch"]()[0] == "beta"
+
+
+@pytest.mark.parametrize("target", ["os:system", "subprocess:run", "labtoolsx:alpha", "toolsx.evil:run"])
+def test_targets_outside_allowed_packages_are_rejected(lab, target):
+    _spec(lab, "evil", target)
+    registry = LazyToolRegistry({})
+    with pytest.raises(LoaderError, match="outside the allowed packages"):
+        registry["evil"]
+    assert "evil" not in registry
+    assert "evil" not in list(registry)
+
+
+def test_allowed_packages_come_from_the_environment(lab, monkeypatch):
+    _spec(lab, "gated", "labtools:alpha")
+    monkeypatch.delenv("AI_SANDBOX_TOOL_PACKAGES")
+    with pytest.raises(LoaderError):
+        LazyToolRegistry({})["gated"]
+    monkeypatch.setenv("AI_SANDBOX_TOOL_PACKAGES", " other , labtools ")
+    assert LazyToolRegistry({})["gated"]()[0] == "alpha"
+
+
+def test_malformed_target_falls_back_to_the_entry_point(lab):
+    _spec(lab, "odd", "not a target")
+    registry = LazyToolRegistry({"odd": "labtools:alpha"})
+    assert registry.target("odd") == "labtools:alpha"
+
+
+def test_registry_without_specs_ignores_spec_targets(lab):
+    _spec(lab, "alpha_tool", "labtools:beta")
+    registry = LazyToolRegistry({"alpha_tool": "labtools:alpha"}, use_specs=False)
+    assert registry["alpha_tool"]()[0] == "alpha"
+    assert list(registry) == ["alpha_tool"]
+
+
+def test_import_errors_propagate(lab):
+    registry = LazyToolRegistry({"broken": "labtools:missing_function", "gone": "labtools.nowhere:f"})
+    with pytest.raises(AttributeError):
+        registry["broken"]
+    with pytest.raises(ModuleNotFoundError):
+        registry["gone"]
+
+
+def test_call_tool_rejects_unregistered_tools(monkeypatch):
+    monkeypatch.setattr(tool_map, "TOOL_MAP", LazyToolRegistry({}, use_specs=False))
+    with pytest.raises(KeyError, match="not registered"):
+        tool_map.call_tool("nope")
+
+
+def test_repository_entry_points_are_importable():
+    for name, target in tool_map.ENTRY_POINTS.items():
+        module, _, function = target.partition(":")
+        assert module.startswith("tools."), name
+        assert callable(tool_map._import_target(target)), name
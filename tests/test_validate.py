@@ -0,0 +1,110 @@
+"""Schema validation in ``validate.py``."""
+
+from __future__ import annotations
+
+import json
+from xml.etree import ElementTree
+
+import pytest
+
+import loader
+import validate
+
+pytest.importorskip("jsonschema")
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def schemas():
+    return validate.load_schemas()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    _write(tmp_path / "rule" / "rules.md", "Be kind.\n")
+    _write(
+        tmp_path / "role" / "good" / "role.yaml",
+        "name: good\nversion: '1.0'\ndescription: ok\n"
+        "imports:\n  prompts: []\n  rules:\n    - ../../rule/rules.md\n  tools: []\n",
+    )
+    _write(tmp_path / "role" / "bad" / "role.yaml", "name: bad\nversion: '1.0'\n")
+    _write(
+        tmp_path / "role" / "orphan" / "role.yaml",
+        "name: orphan\nversion: '1.0'\ndescription: x\n"
+        "imports:\n  prompts: []\n  rules:\n    - ../../rule/missing.md\n  tools: []\n",
+    )
+    _write(tmp_path / "tool" / "echo.yaml", "name: echo\ndescription: Echo the input.\n")
+    _write(tmp_path / "tool" / "broken.yaml", "name: [unclosed\n")
+    return tmp_path
+
+
+def _by_name(results):
+    return {result.path.split("/")[-2] if result.kind == "role" else result.path.split("/")[-1]: result for result in results}
+
+
+def test_libyaml_loader_is_used_when_available():
+    yaml = pytest.importorskip("yaml")
+
+    expected = yaml.CSafeLoader if yaml.__with_libyaml__ else yaml.SafeLoader
+    assert loader._SAFE_LOADER is expected
+
+
+def test_discover_lists_roles_then_tools(tree):
+    tasks = validate.discover(tree)
+
+    assert [kind for _, kind in tasks] == ["role"] * 3 + ["tool"] * 2
+    assert tasks[0][0].endswith("role/bad/role.yaml")
+
+
+def test_results_report_schema_parse_and_import_errors(tree, schemas):
+    results = _by_name(validate.validate_files(validate.discover(tree), schemas, jobs=1))
+
+    assert results["good"].ok and results["echo.yaml"].ok
+    assert any("'description' is a required property" in error for error in results["bad"].errors)
+    assert results["broken.yaml"].errors[0].startswith("parse error:")
+    assert results["orphan"].errors == ["imports/rules: missing import ../../rule/missing.md"]
+    assert results["good"].deps == [str(tree / "rule" / "rules.md")]
+
+
+def test_every_violation_in_a_file_is_reported(tmp_path, schemas):
+    path = _write(tmp_path / "role" / "x" / "role.yaml", "name: 1\n")
+
+    result = validate.validate_files([(path, "role")], schemas, jobs=1)[0]
+
+    assert len(result.errors) >= 4
+
+
+def test_process_pool_matches_serial_run(tree, schemas, monkeypatch):
+    tasks = validate.discover(tree) * 4
+    serial = validate.validate_files(tasks, schemas, jobs=1)
+
+    monkeypatch.setattr(validate, "PARALLEL_THRESHOLD", 1)
+    parallel = validate.validate_files(tasks, schemas, jobs=2)
+
+    assert [(result.path, result.errors) for result in parallel] == [(result.path, result.errors) for result in serial]
+
+
+def test_reports_render(tree, schemas):
+    results = validate.validate_files(validate.discover(tree), schemas, jobs=1)
+
+    text = validate.render_text(results, tree)
+    assert "❌ role/bad/role.yaml - Validation Failed!" in text
+    assert "Found 3 errors" in text
+
+    payload = json.loads(validate.render_json(results, tree, 0.5))
+    assert (payload["files"], payload["failures"]) == (5, 3)
+    assert payload["results"][1]["deps"] == ["rule/rules.md"]
+
+    suites = ElementTree.fromstring(validate.render_junit(results, tree, 0.5))
+    assert [suite.get("failures") for suite in suites] == ["2", "1"]
+
+
+def test_repository_specs_are_valid(schemas):
+    results = validate.validate_files(validate.discover(), schemas)
+
+    assert [result.path for result in results if not result.ok] == []
@@ -0,0 +1,122 @@
+"""``validate.py --incremental`` and its hash manifest."""
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+import validate
+
+pytest.importorskip("jsonschema")
+
+ROLE = "name: {name}\nversion: '1.0'\ndescription: d\nimports:\n  prompts: []\n  rules:\n    - ../../rule/{rule}\n  tools: []\n"
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    _write(tmp_path / "rule" / "rules.md", "Be kind.\n")
+    _write(tmp_path / "role" / "tutor" / "role.yaml", ROLE.format(name="tutor", rule="rules.md"))
+    _write(tmp_path / "tool" / "echo.yaml", "name: echo\ndescription: Echo.\n")
+    _write(tmp_path / "tool" / "ping.yaml", "name: ping\ndescription: Ping.\n")
+    return tmp_path
+
+
+@pytest.fixture
+def run(tree):
+    schemas = validate.load_schemas()
+    manifest_path = tree / ".cache" / "manifest.json"
+
+    def run_once(schemas=schemas):
+        manifest = validate.Manifest(manifest_path, tree)
+        results = validate.validate_incremental(validate.discover(tree), schemas, manifest, jobs=1)
+        return {os.path.relpath(result.path, tree): result for result in results}
+
+    return run_once
+
+
+def _rewrite(path, text):
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_second_run_reuses_every_result(run):
+    first = run()
+    second = run()
+
+    assert not any(result.cached for result in first.values())
+    assert all(result.cached for result in second.values())
+    assert all(result.ok for result in second.values())
+
+
+def test_only_edited_specs_are_revalidated(tree, run):
+    run()
+    _rewrite(tree / "tool" / "echo.yaml", "name: echo\n")
+
+    results = run()
+
+    assert not results["tool/echo.yaml"].cached
+    assert results["tool/echo.yaml"].errors == ["<root>: 'description' is a required property"]
+    assert results["tool/ping.yaml"].cached
+
+
+def test_cached_failures_are_still_reported(tree, run):
+    _write(tree / "tool" / "bad.yaml", "name: bad\n")
+    run()
+
+    result = run()["tool/bad.yaml"]
+
+    assert result.cached and not result.ok
+
+
+def test_touch_without_content_change_stays_cached(tree, run):
+    run()
+    path = tree / "tool" / "echo.yaml"
+    _rewrite(path, path.read_text(encoding="utf-8"))
+
+    assert run()["tool/echo.yaml"].cached
+
+
+def test_changed_import_revalidates_the_role(tree, run):
+    run()
+    _rewrite(tree / "rule" / "rules.md", "Be very kind.\n")
+
+    results = run()
+
+    assert not results["role/tutor/role.yaml"].cached
+    assert results["tool/echo.yaml"].cached
+
+
+def test_deleted_import_is_reported(tree, run):
+    run()
+    (tree / "rule" / "rules.md").unlink()
+
+    assert run()["role/tutor/role.yaml"].errors == ["imports/rules: missing import ../../rule/rules.md"]
+
+
+def test_schema_change_revalidates_its_kind(run):
+    schemas = validate.load_schemas()
+    run(schemas)
+    schemas["tool"] = dict(schemas["tool"], required=["name", "description", "version"])
+
+    results = run(schemas)
+
+    assert not results["tool/echo.yaml"].ok
+    assert results["role/tutor/role.yaml"].cached
+
+
+def test_corrupt_manifest_falls_back_to_full_run(tree, run):
+    run()
+    (tree / ".cache" / "manifest.json").write_text("{not json", encoding="utf-8")
+
+    assert not any(result.cached for result in run().values())
+    data = json.loads((tree / ".cache" / "manifest.json").read_text(encoding="utf-8"))
+    assert data["version"] == 1 and "tool/echo.yaml" in data["files"]
@@ -0,0 +1,226 @@
+"""Tests for the memory-mapped vector index in tools/vector_index.py."""
+from __future__ import annotations
+
+import json
+import shutil
+from array import array
+
+import pytest
+
+from tools.vector_index import HashingEmbedder, VectorIndex
+
+DIM = 64
+TEXTS = {
+    "cat": "the cat sat on the mat",
+    "dog": "dogs bark at the postman",
+    "sea": "waves roll over the sea",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    vectors = VectorIndex(tmp_path / "idx", dim=DIM)
+    yield vectors
+    vectors.close()
+
+
+def _top(index, text, **options):
+    matches = index.search(text, **options)
+    return matches[0].id if matches else None
+
+
+def _vector(text):
+    row = [0.0] * DIM
+    for bucket, value in HashingEmbedder(DIM).embed(text).items():
+        row[bucket] = value
+    return array("f", row).tobytes()
+
+
+def _check_aligned(index):
+    # Every entry must still score ~1.0 against its own text.
+    for item_id, text in TEXTS.items():
+        best = index.search(text, k=1)
+        assert best and best[0].id == item_id and best[0].text == text
+        assert best[0].score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_search_ranks_by_similarity(index):
+    index.add_many(TEXTS.items())
+    assert len(index) == 3
+    _check_aligned(index)
+    assert _top(index, "a cat on a mat") == "cat"
+    assert index.search("") == []
+
+
+def test_readd_replaces_and_remove_hides(index):
+    index.add_many(TEXTS.items())
+    index.add("cat", "kittens purr softly")
+    index.remove("dog")
+
+    assert len(index) == 2
+    assert _top(index, "the cat sat on the mat") != "cat"
+    assert _top(index, "kittens purr") == "cat"
+    assert all(match.id != "dog" for match in index.search("dogs bark", k=5))
+
+
+def test_prefix_restricts_results(index):
+    index.add_many([("alice/s1/a", "green tea"), ("bob/s1/a", "green tea"), ("alice/s2/b", "black tea")])
+    assert {match.id for match in index.search("green tea", k=5, prefix="alice/")} == {"alice/s1/a", "alice/s2/b"}
+    assert [match.id for match in index.search("green tea", k=5, prefix="bob/")] == ["bob/s1/a"]
+
+
+def test_appends_are_seen_by_other_instances(tmp_path):
+    writer = VectorIndex(tmp_path / "idx", dim=DIM)
+    reader = VectorIndex(tmp_path / "idx", dim=128)
+    try:
+        assert reader.dim == DIM  # meta.json wins over the argument
+        writer.add("cat", TEXTS["cat"])
+        assert _top(reader, "cat mat") == "cat"
+        writer.add_many([("dog", TEXTS["dog"]), ("sea", TEXTS["sea"])])
+        _check_aligned(reader)
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_orphan_vectors_from_a_crashed_append_do_not_shift_later_rows(index):
+    index.add("cat", TEXTS["cat"])
+    # A writer died after writing its vectors but before its row lines.
+    with (index.path / "vectors.f32").open("ab") as handle:
+        handle.write(_vector("orphaned text") * 2)
+    index.add_many([("dog", TEXTS["dog"]), ("sea", TEXTS["sea"])])
+
+    _check_aligned(index)
+    fresh = VectorIndex(index.path)
+    try:
+        _check_aligned(fresh)
+        assert len(fresh) == 3
+    finally:
+        fresh.close()
+
+
+def test_partial_vector_and_torn_row_line_are_cut_off(index):
+    index.add("cat", TEXTS["cat"])
+    with (index.path / "vectors.f32").open("ab") as handle:
+        handle.write(_vector("half written")[:10])
+    with (index.path / "rows.jsonl").open("ab") as handle:
+        handle.write(b'{"id": "torn", "te')
+    assert len(index) == 1
+
+    index.add_many([("dog", TEXTS["dog"]), ("sea", TEXTS["sea"])])
+    fresh = VectorIndex(index.path)
+    try:
+        _check_aligned(fresh)
+        assert len(fresh) == 3
+    finally:
+        fresh.close()
+    assert (index.path / "vectors.f32").stat().st_size == 3 * DIM * 4
+
+
+def test_rows_whose_vectors_never_reached_disk_are_dropped(index):
+    index.add("cat", TEXTS["cat"])
+    # Power loss kept a row line but not the vector it points at.
+    with (index.path / "rows.jsonl").open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps({"id": "lost", "text": "lost text", "row": 1}) + "\n")
+    assert len(index) == 1
+
+    index.add_many([("dog", TEXTS["dog"]), ("sea", TEXTS["sea"])])
+    fresh = VectorIndex(index.path)
+    try:
+        _check_aligned(fresh)
+        assert len(fresh) == 3
+        assert all(match.id != "lost" for match in fresh.search("lost text", k=5))
+    finally:
+        fresh.close()
+
+
+def test_rows_without_row_numbers_are_still_read(tmp_path):
+    path = tmp_path / "idx"
+    VectorIndex(path, dim=DIM).close()
+    (path / "vectors.f32").write_bytes(b"".join(_vector(text) for text in TEXTS.values()))
+    (path / "rows.jsonl").write_text(
+        "".join(json.dumps({"id": item_id, "text": text}) + "\n" for item_id, text in TEXTS.items()),
+        encoding="utf-8",
+    )
+    index = VectorIndex(path)
+    try:
+        _check_aligned(index)
+        index.add("cat", "kittens purr softly")
+        assert _top(index, "kittens purr") == "cat"
+    finally:
+        index.close()
+
+
+def test_compact_switches_generation_for_every_reader(tmp_path):
+    writer = VectorIndex(tmp_path / "idx", dim=DIM)
+    reader = VectorIndex(tmp_path / "idx")
+    try:
+        writer.add_many(TEXTS.items())
+        writer.add("tmp", "temporary entry")
+        writer.remove("tmp")
+        _check_aligned(reader)
+
+        assert writer.compact() == 3
+        names = sorted(path.name for path in writer.path.glob("vectors*.f32"))
+        assert len(names) == 1 and names != ["vectors.f32"]
+        header = json.loads((writer.path / "rows.jsonl").read_text(encoding="utf-8").splitlines()[0])
+        assert header == {"vectors": names[0]}
+
+        _check_aligned(reader)
+        reader.add("late", "added after compaction")
+        _check_aligned(writer)
+        assert _top(writer, "added after compaction") == "late"
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_crash_during_compaction_leaves_the_old_generation(index):
+    index.add_many(TEXTS.items())
+    index.remove("sea")
+    # A compaction died after writing its vectors, before replacing rows.jsonl.
+    (index.path / "vectors.deadbeef0000.f32").write_bytes(b"\0" * DIM * 4)
+    (index.path / "rows.jsonl.999.tmp").write_text('{"vectors": "vectors.deadbeef0000.f32"}\n')
+
+    fresh = VectorIndex(index.path)
+    try:
+        assert len(fresh) == 2
+        assert _top(fresh, TEXTS["cat"]) == "cat"
+        assert fresh.compact() == 2
+        assert not (index.path / "vectors.deadbeef0000.f32").exists()
+        assert not (index.path / "vectors.f32").exists()
+        assert _top(fresh, TEXTS["dog"]) == "dog"
+    finally:
+        fresh.close()
+
+
+def test_ivf_partition_is_probed_and_ignored_after_compaction(index):
+    index.add_many((f"doc{number}", f"topic{number % 4} words{number}") for number in range(40))
+    assert index.build_ivf(nlist=4) == 4
+    assert _top(index, "topic1 words5", nprobe=4) == "doc5"
+    saved = {name: (index.path / name).read_bytes() for name in ("ivf.json", "ivf.assign")}
+
+    index.compact()
+    assert not (index.path / "ivf.json").exists()
+    # An IVF file left behind from the previous generation must not be used.
+    for name, data in saved.items():
+        (index.path / name).write_bytes(data)
+    fresh = VectorIndex(index.path)
+    try:
+        assert len(fresh) == 40
+        assert fresh._centroids == []
+        assert _top(fresh, "topic1 words5", nprobe=1) == "doc5"
+    finally:
+        fresh.close()
+
+
+def test_compacted_index_loads_from_a_copy(tmp_path, index):
+    index.add_many(TEXTS.items())
+    index.compact()
+    copy = tmp_path / "copy"
+    shutil.copytree(index.path, copy)
+    restored = VectorIndex(copy)
+    try:
+        _check_aligned(restored)
+    finally:
+        restored.close()
@@ -0,0 +1,126 @@
+"""Parity of ``loader._fallback_yaml_load`` with PyYAML's ``safe_load``."""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+
+import loader
+
+yaml = pytest.importorskip("yaml")
+
+SCALARS = [
+    # integers, including YAML 1.1 radix forms
+    "0", "-0", "+1", "42", "1_000", "017", "-017", "0_7", "07_", "00", "08", "0__",
+    "0x1F", "+0x1f", "0x_1", "0x", "0xg", "0b101", "0b1_0", "0b", "0b2",
+    # ``0o`` is YAML 1.2 only; YAML 1.1 keeps it a string
+    "0o17", "0o", "-0o7",
+    # floats
+    "1.5", "3.", "0.0", "1_0.5", "1.e-3", "1.0e+5", ".5", ".5e+3", "-.5", "+.5", "._", ".", "1e5",
+    ".inf", "-.INF", "+.Inf", ".nan",
+    # base 60
+    "1:30", "-1:30", "190:20:30", "1:30.5", "0:30", "0:30.5", "1:60", "1_0:30",
+    # constants and plain strings
+    "yes", "Off", "~", "null", "NULL", "1.0.2", "_1", "1__0", "v1", "+", "-x", "a b", "0.1.2-beta",
+]
+
+
+def _same(left, right):
+    if isinstance(left, float) and math.isnan(left):
+        return isinstance(right, float) and math.isnan(right)
+    return left == right and type(left) is type(right)
+
+
+@pytest.mark.parametrize("scalar", SCALARS)
+def test_plain_scalars_resolve_like_safe_load(scalar):
+    document = f"value: {scalar}\n"
+
+    expected = yaml.safe_load(document)["value"]
+    actual = loader._fallback_yaml_load(document)["value"]
+
+    assert _same(expected, actual), (expected, actual)
+
+
+@pytest.mark.parametrize("scalar", ["0o17", "0x1F", "1:30", "-.5"])
+def test_scalars_in_flow_sequences_resolve_like_safe_load(scalar):
+    document = f"values: [{scalar}, {scalar}]\n"
+
+    assert loader._fallback_yaml_load(document) == yaml.safe_load(document)
+
+
+DOCUMENTS = {
+    "nested": """\
+name: demo  # trailing comment
+settings:
+  retries: 3
+  ratio: 0.5
+  enabled: yes
+  tags:
+    - a
+    - "b: quoted"
+    - key: value
+      other: 2
+empty:
+""",
+    "block_scalars": """\
+literal: |
+  line one
+
+  line three
+folded: >
+  folded
+  text
+
+  next paragraph
+keep: |+
+  kept
+
+strip: >-
+  stripped
+""",
+    "flow": """\
+inline: [1, two, "three", {a: 1, b: [x, y]}]
+mapping: {k: v, n: null, t: true}
+multi: [
+  one,
+  two,
+]
+""",
+    "quoted": """\
+single: 'it''s'
+double: "tab\\tnew\\nline \\u00e9"
+multi: "first
+  second"
+""",
+}
+
+
+@pytest.mark.parametrize("name", sorted(DOCUMENTS))
+def test_documents_parse_like_safe_load(name):
+    text = DOCUMENTS[name]
+
+    assert loader._fallback_yaml_load(text) == yaml.safe_load(text)
+
+
+def test_file_objects_are_consumed_lazily(tmp_path):
+    path = tmp_path / "spec.yaml"
+    path.write_text(DOCUMENTS["nested"], encoding="utf-8")
+
+    with path.open(encoding="utf-8") as handle:
+        assert loader._fallback_yaml_load(handle) == yaml.safe_load(DOCUMENTS["nested"])
+
+
+def test_repository_specs_parse_like_safe_load():
+    for path in sorted(loader.BASE_PATH.rglob("*.yaml")):
+        relative = path.relative_to(loader.BASE_PATH)
+        if any(part.startswith(".") or part == "node_modules" for part in relative.parts):
+            continue
+        text = path.read_text(encoding="utf-8")
+        assert loader._fallback_yaml_load(text) == (yaml.safe_load(text) or {}), relative
+
+
+@pytest.mark.parametrize("text", ["a:\n\tb: 1\n", "a: 1\n  b: 2\n", "- a\nb: 1\n"])
+def test_invalid_documents_raise_loader_error(text):
+    with pytest.raises(loader.LoaderError):
+        loader._fallback_yaml_load(text)
@@ -0,0 +1,572 @@
+"""Opt-in memoization of idempotent tool results.
+
+A tool is cached when its YAML specification has a ``cache`` block::
+
+    cache:
+      enabled: true
+      ttl_seconds: 300      # optional; entries never expire without it
+      workspace: true       # key on the workspace fingerprint as well
+      files: true           # and on the mtime/size of files named by arguments
+                            # or by the result (checked on every hit)
+
+Tools that modify files list the cached tools they make stale, optionally
+only for some values of their ``action`` argument::
+
+    cache:
+      invalidates: [find_symbol, read_code]
+      invalidate_actions: [upload, delete]
+
+Keys are content addresses: the SHA-256 of the tool name, the arguments as
+normalised by :func:`tools.serena._normalise_args`, the keyword arguments and,
+when requested, :func:`workspace_fingerprint` and the file signatures.  Each
+entry also records the workspace files it refers to (file arguments and
+``file``/``path`` fields of JSON results) so an edit only drops the entries for
+the files it touched.
+
+Two backends are provided: :class:`MemoryBackend` and :class:`SqliteBackend`.
+Both evict least-recently-used entries past ``max_entries``.  The default is
+chosen by ``AI_SANDBOX_TOOL_CACHE``: ``memory`` (default), ``sqlite``,
+``sqlite:<path>`` or ``off``.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence, Set, Tuple
+
+import metrics
+from loader import BASE_PATH, LoaderError, _iter_tool_candidates, load_tool
+from tools.serena import SerenaError, _normalise_args
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_SQLITE_PATH = BASE_PATH / ".cache" / "tool-cache.sqlite3"
+
+# Returned by lookups that find nothing, since ``None`` is a valid result.
+MISS = object()
+
+# Tag for entries that name no file (e.g. a symbol that was not found): any
+# edit may make them stale.
+_ANY_PATH = "*"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """The ``cache`` block of a tool specification."""
+
+    enabled: bool = False
+    ttl_seconds: float | None = None
+    workspace: bool = False
+    files: bool = False
+    invalidates: Tuple[str, ...] = ()
+    invalidate_actions: Tuple[str, ...] = ()
+
+
+_NO_CACHE = CachePolicy()
+
+# Tools without a spec are looked up again after this many seconds.
+_MISSING_SPEC_RECHECK = 1.0
+# name -> (spec path or None, (mtime_ns, size) or recheck deadline, policy)
+_POLICIES: Dict[str, Tuple[Path | None, Any, CachePolicy]] = {}
+
+
+def _spec_signature(path: Path) -> Tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_policy(block: Any) -> CachePolicy:
+    if not isinstance(block, Mapping):
+        return _NO_CACHE
+    ttl = block.get("ttl_seconds")
+
+    def names(field: str) -> Tuple[str, ...]:
+        value = block.get(field) or ()
+        return tuple(str(item) for item in value) if isinstance(value, (list, tuple)) else ()
+
+    return CachePolicy(
+        enabled=bool(block.get("enabled", False)),
+        ttl_seconds=float(ttl) if isinstance(ttl, (int, float)) and not isinstance(ttl, bool) and ttl > 0 else None,
+        workspace=bool(block.get("workspace", False)),
+        files=bool(block.get("files", False)),
+        invalidates=names("invalidates"),
+        invalidate_actions=names("invalidate_actions"),
+    )
+
+
+def cache_policy(name: str) -> CachePolicy:
+    """Return the :class:`CachePolicy` declared by tool *name*.
+
+    Policies are memoized per tool and re-read when the spec file's mtime or
+    size changes, so the per-call cost is one ``stat``.
+    """
+
+    memo = _POLICIES.get(name)
+    if memo is not None:
+        path, signature, policy = memo
+        if path is None:
+            if time.monotonic() < signature:
+                return policy
+        elif _spec_signature(path) == signature:
+            return policy
+    try:
+        spec = load_tool(name)
+        candidates = _iter_tool_candidates(name)
+    except LoaderError:
+        _POLICIES[name] = (None, time.monotonic() + _MISSING_SPEC_RECHECK, _NO_CACHE)
+        return _NO_CACHE
+    policy = _parse_policy(spec.get("cache"))
+    if candidates:
+        # A spec edited after the parse gets a new signature and is re-read next call.
+        _POLICIES[name] = (candidates[0], _spec_signature(candidates[0]), policy)
+    return policy
+
+
+def _workspace() -> str:
+    return os.path.realpath(os.environ.get("SERENA_WORKSPACE") or os.getcwd())
+
+
+def workspace_fingerprint(workspace: str | None = None) -> str:
+    """Identify the state of *workspace*: its path plus the git ``HEAD`` commit.
+
+    Reads ``.git`` directly so no subprocess is needed.  Edits made through
+    tools are handled by invalidation rather than by the fingerprint.
+    """
+
+    root = Path(workspace or _workspace())
+    git = root / ".git"
+    head = ""
+    try:
+        head = (git / "HEAD").read_text(encoding="utf-8").strip()
+        if head.startswith("ref: "):
+            ref = head[5:]
+            ref_file = git / ref
+            if ref_file.is_file():
+                head = ref_file.read_text(encoding="utf-8").strip()
+            else:
+                for line in (git / "packed-refs").read_text(encoding="utf-8").splitlines():
+                    if line.endswith(" " + ref):
+                        head = line.split(" ", 1)[0]
+                        break
+    except OSError:
+        pass
+    return f"{root}@{head}"
+
+
+def _call_values(args: Sequence[Any], kwargs: Mapping[str, Any]) -> List[str]:
+    """The normalised positional arguments plus any string keyword arguments."""
+
+    return [*_normalise_args(args), *(value for value in kwargs.values() if isinstance(value, str))]
+
+
+def _file_signatures(paths: Iterable[str]) -> List[Tuple[str, int, int]]:
+    signatures = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signatures.append((path, stat.st_mtime_ns, stat.st_size))
+    return signatures
+
+
+def _checked_result(entry: Any) -> Any:
+    """Unwrap an entry stored with ``files: true``, or :data:`MISS` if a file changed."""
+
+    if not isinstance(entry, Mapping) or "files" not in entry or "result" not in entry:
+        return MISS
+    for path, mtime_ns, size in entry["files"]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return MISS
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            return MISS
+    return entry["result"]
+
+
+def _referenced_paths(args: Sequence[str], result: Any, workspace: str, existing: bool = True) -> Set[str]:
+    """Return the workspace files named by *args* or by a JSON *result*.
+
+    Relative paths are tried against both the workspace and the repository
+    root.  With *existing* false, paths of files that are gone (a deletion)
+    are kept too.
+    """
+
+    candidates = list(args)
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            result = None
+    stack = [result]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Mapping):
+            for key in ("file", "path", "relative_path"):
+                if isinstance(item.get(key), str):
+                    candidates.append(item[key])
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    roots = {workspace, str(BASE_PATH)}
+    paths = set()
+    for candidate in candidates:
+        if not candidate or "\n" in candidate or len(candidate) > 4096:
+            continue
+        for root in roots:
+            path = os.path.realpath(os.path.join(root, candidate))
+            if os.path.isfile(path) or (not existing and os.path.isdir(os.path.dirname(path))):
+                paths.add(path)
+    return paths
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    currsize: int
+    maxsize: int
+
+
+class MemoryBackend:
+    """Process-local LRU store."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (tool, value, expires_at or None, paths)
+        self._entries: "OrderedDict[str, Tuple[str, Any, float | None, frozenset]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[2] is not None and entry[2] <= time.time():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            value = entry[1]
+        # Hand out copies so callers cannot mutate the cached result.
+        return value if isinstance(value, (str, bytes, int, float, bool, type(None))) else copy.deepcopy(value)
+
+    def put(self, key: str, tool: str, value: Any, expires_at: float | None, paths: Iterable[str]) -> None:
+        if not isinstance(value, (str, bytes, int, float, bool, type(None))):
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (tool, value, expires_at, frozenset(paths))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tool: str, paths: Iterable[str] | None) -> int:
+        targets = None if paths is None else frozenset(paths) | {_ANY_PATH}
+        with self._lock:
+            stale = [
+                key
+                for key, (entry_tool, _value, _expires, entry_paths) in self._entries.items()
+                if entry_tool == tool and (targets is None or entry_paths & targets)
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteBackend:
+    """On-disk LRU store shared between processes; values are stored as JSON."""
+
+    def __init__(self, path: Path | str = DEFAULT_SQLITE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+            CREATE TABLE IF NOT EXISTS entry_paths (
+                key TEXT NOT NULL REFERENCES entries(key) ON DELETE CASCADE,
+                path TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entry_paths_path ON entry_paths(path);
+            CREATE INDEX IF NOT EXISTS entry_paths_key ON entry_paths(key);
+            PRAGMA foreign_keys=ON;
+            """
+        )
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return MISS
+            if row[1] is not None and row[1] <= now:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return MISS
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, tool: str, value: Any, expires_at: float | None, paths: Iterable[str]) -> None:
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError):
+            return  # not representable on disk; leave it uncached
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, tool, value, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, tool, encoded, expires_at, time.time()),
+            )
+            self._db.execute("DELETE FROM entry_paths WHERE key = ?", (key,))
+            self._db.executemany("INSERT INTO entry_paths (key, path) VALUES (?, ?)", [(key, path) for path in paths])
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+
+    def invalidate(self, tool: str, paths: Iterable[str] | None) -> int:
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            if paths is None:
+                cursor = self._db.execute("DELETE FROM entries WHERE tool = ?", (tool,))
+            else:
+                targets = [*paths, _ANY_PATH]
+                placeholders = ",".join("?" * len(targets))
+                cursor = self._db.execute(
+                    f"DELETE FROM entries WHERE tool = ? AND key IN "
+                    f"(SELECT key FROM entry_paths WHERE path IN ({placeholders}))",
+                    (tool, *targets),
+                )
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class ToolCache:
+    """Memoizes calls to tools whose specification enables caching."""
+
+    def __init__(self, backend: MemoryBackend | SqliteBackend | None = None) -> None:
+        self.backend = backend if backend is not None else MemoryBackend()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, name: str, args: Sequence[Any], kwargs: Mapping[str, Any], policy: CachePolicy) -> str:
+        payload = [
+            name,
+            _normalise_args(args),
+            sorted((str(k), v) for k, v in kwargs.items()),
+            workspace_fingerprint() if policy.workspace else None,
+            _file_signatures(_referenced_paths(_call_values(args, kwargs), None, _workspace())) if policy.files else None,
+        ]
+        encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, name: str, args: Sequence[Any], kwargs: Mapping[str, Any], policy: CachePolicy | None = None
+    ) -> Tuple[str | None, Any]:
+        """Return ``(key, value)``; *value* is :data:`MISS` on a miss.
+
+        *key* is ``None`` when *name* is not cacheable, in which case the
+        result should not be passed to :meth:`store`.  Callers that already
+        resolved the tool's :class:`CachePolicy` pass it as *policy*, here
+        and to :meth:`store` and :meth:`after_call`.
+        """
+
+        policy = cache_policy(name) if policy is None else policy
+        if not policy.enabled:
+            return None, MISS
+        try:
+            key = self.key(name, args, kwargs, policy)
+        except SerenaError:
+            return None, MISS
+        value = self.backend.get(key)
+        if value is not MISS and policy.files:
+            value = _checked_result(value)
+        with self._lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, value
+
+    def store(
+        self,
+        key: str,
+        name: str,
+        args: Sequence[Any],
+        result: Any,
+        policy: CachePolicy | None = None,
+        kwargs: Mapping[str, Any] | None = None,
+    ) -> None:
+        policy = cache_policy(name) if policy is None else policy
+        expires_at = time.time() + policy.ttl_seconds if policy.ttl_seconds else None
+        paths = _referenced_paths(_call_values(args, kwargs or {}), result, _workspace())
+        value = result
+        if policy.files:
+            # The key only covers files named by the arguments; also record the
+            # files the result came from (such as the file a symbol resolved
+            # to) so edits made outside this process turn the entry into a miss.
+            value = {"files": _file_signatures(paths), "result": result}
+        self.backend.put(key, name, value, expires_at, paths or {_ANY_PATH})
+
+    def after_call(
+        self,
+        name: str,
+        args: Sequence[Any],
+        result: Any,
+        policy: CachePolicy | None = None,
+        kwargs: Mapping[str, Any] | None = None,
+    ) -> None:
+        """Drop entries made stale by a call to a tool that modifies files."""
+
+        policy = cache_policy(name) if policy is None else policy
+        kwargs = kwargs or {}
+        if not policy.invalidates:
+            return
+        if policy.invalidate_actions:
+            action = kwargs.get("action", args[0] if args else None)
+            if action not in policy.invalidate_actions:
+                return
+        try:
+            paths = _referenced_paths(_call_values(args, kwargs), result, _workspace(), existing=False)
+        except SerenaError:
+            paths = set()
+        dropped = 0
+        for tool in policy.invalidates:
+            # Without a known file, any entry of the tool may be stale.
+            dropped += self.backend.invalidate(tool, paths or None)
+        with self._lock:
+            self.invalidations += dropped
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.backend.evictions, self.invalidations, len(self.backend), self.backend.max_entries
+            )
+
+
+_CACHE: ToolCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _default_backend() -> MemoryBackend | SqliteBackend | None:
+    setting = os.environ.get("AI_SANDBOX_TOOL_CACHE", "memory").strip()
+    if setting.lower() in {"off", "0", "false", "none"}:
+        return None
+    if setting.lower().startswith("sqlite"):
+        _, _, path = setting.partition(":")
+        return SqliteBackend(path or DEFAULT_SQLITE_PATH)
+    return MemoryBackend()
+
+
+def get_tool_cache() -> ToolCache | None:
+    """Return the process-wide cache, or ``None`` when caching is off."""
+
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            backend = _default_backend()
+            if backend is None:
+                return None
+            _CACHE = ToolCache(backend)
+        return _CACHE
+
+
+def set_tool_cache(cache: ToolCache | None) -> None:
+    """Replace the process-wide cache (``None`` re-reads the environment)."""
+
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
+
+
+def clear_tool_cache() -> None:
+    cache = get_tool_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def tool_cache_info() -> CacheInfo | None:
+    cache = get_tool_cache()
+    return cache.info() if cache is not None else None
+
+
+def _tool_cache_samples() -> List[metrics.Sample]:
+    cache = _CACHE
+    if cache is None:
+        return []
+    info = cache.info()
+    return metrics.cache_samples(
+        "tool", info.hits, info.misses, evictions=info.evictions, invalidations=info.invalidations,
+        entries=info.currsize,
+    )
+
+
+metrics.register_collector(_tool_cache_samples)
+
+
+__all__ = [
+    "ToolCache",
+    "MemoryBackend",
+    "SqliteBackend",
+    "CachePolicy",
+    "CacheInfo",
+    "MISS",
+    "cache_policy",
+    "workspace_fingerprint",
+    "get_tool_cache",
+    "set_tool_cache",
+    "clear_tool_cache",
+    "tool_cache_info",
+    "DEFAULT_SQLITE_PATH",
+]
@@ -0,0 +1,306 @@
+"""Asynchronous and batched execution of the registered tools.
+
+:func:`run_tool_async` awaits a single tool and :func:`run_tools_batch` fans
+several calls out concurrently.  Each call is dispatched according to the
+tool's YAML specification:
+
+* tools with a native coroutine in :data:`tool_map.ASYNC_TOOL_MAP` (the Serena
+  CLI tools) are awaited directly;
+* other ``cli`` tools run their ``execution_environment.command`` through
+  :func:`asyncio.create_subprocess_exec`;
+* Python tools run in the loop's default thread pool, so tools that keep
+  state in this process (stores, indexes, caches) all see the same copy;
+* tools whose spec sets ``execution_policy.executor: process`` (stateless,
+  CPU-bound work) run in a shared process pool instead.
+
+``execution_policy.max_concurrency`` bounds how many calls of one tool run at
+once (per event loop) and ``execution_policy.timeout_seconds`` bounds each
+call.  Tools without these fields get :data:`DEFAULT_MAX_CONCURRENCY` and
+:data:`DEFAULT_TIMEOUT_SECONDS`, matching ``docs/rules.md``.  A thread or
+process job cannot be interrupted, so a call that times out keeps its slot
+until the job really finishes.  Tools that opt into :mod:`tool_cache` are
+answered from the cache without taking a slot.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import shlex
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence, Tuple
+
+import metrics
+import tool_cache
+from loader import LoaderError, load_tool
+from tool_map import ASYNC_TOOL_MAP, TOOL_MAP
+
+
+DEFAULT_MAX_CONCURRENCY = 5
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class ToolExecutionError(RuntimeError):
+    """Raised when a tool cannot be dispatched or exits unsuccessfully."""
+
+
+class ToolTimeoutError(ToolExecutionError):
+    """Raised when a tool exceeds its ``timeout_seconds``."""
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """Execution settings derived from a tool's YAML specification."""
+
+    environment: str
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS
+    command: Tuple[str, ...] = ()
+    executor: str = "thread"
+
+
+class ToolCall(NamedTuple):
+    name: str
+    args: Sequence[Any] = ()
+    kwargs: Mapping[str, Any] = {}
+
+
+def _positive(value: Any, default: float) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        return default
+    return value
+
+
+def tool_policy(name: str) -> ToolPolicy:
+    """Return the :class:`ToolPolicy` for *name*, with defaults when it has no spec."""
+
+    try:
+        spec = load_tool(name)
+    except LoaderError:
+        return ToolPolicy(environment="python")
+    policy = spec.get("execution_policy") or {}
+    environment = spec.get("execution_environment") or {}
+    command = environment.get("command")
+    # Template placeholders such as "$COMMAND" are not runnable commands.
+    argv = tuple(shlex.split(command)) if isinstance(command, str) and not command.startswith("$") else ()
+    kind = str(environment.get("type") or "python")
+    executor = policy.get("executor")
+    if executor not in ("thread", "process"):
+        executor = "thread"
+    return ToolPolicy(
+        environment=kind,
+        max_concurrency=int(_positive(policy.get("max_concurrency"), DEFAULT_MAX_CONCURRENCY)),
+        timeout_seconds=float(_positive(policy.get("timeout_seconds"), DEFAULT_TIMEOUT_SECONDS)),
+        command=argv,
+        executor=executor,
+    )
+
+
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None:
+            workers = int(os.environ.get("AI_SANDBOX_TOOL_PROCESSES", "0")) or os.cpu_count() or 1
+            _PROCESS_POOL = ProcessPoolExecutor(max_workers=workers)
+        return _PROCESS_POOL
+
+
+def shutdown_executor() -> None:
+    """Stop the process pool used for ``internal_function`` tools."""
+
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        pool, _PROCESS_POOL = _PROCESS_POOL, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+# asyncio primitives belong to one loop, so limits are tracked per loop.
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    per_loop = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    semaphore = per_loop.get(name)
+    if semaphore is None:
+        semaphore = per_loop[name] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+async def _run_command(name: str, argv: Sequence[str], args: Sequence[Any]) -> str:
+    process = await asyncio.create_subprocess_exec(
+        *argv, *map(str, args), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except BaseException:  # cancelled by the timeout: do not leak the child
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode:
+        details = stderr.decode("utf-8", "replace").strip() or f"exit status {process.returncode}"
+        raise ToolExecutionError(f"Tool '{name}' failed: {details}")
+    return stdout.decode("utf-8")
+
+
+def _run_in_thread(call: Any) -> Future:
+    """Run *call* in the loop's default executor, returning a cancellable job."""
+
+    job: Future = Future()
+
+    def run() -> None:
+        if not job.set_running_or_notify_cancel():
+            return
+        try:
+            job.set_result(call())
+        except BaseException as exc:
+            job.set_exception(exc)
+
+    asyncio.get_running_loop().run_in_executor(None, run)
+    return job
+
+
+def _dispatch(
+    name: str, policy: ToolPolicy, args: Sequence[Any], kwargs: Mapping[str, Any]
+) -> Tuple[Any, Future | None]:
+    """Return an awaitable running *name* where its policy calls for.
+
+    The second item is the underlying thread or process job, if any, which
+    keeps running after the awaitable is cancelled.
+    """
+
+    native = ASYNC_TOOL_MAP.get(name)
+    if native is not None:
+        return native(*args, **kwargs), None
+    function = TOOL_MAP.get(name)
+    if function is None:
+        if policy.environment == "cli" and policy.command:
+            return _run_command(name, policy.command, args), None
+        raise ToolExecutionError(f"Tool '{name}' has no implementation.")
+    call = functools.partial(function, *args, **kwargs)
+    job = _process_pool().submit(call) if policy.executor == "process" else _run_in_thread(call)
+    return asyncio.wrap_future(job), job
+
+
+def _release_when_done(job: Future, semaphore: asyncio.Semaphore) -> None:
+    loop = asyncio.get_running_loop()
+
+    def release(_job: Future) -> None:
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:  # the loop has closed; its semaphores are gone with it
+            pass
+
+    job.add_done_callback(release)
+
+
+async def run_tool_async(
+    name: str,
+    args: Sequence[Any] = (),
+    kwargs: Mapping[str, Any] | None = None,
+    *,
+    timeout: float | None = None,
+) -> Any:
+    """Run tool *name* without blocking the event loop and return its result.
+
+    *timeout* overrides the tool's ``timeout_seconds``; waiting for a free
+    concurrency slot does not count towards it.
+    """
+
+    kwargs = kwargs or {}
+    cache = tool_cache.get_tool_cache()
+    cache_policy = tool_cache.cache_policy(name) if cache is not None else None
+    key = None
+    if cache_policy is not None and cache_policy.enabled:
+        started = time.perf_counter()
+        key, value = cache.lookup(name, args, kwargs, cache_policy)
+        if value is not tool_cache.MISS:
+            metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="cached")
+            return value
+
+    policy = tool_policy(name)
+    limit = timeout if timeout is not None else policy.timeout_seconds
+    semaphore = _semaphore(name, policy.max_concurrency)
+    await semaphore.acquire()
+    job: Future | None = None
+    # Time the call itself, not the wait for a concurrency slot.
+    started = time.perf_counter()
+    try:
+        awaitable, job = _dispatch(name, policy, args, kwargs)
+        result = await asyncio.wait_for(awaitable, limit)
+    except asyncio.TimeoutError as exc:
+        metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="timeout")
+        raise ToolTimeoutError(f"Tool '{name}' timed out after {limit} seconds.") from exc
+    except BaseException:
+        metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="error")
+        raise
+    finally:
+        if job is not None and not job.done():
+            # The job outlived its awaitable; hold the slot until it exits.
+            _release_when_done(job, semaphore)
+        else:
+            semaphore.release()
+    metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="ok")
+
+    if cache_policy is not None:
+        if key is not None:
+            cache.store(key, name, args, result, cache_policy, kwargs)
+        if cache_policy.invalidates:
+            cache.after_call(name, args, result, cache_policy, kwargs)
+    return result
+
+
+def _as_call(call: ToolCall | Sequence[Any] | str) -> ToolCall:
+    if isinstance(call, ToolCall):
+        return call
+    if isinstance(call, str):
+        return ToolCall(call)
+    return ToolCall(*call)
+
+
+async def run_tools_batch(
+    calls: Iterable[ToolCall | Sequence[Any] | str],
+    *,
+    return_exceptions: bool = True,
+) -> List[Any]:
+    """Run *calls* concurrently and return their results in order.
+
+    Each call is a :class:`ToolCall`, a ``(name, args[, kwargs])`` tuple or a
+    bare tool name.  With *return_exceptions* (the default) a failing call
+    yields its exception instead of cancelling the rest of the batch.
+    """
+
+    coroutines = [run_tool_async(call.name, call.args, call.kwargs) for call in map(_as_call, calls)]
+    return await asyncio.gather(*coroutines, return_exceptions=return_exceptions)
+
+
+def run_tools(calls: Iterable[ToolCall | Sequence[Any] | str], *, return_exceptions: bool = True) -> List[Any]:
+    """Synchronous wrapper around :func:`run_tools_batch` for non-async callers."""
+
+    return asyncio.run(run_tools_batch(calls, return_exceptions=return_exceptions))
+
+
+__all__ = [
+    "run_tool_async",
+    "run_tools_batch",
+    "run_tools",
+    "tool_policy",
+    "shutdown_executor",
+    "ToolCall",
+    "ToolPolicy",
+    "ToolExecutionError",
+    "ToolTimeoutError",
+    "DEFAULT_MAX_CONCURRENCY",
+    "DEFAULT_TIMEOUT_SECONDS",
+]
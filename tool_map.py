@@ -1,21 +1,242 @@
-"""Mapping between tool identifiers and their Python implementations."""
+"""Mapping between tool identifiers and their Python implementations.
+
+Implementations are registered as ``"module:function"`` strings and imported
+on first lookup, so importing this module (or calling one tool) does not
+import every tool's dependencies.  A tool whose YAML specification sets
+``execution_environment.target`` to a ``module:function`` string is bound to
+that target; otherwise the entry-point table below is used.  Spec targets must
+live in the ``tools`` package, or in a package listed in
+``AI_SANDBOX_TOOL_PACKAGES`` (comma-separated); anything else is rejected with
+:class:`loader.LoaderError`.
+"""
 
 from __future__ import annotations
 
-from typing import Callable, Dict, Mapping
+import importlib
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Tuple
 
-from tools.serena import find_symbol, insert_after_symbol
+import metrics
 
 
 ToolFunction = Callable[..., object]
+AsyncToolFunction = Callable[..., Awaitable[object]]
+
+_TARGET_PATTERN = re.compile(r"^[A-Za-z_][\w.]*:[A-Za-z_]\w*$")
+# Tools without a spec file are looked up again after this many seconds.
+_MISSING_SPEC_RECHECK = 1.0
+
+
+def _allowed_packages() -> Tuple[str, ...]:
+    extra = os.environ.get("AI_SANDBOX_TOOL_PACKAGES", "")
+    return ("tools", *(package.strip() for package in extra.split(",") if package.strip()))
+
 
+# Mirrors ``MASTER_TOOL_MAP`` in ``tools/index.js``.
+ENTRY_POINTS: Dict[str, str] = {
+    # Serena CLI tools
+    "find_symbol": "tools.serena:find_symbol",
+    "insert_after_symbol": "tools.serena:insert_after_symbol",
+    # Core Memory Tools
+    "prompt_cache": "tools.core_logic:prompt_cache",
+    "file_manager": "tools.core_logic:file_manager",
+    "user_profile_manager": "tools.core_logic:user_profile_manager",
+    # AI Tutor Tools
+    "create_learning_plan": "tools.core_logic:create_learning_plan",
+    "find_analogy": "tools.core_logic:find_analogy",
+    "generate_quiz": "tools.core_logic:generate_quiz",
+    "evaluate_answer": "tools.core_logic:evaluate_answer",
+    # GPT Actions Tools
+    "write_python": "tools.api_stubs:write_python",
+    "write_typescript": "tools.api_stubs:write_typescript",
+    "refactor_code": "tools.api_stubs:refactor_code",
+    "read_code": "tools.api_stubs:read_code",
+    "fix_github_actions": "tools.api_stubs:fix_github_actions",
+    "commit_message_thai": "tools.api_stubs:commit_message_thai",
+    "deep_research": "tools.api_stubs:deep_research",
+    "create_mind_map": "tools.api_stubs:create_mind_map",
+    "memory_store": "tools.api_stubs:memory_store",
+    "think_deeper": "tools.api_stubs:think_deeper",
+    "web_search": "tools.api_stubs:web_search",
+    # Standard Tools
+    "read_file": "tools.standard_tools:read_file",
+    "write_file": "tools.standard_tools:write_file",
+    "delete_file": "tools.standard_tools:delete_file",
+    "execute_code": "tools.standard_tools:execute_code",
+    "open_in_vscode": "tools.standard_tools:open_in_vscode",
+    "search": "tools.standard_tools:search",
+}
 
-TOOL_MAP: Dict[str, ToolFunction] = {
-    "find_symbol": find_symbol,
-    "insert_after_symbol": insert_after_symbol,
+# Native coroutine implementations, preferred by ``tool_executor`` over
+# running the synchronous entry in an executor.
+ASYNC_ENTRY_POINTS: Dict[str, str] = {
+    "find_symbol": "tools.serena:find_symbol_async",
+    "insert_after_symbol": "tools.serena:insert_after_symbol_async",
 }
 
 
+def _import_target(target: str) -> Callable[..., object]:
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _spec_signature(path: Path) -> Tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _spec_target(name: str) -> Tuple[str | None, Path | None, Any]:
+    """``execution_environment.target`` of tool *name* when it names a Python function.
+
+    Returns ``(target, spec path, signature)``; the signature is the spec's
+    ``(mtime_ns, size)``, or a recheck deadline when there is no spec.  A
+    target outside the allowed packages raises :class:`loader.LoaderError`.
+    """
+
+    from loader import LoaderError, _iter_tool_candidates, load_tool
+
+    try:
+        candidates = _iter_tool_candidates(name) if "/" not in name and ".." not in name else []
+        signature = _spec_signature(candidates[0]) if candidates else None
+        target = (load_tool(name).get("execution_environment") or {}).get("target")
+    except LoaderError:
+        return None, None, time.monotonic() + _MISSING_SPEC_RECHECK
+    path = candidates[0] if candidates else None
+    if not isinstance(target, str) or not _TARGET_PATTERN.match(target):
+        return None, path, signature
+    module = target.partition(":")[0]
+    if not any(module == package or module.startswith(package + ".") for package in _allowed_packages()):
+        raise LoaderError(
+            f"Tool '{name}' targets '{target}', which is outside the allowed packages "
+            f"({', '.join(_allowed_packages())}); extend AI_SANDBOX_TOOL_PACKAGES to allow it."
+        )
+    return target, path, signature
+
+
+class LazyToolRegistry(Mapping[str, Callable[..., object]]):
+    """Read-only ``name -> function`` mapping that imports each function on first lookup.
+
+    Targets come from the tool's YAML ``execution_environment.target`` when
+    *use_specs* is set and it holds a ``module:function`` string, otherwise
+    from *entry_points*.  Spec targets are re-read when the spec file's mtime
+    or size changes.  Import errors and disallowed targets propagate to the
+    caller.
+    """
+
+    def __init__(self, entry_points: Mapping[str, str], use_specs: bool = True) -> None:
+        self._entry_points = dict(entry_points)
+        self._use_specs = use_specs
+        # name -> (target, function)
+        self._resolved: Dict[str, Tuple[str, Callable[..., object]]] = {}
+        # name -> (target, spec path or None, signature or recheck deadline)
+        self._targets: Dict[str, Tuple[str | None, Path | None, Any]] = {}
+        self._all_names: List[str] | None = None
+        self._lock = threading.Lock()
+
+    def target(self, name: str) -> str | None:
+        """The ``module:function`` string *name* resolves to, without importing it."""
+
+        if not self._use_specs:
+            return self._entry_points.get(name)
+        memo = self._targets.get(name)
+        if memo is not None:
+            target, path, signature = memo
+            if path is None and signature is not None and time.monotonic() < signature:
+                return target or self._entry_points.get(name)
+            if path is not None and _spec_signature(path) == signature:
+                return target or self._entry_points.get(name)
+        memo = self._targets[name] = _spec_target(name)
+        return memo[0] or self._entry_points.get(name)
+
+    def __getitem__(self, name: str) -> Callable[..., object]:
+        target = self.target(name)
+        if target is None:
+            raise KeyError(name)
+        resolved = self._resolved.get(name)
+        if resolved is not None and resolved[0] == target:
+            return resolved[1]
+        with self._lock:
+            resolved = self._resolved.get(name)
+            if resolved is None or resolved[0] != target:
+                resolved = self._resolved[name] = (target, _import_target(target))
+            return resolved[1]
+
+    def _available(self, name: str) -> bool:
+        from loader import LoaderError
+
+        try:
+            return self.target(name) is not None
+        except LoaderError:
+            return False
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._available(name)
+
+    def _names(self) -> List[str]:
+        if self._all_names is None:
+            names = set(self._entry_points)
+            if self._use_specs:
+                from loader import tool_names
+
+                names.update(name for name in tool_names() if self._available(name))
+            self._all_names = sorted(names)
+        return self._all_names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+    def loaded(self) -> List[str]:
+        """Names whose implementation has been imported so far."""
+
+        return sorted(self._resolved)
+
+
+TOOL_MAP = LazyToolRegistry(ENTRY_POINTS)
+ASYNC_TOOL_MAP = LazyToolRegistry(ASYNC_ENTRY_POINTS, use_specs=False)
+
+
+def call_tool(name: str, *args: object, **kwargs: object) -> object:
+    """Call tool *name*, serving repeated calls from :mod:`tool_cache` when its spec opts in."""
+
+    import tool_cache
+
+    function = TOOL_MAP.get(name)
+    if function is None:
+        raise KeyError(f"Tool '{name}' is not registered.")
+    started = time.perf_counter()
+    cache = tool_cache.get_tool_cache()
+    policy = tool_cache.cache_policy(name) if cache is not None else None
+    key = None
+    if policy is not None and policy.enabled:
+        key, value = cache.lookup(name, args, kwargs, policy)
+        if value is not tool_cache.MISS:
+            metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="cached")
+            return value
+    try:
+        result = function(*args, **kwargs)
+    except BaseException:
+        metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="error")
+        raise
+    metrics.TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=name, outcome="ok")
+    if policy is None:
+        return result
+    if key is not None:
+        cache.store(key, name, args, result, policy, kwargs)
+    if policy.invalidates:
+        cache.after_call(name, args, result, policy, kwargs)
+    return result
+
+
 def available_tools() -> Mapping[str, ToolFunction]:
     """Return a read-only view of the registered tools."""
     from types import MappingProxyType
@@ -23,5 +244,14 @@ def available_tools() -> Mapping[str, ToolFunction]:
     return MappingProxyType(TOOL_MAP)
 
 
-__all__ = ["TOOL_MAP", "available_tools", "ToolFunction"]
-
+__all__ = [
+    "TOOL_MAP",
+    "ASYNC_TOOL_MAP",
+    "ENTRY_POINTS",
+    "ASYNC_ENTRY_POINTS",
+    "LazyToolRegistry",
+    "call_tool",
+    "available_tools",
+    "ToolFunction",
+    "AsyncToolFunction",
+]
@@ -1,45 +1,135 @@
 # tools/api_stubs.py
 
+import json
+
+import metrics
+
+_log = metrics.get_logger(__name__)
+
 def write_python(*args, **kwargs):
-    print(f"[API STUB] write_python called with: {args}, {kwargs}")
+    metrics.log_call(_log, "write_python", args, kwargs)
     return {"status": "success", "code": "print('Hello, World!')"}
 
 def write_typescript(*args, **kwargs):
-    print(f"[API STUB] write_typescript called with: {args}, {kwargs}")
+    metrics.log_call(_log, "write_typescript", args, kwargs)
     return {"status": "success", "code": "console.log('Hello, World!');"}
 
 def refactor_code(*args, **kwargs):
-    print(f"[API STUB] refactor_code called with: {args}, {kwargs}")
+    metrics.log_call(_log, "refactor_code", args, kwargs)
     return {"status": "success", "refactored_code": "..."}
 
-def read_code(*args, **kwargs):
-    print(f"[API STUB] read_code called with: {args}, {kwargs}")
-    return {"status": "success", "explanation": "This code does..."}
+def read_code(path=None, symbol=None, start_line=None, end_line=None):
+    """Return source lines plus an outline, addressed by *path* and/or a *symbol* name."""
+    from loader import BASE_PATH, LoaderError
+    from tools import code_index, file_io
+
+    index = code_index.get_index()
+    if symbol is not None:
+        matches = [match for match in index.find_symbol(symbol) if path is None or match["file"] == path]
+        if not matches:
+            return {"status": "error", "message": f"Symbol '{symbol}' was not found."}
+        path = matches[0]["file"]
+        start_line, end_line = matches[0]["line"], matches[0]["end_line"]
+    if path is None:
+        return {"status": "error", "message": "read_code needs a path or a symbol."}
+    try:
+        target = file_io.resolve(path)
+        with target.open("r", encoding="utf-8", errors="replace") as handle:
+            lines = handle.read().splitlines()
+    except (LoaderError, OSError) as exc:
+        return {"status": "error", "message": str(exc)}
+    start = max(1, start_line or 1)
+    end = min(len(lines), end_line or len(lines))
+    return {
+        "status": "success",
+        "path": target.relative_to(BASE_PATH).as_posix(),
+        "start_line": start,
+        "end_line": end,
+        "code": "\n".join(lines[start - 1 : end]),
+        "outline": index.outline(target.relative_to(BASE_PATH).as_posix()),
+    }
 
 def fix_github_actions(*args, **kwargs):
-    print(f"[API STUB] fix_github_actions called with: {args}, {kwargs}")
+    metrics.log_call(_log, "fix_github_actions", args, kwargs)
     return {"status": "success", "fix_summary": "Fixed workflow."}
 
 def commit_message_thai(*args, **kwargs):
-    print(f"[API STUB] commit_message_thai called with: {args}, {kwargs}")
+    metrics.log_call(_log, "commit_message_thai", args, kwargs)
     return {"status": "success", "commit_message": "feat: เพิ่มฟีเจอร์ใหม่"}
 
 def deep_research(*args, **kwargs):
-    print(f"[API STUB] deep_research called with: {args}, {kwargs}")
+    metrics.log_call(_log, "deep_research", args, kwargs)
     return {"status": "success", "summary": "Deep research summary."}
 
 def create_mind_map(*args, **kwargs):
-    print(f"[API STUB] create_mind_map called with: {args}, {kwargs}")
+    metrics.log_call(_log, "create_mind_map", args, kwargs)
     return {"status": "success", "mind_map_url": "http://example.com/mindmap.png"}
 
-def memory_store(*args, **kwargs):
-    print(f"[API STUB] memory_store called with: {args}, {kwargs}")
-    return {"status": "success", "message": "Data stored."}
+def _memory_text(value):
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+def memory_store(
+    action="put", user_id=None, session_id="default", key=None, value=None, items=None, limit=None, query=None
+):
+    """Per-user, per-session memory: ``put``, ``put_many``, ``get``, ``scan``, ``similar``, ``delete`` or ``flush``.
+
+    ``scan`` and ``similar`` cover a session, or every session of the user
+    when ``session_id`` is ``None``.  ``similar`` returns the stored entries
+    closest to ``query``.
+    """
+    from tools import kv_store, vector_index
+
+    store = kv_store.default_store()
+    vectors = vector_index.get_index("memory")
+    if action == "flush":
+        return {"status": "success", "written": store.flush()}
+    if not user_id:
+        return {"status": "error", "message": "memory_store needs a user_id."}
+    try:
+        if action == "scan":
+            prefix = kv_store.make_key(user_id, session_id, "") if session_id else kv_store.make_key(user_id, "")
+            entries = store.scan("memory", prefix, limit)
+            return {"status": "success", "entries": [{"key": k[len(prefix):], "value": v} for k, v in entries]}
+        if action == "similar":
+            if not isinstance(query, str):
+                return {"status": "error", "message": "'similar' requires a query string."}
+            prefix = kv_store.make_key(user_id, session_id, "") if session_id else kv_store.make_key(user_id, "")
+            matches = vectors.search(query, limit or 5, prefix=prefix)
+            results = [
+                {"key": match.id[len(prefix):], "score": match.score, "value": store.get("memory", match.id)}
+                for match in matches
+            ]
+            return {"status": "success", "results": results}
+        if action == "put_many":
+            batch = items.items() if isinstance(items, dict) else (items or ())
+            entries = [(kv_store.make_key(user_id, session_id, name), data) for name, data in batch]
+            count = store.put_many("memory", entries)
+            vectors.add_many((entry_key, _memory_text(data)) for entry_key, data in entries)
+            return {"status": "success", "message": "Data stored.", "count": count}
+        if key is None:
+            return {"status": "error", "message": f"'{action}' requires a key."}
+        full_key = kv_store.make_key(user_id, session_id, key)
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}
+    if action == "put":
+        store.put("memory", full_key, value)
+        vectors.add(full_key, _memory_text(value))
+        return {"status": "success", "message": "Data stored."}
+    if action == "get":
+        found = store.get("memory", full_key, kv_store.MISSING)
+        if found is kv_store.MISSING:
+            return {"status": "success", "found": False, "value": None}
+        return {"status": "success", "found": True, "value": found}
+    if action == "delete":
+        store.delete("memory", full_key)
+        vectors.remove(full_key)
+        return {"status": "success", "message": "Data deleted."}
+    return {"status": "error", "message": f"Unknown memory_store action: {action}"}
 
 def think_deeper(*args, **kwargs):
-    print(f"[API STUB] think_deeper called with: {args}, {kwargs}")
+    metrics.log_call(_log, "think_deeper", args, kwargs)
     return {"status": "success", "analysis": "Deeper analysis of the topic."}
 
 def web_search(*args, **kwargs):
-    print(f"[API STUB] web_search called with: {args}, {kwargs}")
+    metrics.log_call(_log, "web_search", args, kwargs)
     return {"status": "success", "results": [{"title": "Result 1", "url": "http://example.com"}]}
@@ -0,0 +1,394 @@
+"""On-disk search index over a workspace for ``search``, ``read_code`` and ``find_symbol``.
+
+The index is a sqlite database with three posting tables:
+
+* ``postings``: lower-cased word tokens (and the parts of ``snake_case`` and
+  ``camelCase`` identifiers) to the lines that contain them,
+* ``trigrams``: three-character substrings to the files that contain them,
+  used to narrow substring searches before scanning, and
+* ``symbols``: classes, functions and assignments found by :mod:`ast` in
+  ``.py`` files.
+
+Each file row keeps its ``mtime_ns``/``size`` and its line start offsets.
+:meth:`CodeIndex.refresh` only re-reads files whose stat signature changed,
+and queries refresh at most every ``refresh_interval`` seconds, so lookups
+cost a few sqlite queries.
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Set, Tuple
+
+from loader import BASE_PATH
+
+
+MAX_FILE_BYTES = 1024 * 1024
+SKIP_DIRS = frozenset({".git", ".hg", ".svn", ".cache", "node_modules", "__pycache__", ".venv", "venv"})
+_WORD = re.compile(r"\w+")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_SCHEMA_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of *text*, plus the parts of compound identifiers."""
+
+    tokens: List[str] = []
+    for word in _WORD.findall(text):
+        lowered = word.lower()
+        tokens.append(lowered)
+        if "_" in word or not (word.islower() or word.isupper()):
+            parts = [part.lower() for piece in word.split("_") for part in _CAMEL_PART.findall(piece)]
+            if len(parts) > 1:
+                tokens.extend(part for part in parts if len(part) > 1 and part != lowered)
+    return tokens
+
+
+def _trigrams(text: str) -> Set[str]:
+    lowered = text.lower()
+    return {lowered[i : i + 3] for i in range(len(lowered) - 2)}
+
+
+class Symbol(NamedTuple):
+    name: str
+    kind: str
+    qualname: str
+    line: int
+    end_line: int
+
+
+def _python_symbols(source: str) -> List[Symbol]:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    symbols: List[Symbol] = []
+
+    def visit(nodes: Iterable[ast.AST], prefix: str) -> None:
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(node, ast.ClassDef) else ("method" if prefix else "function")
+                qualname = f"{prefix}{node.name}"
+                symbols.append(Symbol(node.name, kind, qualname, node.lineno, node.end_lineno or node.lineno))
+                visit(node.body, qualname + ".")
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and not prefix:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append(
+                            Symbol(target.id, "variable", target.id, node.lineno, node.end_lineno or node.lineno)
+                        )
+
+    visit(tree.body, "")
+    return symbols
+
+
+class LineHit(NamedTuple):
+    line: int
+    offset: int
+    text: str
+
+
+class SearchResult(NamedTuple):
+    path: str
+    score: float
+    lines: List[LineHit]
+
+
+class CodeIndex:
+    """Incrementally maintained index of the text files under *root*."""
+
+    def __init__(self, root: Path | str = BASE_PATH, db_path: Path | str | None = None, refresh_interval: float = 2.0):
+        self.root = Path(root).resolve()
+        if db_path is None:
+            digest = hashlib.sha1(str(self.root).encode("utf-8")).hexdigest()[:16]
+            db_path = BASE_PATH / ".cache" / "code-index" / f"{digest}.sqlite3"
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.refresh_interval = refresh_interval
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                tokens INTEGER NOT NULL,
+                line_offsets BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                token TEXT NOT NULL, file_id INTEGER NOT NULL, line INTEGER NOT NULL, count INTEGER NOT NULL,
+                PRIMARY KEY (token, file_id, line)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id);
+            CREATE TABLE IF NOT EXISTS trigrams (
+                trigram TEXT NOT NULL, file_id INTEGER NOT NULL,
+                PRIMARY KEY (trigram, file_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams(file_id);
+            CREATE TABLE IF NOT EXISTS symbols (
+                name TEXT NOT NULL, kind TEXT NOT NULL, qualname TEXT NOT NULL,
+                file_id INTEGER NOT NULL, line INTEGER NOT NULL, end_line INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name);
+            CREATE INDEX IF NOT EXISTS symbols_file ON symbols(file_id);
+            """
+        )
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(_SCHEMA_VERSION):
+            self._reset()
+
+    def _reset(self) -> None:
+        with self._db:
+            self._db.execute("BEGIN")
+            for table in ("files", "postings", "trigrams", "symbols"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(_SCHEMA_VERSION),))
+
+    # -- building ------------------------------------------------------
+
+    def _walk(self) -> Iterator[Tuple[str, os.stat_result]]:
+        for current, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+            for filename in filenames:
+                path = os.path.join(current, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_size <= MAX_FILE_BYTES:
+                    yield os.path.relpath(path, self.root), stat
+
+    def refresh(self) -> Tuple[int, int]:
+        """Bring the index up to date; returns ``(files reindexed, files removed)``."""
+
+        with self._lock:
+            known = {path: (file_id, mtime, size) for file_id, path, mtime, size in self._db.execute(
+                "SELECT id, path, mtime_ns, size FROM files"
+            )}
+            seen: Set[str] = set()
+            changed = 0
+            with self._db:
+                self._db.execute("BEGIN")
+                for path, stat in self._walk():
+                    seen.add(path)
+                    previous = known.get(path)
+                    if previous and previous[1] == stat.st_mtime_ns and previous[2] == stat.st_size:
+                        continue
+                    if previous:
+                        self._drop(previous[0])
+                    changed += self._index_file(path, stat)
+                removed = [entry[0] for path, entry in known.items() if path not in seen]
+                for file_id in removed:
+                    self._drop(file_id)
+            self._last_refresh = time.monotonic()
+            return changed, len(removed)
+
+    def _maybe_refresh(self) -> None:
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def _drop(self, file_id: int) -> None:
+        for table in ("postings", "trigrams", "symbols"):
+            self._db.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, path: str, stat: os.stat_result) -> int:
+        try:
+            with open(os.path.join(self.root, path), "rb") as handle:
+                data = handle.read()
+        except OSError:
+            return 0
+        if b"\0" in data[:8192]:
+            return 0  # binary
+        text = data.decode("utf-8", errors="replace")
+        offsets = array("Q")
+        postings: Dict[Tuple[str, int], int] = defaultdict(int)
+        position = 0
+        total = 0
+        for number, line in enumerate(data.split(b"\n"), 1):
+            offsets.append(position)
+            position += len(line) + 1
+            for token in tokenize(line.decode("utf-8", errors="replace")):
+                postings[(token, number)] += 1
+                total += 1
+        cursor = self._db.execute(
+            "INSERT INTO files (path, mtime_ns, size, tokens, line_offsets) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, total, offsets.tobytes()),
+        )
+        file_id = cursor.lastrowid
+        self._db.executemany(
+            "INSERT INTO postings (token, file_id, line, count) VALUES (?, ?, ?, ?)",
+            ((token, file_id, line, count) for (token, line), count in postings.items()),
+        )
+        self._db.executemany(
+            "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)", ((gram, file_id) for gram in _trigrams(text))
+        )
+        if path.endswith(".py"):
+            self._db.executemany(
+                "INSERT INTO symbols (name, kind, qualname, file_id, line, end_line) VALUES (?, ?, ?, ?, ?, ?)",
+                ((s.name, s.kind, s.qualname, file_id, s.line, s.end_line) for s in _python_symbols(text)),
+            )
+        return 1
+
+    # -- queries -------------------------------------------------------
+
+    def _lines(self, path: str, offsets: array, numbers: Sequence[int]) -> List[LineHit]:
+        hits = []
+        try:
+            with open(os.path.join(self.root, path), "rb") as handle:
+                for number in numbers:
+                    start = offsets[number - 1]
+                    handle.seek(start)
+                    text = handle.readline().decode("utf-8", errors="replace").rstrip("\r\n")
+                    hits.append(LineHit(number, start, text))
+        except OSError:
+            pass
+        return hits
+
+    def _offsets(self, blob: bytes) -> array:
+        offsets = array("Q")
+        offsets.frombytes(blob)
+        return offsets
+
+    def search(self, query: str, limit: int = 20, lines_per_file: int = 5) -> List[SearchResult]:
+        """Rank files by BM25 over the query tokens; every token must occur in the file."""
+
+        terms = list(dict.fromkeys(_WORD.findall(query.lower())))
+        if not terms:
+            return []
+        with self._lock:
+            self._maybe_refresh()
+            (documents, average) = self._db.execute("SELECT COUNT(*), AVG(tokens) FROM files").fetchone()
+            if not documents:
+                return []
+            average = average or 1.0
+            scores: Dict[int, float] = defaultdict(float)
+            matched: Dict[int, Set[str]] = defaultdict(set)
+            lines: Dict[int, Counter] = defaultdict(Counter)
+            for term in terms:
+                rows = self._db.execute(
+                    "SELECT p.file_id, p.line, p.count, f.tokens FROM postings p JOIN files f ON f.id = p.file_id "
+                    "WHERE p.token = ?",
+                    (term,),
+                ).fetchall()
+                per_file: Dict[int, Tuple[int, int]] = {}
+                for file_id, line, count, length in rows:
+                    frequency, _ = per_file.get(file_id, (0, length))
+                    per_file[file_id] = (frequency + count, length)
+                    lines[file_id][line] += 1  # distinct query terms on the line
+                idf = math.log(1 + (documents - len(per_file) + 0.5) / (len(per_file) + 0.5))
+                for file_id, (frequency, length) in per_file.items():
+                    norm = frequency + 1.2 * (0.25 + 0.75 * length / average)
+                    scores[file_id] += idf * frequency * 2.2 / norm
+                    matched[file_id].add(term)
+            ranked = sorted(
+                (file_id for file_id in scores if len(matched[file_id]) == len(terms)),
+                key=lambda file_id: -scores[file_id],
+            )[:limit]
+            results = []
+            for file_id in ranked:
+                path, blob = self._db.execute("SELECT path, line_offsets FROM files WHERE id = ?", (file_id,)).fetchone()
+                best = sorted(line for line, _ in lines[file_id].most_common(lines_per_file))
+                results.append(SearchResult(path, round(scores[file_id], 4), self._lines(path, self._offsets(blob), best)))
+            return results
+
+    def grep(self, needle: str, limit: int = 50) -> List[SearchResult]:
+        """Case-insensitive substring search, narrowed by trigram postings."""
+
+        lowered = needle.lower()
+        if not lowered:
+            return []
+        with self._lock:
+            self._maybe_refresh()
+            grams = sorted(_trigrams(lowered))
+            if grams:
+                placeholders = ",".join("?" * len(grams))
+                rows = self._db.execute(
+                    f"SELECT f.path FROM trigrams t JOIN files f ON f.id = t.file_id WHERE t.trigram IN ({placeholders}) "
+                    f"GROUP BY t.file_id HAVING COUNT(*) = ? ORDER BY f.path",
+                    (*grams, len(grams)),
+                ).fetchall()
+            else:
+                rows = self._db.execute("SELECT path FROM files ORDER BY path").fetchall()
+        results: List[SearchResult] = []
+        for (path,) in rows:
+            hits = []
+            offset = 0
+            try:
+                with open(os.path.join(self.root, path), "rb") as handle:
+                    for number, raw in enumerate(handle, 1):
+                        text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                        if lowered in text.lower():
+                            hits.append(LineHit(number, offset, text))
+                        offset += len(raw)
+            except OSError:
+                continue
+            if hits:
+                results.append(SearchResult(path, float(len(hits)), hits))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def find_symbol(self, name: str) -> List[Dict[str, Any]]:
+        """Definitions named *name* (or matching a dotted ``qualname``)."""
+
+        column = "qualname" if "." in name else "name"
+        with self._lock:
+            self._maybe_refresh()
+            rows = self._db.execute(
+                f"SELECT s.name, s.kind, s.qualname, f.path, s.line, s.end_line FROM symbols s "
+                f"JOIN files f ON f.id = s.file_id WHERE s.{column} = ? ORDER BY f.path, s.line",
+                (name,),
+            ).fetchall()
+        return [
+            {"name": n, "kind": kind, "qualname": qualname, "file": path, "line": line, "end_line": end_line}
+            for n, kind, qualname, path, line, end_line in rows
+        ]
+
+    def outline(self, path: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._maybe_refresh()
+            rows = self._db.execute(
+                "SELECT s.name, s.kind, s.qualname, s.line, s.end_line FROM symbols s JOIN files f ON f.id = s.file_id "
+                "WHERE f.path = ? ORDER BY s.line",
+                (path,),
+            ).fetchall()
+        return [{"name": n, "kind": k, "qualname": q, "line": l, "end_line": e} for n, k, q, l, e in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_INDEXES: Dict[str, CodeIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(root: Path | str = BASE_PATH) -> CodeIndex:
+    """Return the shared :class:`CodeIndex` for *root*."""
+
+    key = str(Path(root).resolve())
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = CodeIndex(key)
+        return index
+
+
+__all__ = ["CodeIndex", "SearchResult", "LineHit", "Symbol", "get_index", "tokenize", "MAX_FILE_BYTES", "SKIP_DIRS"]
@@ -0,0 +1,257 @@
+"""Pool of warm, sandboxed workers behind the ``execute_code`` tool.
+
+Starting an interpreter per snippet costs tens of milliseconds, so
+:class:`CodeRunnerPool` keeps a few :mod:`tools.code_runner_worker` processes
+running.  Each snippet goes to an idle worker, which forks a
+resource-limited child for it (see that module for the sandbox details).
+Workers are replaced after ``max_runs`` snippets, or when they die.
+
+Output is streamed: pass ``on_output`` to :meth:`CodeRunnerPool.run` to
+receive ``(stream, text)`` chunks as the snippet produces them.  Each stream
+is capped at ``max_output`` bytes.
+
+Limits and pool size come from the constructor or, for :func:`default_pool`,
+from ``AI_SANDBOX_EXEC_*`` environment variables.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+
+LANGUAGES = ("python", "bash", "sh")
+_WORKER_SCRIPT = Path(__file__).resolve().with_name("code_runner_worker.py")
+# Extra time the worker gets to report a timed-out job before it is killed.
+_GRACE_SECONDS = 5.0
+
+OutputCallback = Callable[[str, str], None]
+
+
+class CodeRunnerError(RuntimeError):
+    """Raised when a snippet cannot be run (as opposed to failing itself)."""
+
+
+@dataclass
+class ExecutionResult:
+    exit_code: int | None
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+    truncated: bool = False
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out
+
+
+@dataclass
+class _Limits:
+    timeout: float = 10.0
+    cpu_seconds: float = 10.0
+    memory_bytes: int = 512 * 1024 * 1024
+    max_file_bytes: int = 64 * 1024 * 1024
+    max_output: int = 1024 * 1024
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.runs = 0
+        self._process = subprocess.Popen(
+            [sys.executable, "-I", str(_WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        ready = self._process.stdout.readline()
+        if not ready.startswith('{"ready"'):
+            self.close()
+            raise CodeRunnerError("execute_code worker failed to start.")
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def run(self, job: dict, on_output: OutputCallback | None) -> ExecutionResult:
+        self.runs += 1
+        self._process.stdin.write(json.dumps(job) + "\n")
+        self._process.stdin.flush()
+
+        # Guard against a wedged worker; the worker enforces job["timeout"].
+        watchdog = threading.Timer(job["timeout"] + _GRACE_SECONDS, self._process.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        chunks = {"stdout": [], "stderr": []}
+        try:
+            for line in self._process.stdout:
+                message = json.loads(line)
+                if message.get("id") != job["id"]:
+                    continue
+                if "stream" in message:
+                    chunks[message["stream"]].append(message["data"])
+                    if on_output is not None:
+                        on_output(message["stream"], message["data"])
+                elif "done" in message:
+                    done = message["done"]
+                    return ExecutionResult(
+                        exit_code=done["exit_code"],
+                        stdout="".join(chunks["stdout"]),
+                        stderr="".join(chunks["stderr"]),
+                        timed_out=done["timed_out"],
+                        truncated=done["truncated"],
+                        duration=done["duration"],
+                    )
+                elif "error" in message:
+                    raise CodeRunnerError(f"execute_code worker error: {message['error']}")
+        finally:
+            watchdog.cancel()
+        raise CodeRunnerError("execute_code worker exited unexpectedly.")
+
+    def close(self) -> None:
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+
+@dataclass
+class CodeRunnerPool:
+    """A fixed number of warm workers shared by concurrent callers."""
+
+    size: int = 2
+    max_runs: int = 100
+    limits: _Limits = field(default_factory=_Limits)
+
+    def __post_init__(self) -> None:
+        self._idle: "queue.Queue[_Worker | None]" = queue.Queue()
+        self._ids = itertools.count(1)
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(_Worker())
+
+    def run(
+        self,
+        code: str,
+        language: str = "python",
+        timeout: float | None = None,
+        on_output: OutputCallback | None = None,
+    ) -> ExecutionResult:
+        """Run *code* in a sandboxed child of a warm worker and wait for it."""
+
+        if language not in LANGUAGES:
+            raise CodeRunnerError(f"Unsupported language '{language}'; expected one of {', '.join(LANGUAGES)}.")
+        if self._closed:
+            raise CodeRunnerError("The execute_code pool has been shut down.")
+        limits = self.limits
+        job = {
+            "id": next(self._ids),
+            "code": code,
+            "language": language,
+            "timeout": timeout if timeout is not None else limits.timeout,
+            "cpu_seconds": limits.cpu_seconds,
+            "memory_bytes": limits.memory_bytes,
+            "max_file_bytes": limits.max_file_bytes,
+            "max_output": limits.max_output,
+        }
+        worker = self._idle.get()
+        if worker is None or not worker.alive:
+            worker = self._replace(worker)
+        try:
+            return worker.run(job, on_output)
+        except (CodeRunnerError, OSError, ValueError) as exc:
+            worker.close()
+            if isinstance(exc, CodeRunnerError):
+                raise
+            raise CodeRunnerError(f"execute_code worker failed: {exc}") from exc
+        finally:
+            self._release(worker)
+
+    def _replace(self, worker: _Worker | None) -> _Worker:
+        if worker is not None:
+            worker.close()
+        try:
+            return _Worker()
+        except CodeRunnerError:
+            self._idle.put(None)  # keep the slot so the next caller retries
+            raise
+
+    def _release(self, worker: _Worker) -> None:
+        if self._closed:
+            worker.close()
+        elif not worker.alive or worker.runs >= self.max_runs:
+            worker.close()
+            # Spawn the replacement off the caller's path; the slot is
+            # filled lazily by the next ``run`` if that fails.
+            threading.Thread(target=self._refill, daemon=True).start()
+        else:
+            self._idle.put(worker)
+            self._drain_if_closed()
+
+    def _refill(self) -> None:
+        if self._closed:
+            return
+        try:
+            self._idle.put(_Worker())
+        except CodeRunnerError:
+            self._idle.put(None)
+        self._drain_if_closed()
+
+    def _drain_if_closed(self) -> None:
+        # ``close`` may have drained the queue just before a worker was put back.
+        if self._closed:
+            self.close()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.close()
+
+
+_DEFAULT: CodeRunnerPool | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_pool() -> CodeRunnerPool:
+    """Return the process-wide pool, starting its workers on first use."""
+
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            env = os.environ.get
+            limits = _Limits(
+                timeout=float(env("AI_SANDBOX_EXEC_TIMEOUT", "10")),
+                cpu_seconds=float(env("AI_SANDBOX_EXEC_CPU_SECONDS", "10")),
+                memory_bytes=int(env("AI_SANDBOX_EXEC_MEMORY_MB", "512")) * 1024 * 1024,
+                max_output=int(env("AI_SANDBOX_EXEC_MAX_OUTPUT", str(1024 * 1024))),
+            )
+            _DEFAULT = CodeRunnerPool(
+                size=int(env("AI_SANDBOX_EXEC_WORKERS", "2")),
+                max_runs=int(env("AI_SANDBOX_EXEC_MAX_RUNS", "100")),
+                limits=limits,
+            )
+            atexit.register(_DEFAULT.close)
+        return _DEFAULT
+
+
+__all__ = ["CodeRunnerPool", "ExecutionResult", "CodeRunnerError", "OutputCallback", "default_pool", "LANGUAGES"]
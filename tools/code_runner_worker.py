@@ -0,0 +1,311 @@
+"""Warm worker process for :mod:`tools.code_runner`.
+
+Started once per pool slot with ``python -I code_runner_worker.py``.  It reads
+one JSON job per line from stdin and, for each job, forks a child that:
+
+* moves into a fresh temporary directory and its own process group,
+* drops into new user and network namespaces, so it has no network,
+* confines the filesystem with Landlock: it may write only inside its
+  temporary directory (and to ``/dev``) and read only system directories and
+  the interpreter's own library paths,
+* applies CPU, address-space, file-size and descriptor rlimits, and
+* runs the snippet (Python in the already-initialised interpreter, shell
+  snippets via ``exec``).
+
+When the kernel offers either namespaces or Landlock (5.13+, enabled in the
+LSM list) but not both, the snippet is refused with exit status 126 rather than
+run half-isolated.
+
+The child's stdout/stderr are relayed as they arrive, capped at the job's
+``max_output`` bytes per stream, followed by a ``done`` message.  The timeout
+covers the child's exit as well as its output, and the child's process group
+is killed when the job ends, so nothing the snippet started outlives it.  The
+worker itself never runs snippet code, so it stays clean between jobs.
+"""
+from __future__ import annotations
+
+import codecs
+import ctypes
+import json
+import os
+import resource
+import selectors
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+# Warm the modules snippets commonly import so forked children get them free.
+import collections  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import re  # noqa: F401
+import statistics  # noqa: F401
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_SHELLS = {"bash": ("bash", "-c"), "sh": ("sh", "-c")}
+
+# Landlock system calls (the same numbers on every architecture) and flags.
+_SYS_LANDLOCK_CREATE_RULESET = 444
+_SYS_LANDLOCK_ADD_RULE = 445
+_SYS_LANDLOCK_RESTRICT_SELF = 446
+_LANDLOCK_CREATE_RULESET_VERSION = 1
+_LANDLOCK_RULE_PATH_BENEATH = 1
+_PR_SET_NO_NEW_PRIVS = 38
+_FS_EXECUTE = 1 << 0
+_FS_WRITE_FILE = 1 << 1
+_FS_READ_FILE = 1 << 2
+_FS_READ_DIR = 1 << 3
+_FS_ABI1 = (1 << 13) - 1  # EXECUTE .. MAKE_SYM
+_FS_REFER = 1 << 13  # ABI 2
+_FS_TRUNCATE = 1 << 14  # ABI 3
+_FS_FILE_ONLY = _FS_EXECUTE | _FS_WRITE_FILE | _FS_READ_FILE | _FS_TRUNCATE
+_READ_ONLY_ROOTS = ("/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/etc", "/proc")
+
+
+class _RulesetAttr(ctypes.Structure):
+    _fields_ = [("handled_access_fs", ctypes.c_uint64)]
+
+
+class _PathBeneathAttr(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("allowed_access", ctypes.c_uint64), ("parent_fd", ctypes.c_int32)]
+
+
+def _isolate_network() -> bool:
+    """Enter empty user + network namespaces; ``False`` if unsupported."""
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _confine_filesystem(workdir: str) -> bool:
+    """Restrict this process with Landlock; ``False`` if unsupported."""
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.syscall.restype = ctypes.c_long
+        abi = libc.syscall(_SYS_LANDLOCK_CREATE_RULESET, None, ctypes.c_size_t(0), _LANDLOCK_CREATE_RULESET_VERSION)
+        if abi < 1:
+            return False
+        handled = _FS_ABI1 | (_FS_REFER if abi >= 2 else 0) | (_FS_TRUNCATE if abi >= 3 else 0)
+        attr = _RulesetAttr(handled)
+        ruleset = libc.syscall(_SYS_LANDLOCK_CREATE_RULESET, ctypes.byref(attr), ctypes.c_size_t(ctypes.sizeof(attr)), 0)
+        if ruleset < 0:
+            return False
+        read = _FS_EXECUTE | _FS_READ_FILE | _FS_READ_DIR
+        rules = {path: read for path in (*_READ_ONLY_ROOTS, sys.prefix, sys.base_prefix, sys.exec_prefix, *sys.path)}
+        rules["/dev"] = read | _FS_WRITE_FILE
+        rules[workdir] = handled
+        try:
+            for path, access in rules.items():
+                try:
+                    fd = os.open(path, os.O_PATH | os.O_CLOEXEC)
+                except OSError:
+                    continue  # missing on this system
+                try:
+                    if not os.path.isdir(path):
+                        access &= _FS_FILE_ONLY
+                    rule = _PathBeneathAttr(access & handled, fd)
+                    if libc.syscall(_SYS_LANDLOCK_ADD_RULE, ruleset, _LANDLOCK_RULE_PATH_BENEATH, ctypes.byref(rule), 0):
+                        return False
+                finally:
+                    os.close(fd)
+            if libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0):
+                return False
+            return libc.syscall(_SYS_LANDLOCK_RESTRICT_SELF, ruleset, 0) == 0
+        finally:
+            os.close(ruleset)
+    except (OSError, AttributeError):
+        return False
+
+
+def _apply_limits(job: dict) -> None:
+    cpu = max(1, int(job["cpu_seconds"]))
+    limits = [
+        (resource.RLIMIT_CPU, cpu),
+        (resource.RLIMIT_CORE, 0),
+        (resource.RLIMIT_FSIZE, int(job["max_file_bytes"])),
+        (resource.RLIMIT_NOFILE, 64),
+    ]
+    if job.get("memory_bytes"):
+        limits.append((resource.RLIMIT_AS, int(job["memory_bytes"])))
+    for limit, value in limits:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _child(job: dict, workdir: str, out_w: int, err_w: int, proto_fds: tuple) -> None:
+    """Runs in the forked child; never returns."""
+
+    code = 1
+    try:
+        os.setpgid(0, 0)
+        for fd in proto_fds:
+            os.close(fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        for fd in (devnull, out_w, err_w):
+            os.close(fd)
+        os.chdir(workdir)
+        if not _isolate_network():
+            os.write(2, b"Snippets need user and network namespaces, which are unavailable here.\n")
+            os._exit(126)
+        if not _confine_filesystem(workdir):
+            os.write(2, b"Snippets need Landlock filesystem confinement, which is unavailable here.\n")
+            os._exit(126)
+        language = job["language"]
+        _apply_limits(job)
+        env = {"PATH": "/usr/local/bin:/usr/bin:/bin", "HOME": workdir, "TMPDIR": workdir, "LANG": "C.UTF-8"}
+        if language in _SHELLS:
+            os.execvpe(_SHELLS[language][0], [*_SHELLS[language], job["code"]], env)
+        os.environ.clear()
+        os.environ.update(env)
+        tempfile.tempdir = workdir
+        sys.stdout = open(1, "w", encoding="utf-8", errors="replace", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", encoding="utf-8", errors="replace", buffering=1, closefd=False)
+        sys.stdin = open(0, "r", closefd=False)
+        sys.argv = ["<snippet>"]
+        sys.path[:] = [p for p in sys.path if p and os.path.isdir(p)]
+        try:
+            exec(compile(job["code"], "<snippet>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+            code = 0
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+            if not isinstance(exc.code, (int, type(None))):
+                print(exc.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        try:
+            traceback.print_exc()
+        except BaseException:
+            pass
+    finally:
+        os._exit(code)
+
+
+def _run(job: dict, emit, proto_fds: tuple) -> dict:
+    workdir = tempfile.mkdtemp(prefix="execute-code-")
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        _child(job, workdir, out_w, err_w, proto_fds)
+    try:
+        os.setpgid(pid, pid)  # also done by the child; whichever runs first wins
+    except OSError:
+        pass
+    os.close(out_w)
+    os.close(err_w)
+
+    cap = int(job["max_output"])
+    deadline = started + float(job["timeout"])
+    streams = {out_r: "stdout", err_r: "stderr"}
+    decoders = {fd: codecs.getincrementaldecoder("utf-8")("replace") for fd in streams}
+    sent = dict.fromkeys(streams, 0)
+    truncated = timed_out = False
+    selector = selectors.DefaultSelector()
+    for fd in streams:
+        os.set_blocking(fd, False)
+        selector.register(fd, selectors.EVENT_READ)
+    try:
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for key, _mask in selector.select(remaining):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+                room = cap - sent[key.fd]
+                if room <= 0:
+                    truncated = True
+                    continue  # keep draining so the child does not block
+                if len(chunk) > room:
+                    chunk, truncated = chunk[:room], True
+                sent[key.fd] += len(chunk)
+                text = decoders[key.fd].decode(chunk)
+                if text:
+                    emit({"id": job["id"], "stream": streams[key.fd], "data": text})
+        # Both streams can reach EOF while the child keeps running (it may
+        # close fds 1 and 2), so the deadline applies to its exit as well.
+        # WNOWAIT leaves it unreaped, so its pid cannot be reused before killpg.
+        while not timed_out and os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+            else:
+                time.sleep(min(remaining, 0.01))
+    finally:
+        selector.close()
+        # Always kill the group: it takes down a child past its deadline and
+        # anything it left running in the background.
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        _, status = os.waitpid(pid, 0)
+        for fd in streams:
+            os.close(fd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    return {
+        "id": job["id"],
+        "done": {
+            "exit_code": exit_code,
+            "timed_out": timed_out,
+            "truncated": truncated,
+            "duration": time.monotonic() - started,
+        },
+    }
+
+
+def main() -> int:
+    # Keep the protocol off fds 0/1 so children can take them over.
+    proto_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    proto_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    def emit(message: dict) -> None:
+        proto_out.write(json.dumps(message) + "\n")
+        proto_out.flush()
+
+    emit({"ready": os.getpid()})
+    proto_fds = (proto_in.fileno(), proto_out.fileno())
+    for line in proto_in:
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        try:
+            emit(_run(job, emit, proto_fds))
+        except Exception as exc:  # report and stay available
+            emit({"id": job.get("id"), "error": f"{type(exc).__name__}: {exc}"})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,152 @@
 # tools/core_logic.py
 
-def prompt_cache(*args, **kwargs):
-    print(f"[TOOL EXECUTED] prompt_cache with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "message": "Prompt cache accessed."}
+import metrics
 
-def file_manager(*args, **kwargs):
-    print(f"[TOOL EXECUTED] file_manager with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "files": ["file1.txt", "file2.txt"]}
+_log = metrics.get_logger(__name__)
 
-def user_profile_manager(*args, **kwargs):
-    print(f"[TOOL EXECUTED] user_profile_manager with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "user_profile": {"name": "Jules", "preferences": "Python"}}
+def prompt_cache(action="stats", prompt=None, value=None, persona=None, rules=()):
+    """Look up or store a refined prompt in the shared prompt cache.
+
+    ``action`` is one of ``get``, ``prefix``, ``put``, ``stats``, ``save`` or ``clear``.
+    """
+    from tools.prompt_cache import default_cache, prompt_segments
+
+    cache = default_cache()
+    if action == "stats":
+        info = cache.info()
+        return {"status": "success", "stats": dict(info._asdict(), hit_rate=info.hit_rate)}
+    if action == "clear":
+        cache.clear()
+        return {"status": "success", "message": "Prompt cache cleared."}
+    if action == "save":
+        if cache.path is None:
+            return {"status": "error", "message": "Prompt cache persistence is disabled."}
+        return {"status": "success", "path": str(cache.save())}
+    if not isinstance(prompt, str):
+        return {"status": "error", "message": f"'{action}' requires a prompt string."}
+    segments = prompt_segments(prompt, persona, rules)
+    if action == "get":
+        found = segments in cache
+        return {"status": "success", "hit": found, "value": cache.get(segments)}
+    if action == "prefix":
+        depth, cached = cache.longest_prefix(segments)
+        return {"status": "success", "depth": depth, "value": cached}
+    if action == "put":
+        cache.put(segments, value)
+        return {"status": "success", "message": "Prompt cached."}
+    return {"status": "error", "message": f"Unknown prompt_cache action: {action}"}
+
+def file_manager(action="list", path=".", content=None, cursor=None, limit=100, offset=0, length=None):
+    """Manage workspace files: ``list`` (paginated), ``upload``, ``download`` or ``delete``."""
+    from loader import LoaderError
+    from tools import file_io
+    from tools.standard_tools import delete_file, read_file, write_file
+
+    if action == "upload":
+        return write_file(path, content if content is not None else "")
+    if action == "download":
+        return read_file(path, offset, length)
+    if action == "delete":
+        return delete_file(path)
+    if action != "list":
+        return {"status": "error", "message": f"Unknown file_manager action: {action}"}
+    try:
+        page = file_io.list_dir(path, cursor, limit)
+    except (LoaderError, OSError, ValueError) as exc:
+        return {"status": "error", "message": str(exc)}
+    return {
+        "status": "success",
+        "files": [entry._asdict() for entry in page.entries],
+        "next_cursor": page.next_cursor,
+    }
+
+def user_profile_manager(action="get", user_id=None, field=None, updates=None):
+    """Long-term user profiles, one stored entry per field.
+
+    ``action`` is ``get`` (the whole profile, or one ``field``), ``update``
+    (merge the ``updates`` mapping; ``None`` values remove fields) or ``delete``.
+    """
+    from tools.kv_store import MISSING, default_store, make_key
+
+    if not user_id:
+        return {"status": "error", "message": "user_profile_manager needs a user_id."}
+    store = default_store()
+    try:
+        prefix = make_key(user_id, "")
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}
+    if action == "get":
+        if field is not None:
+            found = store.get("profile", prefix + field, MISSING)
+            if found is MISSING:
+                return {"status": "error", "message": f"Profile field '{field}' is not set."}
+            return {"status": "success", "user_profile": {field: found}}
+        fields = store.scan("profile", prefix)
+        return {"status": "success", "user_profile": {key[len(prefix):]: value for key, value in fields}}
+    if action == "update":
+        if not isinstance(updates, dict) or not updates:
+            return {"status": "error", "message": "'update' requires a mapping of fields."}
+        changed = {name: value for name, value in updates.items() if value is not None}
+        store.put_many("profile", ((prefix + name, value) for name, value in changed.items()))
+        for name in updates.keys() - changed.keys():
+            store.delete("profile", prefix + name)
+        return {"status": "success", "updated": sorted(updates)}
+    if action == "delete":
+        removed = store.delete_prefix("profile", prefix)
+        return {"status": "success", "removed": removed}
+    return {"status": "error", "message": f"Unknown user_profile_manager action: {action}"}
 
 def create_learning_plan(*args, **kwargs):
-    print(f"[TOOL EXECUTED] create_learning_plan with args: {args}, kwargs: {kwargs}")
+    metrics.log_call(_log, "create_learning_plan", args, kwargs)
     return {"status": "success", "plan": "1. Learn basics. 2. Practice. 3. Advanced topics."}
 
-def find_analogy(*args, **kwargs):
-    print(f"[TOOL EXECUTED] find_analogy with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "analogy": "A tool registry is like a phone book for functions."}
+_DEFAULT_ANALOGY = "A tool registry is like a phone book for functions."
+
+def find_analogy(concept=None, action="find", analogy=None, k=3):
+    """Find stored analogies close to ``concept``, or ``add`` a new ``analogy`` for it."""
+    from tools.vector_index import get_index
+
+    if not isinstance(concept, str) or not concept.strip():
+        return {"status": "error", "message": "find_analogy needs a concept."}
+    index = get_index("analogies")
+    if action == "add":
+        if not isinstance(analogy, str) or not analogy.strip():
+            return {"status": "error", "message": "'add' requires an analogy string."}
+        index.add(f"{concept}\x1f{analogy}", f"{concept}: {analogy}")
+        return {"status": "success", "message": "Analogy stored."}
+    if action != "find":
+        return {"status": "error", "message": f"Unknown find_analogy action: {action}"}
+    matches = index.search(concept, k)
+    if not matches:
+        return {"status": "success", "analogy": _DEFAULT_ANALOGY, "matches": []}
+    found = [
+        {"concept": match.id.split("\x1f", 1)[0], "analogy": match.id.split("\x1f", 1)[-1], "score": match.score}
+        for match in matches
+    ]
+    return {"status": "success", "analogy": found[0]["analogy"], "matches": found}
+
+def generate_quiz(topic=None, count=3, difficulty=None, learners=None, seed=0):
+    """Pick quiz questions from the shared bank for one learner, or for each of ``learners``."""
+    from tools.quiz import QuizError, generate_quizzes
+
+    requests = learners if learners is not None else [{"topic": topic, "count": count, "difficulty": difficulty}]
+    try:
+        quizzes = generate_quizzes(requests, seed)
+    except QuizError as exc:
+        return {"status": "error", "message": str(exc)}
+    if learners is not None:
+        return {"status": "success", "quizzes": quizzes}
+    return {"status": "success", "quiz": quizzes[0]["quiz"]}
 
-def generate_quiz(*args, **kwargs):
-    print(f"[TOOL EXECUTED] generate_quiz with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "quiz": [{"question": "What is Python?", "answer": "A programming language."}]}
+def evaluate_answer(question_id=None, answer=None, answers=None):
+    """Score one answer, or a batch of ``{"learner_id", "question_id", "answer"}`` records."""
+    from tools.quiz import QuizError, evaluate_answers
 
-def evaluate_answer(*args, **kwargs):
-    print(f"[TOOL EXECUTED] evaluate_answer with args: {args}, kwargs: {kwargs}")
-    return {"status": "success", "feedback": "Your answer is correct and well-explained."}
+    batch = answers if answers is not None else [{"question_id": question_id, "answer": answer}]
+    try:
+        results = evaluate_answers(batch)
+    except QuizError as exc:
+        return {"status": "error", "message": str(exc)}
+    if answers is not None:
+        return {"status": "success", "results": results}
+    return dict(results[0], status="success")
@@ -0,0 +1,192 @@
+"""Sandboxed file access for the file tools, built for large artifacts.
+
+Every path is resolved against the repository root and checked with the same
+rule as :func:`loader._ensure_within_base`, so symlinks and ``..`` cannot
+escape the sandbox.
+
+* :func:`iter_chunks` streams a file (or a byte range) in fixed-size chunks.
+* :func:`read_range` maps the file and returns a zero-copy ``memoryview``.
+* :func:`write_stream` writes chunks to a temporary file in the target
+  directory and renames it into place, so readers never see partial files.
+* :func:`list_dir` pages through a directory with ``os.scandir``, stat-ing
+  only the entries it returns.
+"""
+from __future__ import annotations
+
+import heapq
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple
+
+from loader import BASE_PATH, _ensure_within_base
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_PAGE_SIZE = 100
+
+
+def resolve(path: str | os.PathLike) -> Path:
+    """Resolve *path* (relative paths are taken from the repository root) inside the sandbox."""
+
+    candidate = Path(path)
+    if not candidate.is_absolute():
+        candidate = BASE_PATH / candidate
+    return _ensure_within_base(candidate)
+
+
+def iter_chunks(
+    path: str | os.PathLike,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    offset: int = 0,
+    length: int | None = None,
+) -> Iterator[bytes]:
+    """Yield the bytes of *path* from *offset* in chunks of at most *chunk_size*."""
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    remaining = length
+    with resolve(path).open("rb", buffering=0) as handle:
+        if offset:
+            handle.seek(offset)
+        while remaining is None or remaining > 0:
+            chunk = handle.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def read_range(path: str | os.PathLike, offset: int = 0, length: int | None = None) -> memoryview:
+    """Return bytes ``[offset, offset + length)`` of *path* as a view over a memory map.
+
+    Only the touched pages are read from disk.  The mapping stays open for as
+    long as the returned view (or a slice of it) is referenced; call
+    ``release()`` on the view to unmap it early.
+    """
+
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError("offset and length must not be negative.")
+    with resolve(path).open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if offset >= size or length == 0:
+            return memoryview(b"")
+        mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    end = size if length is None else min(size, offset + length)
+    view = memoryview(mapping)
+    try:
+        return view[offset:end]
+    finally:
+        view.release()
+
+
+def write_stream(
+    path: str | os.PathLike,
+    chunks: Iterable[bytes | bytearray | memoryview | str],
+    encoding: str = "utf-8",
+    fsync: bool = True,
+) -> int:
+    """Atomically replace *path* with the concatenation of *chunks*.
+
+    Returns the number of bytes written.  The existing file's permissions are
+    kept.  On any error the temporary file is removed and *path* is left as
+    it was.
+    """
+
+    target = resolve(path)
+    if target.is_dir():
+        raise IsADirectoryError(f"'{path}' is a directory.")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    written = 0
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(encoding)
+                handle.write(chunk)
+                written += len(chunk) if not isinstance(chunk, memoryview) else chunk.nbytes
+            handle.flush()
+            if fsync:
+                os.fsync(handle.fileno())
+        try:
+            os.chmod(tmp_name, target.stat().st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_name, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return written
+
+
+def delete(path: str | os.PathLike) -> None:
+    target = resolve(path)
+    if target == BASE_PATH or target.is_dir():
+        raise IsADirectoryError(f"'{path}' is a directory.")
+    target.unlink()
+
+
+class DirEntry(NamedTuple):
+    name: str
+    kind: str  # "file", "dir", "symlink" or "other"
+    size: int | None
+
+
+class DirectoryPage(NamedTuple):
+    entries: List[DirEntry]
+    next_cursor: str | None
+
+
+def _kind(entry: os.DirEntry) -> str:
+    if entry.is_symlink():
+        return "symlink"
+    if entry.is_dir(follow_symlinks=False):
+        return "dir"
+    if entry.is_file(follow_symlinks=False):
+        return "file"
+    return "other"
+
+
+def list_dir(path: str | os.PathLike = ".", cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> DirectoryPage:
+    """Return up to *limit* entries of *path* whose names sort after *cursor*.
+
+    Pass the returned ``next_cursor`` back to get the following page; it is
+    ``None`` on the last page.  Pages are in name order and stay consistent
+    while entries are added or removed between calls.
+    """
+
+    if limit <= 0:
+        raise ValueError("limit must be positive.")
+    directory = resolve(path)
+    with os.scandir(directory) as iterator:
+        candidates = (entry for entry in iterator if cursor is None or entry.name > cursor)
+        # One more than requested tells us whether another page exists.
+        selected = heapq.nsmallest(limit + 1, candidates, key=lambda entry: entry.name)
+        page = selected[:limit]
+        entries = []
+        for entry in page:
+            kind = _kind(entry)
+            size = entry.stat(follow_symlinks=False).st_size if kind == "file" else None
+            entries.append(DirEntry(entry.name, kind, size))
+    next_cursor = page[-1].name if len(selected) > limit else None
+    return DirectoryPage(entries, next_cursor)
+
+
+__all__ = [
+    "resolve",
+    "iter_chunks",
+    "read_range",
+    "write_stream",
+    "delete",
+    "list_dir",
+    "DirEntry",
+    "DirectoryPage",
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_PAGE_SIZE",
+]
@@ -0,0 +1,266 @@
+"""Embedded key-value store behind ``memory_store`` and ``user_profile_manager``.
+
+Values are JSON documents in a sqlite database in WAL mode, keyed by
+``(namespace, key)``.  Keys are ``/``-separated paths such as
+``<user>/<session>/<name>``, so :meth:`KVStore.scan` can list everything for
+a user or a session with a range query on the primary key.
+
+Writes are buffered: :meth:`KVStore.put`, :meth:`KVStore.put_many` and
+:meth:`KVStore.delete` update an in-memory buffer that a background thread
+commits every ``flush_interval`` seconds (or once ``max_pending`` writes are
+waiting) in a single transaction, so a burst of small updates costs one
+fsync.  Reads and scans see buffered writes immediately.  Call
+:meth:`KVStore.flush` when a write must be on disk before continuing.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+from loader import BASE_PATH
+
+
+DEFAULT_PATH = BASE_PATH / ".cache" / "kv-store.sqlite3"
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_MAX_PENDING = 1000
+# Sorts after every character a key can contain, closing prefix ranges.
+_PREFIX_END = "\U0010ffff"
+_DELETED = object()
+#: Default for :meth:`KVStore.get` that tells a missing key from a stored ``null``.
+MISSING = object()
+
+
+def make_key(*parts: str) -> str:
+    """Join key parts with ``/``; every part but the last must not contain ``/``."""
+
+    if not parts:
+        raise ValueError("A key needs at least one part.")
+    for part in parts[:-1]:
+        if not part or "/" in part:
+            raise ValueError(f"Key part '{part}' must be non-empty and must not contain '/'.")
+    return "/".join(parts)
+
+
+class KVStoreInfo(NamedTuple):
+    pending: int
+    flushes: int
+    flushed_writes: int
+    path: str
+
+
+class KVStore:
+    """sqlite-backed JSON store with a write-behind buffer."""
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_PATH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # (namespace, key) -> JSON text, or _DELETED
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        # The batch being committed; still visible to readers until it lands.
+        self._inflight: Dict[Tuple[str, str], Any] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.flushes = self.flushed_writes = 0
+        writer = self._connection()
+        writer.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._flusher = threading.Thread(target=self._flush_loop, name="kv-store-flush", daemon=True)
+        self._flusher.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+            # FULL makes every commit one fsync of the WAL; batching is what keeps that cheap.
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    # -- reads ---------------------------------------------------------
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Return the value stored under *key*, or *default*."""
+
+        with self._pending_lock:
+            pending = self._pending.get((namespace, key), self._inflight.get((namespace, key)))
+        if pending is not None:
+            return default if pending is _DELETED else json.loads(pending)
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def scan(self, namespace: str, prefix: str = "", limit: int | None = None) -> List[Tuple[str, Any]]:
+        """Return ``(key, value)`` pairs whose key starts with *prefix*, in key order."""
+
+        # Snapshot the buffers before reading the table, as ``get`` does: a
+        # flush landing in between then shows up in the rows instead of being
+        # missed by both.
+        with self._pending_lock:
+            overlay = {
+                key: value
+                for buffered in (self._inflight, self._pending)
+                for (space, key), value in buffered.items()
+                if space == namespace and key.startswith(prefix)
+            }
+        rows = self._connection().execute(
+            "SELECT key, value FROM kv WHERE namespace = ? AND key >= ? AND key < ? ORDER BY key",
+            (namespace, prefix, prefix + _PREFIX_END),
+        ).fetchall()
+        if overlay:
+            merged = dict(rows)
+            merged.update(overlay)
+            rows = sorted((key, value) for key, value in merged.items() if value is not _DELETED)
+        if limit is not None:
+            rows = rows[:limit]
+        return [(key, json.loads(value)) for key, value in rows]
+
+    # -- writes --------------------------------------------------------
+
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        self.put_many(namespace, [(key, value)])
+
+    def put_many(self, namespace: str, items: Iterable[Tuple[str, Any]]) -> int:
+        """Buffer several writes at once; returns how many were buffered."""
+
+        encoded = [((namespace, key), json.dumps(value, ensure_ascii=False)) for key, value in items]
+        self._buffer(encoded)
+        return len(encoded)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._buffer([((namespace, key), _DELETED)])
+
+    def delete_prefix(self, namespace: str, prefix: str) -> int:
+        """Delete every key under *prefix*; returns how many were removed."""
+
+        keys = [key for key, _value in self.scan(namespace, prefix)]
+        self._buffer([((namespace, key), _DELETED) for key in keys])
+        return len(keys)
+
+    def _buffer(self, writes: List[Tuple[Tuple[str, str], Any]]) -> None:
+        if self._closed:
+            raise RuntimeError("The key-value store has been closed.")
+        with self._pending_lock:
+            self._pending.update(writes)
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Commit buffered writes now; returns how many were written."""
+
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return 0
+                batch = self._inflight = self._pending
+                self._pending = {}
+            now = time.time()
+            writer = self._connection()
+            try:
+                writer.execute("BEGIN IMMEDIATE")
+                writer.executemany(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                    [(space, key, value, now) for (space, key), value in batch.items() if value is not _DELETED],
+                )
+                writer.executemany(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ?",
+                    [(space, key) for (space, key), value in batch.items() if value is _DELETED],
+                )
+                writer.execute("COMMIT")
+            except sqlite3.Error:
+                if writer.in_transaction:
+                    writer.execute("ROLLBACK")
+                with self._pending_lock:
+                    # Keep newer writes that arrived while this batch failed.
+                    batch.update(self._pending)
+                    self._pending, self._inflight = batch, {}
+                raise
+            with self._pending_lock:
+                self._inflight = {}
+            self.flushes += 1
+            self.flushed_writes += len(batch)
+            return len(batch)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                time.sleep(self.flush_interval)
+
+    def info(self) -> KVStoreInfo:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return KVStoreInfo(pending, self.flushes, self.flushed_writes, str(self.path))
+
+    def close(self) -> None:
+        """Flush outstanding writes and close every connection."""
+
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+_DEFAULT: KVStore | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_store() -> KVStore:
+    """Return the process-wide store, opened on first use.
+
+    ``AI_SANDBOX_KV_PATH`` sets the database file and
+    ``AI_SANDBOX_KV_FLUSH_MS`` the write-behind interval.
+    """
+
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            path = os.environ.get("AI_SANDBOX_KV_PATH") or DEFAULT_PATH
+            interval = float(os.environ.get("AI_SANDBOX_KV_FLUSH_MS", DEFAULT_FLUSH_INTERVAL * 1000)) / 1000
+            _DEFAULT = KVStore(path, flush_interval=interval)
+            atexit.register(_DEFAULT.close)
+        return _DEFAULT
+
+
+__all__ = ["KVStore", "KVStoreInfo", "default_store", "make_key", "MISSING", "DEFAULT_PATH"]
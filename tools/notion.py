@@ -0,0 +1,548 @@
+"""Client for the Notion action described in ``action/notion_core.yaml``.
+
+The OpenAPI document is read when a client is created.  Every
+``operationId`` becomes a method (``getPage`` -> ``client.get_page``) whose
+path, query and header parameters and request body are taken from the spec,
+and operations answering with ``ListResponse`` can be paginated:
+
+* requests go through a pool of keep-alive ``http.client`` connections;
+* ``GET`` responses are cached with their ``ETag`` and revalidated with
+  ``If-None-Match``;
+* ``429`` answers are retried with exponential backoff and jitter, and pause
+  every request on the client for ``Retry-After`` seconds; ``5xx`` answers
+  and network failures are retried only for idempotent methods (``GET``,
+  ``PUT``, ``DELETE``...), since a ``POST``/``PATCH`` may already have been
+  applied;
+* :meth:`NotionClient.paginate` is an async generator that fetches the next
+  page while the caller consumes the current one;
+* :meth:`NotionClient.bulk` (and ``create_pages`` / ``update_pages``) run
+  many calls with bounded concurrency.
+
+Environment variables:
+
+``NOTION_TOKEN``
+    Integration token, sent as ``Authorization: Bearer``.
+``NOTION_BASE_URL``
+    Overrides the spec's server URL, e.g. for ``scripts/notion_stub_server.py``.
+``NOTION_VERSION``
+    ``Notion-Version`` header; defaults to the spec's example value.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+import metrics
+from loader import BASE_PATH, parse_yaml_file
+
+
+DEFAULT_SPEC_PATH = BASE_PATH / "action" / "notion_core.yaml"
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30.0
+# Notion allows an average of about three requests per second per integration.
+DEFAULT_BULK_CONCURRENCY = 3
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+_METHODS = ("get", "put", "post", "patch", "delete")
+_STALE_CONNECTION = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class NotionError(RuntimeError):
+    """Raised for error responses and for calls the spec does not allow."""
+
+    def __init__(self, message: str, status: int | None = None, code: str | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class Parameter(NamedTuple):
+    name: str
+    location: str  # "path", "query" or "header"
+    required: bool
+    example: Any = None
+
+
+class Operation(NamedTuple):
+    operation_id: str
+    method: str
+    path: str
+    parameters: Tuple[Parameter, ...]
+    has_body: bool
+    body_required: bool
+    paginated: bool
+
+    @property
+    def cursor_in_query(self) -> bool:
+        return any(p.name == "start_cursor" and p.location == "query" for p in self.parameters)
+
+
+def snake_case(name: str) -> str:
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).lower()
+
+
+def _schema_name(schema: Any) -> str | None:
+    ref = schema.get("$ref") if isinstance(schema, dict) else None
+    return ref.rsplit("/", 1)[-1] if isinstance(ref, str) else None
+
+
+class NotionSpec:
+    """The operations of an OpenAPI document, keyed by ``operationId``."""
+
+    def __init__(self, document: Mapping[str, Any]) -> None:
+        servers = document.get("servers") or [{}]
+        self.base_url: str = servers[0].get("url", "")
+        self.operations: Dict[str, Operation] = {}
+        for path, item in (document.get("paths") or {}).items():
+            shared = item.get("parameters") or []
+            for method in _METHODS:
+                operation = item.get(method)
+                if not isinstance(operation, dict) or "operationId" not in operation:
+                    continue
+                parameters = tuple(
+                    Parameter(
+                        entry["name"],
+                        entry["in"],
+                        bool(entry.get("required")),
+                        (entry.get("schema") or {}).get("example"),
+                    )
+                    for entry in [*shared, *(operation.get("parameters") or [])]
+                )
+                body = operation.get("requestBody")
+                responses = (operation.get("responses") or {}).values()
+                paginated = any(
+                    _schema_name(media.get("schema")) == "ListResponse"
+                    for response in responses
+                    for media in ((response or {}).get("content") or {}).values()
+                )
+                self.operations[operation["operationId"]] = Operation(
+                    operation["operationId"],
+                    method.upper(),
+                    path,
+                    parameters,
+                    body is not None,
+                    bool(body and body.get("required")),
+                    paginated,
+                )
+        self.by_name: Dict[str, str] = {snake_case(name): name for name in self.operations}
+
+    @classmethod
+    def load(cls, path: Path | str = DEFAULT_SPEC_PATH) -> "NotionSpec":
+        return cls(parse_yaml_file(Path(path)))
+
+    def operation(self, name: str) -> Operation:
+        operation = self.operations.get(name) or self.operations.get(self.by_name.get(name, ""))
+        if operation is None:
+            raise NotionError(f"Unknown operation '{name}'")
+        return operation
+
+
+class ConnectionPool:
+    """Keep-alive ``http.client`` connections to one origin, reused LIFO.
+
+    At most *size* requests are in flight at once.  A request that fails
+    because a reused connection was closed by the server is retried once
+    on a fresh connection, provided the server cannot have acted on it: the
+    method is idempotent, or the request was not fully written.
+    """
+
+    def __init__(self, base_url: str, size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT) -> None:
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise NotionError(f"Unsupported base URL '{base_url}'")
+        self._factory = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle: List[http.client.HTTPConnection] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        return self._factory(self.host, self.port, timeout=self.timeout)
+
+    def request(
+        self, method: str, url: str, body: bytes | None, headers: Mapping[str, str]
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            connection = connection or self._connect()
+            try:
+                sent = False
+                try:
+                    connection.request(method, self.prefix + url, body=body, headers=dict(headers))
+                    sent = True
+                    status, response_headers, data, will_close = self._receive(connection)
+                except _STALE_CONNECTION:
+                    connection.close()
+                    # Once sent, a POST/PATCH may have been applied before the
+                    # connection dropped; sending it again could apply it twice.
+                    if not reused or (sent and method not in IDEMPOTENT_METHODS):
+                        raise
+                    connection = self._connect()
+                    connection.request(method, self.prefix + url, body=body, headers=dict(headers))
+                    status, response_headers, data, will_close = self._receive(connection)
+            except BaseException:
+                connection.close()
+                raise
+            if will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+            return status, response_headers, data
+
+    @staticmethod
+    def _receive(connection: http.client.HTTPConnection) -> Tuple[int, Dict[str, str], bytes, bool]:
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, {key.lower(): value for key, value in response.getheaders()}, data, response.will_close
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class BulkCall(NamedTuple):
+    operation_id: str
+    body: Dict[str, Any] | None = None
+    params: Mapping[str, Any] = {}
+
+
+class NotionClient:
+    """Spec-driven Notion client; see the module docstring."""
+
+    def __init__(
+        self,
+        token: str | None = None,
+        base_url: str | None = None,
+        spec: NotionSpec | Path | str | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        notion_version: str | None = None,
+        cache_size: int = 256,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ) -> None:
+        self.spec = spec if isinstance(spec, NotionSpec) else NotionSpec.load(spec or DEFAULT_SPEC_PATH)
+        self.token = token if token is not None else os.environ.get("NOTION_TOKEN")
+        self.base_url = base_url or os.environ.get("NOTION_BASE_URL") or self.spec.base_url
+        self.notion_version = notion_version or os.environ.get("NOTION_VERSION")
+        self.pool = ConnectionPool(self.base_url, pool_size, timeout)
+        self.cache_size = cache_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._etags: "collections.OrderedDict[str, Tuple[str, bytes]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.stats: Dict[str, int] = {"requests": 0, "not_modified": 0, "retries": 0, "rate_limited": 0}
+
+    def __getattr__(self, name: str) -> Any:
+        spec = self.__dict__.get("spec")
+        operation_id = spec.by_name.get(name) if spec is not None else None
+        if operation_id is None:
+            raise AttributeError(name)
+        return functools.partial(self.call, operation_id)
+
+    def __dir__(self) -> List[str]:
+        return [*super().__dir__(), *self.spec.by_name]
+
+    # -- single calls ----------------------------------------------------
+
+    def call(self, operation_id: str, body: Dict[str, Any] | None = None, **params: Any) -> Dict[str, Any]:
+        """Run one operation; path, query and header parameters go in *params*."""
+
+        operation = self.spec.operation(operation_id)
+        url, headers, payload = self._build(operation, body, params)
+        return self._request(operation, url, headers, payload)
+
+    def _build(
+        self, operation: Operation, body: Dict[str, Any] | None, params: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, str], bytes | None]:
+        path = operation.path
+        query: Dict[str, Any] = {}
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        remaining = dict(params)
+        for parameter in operation.parameters:
+            if parameter.location == "header":
+                value = remaining.pop(parameter.name.lower().replace("-", "_"), None)
+                if value is None and parameter.name.lower() == "notion-version":
+                    value = self.notion_version
+                value = parameter.example if value is None else value
+            else:
+                value = remaining.pop(parameter.name, None)
+            if value is None:
+                if parameter.required:
+                    raise NotionError(f"{operation.operation_id} needs the '{parameter.name}' {parameter.location} parameter")
+                continue
+            if parameter.location == "path":
+                path = path.replace("{" + parameter.name + "}", urllib.parse.quote(str(value), safe=""))
+            elif parameter.location == "query":
+                query[parameter.name] = value
+            elif parameter.location == "header":
+                headers[parameter.name] = str(value)
+        if remaining:
+            raise NotionError(f"{operation.operation_id} got unknown parameters: {', '.join(sorted(remaining))}")
+        if body is not None and not operation.has_body:
+            raise NotionError(f"{operation.operation_id} does not take a request body")
+        if body is None and operation.body_required:
+            raise NotionError(f"{operation.operation_id} needs a request body")
+        payload = None
+        if body is not None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if query:
+            path += "?" + urllib.parse.urlencode(query)
+        return path, headers, payload
+
+    def _request(
+        self, operation: Operation, url: str, headers: Dict[str, str], payload: bytes | None
+    ) -> Dict[str, Any]:
+        method = operation.method
+        cached = None
+        if method == "GET":
+            with self._lock:
+                cached = self._etags.get(url)
+                if cached is not None:
+                    self._etags.move_to_end(url)
+            if cached is not None:
+                headers["If-None-Match"] = cached[0]
+
+        attempt = 0
+        failure: OSError | None = None
+        while True:
+            self._wait_for_rate_limit()
+            started = time.perf_counter()
+            try:
+                status, response_headers, data = self.pool.request(method, url, payload, headers)
+            except OSError as exc:
+                # Only idempotent requests are retried after a network failure.
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise NotionError(f"{operation.operation_id} failed: {exc}") from exc
+                status, response_headers, data, failure = 0, {}, b"", exc
+            metrics.NOTION_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, operation=operation.operation_id, status=status or "network"
+            )
+            with self._lock:
+                self.stats["requests"] += 1
+            # A 429 was rejected before any work; a 5xx write may have been applied.
+            retryable = status == 429 or (
+                method in IDEMPOTENT_METHODS and (status in RETRY_STATUSES or status == 0)
+            )
+            if not retryable or attempt >= self.max_retries:
+                break
+            delay = self._retry_delay(attempt, response_headers)
+            with self._lock:
+                self.stats["retries"] += 1
+                if status == 429:
+                    self.stats["rate_limited"] += 1
+                    # Every caller on this client waits, not just this one.
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if status != 429:
+                time.sleep(delay)
+            attempt += 1
+
+        if status == 304 and cached is not None:
+            with self._lock:
+                self.stats["not_modified"] += 1
+            return json.loads(cached[1])
+        if status == 0:
+            raise NotionError(f"{operation.operation_id} failed: {failure}")
+        try:
+            result = json.loads(data) if data else {}
+        except ValueError:
+            result = {"message": data[:200].decode("utf-8", errors="replace")}
+        if status >= 400:
+            message = result.get("message") if isinstance(result, dict) else None
+            code = result.get("code") if isinstance(result, dict) else None
+            raise NotionError(f"{operation.operation_id}: {message or f'HTTP {status}'}", status, code)
+        self._update_cache(method, url, response_headers.get("etag"), data)
+        return result
+
+    def _retry_delay(self, attempt: int, headers: Mapping[str, str]) -> float:
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(self.max_backoff, self.backoff * 2**attempt) * random.uniform(0.5, 1.0)
+
+    def _wait_for_rate_limit(self) -> None:
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _update_cache(self, method: str, url: str, etag: str | None, data: bytes) -> None:
+        with self._lock:
+            if method == "GET":
+                if etag and self.cache_size > 0:
+                    self._etags[url] = (etag, data)
+                    self._etags.move_to_end(url)
+                    while len(self._etags) > self.cache_size:
+                        self._etags.popitem(last=False)
+                return
+            # A write makes cached reads of the same resource stale.
+            path = url.split("?", 1)[0]
+            for key in [key for key in self._etags if key.split("?", 1)[0] == path]:
+                del self._etags[key]
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._etags.clear()
+
+    # -- pagination --------------------------------------------------------
+
+    def _page(
+        self, operation: Operation, body: Dict[str, Any] | None, page_size: int | None, params: Mapping[str, Any], cursor: str | None
+    ) -> Dict[str, Any]:
+        if operation.cursor_in_query:
+            params = dict(params)
+            if cursor:
+                params["start_cursor"] = cursor
+            if page_size:
+                params["page_size"] = page_size
+        elif cursor or page_size:
+            body = dict(body or {})
+            if cursor:
+                body["start_cursor"] = cursor
+            if page_size:
+                body["page_size"] = page_size
+        return self.call(operation.operation_id, body, **params)
+
+    def _paginated(self, operation_id: str) -> Operation:
+        operation = self.spec.operation(operation_id)
+        if not operation.paginated:
+            raise NotionError(f"{operation.operation_id} does not return a ListResponse")
+        return operation
+
+    def iter_results(
+        self, operation_id: str, body: Dict[str, Any] | None = None, page_size: int | None = None, **params: Any
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every result of a paginated operation, one page at a time."""
+
+        operation = self._paginated(operation_id)
+        cursor = None
+        while True:
+            page = self._page(operation, body, page_size, params, cursor)
+            yield from page.get("results") or ()
+            cursor = page.get("next_cursor")
+            if not page.get("has_more") or not cursor:
+                return
+
+    async def paginate(
+        self, operation_id: str, body: Dict[str, Any] | None = None, page_size: int | None = None, **params: Any
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of :meth:`iter_results` that prefetches the next page."""
+
+        operation = self._paginated(operation_id)
+
+        def fetch(cursor: str | None) -> "asyncio.Future[Dict[str, Any]]":
+            return asyncio.ensure_future(asyncio.to_thread(self._page, operation, body, page_size, params, cursor))
+
+        pending: asyncio.Future | None = fetch(None)
+        try:
+            while pending is not None:
+                page = await pending
+                pending = None
+                cursor = page.get("next_cursor")
+                if page.get("has_more") and cursor:
+                    pending = fetch(cursor)
+                for result in page.get("results") or ():
+                    yield result
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    # -- bulk --------------------------------------------------------------
+
+    async def bulk(
+        self,
+        calls: Iterable[BulkCall | Tuple[Any, ...]],
+        concurrency: int = DEFAULT_BULK_CONCURRENCY,
+        return_exceptions: bool = True,
+    ) -> List[Any]:
+        """Run *calls* with at most *concurrency* in flight; results keep their order.
+
+        With *return_exceptions* a failed call leaves its :class:`NotionError`
+        in the result list instead of cancelling the batch.
+        """
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(call: BulkCall) -> Dict[str, Any]:
+            async with semaphore:
+                return await asyncio.to_thread(self.call, call.operation_id, call.body, **call.params)
+
+        return await asyncio.gather(
+            *(run(BulkCall(*call)) for call in calls), return_exceptions=return_exceptions
+        )
+
+    async def create_pages(self, bodies: Iterable[Dict[str, Any]], concurrency: int = DEFAULT_BULK_CONCURRENCY) -> List[Any]:
+        return await self.bulk((BulkCall("createPage", body) for body in bodies), concurrency)
+
+    async def update_pages(
+        self, updates: Mapping[str, Dict[str, Any]] | Iterable[Tuple[str, Dict[str, Any]]], concurrency: int = DEFAULT_BULK_CONCURRENCY
+    ) -> List[Any]:
+        items = updates.items() if isinstance(updates, Mapping) else updates
+        return await self.bulk((BulkCall("updatePage", body, {"page_id": page_id}) for page_id, body in items), concurrency)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+_CLIENT: NotionClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> NotionClient:
+    """Return the shared client configured from the environment."""
+
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = NotionClient()
+        return _CLIENT
+
+
+__all__ = [
+    "BulkCall",
+    "ConnectionPool",
+    "DEFAULT_BULK_CONCURRENCY",
+    "DEFAULT_SPEC_PATH",
+    "IDEMPOTENT_METHODS",
+    "NotionClient",
+    "NotionError",
+    "NotionSpec",
+    "Operation",
+    "Parameter",
+    "get_client",
+    "snake_case",
+]
@@ -0,0 +1,351 @@
+"""Cache for refined prompts, keyed on normalised prompt text.
+
+A prompt is a sequence of segments (typically the role persona, each rule
+and the user prompt).  Segments are stored in a trie, so the persona and
+rules shared by every preview of a role are kept once however many user
+prompts are cached under them.  Lookups go through a hash of the whole
+normalised prompt (:meth:`PromptCache.get`) or walk the trie for the longest
+cached prefix (:meth:`PromptCache.longest_prefix`).
+
+The cache is bounded by a byte budget covering both the stored segments and
+the cached values; least-recently-used values are evicted first and trie
+branches left without values are pruned.  It can be saved to and reloaded
+from a JSON file.
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+import metrics
+
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+_FORMAT_VERSION = 1
+_NO_VALUE = object()
+
+
+def normalise(text: str) -> str:
+    """Canonical form used for keys: NFC, ``\\n`` line endings, no trailing blanks."""
+
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def _render(part: Any) -> str:
+    if isinstance(part, str):
+        return part
+    # Personas are mappings in the prompt YAML; give them a canonical text form.
+    return json.dumps(part, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def prompt_segments(prompt: str, persona: Any = None, rules: Iterable[str] = ()) -> List[str]:
+    """Build the segment list for *prompt* under an optional persona and rules."""
+
+    segments = [persona] if persona else []
+    segments.extend(rule for rule in rules if rule)
+    segments.append(prompt)
+    return [normalise(_render(segment)) for segment in segments]
+
+
+def role_segments(agent: Any, prompt: str) -> List[str]:
+    """Segments for *prompt* sent to a :class:`loader.ResolvedAgent`.
+
+    The role's persona, system prompts and rules come first, so every prompt
+    for the same role shares one trie branch.
+    """
+
+    system = [entry["prompt"] for entry in agent.prompts if isinstance(entry.get("prompt"), str)]
+    return prompt_segments(prompt, agent.persona, [*system, *agent.rules])
+
+
+def _digest(segments: Sequence[str]) -> str:
+    return hashlib.sha256("\x1f".join(segments).encode("utf-8")).hexdigest()
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+class PromptCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    prefix_hits: int
+    evictions: int
+    entries: int
+    nodes: int
+    nbytes: int
+    max_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Node:
+    __slots__ = ("segment", "parent", "children", "value", "digest", "size")
+
+    def __init__(self, segment: str, parent: "_Node | None") -> None:
+        self.segment = segment
+        self.parent = parent
+        self.children: Dict[str, _Node] = {}
+        self.value: Any = _NO_VALUE
+        self.digest: str | None = None
+        self.size = 0
+
+
+class PromptCache:
+    """Byte-budgeted LRU of prompt results over a segment trie."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, path: Path | str | None = None) -> None:
+        self.max_bytes = max_bytes
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.RLock()
+        self._root = _Node("", None)
+        # digest -> node holding a value, least recently used first
+        self._entries: "OrderedDict[str, _Node]" = OrderedDict()
+        self._nodes = 0
+        self._nbytes = 0
+        self.hits = self.misses = self.prefix_hits = self.evictions = 0
+        self._dirty = False
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    # -- lookups -------------------------------------------------------
+
+    def get(self, segments: Sequence[str], default: Any = None) -> Any:
+        """Return the value cached for exactly *segments*, or *default*."""
+
+        with self._lock:
+            node = self._entries.get(_digest(segments))
+            if node is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(node.digest)
+            self.hits += 1
+            return node.value
+
+    def longest_prefix(self, segments: Sequence[str]) -> Tuple[int, Any]:
+        """Return ``(depth, value)`` for the longest cached prefix of *segments*.
+
+        *depth* is the number of leading segments matched; it is ``0`` (with
+        a ``None`` value) when no prefix has a cached value.
+        """
+
+        with self._lock:
+            node, best = self._root, (0, None, None)
+            for depth, segment in enumerate(segments, 1):
+                node = node.children.get(segment)
+                if node is None:
+                    break
+                if node.value is not _NO_VALUE:
+                    best = (depth, node.value, node)
+            if best[2] is None:
+                return 0, None
+            self._entries.move_to_end(best[2].digest)
+            self.prefix_hits += 1
+            return best[0], best[1]
+
+    def __contains__(self, segments: Sequence[str]) -> bool:
+        return _digest(segments) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -- updates -------------------------------------------------------
+
+    def put(self, segments: Sequence[str], value: Any) -> None:
+        """Cache *value* for *segments* (already normalised)."""
+
+        if not segments:
+            raise ValueError("A prompt needs at least one segment.")
+        size = _value_size(value)
+        with self._lock:
+            node = self._root
+            for segment in segments:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node(segment, node)
+                    self._nodes += 1
+                    self._nbytes += len(segment.encode("utf-8"))
+                node = child
+            if node.value is not _NO_VALUE:
+                self._nbytes -= node.size
+            node.value = value
+            node.digest = _digest(segments)
+            node.size = size
+            self._nbytes += size
+            self._entries[node.digest] = node
+            self._entries.move_to_end(node.digest)
+            self._dirty = True
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                self._evict(next(iter(self._entries.values())))
+                self.evictions += 1
+
+    def discard(self, segments: Sequence[str]) -> bool:
+        with self._lock:
+            node = self._entries.get(_digest(segments))
+            if node is None:
+                return False
+            self._evict(node)
+            self._dirty = True
+            return True
+
+    def _evict(self, node: _Node) -> None:
+        del self._entries[node.digest]
+        self._nbytes -= node.size
+        node.value = _NO_VALUE
+        node.digest = None
+        # Prune the branch back to the nearest node that is still needed.
+        while node.parent is not None and not node.children and node.value is _NO_VALUE:
+            del node.parent.children[node.segment]
+            self._nodes -= 1
+            self._nbytes -= len(node.segment.encode("utf-8"))
+            node = node.parent
+
+    def clear(self) -> None:
+        with self._lock:
+            self._root = _Node("", None)
+            self._entries.clear()
+            self._nodes = self._nbytes = 0
+            self._dirty = True
+
+    def info(self) -> PromptCacheInfo:
+        with self._lock:
+            return PromptCacheInfo(
+                self.hits,
+                self.misses,
+                self.prefix_hits,
+                self.evictions,
+                len(self._entries),
+                self._nodes,
+                self._nbytes,
+                self.max_bytes,
+            )
+
+    # -- persistence ---------------------------------------------------
+
+    def save(self, path: Path | str | None = None) -> Path:
+        """Write the cache to *path* (default: the path given at construction)."""
+
+        target = Path(path) if path is not None else self.path
+        if target is None:
+            raise ValueError("No path configured for the prompt cache.")
+        with self._lock:
+            # Nodes are written parents-first and referenced by position, so
+            # shared segments stay shared in the file; entries keep LRU order.
+            nodes: List[list] = []
+            index: Dict[int, int] = {id(self._root): -1}
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                for child in node.children.values():
+                    index[id(child)] = len(nodes)
+                    nodes.append([index[id(node)], child.segment])
+                    stack.append(child)
+            entries = [[index[id(node)], node.value] for node in self._entries.values()]
+            payload = {"version": _FORMAT_VERSION, "nodes": nodes, "entries": entries}
+            self._dirty = False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+        os.replace(tmp_path, target)
+        return target
+
+    def load(self, path: Path | str | None = None) -> None:
+        """Replace the contents with those saved at *path*; unreadable files are ignored."""
+
+        source = Path(path) if path is not None else self.path
+        try:
+            with source.open("r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError, AttributeError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != _FORMAT_VERSION:
+            return
+        paths: List[List[str]] = []
+        for parent, segment in payload.get("nodes", ()):
+            paths.append((paths[parent] if parent >= 0 else []) + [segment])
+        with self._lock:
+            self.clear()
+            for position, value in payload.get("entries", ()):
+                self.put(paths[position], value)
+            self._dirty = False
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+
+_DEFAULT: PromptCache | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def _default_path() -> Path | None:
+    setting = os.environ.get("AI_SANDBOX_PROMPT_CACHE")
+    if setting is not None and setting.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    if setting:
+        return Path(setting)
+    return Path(__file__).resolve().parent.parent / ".cache" / "prompt-cache.json"
+
+
+def default_cache() -> PromptCache:
+    """Return the process-wide cache, loading it from disk on first use.
+
+    ``AI_SANDBOX_PROMPT_CACHE`` sets the file (``off`` keeps it in memory
+    only) and ``AI_SANDBOX_PROMPT_CACHE_BYTES`` the byte budget.
+    """
+
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            max_bytes = int(os.environ.get("AI_SANDBOX_PROMPT_CACHE_BYTES", "0")) or DEFAULT_MAX_BYTES
+            _DEFAULT = PromptCache(max_bytes, _default_path())
+            atexit.register(save_default_cache)
+        return _DEFAULT
+
+
+def _prompt_cache_samples() -> List[metrics.Sample]:
+    cache = _DEFAULT
+    if cache is None:
+        return []
+    info = cache.info()
+    return metrics.cache_samples(
+        "prompt", info.hits, info.misses, prefix_hits=info.prefix_hits, evictions=info.evictions,
+        entries=info.entries, bytes=info.nbytes,
+    )
+
+
+metrics.register_collector(_prompt_cache_samples)
+
+
+def save_default_cache() -> None:
+    """Persist the process-wide cache if it changed."""
+
+    cache = _DEFAULT
+    if cache is not None and cache.path is not None and cache.dirty:
+        cache.save()
+
+
+__all__ = [
+    "PromptCache",
+    "PromptCacheInfo",
+    "default_cache",
+    "save_default_cache",
+    "normalise",
+    "prompt_segments",
+    "role_segments",
+    "DEFAULT_MAX_BYTES",
+]
@@ -0,0 +1,313 @@
+"""Batch quiz generation and answer scoring for the tutor tools.
+
+The question bank (``prompt/learning/question_bank.yaml`` unless
+``AI_SANDBOX_QUESTION_BANK`` points elsewhere) is loaded once per process and
+precomputed into:
+
+* a topic/difficulty index for picking questions,
+* a reference-answer embedding per question, and
+* a question x keyword rubric matrix, with every keyword split into words.
+
+:func:`evaluate_answers` scores a whole cohort at once.  Answers are embedded
+into one matrix; rubric coverage is ``(answer words @ keyword words) ==
+keyword length`` masked by each question's rubric row, and similarity is the
+row-wise dot product with the reference embeddings.  With NumPy these are
+array operations over the cohort; without it the same steps run per answer
+on sets and sparse vectors.  The bank is reloaded when its file changes.
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence, Tuple
+
+from loader import BASE_PATH, parse_yaml_file
+from tools.vector_index import HashingEmbedder
+
+try:  # pragma: no cover - dependency optionality
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - pure-Python fallback below
+    np = None
+
+
+DEFAULT_BANK_PATH = BASE_PATH / "prompt" / "learning" / "question_bank.yaml"
+# Share of the score from rubric keywords; the rest comes from similarity.
+KEYWORD_WEIGHT = 0.7
+CORRECT_THRESHOLD = 0.7
+PARTIAL_THRESHOLD = 0.4
+_WORD = re.compile(r"\w+")
+
+
+class QuizError(ValueError):
+    """Raised for malformed quiz requests or an unusable question bank."""
+
+
+def _words(text: str) -> List[str]:
+    # Light stemming so "keys" matches "key" and "halving" is left alone.
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in _WORD.findall(text.lower())]
+
+
+class Question(NamedTuple):
+    id: str
+    topic: str
+    difficulty: int
+    question: str
+    answer: str
+    keywords: Tuple[str, ...]
+
+
+class Evaluation(NamedTuple):
+    question_id: str
+    score: float
+    keyword_coverage: float
+    similarity: float
+    matched: Tuple[str, ...]
+    missing: Tuple[str, ...]
+
+    @property
+    def verdict(self) -> str:
+        if self.score >= CORRECT_THRESHOLD:
+            return "correct"
+        if self.score >= PARTIAL_THRESHOLD:
+            return "partial"
+        return "incorrect"
+
+    @property
+    def feedback(self) -> str:
+        if self.verdict == "correct":
+            return "Your answer is correct and well-explained."
+        if not self.missing:
+            return "Your answer covers the key points; explain them in more detail."
+        return f"Your answer should also cover: {', '.join(self.missing)}."
+
+
+class QuestionBank:
+    """Questions plus the precomputed structures used to score answers."""
+
+    def __init__(self, questions: Sequence[Question], dim: int = 256) -> None:
+        if not questions:
+            raise QuizError("The question bank is empty.")
+        self.questions = list(questions)
+        self.position = {question.id: index for index, question in enumerate(self.questions)}
+        if len(self.position) != len(self.questions):
+            raise QuizError("Question ids in the bank must be unique.")
+        self.by_topic: Dict[str, List[int]] = {}
+        for index, question in enumerate(self.questions):
+            self.by_topic.setdefault(question.topic, []).append(index)
+        self.embedder = HashingEmbedder(dim)
+        self.references = [self.embedder.embed(question.answer) for question in self.questions]
+
+        self.keywords: List[str] = sorted({keyword for question in self.questions for keyword in question.keywords})
+        self.keyword_words = [frozenset(_words(keyword)) for keyword in self.keywords]
+        self.vocabulary = {word: column for column, word in enumerate(sorted(set().union(*self.keyword_words)))}
+        keyword_column = {keyword: column for column, keyword in enumerate(self.keywords)}
+        self.rubric = [[keyword_column[keyword] for keyword in question.keywords] for question in self.questions]
+        if np is not None:
+            self._keyword_matrix = np.zeros((len(self.keywords), len(self.vocabulary)), dtype=np.float32)
+            for row, words in enumerate(self.keyword_words):
+                for word in words:
+                    self._keyword_matrix[row, self.vocabulary[word]] = 1.0
+            self._keyword_lengths = self._keyword_matrix.sum(axis=1)
+            self._rubric_matrix = np.zeros((len(self.questions), len(self.keywords)), dtype=bool)
+            for row, columns in enumerate(self.rubric):
+                self._rubric_matrix[row, columns] = True
+            self._reference_matrix = self._dense(self.references)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "QuestionBank":
+        data = parse_yaml_file(Path(path))
+        questions = []
+        for entry in data.get("questions") or ():
+            try:
+                questions.append(
+                    Question(
+                        str(entry["id"]),
+                        str(entry.get("topic", "general")).lower(),
+                        int(entry.get("difficulty", 1)),
+                        str(entry["question"]),
+                        str(entry.get("answer", "")),
+                        tuple(str(keyword).lower() for keyword in entry.get("keywords") or ()),
+                    )
+                )
+            except (KeyError, TypeError, ValueError) as exc:
+                raise QuizError(f"Malformed question in {path}: {entry!r}") from exc
+        return cls(questions)
+
+    def _dense(self, vectors: Sequence[Mapping[int, float]]):
+        matrix = np.zeros((len(vectors), self.embedder.dim), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            for bucket, value in vector.items():
+                matrix[row, bucket] = value
+        return matrix
+
+    # -- generation ----------------------------------------------------
+
+    def pick(self, topic: str | None, count: int, difficulty: int | None, rng: random.Random) -> List[Question]:
+        pool = self.by_topic.get(topic.lower(), []) if topic else range(len(self.questions))
+        candidates = [index for index in pool if difficulty is None or self.questions[index].difficulty == difficulty]
+        chosen = rng.sample(candidates, min(count, len(candidates)))
+        return [self.questions[index] for index in sorted(chosen)]
+
+    # -- scoring -------------------------------------------------------
+
+    def evaluate(self, pairs: Sequence[Tuple[str, str]]) -> List[Evaluation]:
+        """Score ``(question_id, answer)`` pairs; unknown ids raise :class:`QuizError`."""
+
+        try:
+            rows = [self.position[question_id] for question_id, _answer in pairs]
+        except KeyError as exc:
+            raise QuizError(f"Unknown question id {exc.args[0]!r}.") from None
+        if not rows:
+            return []
+        answer_words = [set(_words(answer)) for _question_id, answer in pairs]
+        embeddings = [self.embedder.embed(answer) for _question_id, answer in pairs]
+        if np is not None:
+            coverage, similarity, hits = self._score_arrays(rows, answer_words, embeddings)
+        else:
+            coverage, similarity, hits = self._score_loop(rows, answer_words, embeddings)
+        results = []
+        for position, row in enumerate(rows):
+            question = self.questions[row]
+            matched = tuple(keyword for keyword in question.keywords if keyword in hits[position])
+            missing = tuple(keyword for keyword in question.keywords if keyword not in hits[position])
+            score = KEYWORD_WEIGHT * coverage[position] + (1 - KEYWORD_WEIGHT) * max(0.0, similarity[position])
+            results.append(
+                Evaluation(question.id, round(score, 4), round(coverage[position], 4),
+                           round(similarity[position], 4), matched, missing)
+            )
+        return results
+
+    def _score_arrays(self, rows, answer_words, embeddings):
+        index = np.asarray(rows, dtype=np.int64)
+        words = np.zeros((len(rows), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(answer_words):
+            columns = [self.vocabulary[word] for word in tokens if word in self.vocabulary]
+            words[row, columns] = 1.0
+        present = (words @ self._keyword_matrix.T) == self._keyword_lengths
+        rubric = self._rubric_matrix[index]
+        hit_matrix = present & rubric
+        totals = rubric.sum(axis=1)
+        coverage = np.divide(hit_matrix.sum(axis=1), totals, out=np.ones(len(rows)), where=totals > 0)
+        similarity = (self._dense(embeddings) * self._reference_matrix[index]).sum(axis=1)
+        hits = [{self.keywords[column] for column in np.flatnonzero(row)} for row in hit_matrix]
+        return coverage.tolist(), similarity.tolist(), hits
+
+    def _score_loop(self, rows, answer_words, embeddings):
+        coverage, similarity, hits = [], [], []
+        for row, tokens, vector in zip(rows, answer_words, embeddings):
+            found = {self.keywords[column] for column in self.rubric[row] if self.keyword_words[column] <= tokens}
+            total = len(self.rubric[row])
+            coverage.append(len(found) / total if total else 1.0)
+            reference = self.references[row]
+            similarity.append(sum(value * reference.get(bucket, 0.0) for bucket, value in vector.items()))
+            hits.append(found)
+        return coverage, similarity, hits
+
+
+_BANK: Tuple[Tuple[str, int], QuestionBank] | None = None
+_BANK_LOCK = threading.Lock()
+
+
+def question_bank() -> QuestionBank:
+    """Return the shared bank, reloading it only when the file changes."""
+
+    global _BANK
+    path = Path(os.environ.get("AI_SANDBOX_QUESTION_BANK") or DEFAULT_BANK_PATH)
+    try:
+        signature = (str(path), path.stat().st_mtime_ns)
+    except OSError as exc:
+        raise QuizError(f"Question bank '{path}' cannot be read: {exc}") from exc
+    with _BANK_LOCK:
+        if _BANK is None or _BANK[0] != signature:
+            _BANK = (signature, QuestionBank.load(path))
+        return _BANK[1]
+
+
+def _whole_number(value: Any, field: str, learner_id: str) -> int:
+    # Tool arguments often arrive as strings ("2"); bools and 2.5 are mistakes.
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    prefix = f"Learner '{learner_id}': " if learner_id else ""
+    if number is None:
+        raise QuizError(f"{prefix}'{field}' must be a whole number, not {value!r}.")
+    if number < 0:
+        raise QuizError(f"{prefix}'{field}' must not be negative.")
+    return number
+
+
+def generate_quizzes(learners: Iterable[Mapping[str, Any]], seed: int | str = 0) -> List[Dict[str, Any]]:
+    """Pick questions for each learner request.
+
+    Each request may give ``learner_id``, ``topic``, ``count`` (default 3)
+    and ``difficulty``; numbers may be given as strings.  Selection is
+    deterministic for a given seed and learner, so a learner keeps the same
+    quiz across retries.  A malformed request raises :class:`QuizError`
+    naming the learner.
+    """
+
+    bank = question_bank()
+    quizzes = []
+    for learner in learners:
+        if not isinstance(learner, Mapping):
+            raise QuizError(f"Each learner request must be a mapping, not {learner!r}.")
+        learner_id = str(learner.get("learner_id", ""))
+        count = _whole_number(learner.get("count", 3), "count", learner_id)
+        difficulty = learner.get("difficulty")
+        if difficulty is not None and difficulty != "":
+            difficulty = _whole_number(difficulty, "difficulty", learner_id)
+        else:
+            difficulty = None
+        topic = learner.get("topic")
+        rng = random.Random(f"{seed}:{learner_id}")
+        questions = bank.pick(str(topic) if topic else None, count, difficulty, rng)
+        quizzes.append(
+            {
+                "learner_id": learner_id,
+                "quiz": [{"id": q.id, "question": q.question, "difficulty": q.difficulty} for q in questions],
+            }
+        )
+    return quizzes
+
+
+def evaluate_answers(answers: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Score ``{"learner_id", "question_id", "answer"}`` records in one batch."""
+
+    evaluations = question_bank().evaluate(
+        [(str(entry.get("question_id")), str(entry.get("answer") or "")) for entry in answers]
+    )
+    return [
+        {
+            "learner_id": entry.get("learner_id"),
+            "question_id": result.question_id,
+            "score": result.score,
+            "verdict": result.verdict,
+            "keyword_coverage": result.keyword_coverage,
+            "similarity": result.similarity,
+            "matched_keywords": list(result.matched),
+            "missing_keywords": list(result.missing),
+            "feedback": result.feedback,
+        }
+        for entry, result in zip(answers, evaluations)
+    ]
+
+
+__all__ = [
+    "QuestionBank",
+    "Question",
+    "Evaluation",
+    "QuizError",
+    "question_bank",
+    "generate_quizzes",
+    "evaluate_answers",
+    "DEFAULT_BANK_PATH",
+]
@@ -1,22 +1,97 @@
-"""Runtime helpers for invoking the Serena CLI tools."""
+"""Runtime helpers for invoking the Serena CLI tools.
+
+Calls are routed through a long-lived Serena worker per workspace so the
+codebase is indexed once rather than on every call.  The worker is started
+as ``serena session --stdio`` and speaks newline-delimited JSON::
+
+    -> {"id": 1, "command": "find_symbol", "args": ["Foo"]}
+    <- {"id": 1, "stdout": "..."}            (or {"id": 1, "error": "..."})
+
+Requests are multiplexed by ``id`` so concurrent callers share one worker.
+Workers are health-checked with a ``ping`` command and restarted when they
+exit.  If the executable does not support sessions, calls fall back to one
+``serena <subcommand>`` process per call.
+
+Environment variables:
+
+``SERENA_EXECUTABLE``
+    Path to the Serena executable; defaults to ``serena`` on ``PATH``.
+``SERENA_SESSION``
+    Set to ``0`` to disable the persistent worker.
+``SERENA_TIMEOUT``
+    Per-request timeout in seconds (default 30).
+``SERENA_SESSION_RETRY``
+    Seconds to wait before trying to start a worker again after a failed
+    start, or before searching ``PATH`` again for a missing executable
+    (default 60).
+``SERENA_WORKSPACE``
+    Directory the worker and one-shot processes run in; defaults to the
+    current directory.
+"""
 
 from __future__ import annotations
 
-from typing import List, Sequence
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Sequence, Tuple
 
+import asyncio
+import atexit
+import collections
+import itertools
+import json
+import os
 import shutil
 import subprocess
+import threading
+import time
+
+import metrics
 
 
 class SerenaError(RuntimeError):
     """Raised when Serena cannot be executed successfully."""
 
 
+class _SessionDown(SerenaError):
+    """The worker was gone before the request was sent."""
+
+
+SESSION_ARGS = ("session", "--stdio")
+DEFAULT_TIMEOUT = float(os.environ.get("SERENA_TIMEOUT", "30"))
+SESSION_RETRY_AFTER = float(os.environ.get("SERENA_SESSION_RETRY", "60"))
+# Workers idle for longer than this are pinged before being reused.
+HEALTH_CHECK_INTERVAL = 60.0
+_STARTUP_TIMEOUT = 10.0
+_PING_TIMEOUT = 5.0
+
+_EXECUTABLE: str | None = None
+# The name of a failed lookup and when to search ``PATH`` for it again.
+_MISSING: Tuple[str, float] | None = None
+_EXECUTABLE_LOCK = threading.Lock()
+
+
 def _resolve_serena_command() -> str:
-    executable = shutil.which("serena")
-    if not executable:
-        raise SerenaError("The 'serena' executable is not available on PATH.")
-    return executable
+    """Resolve the Serena executable once and cache it for the process.
+
+    A failed lookup is cached too and retried after ``SESSION_RETRY_AFTER``
+    seconds, so offline callers do not search ``PATH`` on every call.
+    """
+
+    global _EXECUTABLE, _MISSING
+    with _EXECUTABLE_LOCK:
+        if _EXECUTABLE is None:
+            name = os.environ.get("SERENA_EXECUTABLE") or "serena"
+            if _MISSING is None or _MISSING[0] != name or _MISSING[1] <= time.monotonic():
+                _EXECUTABLE = shutil.which(name)
+                _MISSING = None if _EXECUTABLE else (name, time.monotonic() + SESSION_RETRY_AFTER)
+            if _EXECUTABLE is None:
+                raise SerenaError(f"The '{name}' executable is not available on PATH.")
+        return _EXECUTABLE
+
+
+def _workspace(workspace: str | None = None) -> str:
+    return os.path.realpath(workspace or os.environ.get("SERENA_WORKSPACE") or os.getcwd())
 
 
 def _normalise_args(args: Sequence[object] | None) -> List[str]:
@@ -37,37 +112,344 @@ def _normalise_args(args: Sequence[object] | None) -> List[str]:
     return normalised
 
 
-def _run_serena(subcommand: str, args: Sequence[object] | None = None) -> str:
-    executable = _resolve_serena_command()
-    command = [executable, subcommand, *_normalise_args(args)]
+def _run_serena_once(subcommand: str, args: List[str], timeout: float) -> str:
+    """Run a single ``serena <subcommand>`` process and return its stdout."""
+
+    command = [_resolve_serena_command(), subcommand, *args]
 
+    started = time.perf_counter()
     try:
-        completed = subprocess.run(
-            command,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=30,  # Prevent hanging processes
-            timeout=30,
+        process = subprocess.Popen(
+            command, cwd=_workspace(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
     except FileNotFoundError as exc:  # pragma: no cover - surfaced via SerenaError
         raise SerenaError("The 'serena' executable could not be located.") from exc
+    spawned = time.perf_counter()
+    metrics.SERENA_SPAWN_SECONDS.observe(spawned - started, mode="oneshot")
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)  # Prevent hanging processes
     except subprocess.TimeoutExpired as exc:
-        raise SerenaError(f"Serena command timed out after {exc.timeout} seconds: {exc}") from exc
-    except subprocess.CalledProcessError as exc:
-        stderr = (exc.stderr or "").strip()
-        stdout = (exc.stdout or "").strip()
-        details = " | ".join(part for part in (stderr, stdout) if part) or str(exc)
-        raise SerenaError(f"Serena command failed: {details}") from exc
-    except subprocess.TimeoutExpired as exc:
-        raise SerenaError(f"Serena command timed out after 30 seconds: {' '.join(command)}") from exc
+        process.kill()
+        process.communicate()
+        raise SerenaError(f"Serena command timed out after {exc.timeout} seconds: {' '.join(command)}") from exc
+    finally:
+        metrics.SERENA_EXEC_SECONDS.observe(time.perf_counter() - spawned, mode="oneshot", command=subcommand)
+    if process.returncode:
+        details = " | ".join(part for part in (stderr.strip(), stdout.strip()) if part)
+        raise SerenaError(f"Serena command failed: {details or f'exit status {process.returncode}'}")
+    return stdout
 
-    return completed.stdout
+
+class SerenaSession:
+    """A warm Serena worker process for one workspace."""
+
+    def __init__(self, executable: str, workspace: str) -> None:
+        self.executable = executable
+        self.workspace = workspace
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stderr: collections.deque = collections.deque(maxlen=20)
+        self._closed = False
+        self.last_used = time.monotonic()
+        self._process = subprocess.Popen(
+            [executable, *SESSION_ARGS],
+            cwd=workspace,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, name="serena-stdout", daemon=True).start()
+        threading.Thread(target=self._read_stderr, name="serena-stderr", daemon=True).start()
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed and self._process.poll() is None
+
+    def _read_stdout(self) -> None:
+        for line in self._process.stdout:
+            try:
+                message = json.loads(line)
+                future = self._pending.pop(message["id"], None)
+            except (ValueError, KeyError, TypeError):
+                continue
+            if future is None or future.done():  # timed out or cancelled
+                continue
+            if message.get("error") is not None:
+                future.set_exception(SerenaError(f"Serena command failed: {message['error']}"))
+            else:
+                future.set_result(message.get("stdout", ""))
+        self._fail_pending()
+
+    def _read_stderr(self) -> None:
+        for line in self._process.stderr:
+            self._stderr.append(line.rstrip())
+
+    def _fail_pending(self) -> None:
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        # stdout is gone, so the worker is unusable even if it is still running.
+        if self._process.poll() is None:
+            self._process.kill()
+        status = self._process.wait()
+        details = " | ".join(self._stderr) or f"exit status {status}"
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(SerenaError(f"Serena session exited: {details}"))
+
+    def submit(self, command: str, args: List[str]) -> Future:
+        """Send a request and return a future for its stdout."""
+
+        future: Future = Future()
+        with self._lock:
+            if self._closed or not self.alive:
+                raise _SessionDown("Serena session is not running.")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        payload = json.dumps({"id": request_id, "command": command, "args": args}) + "\n"
+        try:
+            with self._write_lock:
+                self._process.stdin.write(payload)
+                self._process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as exc:
+            self._pending.pop(request_id, None)
+            raise _SessionDown("Serena session is not running.") from exc
+        self.last_used = time.monotonic()
+        future.request_id = request_id  # type: ignore[attr-defined]
+        return future
+
+    def request(self, command: str, args: List[str], timeout: float = DEFAULT_TIMEOUT) -> str:
+        future = self.submit(command, args)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError as exc:
+            self._pending.pop(future.request_id, None)  # type: ignore[attr-defined]
+            # A worker that stops answering is likely wedged; replace it.
+            self.close()
+            raise SerenaError(f"Serena command timed out after {timeout} seconds: {command}") from exc
+
+    def ping(self, timeout: float = _PING_TIMEOUT) -> bool:
+        try:
+            return self.request("ping", [], timeout) == "pong"
+        except SerenaError:
+            return False
+
+    def close(self) -> None:
+        self._closed = True
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+
+_SESSIONS: Dict[str, SerenaSession] = {}
+_SESSIONS_LOCK = threading.Lock()
+# Per-workspace locks so a slow worker start-up does not block other workspaces.
+_STARTING: Dict[str, threading.Lock] = {}
+# Executables whose last session start failed, mapped to when to try again.
+_RETRY_AT: Dict[str, float] = {}
+
+
+def _sessions_enabled() -> bool:
+    return os.environ.get("SERENA_SESSION", "1").strip().lower() not in {"0", "off", "false", "no"}
+
+
+def _start_session(executable: str, workspace: str) -> SerenaSession | None:
+    started = time.perf_counter()
+    try:
+        session = SerenaSession(executable, workspace)
+    except OSError:
+        return None
+    if session.ping(_STARTUP_TIMEOUT):
+        # Until the first ping answers, the worker is still starting up.
+        metrics.SERENA_SPAWN_SECONDS.observe(time.perf_counter() - started, mode="session")
+        return session
+    session.close()
+    return None
+
+
+def get_session(workspace: str | None = None) -> SerenaSession | None:
+    """Return a healthy worker for *workspace*, starting one if needed.
+
+    ``None`` means sessions are disabled or unsupported and callers should
+    fall back to one process per call.
+    """
+
+    if not _sessions_enabled():
+        return None
+    executable = _resolve_serena_command()
+    workspace = _workspace(workspace)
+    with _SESSIONS_LOCK:
+        start_lock = _STARTING.setdefault(workspace, threading.Lock())
+    with start_lock:
+        with _SESSIONS_LOCK:
+            session = _SESSIONS.get(workspace)
+            if session is None and _RETRY_AT.get(executable, 0.0) > time.monotonic():
+                return None
+        if session is not None and session.alive:
+            if time.monotonic() - session.last_used < HEALTH_CHECK_INTERVAL or session.ping():
+                return session
+            session.close()
+        with _SESSIONS_LOCK:
+            if _RETRY_AT.get(executable, 0.0) > time.monotonic():
+                _SESSIONS.pop(workspace, None)
+                return None
+        session = _start_session(executable, workspace)
+        with _SESSIONS_LOCK:
+            if session is None:
+                _SESSIONS.pop(workspace, None)
+                _RETRY_AT[executable] = time.monotonic() + SESSION_RETRY_AFTER
+                return None
+            _RETRY_AT.pop(executable, None)
+            _SESSIONS[workspace] = session
+        return session
+
+
+def _run_serena(subcommand: str, args: Sequence[object] | None = None, timeout: float | None = None) -> str:
+    arguments = _normalise_args(args)
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    for _attempt in range(2):
+        session = get_session()
+        if session is None:
+            break
+        try:
+            with metrics.SERENA_EXEC_SECONDS.time(mode="session", command=subcommand):
+                return session.request(subcommand, arguments, timeout)
+        except _SessionDown:
+            # The worker died before the request was written, so retrying
+            # on a fresh worker cannot run the command twice.
+            continue
+    return _run_serena_once(subcommand, arguments, timeout)
+
+
+async def _run_serena_subprocess(subcommand: str, args: List[str], timeout: float) -> str:
+    """Async twin of :func:`_run_serena_once` built on ``create_subprocess_exec``."""
+
+    command = [_resolve_serena_command(), subcommand, *args]
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *command, cwd=_workspace(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    spawned = time.perf_counter()
+    metrics.SERENA_SPAWN_SECONDS.observe(spawned - started, mode="oneshot")
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException as exc:  # timeout or cancellation: do not leak the child
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(exc, asyncio.TimeoutError):
+            raise SerenaError(f"Serena command timed out after {timeout} seconds: {' '.join(command)}") from exc
+        raise
+    finally:
+        metrics.SERENA_EXEC_SECONDS.observe(time.perf_counter() - spawned, mode="oneshot", command=subcommand)
+    if process.returncode:
+        details = " | ".join(
+            part for part in (stderr.decode("utf-8", "replace").strip(), stdout.decode("utf-8", "replace").strip()) if part
+        ) or f"exit status {process.returncode}"
+        raise SerenaError(f"Serena command failed: {details}")
+    return stdout.decode("utf-8")
+
+
+async def run_serena_async(subcommand: str, args: Sequence[object] | None = None, timeout: float | None = None) -> str:
+    """Await a Serena command without blocking the event loop.
+
+    Uses the workspace session when available, otherwise an asyncio
+    subprocess per call.
+    """
+
+    arguments = _normalise_args(args)
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    for _attempt in range(2):
+        # Starting a worker blocks on its handshake, so do it off the loop.
+        session = await asyncio.to_thread(get_session)
+        if session is None:
+            break
+        try:
+            future = session.submit(subcommand, arguments)
+        except _SessionDown:
+            continue
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError as exc:
+            session._pending.pop(future.request_id, None)  # type: ignore[attr-defined]
+            session.close()
+            raise SerenaError(f"Serena command timed out after {timeout} seconds: {subcommand}") from exc
+    return await _run_serena_subprocess(subcommand, arguments, timeout)
+
+
+def health_check() -> Dict[str, bool]:
+    """Ping every running worker, dropping the ones that do not answer."""
+
+    with _SESSIONS_LOCK:
+        sessions = dict(_SESSIONS)
+    status = {}
+    for workspace, session in sessions.items():
+        healthy = session.alive and session.ping()
+        if not healthy:
+            session.close()
+            with _SESSIONS_LOCK:
+                if _SESSIONS.get(workspace) is session:
+                    del _SESSIONS[workspace]
+        status[workspace] = healthy
+    return status
+
+
+def shutdown_sessions() -> None:
+    """Stop all workers and forget the resolved (or missing) executable."""
+
+    global _EXECUTABLE, _MISSING
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+        _RETRY_AT.clear()
+    for session in sessions:
+        session.close()
+    with _EXECUTABLE_LOCK:
+        _EXECUTABLE = None
+        _MISSING = None
+
+
+atexit.register(shutdown_sessions)
+
+
+def _offline_find_symbol(args: Sequence[object]) -> str | None:
+    """Answer ``find_symbol`` from the local code index when Serena is not installed."""
+
+    try:
+        _resolve_serena_command()
+        return None
+    except SerenaError:
+        pass
+    if not args:
+        raise SerenaError("find_symbol needs a symbol name.")
+    from tools.code_index import get_index
+
+    return json.dumps(get_index(_workspace()).find_symbol(str(args[0])))
 
 
 def find_symbol(*args: object) -> str:
-    """Proxy to ``serena find_symbol`` returning the CLI stdout."""
+    """Proxy to ``serena find_symbol`` returning the CLI stdout.
 
+    Without a Serena executable the answer comes from :mod:`tools.code_index`
+    as a JSON list of ``{"name", "kind", "qualname", "file", "line", "end_line"}``.
+    """
+
+    offline = _offline_find_symbol(args)
+    if offline is not None:
+        return offline
     return _run_serena("find_symbol", args)
 
 
@@ -77,5 +459,30 @@ def insert_after_symbol(*args: object) -> str:
     return _run_serena("insert_after_symbol", args)
 
 
-__all__ = ["find_symbol", "insert_after_symbol", "SerenaError"]
+async def find_symbol_async(*args: object) -> str:
+    """Awaitable :func:`find_symbol`."""
+
+    offline = await asyncio.to_thread(_offline_find_symbol, args)
+    if offline is not None:
+        return offline
+    return await run_serena_async("find_symbol", args)
+
+
+async def insert_after_symbol_async(*args: object) -> str:
+    """Awaitable :func:`insert_after_symbol`."""
+
+    return await run_serena_async("insert_after_symbol", args)
+
 
+__all__ = [
+    "find_symbol",
+    "insert_after_symbol",
+    "find_symbol_async",
+    "insert_after_symbol_async",
+    "run_serena_async",
+    "get_session",
+    "health_check",
+    "shutdown_sessions",
+    "SerenaSession",
+    "SerenaError",
+]
@@ -1,26 +1,76 @@
 # tools/standard_tools.py
 
-def read_file(*args, **kwargs):
-    print(f"[STD TOOL STUB] read_file called with: {args}, {kwargs}")
-    return {"status": "success", "content": "File content here."}
+from tools import file_io
+import metrics
+from loader import LoaderError
 
-def write_file(*args, **kwargs):
-    print(f"[STD TOOL STUB] write_file called with: {args}, {kwargs}")
-    return {"status": "success", "message": "File written successfully."}
+_log = metrics.get_logger(__name__)
 
-def delete_file(*args, **kwargs):
-    print(f"[STD TOOL STUB] delete_file called with: {args}, {kwargs}")
+
+def read_file(path, offset=0, length=None, encoding="utf-8"):
+    """Read *path* (or a byte range of it) from a memory map."""
+    try:
+        view = file_io.read_range(path, offset, length)
+        try:
+            content = str(view, encoding, errors="replace")
+        finally:
+            view.release()
+    except (LoaderError, OSError, ValueError) as exc:
+        return {"status": "error", "message": str(exc)}
+    return {"status": "success", "content": content}
+
+def write_file(path, content, encoding="utf-8"):
+    """Atomically replace *path* with *content* (a string, bytes or an iterable of chunks)."""
+    chunks = [content] if isinstance(content, (str, bytes, bytearray, memoryview)) else content
+    try:
+        written = file_io.write_stream(path, chunks, encoding)
+    except (LoaderError, OSError, ValueError) as exc:
+        return {"status": "error", "message": str(exc)}
+    return {"status": "success", "message": "File written successfully.", "bytes_written": written}
+
+def delete_file(path):
+    try:
+        file_io.delete(path)
+    except (LoaderError, OSError) as exc:
+        return {"status": "error", "message": str(exc)}
     return {"status": "success", "message": "File deleted."}
 
-def execute_code(*args, **kwargs):
-    print(f"[STD TOOL STUB] execute_code called with: {args}, {kwargs}")
-    return {"status": "success", "output": "Code execution output."}
+def execute_code(language, code, timeout=None, on_output=None):
+    """Run *code* in the sandboxed worker pool (see ``tools/code_runner.py``)."""
+    from tools.code_runner import CodeRunnerError, default_pool
+
+    try:
+        result = default_pool().run(code, language, timeout, on_output)
+    except CodeRunnerError as exc:
+        return {"status": "error", "message": str(exc)}
+    return {
+        "status": "success" if result.ok else "error",
+        "output": result.stdout,
+        "stderr": result.stderr,
+        "exit_code": result.exit_code,
+        "timed_out": result.timed_out,
+        "truncated": result.truncated,
+    }
 
 # The original coder-agent also had open_in_vscode and search
 def open_in_vscode(*args, **kwargs):
-    print(f"[STD TOOL STUB] open_in_vscode called with: {args}, {kwargs}")
+    metrics.log_call(_log, "open_in_vscode", args, kwargs)
     return {"status": "success", "message": "Opened in VS Code."}
 
-def search(*args, **kwargs):
-    print(f"[STD TOOL STUB] search called with: {args}, {kwargs}")
-    return {"status": "success", "results": "Search results here."}
+def search(query, limit=20, mode="text"):
+    """Search the workspace index: ranked tokens (``text``) or a substring (``substring``)."""
+    if mode not in ("text", "substring"):
+        return {"status": "error", "message": f"Unknown search mode '{mode}'."}
+    from tools.code_index import get_index
+
+    index = get_index()
+    found = index.search(query, limit) if mode == "text" else index.grep(query, limit)
+    results = [
+        {
+            "path": result.path,
+            "score": result.score,
+            "lines": [hit._asdict() for hit in result.lines],
+        }
+        for result in found
+    ]
+    return {"status": "success", "results": results}
@@ -0,0 +1,524 @@
+"""Local vector index for similarity lookups in ``memory_store`` and ``find_analogy``.
+
+Texts are embedded locally (no network) by an :class:`Embedder`; the default
+:class:`HashingEmbedder` hashes word unigrams and bigrams into a fixed number
+of signed buckets with sublinear term weights and L2 normalisation.
+
+An index lives in a directory:
+
+* ``meta.json``: dimension and embedder name,
+* ``vectors.f32``: one float32 row per added entry, append-only,
+* ``rows.jsonl``: the id, text and vector row number of each entry, plus
+  ``{"delete": id}`` tombstones; the last row for an id wins, and
+* ``ivf.json`` / ``ivf.assign``: the optional inverted-file partition.
+
+After :meth:`VectorIndex.compact` the vectors live in
+``vectors.<generation>.f32``, named by a header line at the top of
+``rows.jsonl``, so replacing that one file switches both at once.
+
+The vector file is memory-mapped read-only, so every process that opens the
+same index shares one copy through the page cache, and new rows appended by
+another process are picked up on the next query.  Appends take an
+``fcntl`` lock and write the vectors before the row lines that point at
+them.  A row whose vector is not in the file, or that overlaps an earlier
+row, is ignored, and the next append cuts off whatever a crashed writer
+left behind, so a crash never misaligns later rows.
+
+Queries score every live row with one matrix product when NumPy is
+installed and fall back to a pure-Python loop over the query's non-zero
+components otherwise.  :meth:`VectorIndex.build_ivf` clusters the rows with
+k-means so queries only score the ``nprobe`` nearest clusters (plus rows
+added since the build), which keeps large indexes fast.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import random
+import re
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Protocol, Sequence, Tuple
+
+from loader import BASE_PATH
+
+try:  # pragma: no cover - dependency optionality
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - pure-Python fallback below
+    np = None
+
+
+DEFAULT_DIM = 256
+DEFAULT_ROOT = BASE_PATH / ".cache" / "vectors"
+_WORD = re.compile(r"\w+")
+_FLOAT_BYTES = 4
+_LEGACY_VECTORS = "vectors.f32"
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, text: str) -> Dict[int, float]:
+        """Return the non-zero components of the unit vector for *text*."""
+
+
+class HashingEmbedder:
+    """Signed feature hashing of word unigrams and bigrams."""
+
+    def __init__(self, dim: int = DEFAULT_DIM) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return (digest >> 1) % self.dim, (1.0 if digest & 1 else -1.0)
+
+    def embed(self, text: str) -> Dict[int, float]:
+        words = [word.lower() for word in _WORD.findall(text)]
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        vector: Dict[int, float] = {}
+        for feature, count in features.items():
+            bucket, sign = self._bucket(feature)
+            vector[bucket] = vector.get(bucket, 0.0) + sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {bucket: value / norm for bucket, value in vector.items() if value} if norm else {}
+
+
+_EMBEDDERS = {"hashing": HashingEmbedder}
+
+
+def register_embedder(name: str, factory) -> None:
+    """Make ``factory(dim)`` available to :class:`VectorIndex` under *name*."""
+
+    _EMBEDDERS[name] = factory
+
+
+class Match(NamedTuple):
+    id: str
+    score: float
+    text: str
+
+
+class VectorIndex:
+    """Append-only, memory-mapped vector index stored under *path*."""
+
+    def __init__(self, path: Path | str, dim: int = DEFAULT_DIM, embedder: str = "hashing") -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            dim, embedder = meta["dim"], meta["embedder"]
+        else:
+            tmp_path = meta_path.with_name(f"meta.json.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({"dim": dim, "embedder": embedder}), encoding="utf-8")
+            os.replace(tmp_path, meta_path)
+        self.dim = dim
+        self.embedder: Embedder = _EMBEDDERS[embedder](dim)
+        self._vectors_path = self.path / _LEGACY_VECTORS
+        self._rows_path = self.path / "rows.jsonl"
+        self._lock = threading.RLock()
+        self._rows_offset = 0
+        # Held open so that its inode, our generation marker, cannot be reused.
+        self._rows_handle = None
+        self._vectors_handle = None
+        # Indexed by vector row; rows no record points at hold None.
+        self._ids: List[str | None] = []
+        self._texts: List[str] = []
+        self._live: Dict[str, int] = {}
+        # Rows of this generation dropped as inconsistent; see _apply.
+        self._lost = 0
+        self._mapped_rows = 0
+        self._map: mmap.mmap | None = None
+        self._matrix = None
+        self._ivf_key: Tuple[int | None, str] | None = None
+        self._centroids: List[List[float]] = []
+        self._lists: List[List[int]] = []
+        self._ivf_rows = 0
+        if not self._rows_path.exists():
+            self._vectors_path.touch(exist_ok=True)
+            self._rows_path.touch(exist_ok=True)
+
+    # -- state ---------------------------------------------------------
+
+    def _sync(self) -> None:
+        """Pick up rows appended since the last call, by this or another process."""
+
+        current = self._rows_path.stat()
+        handle = self._rows_handle
+        if handle is not None:
+            held = os.fstat(handle.fileno())
+            if (held.st_dev, held.st_ino) != (current.st_dev, current.st_ino):
+                # compact() replaced the file (here or in another process), so
+                # offsets into the old one mean nothing: start over.
+                self._close_handles()
+                handle = None
+        if handle is None:
+            handle = self._open_generation()
+        # Read through the held handle so every row comes from one file.
+        if os.fstat(handle.fileno()).st_size > self._rows_offset:
+            handle.seek(self._rows_offset)
+            lines = []
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    break  # a writer is mid-line; read it next time
+                self._rows_offset += len(raw)
+                lines.append(raw)
+            # Sized after the lines were read: writers add vectors first, so
+            # every row written so far is covered unless a crash lost it.
+            stored = os.fstat(self._vectors_handle.fileno()).st_size // (self.dim * _FLOAT_BYTES)
+            for raw in lines:
+                self._apply(raw, stored)
+        if len(self._ids) != self._mapped_rows:
+            self._remap()
+        ivf_path = self.path / "ivf.json"
+        key = (ivf_path.stat().st_mtime_ns if ivf_path.exists() else None, self._vectors_path.name)
+        if key != self._ivf_key:
+            self._load_ivf(key)
+
+    def _open_generation(self):
+        """Open ``rows.jsonl`` and the vector file its header names, as one pair."""
+
+        while True:
+            handle = self._rows_path.open("rb")
+            name = _LEGACY_VECTORS
+            first = handle.readline()
+            if first.endswith(b"\n"):
+                try:
+                    header = json.loads(first)
+                except ValueError:
+                    header = None
+                if isinstance(header, dict) and "vectors" in header:
+                    name = header["vectors"]
+            try:
+                self._vectors_handle = (self.path / name).open("rb")
+            except FileNotFoundError:
+                held, current = os.fstat(handle.fileno()), self._rows_path.stat()
+                handle.close()
+                if (held.st_dev, held.st_ino) == (current.st_dev, current.st_ino):
+                    raise
+                # compact() switched generations between the two opens.
+                continue
+            break
+        self._rows_handle = handle
+        self._vectors_path = self.path / name
+        self._ids, self._texts, self._live, self._rows_offset = [], [], {}, 0
+        self._lost = 0
+        self._mapped_rows = -1
+        return handle
+
+    def _apply(self, raw: bytes, stored: int) -> None:
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            return  # a line torn by a crashed writer
+        if "delete" in record:
+            self._live.pop(record["delete"], None)
+            return
+        if "id" not in record:
+            return  # the generation header
+        row = record.get("row", len(self._ids))
+        if row < len(self._ids) or row >= stored:
+            # Overlaps an earlier row, or its vector never reached the file.
+            self._lost += 1
+            return
+        if row > len(self._ids):
+            # Vectors orphaned by an append that crashed before its rows.
+            self._ids.extend([None] * (row - len(self._ids)))
+            self._texts.extend([""] * (row - len(self._texts)))
+        self._live[record["id"]] = row
+        self._ids.append(record["id"])
+        self._texts.append(record.get("text", ""))
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            if isinstance(self._matrix, memoryview):
+                self._matrix.release()
+            self._matrix = None
+            self._map.close()
+            self._map = None
+        rows = len(self._ids)
+        self._mapped_rows = rows
+        if not rows:
+            return
+        self._map = mmap.mmap(self._vectors_handle.fileno(), rows * self.dim * _FLOAT_BYTES, access=mmap.ACCESS_READ)
+        if np is not None:
+            self._matrix = np.frombuffer(self._map, dtype=np.float32).reshape(rows, self.dim)
+        else:
+            self._matrix = memoryview(self._map).cast("f")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._live)
+
+    # -- writes --------------------------------------------------------
+
+    def add(self, id: str, text: str) -> None:
+        self.add_many([(id, text)])
+
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Embed and append ``(id, text)`` pairs; re-adding an id replaces it."""
+
+        vectors = array("f")
+        records = []
+        for item_id, text in items:
+            row = [0.0] * self.dim
+            for bucket, value in self.embedder.embed(text).items():
+                row[bucket] = value
+            vectors.extend(row)
+            records.append({"id": item_id, "text": text})
+        if records:
+            self._append(vectors.tobytes(), records)
+        return len(records)
+
+    def remove(self, id: str) -> None:
+        self._append(b"", [{"delete": id}])
+
+    def _append(self, vectors: bytes, records: List[Dict[str, str]]) -> None:
+        with self._lock, (self.path / ".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Under the lock this reads the current generation to its end.
+            self._sync()
+            if self._lost:
+                # Rows that outlived their vectors (power loss) would pick up
+                # the next vectors written at their offsets: drop them first.
+                self._rewrite()
+            base = len(self._ids)
+            lines = []
+            for record in records:
+                if "delete" not in record:
+                    record = dict(record, row=base)
+                    base += 1
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            # Cut off what a crashed writer left past the last complete row,
+            # then write vectors first: a row is only visible once its line exists.
+            with self._vectors_path.open("r+b") as handle:
+                handle.truncate(len(self._ids) * self.dim * _FLOAT_BYTES)
+                handle.seek(0, os.SEEK_END)
+                handle.write(vectors)
+            with self._rows_path.open("r+b") as handle:
+                handle.truncate(self._rows_offset)
+                handle.seek(self._rows_offset)
+                handle.write("".join(lines).encode("utf-8"))
+
+    # -- queries -------------------------------------------------------
+
+    def _score(self, query: Dict[int, float], rows: Sequence[int] | None) -> List[Tuple[float, int]]:
+        if np is not None:
+            dense = np.zeros(self.dim, dtype=np.float32)
+            for bucket, value in query.items():
+                dense[bucket] = value
+            if rows is None:
+                scores = self._matrix @ dense
+                return list(zip(scores.tolist(), range(len(scores))))
+            selected = np.fromiter(rows, dtype=np.int64)
+            return list(zip((self._matrix[selected] @ dense).tolist(), selected.tolist()))
+        matrix, dim = self._matrix, self.dim
+        terms = list(query.items())
+        candidates = range(self._mapped_rows) if rows is None else rows
+        return [(sum(matrix[row * dim + bucket] * value for bucket, value in terms), row) for row in candidates]
+
+    def search(self, text: str, k: int = 5, prefix: str | None = None, nprobe: int = 8) -> List[Match]:
+        """Return the *k* live entries most similar to *text* (cosine similarity).
+
+        *prefix* restricts results to ids starting with it.  With an IVF
+        partition, only the *nprobe* nearest clusters are scored.
+        """
+
+        query = self.embedder.embed(text)
+        with self._lock:
+            self._sync()
+            if not query or not self._live:
+                return []
+            rows: Sequence[int] | None = None
+            if self._centroids and nprobe < len(self._centroids):
+                rows = self._probe(query, nprobe)
+            if prefix is not None:
+                allowed = [row for item_id, row in self._live.items() if item_id.startswith(prefix)]
+                rows = allowed if rows is None else sorted(set(rows).intersection(allowed))
+            ids, live = self._ids, self._live
+            scored = [pair for pair in self._score(query, rows) if live.get(ids[pair[1]]) == pair[1]]
+            best = sorted(scored, reverse=True)[:k]
+            return [Match(self._ids[row], round(score, 6), self._texts[row]) for score, row in best if score > 0]
+
+    # -- IVF -----------------------------------------------------------
+
+    def _probe(self, query: Dict[int, float], nprobe: int) -> List[int]:
+        ranked = sorted(
+            range(len(self._centroids)),
+            key=lambda cluster: -sum(self._centroids[cluster][b] * v for b, v in query.items()),
+        )
+        rows = [row for cluster in ranked[:nprobe] for row in self._lists[cluster]]
+        rows.extend(range(self._ivf_rows, self._mapped_rows))
+        return rows
+
+    def _row(self, row: int) -> List[float]:
+        if np is not None:
+            return self._matrix[row].tolist()
+        return list(self._matrix[row * self.dim : (row + 1) * self.dim])
+
+    def build_ivf(self, nlist: int | None = None, iterations: int = 8, sample: int = 20000, seed: int = 0) -> int:
+        """Partition the live rows into *nlist* k-means clusters; returns the cluster count.
+
+        *nlist* defaults to about ``sqrt(rows)``.  Centroids are trained on up
+        to *sample* rows and every live row is then assigned to its nearest one.
+        """
+
+        with self._lock:
+            self._sync()
+            live = sorted(self._live.values())
+            if not live:
+                return 0
+            nlist = max(1, min(len(live), nlist or int(math.sqrt(len(live)))))
+            rng = random.Random(seed)
+            training = rng.sample(live, min(sample, len(live)))
+            centroids = [self._row(row) for row in rng.sample(training, nlist)]
+            for _ in range(iterations):
+                assignment = self._assign(training, centroids)
+                sums = [[0.0] * self.dim for _ in centroids]
+                counts = [0] * len(centroids)
+                for row, cluster in zip(training, assignment):
+                    counts[cluster] += 1
+                    target = sums[cluster]
+                    for position, value in enumerate(self._row(row)):
+                        target[position] += value
+                for cluster, total in enumerate(sums):
+                    norm = math.sqrt(sum(value * value for value in total))
+                    if counts[cluster] and norm:
+                        centroids[cluster] = [value / norm for value in total]
+            rows = self._mapped_rows
+            assignment = array("i", [-1]) * rows
+            for row, cluster in zip(live, self._assign(live, centroids)):
+                assignment[row] = cluster
+            payload = {"rows": rows, "centroids": centroids, "vectors": self._vectors_path.name}
+            _write_replace(self.path / "ivf.assign", assignment.tobytes())
+            _write_replace(self.path / "ivf.json", json.dumps(payload).encode("utf-8"))
+            self._sync()
+            return nlist
+
+    def _assign(self, rows: Sequence[int], centroids: List[List[float]]) -> List[int]:
+        if np is not None:
+            matrix = np.asarray(centroids, dtype=np.float32)
+            return (self._matrix[np.fromiter(rows, dtype=np.int64)] @ matrix.T).argmax(axis=1).tolist()
+        assigned = []
+        for row in rows:
+            vector = [(position, value) for position, value in enumerate(self._row(row)) if value]
+            scores = [sum(centroid[position] * value for position, value in vector) for centroid in centroids]
+            assigned.append(max(range(len(scores)), key=scores.__getitem__))
+        return assigned
+
+    def _load_ivf(self, key: Tuple[int | None, str]) -> None:
+        self._ivf_key = key
+        self._centroids, self._lists, self._ivf_rows = [], [], 0
+        if key[0] is None:
+            return
+        try:
+            payload = json.loads((self.path / "ivf.json").read_text(encoding="utf-8"))
+            assignment = array("i")
+            assignment.frombytes((self.path / "ivf.assign").read_bytes())
+        except (OSError, ValueError):
+            return
+        if payload.get("vectors", _LEGACY_VECTORS) != key[1] or len(assignment) != payload["rows"]:
+            return  # built for another generation, or caught mid-rebuild
+        self._centroids = payload["centroids"]
+        self._ivf_rows = payload["rows"]
+        self._lists = [[] for _ in self._centroids]
+        for row, cluster in enumerate(assignment):
+            if cluster >= 0:
+                self._lists[cluster].append(row)
+
+    # -- maintenance ---------------------------------------------------
+
+    def compact(self) -> int:
+        """Rewrite the files without replaced or deleted rows; returns the rows kept.
+
+        Drops the IVF partition, which has to be rebuilt afterwards.
+        """
+
+        with self._lock, (self.path / ".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._sync()
+            return self._rewrite()
+
+    def _rewrite(self) -> int:
+        # Write a new generation beside the current one and switch to it by
+        # replacing rows.jsonl alone; a crash before that leaves the old one.
+        keep = sorted(self._live.values())
+        name = f"vectors.{os.urandom(6).hex()}.f32"
+        vectors = array("f")
+        lines = [json.dumps({"vectors": name}) + "\n"]
+        for position, row in enumerate(keep):
+            vectors.extend(self._row(row))
+            record = {"id": self._ids[row], "text": self._texts[row], "row": position}
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        _write_replace(self.path / name, vectors.tobytes())
+        _write_replace(self._rows_path, "".join(lines).encode("utf-8"))
+        for stale in self.path.glob("vectors*.f32"):
+            if stale.name != name:
+                stale.unlink(missing_ok=True)
+        for stale_name in ("ivf.json", "ivf.assign"):
+            (self.path / stale_name).unlink(missing_ok=True)
+        self._sync()
+        return len(keep)
+
+    def _close_handles(self) -> None:
+        for handle in (self._rows_handle, self._vectors_handle):
+            if handle is not None:
+                handle.close()
+        self._rows_handle = self._vectors_handle = None
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._matrix, memoryview):
+                self._matrix.release()
+            self._matrix = None
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._close_handles()
+
+
+def _write_replace(path: Path, data: bytes) -> None:
+    """Write *data* to a temporary file, fsync it and move it over *path*."""
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+_INDEXES: Dict[str, VectorIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(name: str) -> VectorIndex:
+    """Return the shared index *name*, stored under ``AI_SANDBOX_VECTOR_DIR`` (default ``.cache/vectors``)."""
+
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(name)
+        if index is None:
+            root = Path(os.environ.get("AI_SANDBOX_VECTOR_DIR") or DEFAULT_ROOT)
+            index = _INDEXES[name] = VectorIndex(root / name)
+        return index
+
+
+__all__ = [
+    "VectorIndex",
+    "Match",
+    "Embedder",
+    "HashingEmbedder",
+    "register_embedder",
+    "get_index",
+    "DEFAULT_DIM",
+]
@@ -1,121 +1,412 @@
 #!/usr/bin/env python3
+"""Validate ``role/`` and ``tool/`` definitions against their JSON schemas.
+
+YAML files are parsed with :func:`loader.parse_yaml_file`, so the validator
+sees exactly what the runtime loader sees.  Each schema is compiled into a
+single ``Draft7Validator`` per process and files are checked across a
+process pool when there are enough of them to amortise the start-up cost.
+
+With ``--incremental`` a manifest of content hashes is kept between runs
+and only files whose content, schema or role imports changed are checked
+again; the rest reuse their recorded result.
+
+Usage::
+
+    python validate.py [--jobs N] [--format text|json|junit] [--output FILE]
+                       [--incremental [--manifest FILE]]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
 import os
 import sys
-import json
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+from xml.etree import ElementTree
 
-# We need a YAML loader. To avoid a dependency on app.py, we can include a simple one here.
-# This loader should be robust enough for our known file structures.
-def _yaml_load(text: str) -> dict:
-    """
-    A robust YAML loader that tries to use PyYAML if available,
-    but falls back to a basic parser for our specific structure.
+from loader import BASE_PATH, LoaderError, parse_yaml_file
+
+
+SCHEMA_FILES: Dict[str, str] = {
+    "role": "schemas/role_schema.json",
+    "tool": "schemas/tool_schema.json",
+}
+
+# (directory to scan, schema key)
+TARGETS: Tuple[Tuple[str, str], ...] = (("role", "role"), ("tool", "tool"))
+
+DEFAULT_MANIFEST_PATH = BASE_PATH / ".cache" / "validate-manifest.json"
+_MANIFEST_VERSION = 1
+
+# Below this many files a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 64
+
+
+@dataclass
+class FileResult:
+    path: str
+    kind: str
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    deps: List[str] = field(default_factory=list)
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def load_yaml_file(path: str) -> dict:
+    """Parse *path* with the same parser the loader uses."""
+
+    return parse_yaml_file(Path(path))
+
+
+def load_schemas(root: Path = BASE_PATH) -> Dict[str, Dict[str, Any]]:
+    schemas = {}
+    for kind, relative in SCHEMA_FILES.items():
+        with (root / relative).open("r", encoding="utf-8") as handle:
+            schemas[kind] = json.load(handle)
+    return schemas
+
+
+def discover(root: Path = BASE_PATH) -> List[Tuple[str, str]]:
+    """Return ``(path, schema kind)`` for every YAML file under the targets."""
+
+    tasks: List[Tuple[str, str]] = []
+    for directory, kind in TARGETS:
+        for current, dirnames, filenames in os.walk(root / directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith((".yaml", ".yml")):
+                    tasks.append((os.path.join(current, filename), kind))
+    return tasks
+
+
+_VALIDATORS: Dict[str, Any] = {}
+
+
+def _init_worker(schemas: Dict[str, Dict[str, Any]]) -> None:
+    """Compile one validator per schema for this process."""
+
+    from jsonschema import Draft7Validator
+
+    _VALIDATORS.clear()
+    for kind, schema in schemas.items():
+        Draft7Validator.check_schema(schema)
+        _VALIDATORS[kind] = Draft7Validator(schema)
+
+
+def _format_error(error: Any) -> str:
+    location = "/".join(str(part) for part in error.absolute_path) or "<root>"
+    return f"{location}: {error.message}"
+
+
+def _check_imports(result: FileResult, instance: Any) -> None:
+    """Record a role's imports as dependencies and report missing ones."""
+
+    imports = instance.get("imports") if isinstance(instance, dict) else None
+    if not isinstance(imports, dict):
+        return
+    role_dir = Path(result.path).parent
+    for kind, entries in imports.items():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            if not isinstance(entry, str):
+                continue
+            target = os.path.normpath(role_dir / entry)
+            result.deps.append(target)
+            if not os.path.isfile(target):
+                result.errors.append(f"imports/{kind}: missing import {entry}")
+
+
+def validate_file(task: Tuple[str, str]) -> FileResult:
+    path, kind = task
+    started = time.perf_counter()
+    result = FileResult(path=path, kind=kind)
+    try:
+        instance = load_yaml_file(path)
+    except (LoaderError, OSError, UnicodeDecodeError) as exc:
+        result.errors.append(f"parse error: {exc}")
+    else:
+        validator = _VALIDATORS[kind]
+        errors = sorted(validator.iter_errors(instance), key=lambda error: list(error.absolute_path))
+        result.errors.extend(_format_error(error) for error in errors)
+        if kind == "role":
+            _check_imports(result, instance)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def validate_files(
+    tasks: Sequence[Tuple[str, str]],
+    schemas: Dict[str, Dict[str, Any]],
+    jobs: int | None = None,
+) -> List[FileResult]:
+    """Validate *tasks*, in a process pool when it is worth it."""
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(tasks) < PARALLEL_THRESHOLD:
+        _init_worker(schemas)
+        return [validate_file(task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(schemas,)) as pool:
+        return list(pool.map(validate_file, tasks, chunksize=chunksize))
+
+
+def _schema_digest(schema: Mapping[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """Content hashes and results from the previous incremental run.
+
+    ``hashes`` maps each file seen (specs and role imports) to
+    ``[mtime_ns, size, sha256]`` so unchanged files are not re-read;
+    ``files`` holds the result recorded for each validated spec.
     """
+
+    def __init__(self, path: Path, root: Path = BASE_PATH) -> None:
+        self.path = path
+        self.root = root
+        self.previous_hashes: Dict[str, List[Any]] = {}
+        self.hashes: Dict[str, List[Any]] = {}
+        self.previous_files: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        try:
+            with path.open("r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == _MANIFEST_VERSION:
+            self.previous_hashes = data.get("hashes") or {}
+            self.previous_files = data.get("files") or {}
+
+    def digest(self, path: str) -> str | None:
+        """Return the sha256 of *path*, or ``None`` if it does not exist."""
+
+        key = _relative(path, self.root)
+        if key in self.hashes:
+            return self.hashes[key][2]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        previous = self.previous_hashes.get(key)
+        if previous and previous[0] == stat.st_mtime_ns and previous[1] == stat.st_size:
+            digest = previous[2]
+        else:
+            with open(path, "rb") as handle:
+                digest = hashlib.file_digest(handle, "sha256").hexdigest()
+        self.hashes[key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+    def cached(self, path: str, kind: str, schema_digest: str) -> FileResult | None:
+        """Return the recorded result for *path* if nothing it depends on changed."""
+
+        key = _relative(path, self.root)
+        entry = self.previous_files.get(key)
+        if not entry or entry.get("kind") != kind or entry.get("schema") != schema_digest:
+            return None
+        if entry.get("digest") != self.digest(path):
+            return None
+        deps = entry.get("deps") or {}
+        for dep, digest in deps.items():
+            if self.digest(str(self.root / dep)) != digest:
+                return None
+        self.files[key] = entry
+        return FileResult(
+            path=path,
+            kind=kind,
+            errors=list(entry.get("errors") or ()),
+            deps=[str(self.root / dep) for dep in deps],
+            cached=True,
+        )
+
+    def record(self, result: FileResult, schema_digest: str) -> None:
+        self.files[_relative(result.path, self.root)] = {
+            "kind": result.kind,
+            "schema": schema_digest,
+            "digest": self.digest(result.path),
+            "deps": {_relative(dep, self.root): self.digest(dep) for dep in result.deps},
+            "errors": result.errors,
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": _MANIFEST_VERSION, "hashes": self.hashes, "files": self.files}
+        tmp_path = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def validate_incremental(
+    tasks: Sequence[Tuple[str, str]],
+    schemas: Dict[str, Dict[str, Any]],
+    manifest: Manifest,
+    jobs: int | None = None,
+) -> List[FileResult]:
+    """Validate only the *tasks* that changed since *manifest* was written."""
+
+    schema_digests = {kind: _schema_digest(schema) for kind, schema in schemas.items()}
+    results: List[FileResult | None] = []
+    dirty: List[Tuple[str, str]] = []
+    positions: List[int] = []
+    for task in tasks:
+        path, kind = task
+        result = manifest.cached(path, kind, schema_digests[kind])
+        if result is None:
+            positions.append(len(results))
+            dirty.append(task)
+        results.append(result)
+
+    for position, result in zip(positions, validate_files(dirty, schemas, jobs) if dirty else ()):
+        manifest.record(result, schema_digests[result.kind])
+        results[position] = result
+    manifest.save()
+    return results  # type: ignore[return-value]
+
+
+def _relative(path: str, root: Path) -> str:
     try:
-        import yaml
-        return yaml.safe_load(text) or {}
-    except ImportError:
-        # This fallback is intentionally simple and may not cover all YAML features.
-        # It's designed for the key-value and list structures in our project.
-        data: dict = {}
-        lines = text.splitlines()
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if not line.strip() or line.strip().startswith('#'):
-                i += 1
-                continue
+        return Path(path).relative_to(root).as_posix()
+    except ValueError:
+        return path
 
-            match = re.match(r'^(\s*)(\S+):\s*(.*)', line)
-            if not match:
-                i += 1
-                continue
 
-            indent, key, value = match.groups()
-
-            if value:
-                data[key] = value.strip('\'"')
-                i += 1
-            else:
-                # It's a block, could be a list or dict
-                block_lines = []
-                j = i + 1
-                while j < len(lines) and (not lines[j].strip() or len(re.match(r'^(\s*)', lines[j]).group(1)) > len(indent)):
-                    block_lines.append(lines[j])
-                    j += 1
-
-                # Check if it's a list
-                if block_lines and block_lines[0].strip().startswith('-'):
-                    data[key] = [item.strip()[2:] for item in block_lines]
-                else: # Assume it's a dictionary
-                    sub_yaml = "\n".join([l.strip() for l in block_lines])
-                    data[key] = _yaml_load(sub_yaml)
-                i = j
-        return data
+def render_text(results: Iterable[FileResult], root: Path) -> str:
+    lines: List[str] = ["--- Running Configuration Validator ---"]
+    current_kind = None
+    error_count = 0
+    for result in results:
+        if result.kind != current_kind:
+            current_kind = result.kind
+            lines.append(f"\nValidating {current_kind}s in /{current_kind}/...")
+        path = _relative(result.path, root)
+        if result.cached:
+            path += " (unchanged)"
+        if result.ok:
+            lines.append(f"  ✅ {path}")
+            continue
+        error_count += 1
+        lines.append(f"  ❌ {path} - Validation Failed!")
+        lines.extend(f"     {message}" for message in result.errors)
+    if error_count:
+        lines.append(f"\n--- Validation Complete: Found {error_count} errors. ---")
+    else:
+        lines.append("\n--- Validation Complete: All configuration files are valid! ---")
+    return "\n".join(lines)
+
 
+def render_json(results: Sequence[FileResult], root: Path, seconds: float) -> str:
+    failures = sum(1 for result in results if not result.ok)
+    payload = {
+        "files": len(results),
+        "failures": failures,
+        "seconds": round(seconds, 6),
+        "results": [
+            dict(
+                asdict(result),
+                path=_relative(result.path, root),
+                deps=[_relative(dep, root) for dep in result.deps],
+                ok=result.ok,
+            )
+            for result in results
+        ],
+    }
+    return json.dumps(payload, ensure_ascii=False, indent=2)
 
-def load_yaml_file(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return _yaml_load(f.read())
 
-def main():
-    # This script must be run from the root of the repository.
+def render_junit(results: Sequence[FileResult], root: Path, seconds: float) -> str:
+    suites = ElementTree.Element("testsuites", name="validate", time=f"{seconds:.6f}")
+    by_kind: Dict[str, List[FileResult]] = {}
+    for result in results:
+        by_kind.setdefault(result.kind, []).append(result)
+    for kind, kind_results in by_kind.items():
+        suite = ElementTree.SubElement(
+            suites,
+            "testsuite",
+            name=kind,
+            tests=str(len(kind_results)),
+            failures=str(sum(1 for result in kind_results if not result.ok)),
+            time=f"{sum(result.seconds for result in kind_results):.6f}",
+        )
+        for result in kind_results:
+            case = ElementTree.SubElement(
+                suite, "testcase", classname=kind, name=_relative(result.path, root), time=f"{result.seconds:.6f}"
+            )
+            if not result.ok:
+                failure = ElementTree.SubElement(case, "failure", message=result.errors[0])
+                failure.text = "\n".join(result.errors)
+    return ElementTree.tostring(suites, encoding="unicode", xml_declaration=True)
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate role and tool definitions against their schemas.")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count; 1 disables the pool).")
+    parser.add_argument("--format", choices=("text", "json", "junit"), default="text", help="Report format.")
+    parser.add_argument("--output", "-o", type=Path, default=None, help="Write the report to this file instead of stdout.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only revalidate files whose content, schema or role imports changed since the last incremental run.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=DEFAULT_MANIFEST_PATH,
+        help=f"Manifest used by --incremental (default: {DEFAULT_MANIFEST_PATH.relative_to(BASE_PATH)}).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    options = parse_args(argv)
     try:
-        from jsonschema import validate, ValidationError
+        import jsonschema  # noqa: F401
     except ImportError:
         print("Error: jsonschema is not installed. Please run 'pip install jsonschema'", file=sys.stderr)
         sys.exit(1)
 
-    print("--- Running Configuration Validator ---")
-
-    # Load schemas
+    root = BASE_PATH
     try:
-        with open('schemas/role_schema.json', 'r') as f:
-            role_schema = json.load(f)
-        with open('schemas/tool_schema.json', 'r') as f:
-            tool_schema = json.load(f)
+        schemas = load_schemas(root)
     except FileNotFoundError as e:
-        print(f"Error: Could not load schema files. Make sure you are in the repo root.", file=sys.stderr)
+        print("Error: Could not load schema files.", file=sys.stderr)
         print(e, file=sys.stderr)
         sys.exit(1)
 
-    error_count = 0
+    started = time.perf_counter()
+    tasks = discover(root)
+    if options.incremental:
+        results = validate_incremental(tasks, schemas, Manifest(options.manifest, root), options.jobs)
+    else:
+        results = validate_files(tasks, schemas, options.jobs)
+    seconds = time.perf_counter() - started
 
-    # Validate roles
-    print("\nValidating roles in /role/...")
-    for root, _, files in os.walk('role'):
-        for file in files:
-            if file.endswith('.yaml'):
-                path = os.path.join(root, file)
-                try:
-                    instance = load_yaml_file(path)
-                    validate(instance=instance, schema=role_schema)
-                    print(f"  ✅ {path}")
-                except (ValidationError, Exception) as e:
-                    print(f"  ❌ {path} - Validation Failed!")
-                    print(f"     {e}")
-                    error_count += 1
-
-    # Validate tools
-    print("\nValidating tools in /tool/...")
-    for root, _, files in os.walk('tool'):
-        for file in files:
-            if file.endswith('.yaml'):
-                path = os.path.join(root, file)
-                try:
-                    instance = load_yaml_file(path)
-                    validate(instance=instance, schema=tool_schema)
-                    print(f"  ✅ {path}")
-                except (ValidationError, Exception) as e:
-                    print(f"  ❌ {path} - Validation Failed!")
-                    print(f"     {e}")
-                    error_count += 1
-
-    if error_count > 0:
-        print(f"\n--- Validation Complete: Found {error_count} errors. ---")
-        sys.exit(1)
+    if options.format == "json":
+        report = render_json(results, root, seconds)
+    elif options.format == "junit":
+        report = render_junit(results, root, seconds)
     else:
-        print("\n--- Validation Complete: All configuration files are valid! ---")
+        report = render_text(results, root)
+
+    if options.output is not None:
+        options.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+    if any(not result.ok for result in results):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()